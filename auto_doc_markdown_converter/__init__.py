@@ -9,7 +9,13 @@
 __version__ = "1.0.0"
 __author__ = "Auto Doc Markdown Converter Team"
 
-# 导入核心功能
-from .src.core_processor import process_document_to_markdown
 
-__all__ = ['process_document_to_markdown'] 
\ No newline at end of file
+def __getattr__(name):
+    # 核心功能延迟导入 (见 src/__init__.py)：导入本包不会加载 PDF/DOCX 提取器、requests 或读取配置
+    if name in __all__:
+        from .src import core_processor
+        return getattr(core_processor, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ['process_document_to_markdown', 'convert_to_markdown', 'iter_markdown_blocks'] 
\ No newline at end of file
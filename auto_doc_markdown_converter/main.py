@@ -5,19 +5,80 @@
 (如文件处理、LLM分析、Markdown生成) 来完成文档转换任务。
 """
 import argparse
-import os # 保留 os 是为了 os.listdir，尽管 pathlib.Path.iterdir() 是一个选项
 import logging
 from pathlib import Path
 
 # Project-specific imports
 # 移除了不再直接使用的导入：get_file_type, read_file_content, analyze_text_with_llm, generate_markdown_from_labeled_text
-from src.config import API_KEY, API_ENDPOINT # 仍然需要用于初始检查
+# 处理链 (pipeline、core_processor 及 PDF/DOCX 提取器、requests) 在解析参数之后才导入，
+# 使 `python main.py --help` 以及参数错误时能够立即返回 (见 tests/test_import_time.py)；
+# 配置项 (config.X) 同样在解析参数之后才读取，此前不会加载 .env 文件
+from src import config
+from src.config import STRUCTURE_MODES
 from src.utils import setup_logging # 导入新的日志设置函数
-from src.core_processor import process_document_to_markdown # 导入新的核心处理函数
+from src.stage_artifacts import STAGES
 
 # Basic Logging Configuration - 将被移除
 # logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+def _positive_int(value: str) -> int:
+    """argparse 类型函数：解析正整数。"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' 不是有效的整数")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"'{value}' 不是正整数")
+    return number
+
+# 文件大小单位 (--min-size / --max-size)
+_SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024 ** 2, "MB": 1024 ** 2, "G": 1024 ** 3, "GB": 1024 ** 3}
+
+def _file_size(value: str) -> int:
+    """argparse 类型函数：解析文件大小，例如 500K、20MB、1G (不带单位时为字节)。"""
+    text = value.strip().upper()
+    number_part = text.rstrip("KMGB")
+    unit = text[len(number_part):]
+    try:
+        number = float(number_part)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' 不是有效的文件大小")
+    if unit not in _SIZE_UNITS or number < 0:
+        raise argparse.ArgumentTypeError(f"'{value}' 不是有效的文件大小")
+    return int(number * _SIZE_UNITS[unit])
+
+def _print_conversion_plan(args, input_filepaths, input_path: Path, logger: logging.Logger) -> int:
+    """--plan：估算转换用量并输出表格 (以及 JSON)，不调用 LLM。"""
+    import json
+    from src.conversion_planner import load_price_table, plan_conversion
+    from src.llm_latency import load_latency_model
+
+    try:
+        price_table = load_price_table(args.price_table or config.LLM_PRICE_TABLE)
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    logger.info("估算模式：只运行提取与文本分割，不调用 LLM。")
+    plan = plan_conversion(input_filepaths, structure_mode=args.structure_mode, extract_workers=args.jobs,
+                           llm_concurrency=args.llm_threads or config.MAX_CONCURRENT_LLM_REQUESTS,
+                           price_table=price_table, latency=load_latency_model(config.LLM_LATENCY_PROFILE),
+                           deduplicate=not args.no_dedup and config.BATCH_DEDUPLICATION)
+    if not plan.files:
+        logger.info("在指定的输入路径中未找到要估算的 .docx 或 .pdf 文件。")
+    if args.plan_json == "-":
+        print(json.dumps(plan.to_dict(), ensure_ascii=False, indent=2))
+    else:
+        print(plan.format_report(str(input_path) if input_path.is_dir() else None))
+        if args.plan_json:
+            try:
+                with open(args.plan_json, "w", encoding="utf-8") as f:
+                    json.dump(plan.to_dict(), f, ensure_ascii=False, indent=2)
+            except OSError as e:
+                logger.error(f"无法写入估算结果 {args.plan_json}: {e}")
+                return 1
+            logger.info(f"估算结果已保存到: {args.plan_json}")
+    return 0 if not any(file_plan.error for file_plan in plan.files) else 1
+
 def main_cli():
     """
     命令行界面主函数。
@@ -27,8 +88,53 @@ def main_cli():
     parser.add_argument("input_path", type=str, help="输入文件（.docx, .pdf）或目录的路径。")
     parser.add_argument("output_dir", type=str, help="保存 Markdown 文件的目录路径。")
     parser.add_argument("-v", "--verbose", action="store_true", help="启用详细输出以进行调试。")
+    parser.add_argument("--structure-mode", choices=STRUCTURE_MODES, default=None,
+                        help="文档结构识别模式：llm 由 LLM 标注全文；layout 对 PDF 按版面特征本地标注，"
+                             "仅将低置信度区域交给 LLM；outline 仅将候选标题行交给 LLM 指定层级；"
+                             "rules 按编号规则离线识别，置信度不足时才调用 LLM；"
+                             "classifier 使用本地训练的标题分类器，仅将低概率的行交给 LLM。"
+                             "默认取环境变量 STRUCTURE_MODE (llm)。")
+    parser.add_argument("-j", "--jobs", type=_positive_int, default=None,
+                        help="并行提取文本的工作进程数 (CPU 密集部分)，默认取环境变量 PIPELINE_EXTRACT_WORKERS。")
+    parser.add_argument("--llm-threads", type=_positive_int, default=None,
+                        help="并发 LLM 请求的线程数 (网络 I/O 部分)，在所有文件之间共享，"
+                             "默认取环境变量 MAX_CONCURRENT_LLM_REQUESTS (5)。")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量转换：根据输出目录中的构建清单跳过内容和转换设置都未变化的文件，"
+                             "并删除输入已不存在的文件的输出。")
+    parser.add_argument("--from-stage", choices=STAGES, default=STAGES[0],
+                        help="从指定阶段开始重新处理，之前阶段的输出从中间结果包 (STAGE_ARTIFACTS_DIR) 读取。"
+                             "例如修改 Markdown 渲染后使用 render，无需重新提取或调用 LLM。"
+                             "缺少所需中间结果的文件会从较早的阶段开始。默认 extract (完整处理)。")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="递归处理输入目录的所有子目录，输出目录保持与输入相同的目录结构。")
+    parser.add_argument("--include", action="append", default=[], metavar="PATTERN",
+                        help="只处理与 glob 模式匹配的文件，可重复指定。含 '/' 的模式匹配相对于输入目录的路径，"
+                             "否则匹配文件名，例如 --include '*.pdf' --include 'reports/2024/*'。")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="跳过与 glob 模式匹配的文件和目录，可重复指定，匹配规则同 --include。")
+    parser.add_argument("--min-size", type=_file_size, default=None,
+                        help="跳过小于该大小的文件，例如 1K。")
+    parser.add_argument("--max-size", type=_file_size, default=None,
+                        help="跳过大于该大小的文件，例如 50MB。")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="不检测内容相同的输入文件 (默认每组逐字节相同的文件只转换一个，其余文件复用其输出；"
+                             "亦可通过环境变量 BATCH_DEDUPLICATION=false 关闭)。")
+    parser.add_argument("--plan", action="store_true",
+                        help="只估算不转换：对每个文件运行提取与文本分割 (不调用 LLM)，输出每个文件及合计的请求数、"
+                             "输入/输出 token 数、费用与预计耗时。")
+    parser.add_argument("--plan-json", metavar="FILE", default=None,
+                        help="与 --plan 一起使用，将估算结果以 JSON 格式写入 FILE ('-' 表示标准输出)。")
+    parser.add_argument("--price-table", metavar="JSON", default=None,
+                        help="估算费用所用的价格表 (JSON 文件路径或 JSON 字符串，每百万 token 的价格)，"
+                             "默认取环境变量 LLM_PRICE_TABLE。")
 
     args = parser.parse_args()
+    # 未在命令行指定的选项取环境变量中的配置 (此时才加载配置)
+    if args.structure_mode is None:
+        args.structure_mode = config.STRUCTURE_MODE
+    if args.jobs is None:
+        args.jobs = config.PIPELINE_EXTRACT_WORKERS
 
     # 初始化日志记录
     log_level = logging.DEBUG if args.verbose else logging.INFO
@@ -37,17 +143,24 @@ def main_cli():
     # 获取一个名为 'main' 的记录器实例，或者使用根记录器
     logger = logging.getLogger(__name__) # 或者 logging.getLogger("auto_doc_markdown_converter.main")
 
-    # 1. 初始检查
+    # 1. 初始检查 (估算模式不调用 LLM，不需要 API 凭证)
     logger.debug("正在执行初始检查...")
-    if not API_KEY:
-        logger.critical("LLM_API_KEY 未设置。请设置此环境变量。程序即将退出。") # 使用更严重的级别
-        return 1 
-    if not API_ENDPOINT: 
-        logger.critical("LLM_API_ENDPOINT 未设置。请设置此环境变量。程序即将退出。") # 使用更严重的级别
+    if args.plan_json and not args.plan:
+        parser.error("--plan-json 需要与 --plan 一起使用")
+    if not args.plan:
+        try:
+            config.require_llm_credentials()
+        except EnvironmentError as e:
+            logger.critical(f"{e} 程序即将退出。") # 使用更严重的级别
+            return 1
+        API_KEY, API_ENDPOINT = config.API_KEY, config.API_ENDPOINT
+
+        logger.info(f"使用的 LLM API 密钥: {'*' * (len(API_KEY) - 4) + API_KEY[-4:] if API_KEY else '未设置'}")
+        logger.info(f"使用的 LLM API 端点: {API_ENDPOINT if API_ENDPOINT else '未设置'}")
+
+    if args.from_stage != STAGES[0] and not config.STAGE_ARTIFACTS_ENABLED:
+        logger.critical(f"--from-stage {args.from_stage} 需要中间结果包，但未启用 STAGE_ARTIFACTS_ENABLED (之前的运行也需要启用它才会保存结果包)。程序即将退出。")
         return 1
-    
-    logger.info(f"使用的 LLM API 密钥: {'*' * (len(API_KEY) - 4) + API_KEY[-4:] if API_KEY else '未设置'}")
-    logger.info(f"使用的 LLM API 端点: {API_ENDPOINT if API_ENDPOINT else '未设置'}")
 
     input_path = Path(args.input_path)
     output_dir = Path(args.output_dir)
@@ -56,61 +169,100 @@ def main_cli():
         logger.error(f"输入路径不存在: {input_path}")
         return 1
 
-    try:
-        output_dir.mkdir(parents=True, exist_ok=True) 
-        logger.info(f"确保输出目录已创建: {output_dir}")
-    except OSError as e:
-        logger.error(f"无法创建输出目录 {output_dir}: {e}")
-        return 1
-
-    # 2. 文件处理逻辑
-    logger.debug("开始文件处理逻辑...")
-    files_to_process = []
-    if input_path.is_file():
-        if input_path.suffix.lower() in ['.docx', '.pdf']:
-            files_to_process.append(input_path)
-        else:
-            logger.warning(f"输入文件 {input_path.name} 不是 .docx 或 .pdf 文件。已跳过。")
-    elif input_path.is_dir():
-        logger.info(f"正在处理目录中的文件: {input_path}")
+    if not args.plan:
         try:
-            # 使用 pathlib.Path.iterdir() 替代 os.listdir()
-            for item_path in input_path.iterdir():
-                if item_path.is_file() and item_path.suffix.lower() in ['.docx', '.pdf']:
-                    files_to_process.append(item_path)
+            output_dir.mkdir(parents=True, exist_ok=True) 
+            logger.info(f"确保输出目录已创建: {output_dir}")
         except OSError as e:
-            logger.error(f"无法读取目录 {input_path} 中的文件: {e}")
-            return 1 # 如果无法列出目录，则退出
-    else:
+            logger.error(f"无法创建输出目录 {output_dir}: {e}")
+            return 1
+
+    if not input_path.is_file() and not input_path.is_dir():
         logger.error(f"输入路径 {input_path} 不是有效的文件或目录。")
         return 1
-        
-    if not files_to_process:
-        logger.info("在指定的输入路径中未找到要处理的 .docx 或 .pdf 文件。")
-        return 0
 
-    processed_count = 0
-    error_count = 0
+    from src.pipeline import DocumentPipeline # 多文档流水线 (内部使用 core_processor 的各处理阶段)
+    from src.build_manifest import BuildManifest, conversion_settings
+    from src.file_discovery import discover_documents
+
+    # 2. 文件发现：逐个产出文件，流水线在发现第一个文件后即开始处理，不必等待整个目录遍历完成
+    logger.debug("开始文件处理逻辑...")
+    if input_path.is_dir():
+        logger.info(f"正在{'递归' if args.recursive else ''}处理目录中的文件: {input_path}")
+    discovered = []  # 已发现的文件 (包括增量模式下跳过的文件)
+    skipped_count = [0]
 
-    for file_path_obj in files_to_process: 
-        full_input_file_path_str = str(file_path_obj)
-        # file_name_for_logging = file_path_obj.name # core_processor 内部会记录文件名
+    manifest = None
+    if args.incremental:
+        manifest = BuildManifest(str(output_dir), conversion_settings(args.structure_mode))
 
-        # 调用核心处理函数
-        # logger.info(f"正在处理文件: {file_name_for_logging}...") # core_processor 会记录开始处理
-        
-        # 注意：我们将 output_dir (Path 对象) 转换为字符串，因为 core_processor 当前期望字符串路径
-        result_md_path = process_document_to_markdown(str(file_path_obj), str(output_dir))
+    def files_to_process():
+        for file_path in discover_documents(str(input_path), recursive=args.recursive,
+                                            include=args.include, exclude=args.exclude,
+                                            min_size=args.min_size, max_size=args.max_size):
+            discovered.append(file_path)
+            # 从中间阶段重新处理通常是因为下游逻辑变化 (不体现在转换设置中)，此时不跳过任何文件
+            if manifest is not None and args.from_stage == STAGES[0] and manifest.is_up_to_date(file_path):
+                skipped_count[0] += 1
+                continue
+            yield file_path
 
-        if result_md_path:
-            logger.info(f"文件 '{file_path_obj.name}' 已成功处理并保存到 '{result_md_path}'。")
-            processed_count += 1
+    if args.plan:
+        return _print_conversion_plan(args, files_to_process(), input_path, logger)
+
+    # 3. 以流水线方式处理所有文件：不同文件的提取 (进程池)、LLM 调用 (共享线程池) 与写入可以同时进行
+    logger.info(f"提取进程数 {args.jobs}，LLM 并发数 {args.llm_threads or config.MAX_CONCURRENT_LLM_REQUESTS}。")
+    if args.from_stage != STAGES[0]:
+        logger.info(f"从 '{args.from_stage}' 阶段开始处理，之前阶段的输出从中间结果包读取: {config.STAGE_ARTIFACTS_DIR}")
+    pipeline = DocumentPipeline(str(output_dir), structure_mode=args.structure_mode,
+                                extract_workers=args.jobs, llm_workers=args.llm_threads,
+                                artifacts_dir=config.STAGE_ARTIFACTS_DIR if config.STAGE_ARTIFACTS_ENABLED else None,
+                                from_stage=args.from_stage,
+                                input_root=str(input_path) if input_path.is_dir() else None,
+                                deduplicate=False if args.no_dedup else None)
+    completed_count = [0]
+
+    def report_document(result):
+        # 每个文件完成时立即报告，不必等待整批文件
+        completed_count[0] += 1
+        file_name = Path(result.input_filepath).name
+        progress = f"(第 {completed_count[0]} 个)"
+        if result.output_path:
+            reused = f" (复用了内容相同的 '{Path(result.duplicate_of).name}' 的结果)" if result.duplicate_of else ""
+            logger.info(f"{progress} 文件 '{file_name}' 已成功处理并保存到 '{result.output_path}'{reused}。")
+            if manifest is not None:
+                manifest.record(result.input_filepath, result.output_path)
         else:
-            # process_document_to_markdown 内部已记录详细错误日志
-            logger.error(f"处理文件 '{file_path_obj.name}' 失败。详情请查看之前的日志。")
-            error_count += 1
+            # 流水线各阶段内部已记录详细错误日志
+            logger.error(f"{progress} 处理文件 '{file_name}' 失败。详情请查看之前的日志。")
+            if manifest is not None:
+                manifest.forget(result.input_filepath)
+
+    try:
+        report = pipeline.run(files_to_process(), on_document_done=report_document)
+        if manifest is not None:
+            # 只清理输入文件已被删除的记录：被本次过滤条件排除的文件仍保留其输出
+            manifest.remove_orphans(str(input_path))
+    finally:
+        if manifest is not None:
+            manifest.save()
+        # 保存本次运行中 LLM 请求的实测耗时，供之后的 --plan 估算使用
+        from src.llm_latency import save_latency_samples
+        save_latency_samples(config.LLM_LATENCY_PROFILE)
+
+    if skipped_count[0]:
+        logger.info(f"增量模式: {skipped_count[0]} 个文件的内容和转换设置均未变化，已跳过。")
+    if not report.results:
+        if manifest is not None and discovered:
+            logger.info("增量模式: 没有需要重新转换的文件。")
+        else:
+            logger.info("在指定的输入路径中未找到要处理的 .docx 或 .pdf 文件。")
+        return 0
 
+    processed_count = sum(1 for result in report.results if result.output_path)
+    error_count = len(report.results) - processed_count
     logger.info(f"处理完成。成功处理 {processed_count} 个文件，发生 {error_count} 个错误。")
+    logger.info(f"吞吐量统计: {report.throughput_summary()}")
     return 0 if error_count == 0 else 1
 
 if __name__ == "__main__":
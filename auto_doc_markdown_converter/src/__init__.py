@@ -5,26 +5,47 @@ auto_doc_markdown_converter.src 包初始化文件。
 通过导入 `process_document_to_markdown` 函数，提供了一个便捷的
 核心功能调用入口。同时，也使得 `config` 和 `utils` 等基础模块
 可以从包级别访问。
+
+包级别的名称都是延迟导入的 (PEP 562 模块 __getattr__)：导入本包本身不会加载 pdfplumber、
+python-docx、requests 等较重的依赖，也不会读取配置；只有在首次访问对应名称时才导入相应的模块。
 """
-# 导入项目的主要配置和工具
-from . import config
-from . import utils
+import importlib
+from typing import Any
+
+# 包级别名称 -> (模块, 属性)；属性为 None 时表示模块本身
+_LAZY_ATTRIBUTES = {
+    # 项目的主要配置和工具
+    'config': ('.config', None),
+    'utils': ('.utils', None),
+    # 各个处理模块 (这些通常由核心处理器或主应用间接使用)
+    'docx_extractor': ('.docx_extractor', None),
+    'pdf_extractor': ('.pdf_extractor', None),
+    'file_handler': ('.file_handler', None),
+    'llm_processor': ('.llm_processor', None),
+    'markdown_generator': ('.markdown_generator', None),
+    # 核心处理函数，使其可从 src 包直接访问
+    'process_document_to_markdown': ('.core_processor', 'process_document_to_markdown'),
+    'convert_to_markdown': ('.core_processor', 'convert_to_markdown'),
+    'iter_markdown_blocks': ('.core_processor', 'iter_markdown_blocks'),
+    # 文本分割相关函数以及 text_splitter 模块本身
+    'estimate_tokens': ('.text_splitter', 'estimate_tokens'),
+    'split_text_into_chunks': ('.text_splitter', 'split_text_into_chunks'),
+    'text_splitter': ('.text_splitter', None),
+}
 
-# 导入各个处理模块 (这些通常由核心处理器或主应用间接使用)
-from . import docx_extractor
-from . import pdf_extractor
-from . import file_handler
-from . import llm_processor
-from . import markdown_generator
 
-# 导入并导出核心处理函数，使其可从 src 包直接访问
-from .core_processor import process_document_to_markdown
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    module = importlib.import_module(module_name, __name__)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value  # 之后的访问不再经过 __getattr__
+    return value
 
-# 导入并导出文本分割相关函数
-from .text_splitter import estimate_tokens, split_text_into_chunks
 
-# 也导入 text_splitter 模块本身，如果需要的话
-from . import text_splitter # 确保 text_splitter 模块被导入
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
 
 
 # 定义 __all__ 以明确指定从 "from src import *" 时应导入的内容
@@ -33,6 +54,8 @@ __all__ = [
     'config',           # 应用程序配置
     'utils',            # 通用工具函数 (例如 setup_logging)
     'process_document_to_markdown', # 核心文档处理函数
+    'convert_to_markdown', # 内存中的文档 -> Markdown 字符串
+    'iter_markdown_blocks', # 内存中的文档 -> Markdown 块迭代器
     'estimate_tokens',  # Token 估算函数
     'split_text_into_chunks', # 文本分割函数
     'text_splitter',    # 文本分割模块 (如果希望用户能通过 src.text_splitter 访问)
@@ -0,0 +1,80 @@
+"""
+批量处理中的重复输入检测。
+
+共享目录中经常在不同文件夹里存放同一份文档的多个逐字节相同的副本，原先每个副本都会被单独提取并调用 LLM。
+DuplicateDetector 在文件被交给流水线时判断它是否与本批次中较早出现的某个文件内容相同：
+
+- 先比较文件大小 (一次 stat)：大小与之前所有文件都不同的文件一定不是副本，不需要读取内容；
+- 只有大小相同 (且扩展名相同，提取方式由扩展名决定) 时才计算 SHA-256，已计算的摘要会被缓存，
+  每个文件最多读取一次。
+
+流水线只转换每组相同文件中的第一个 (代表文件)，其余副本在代表文件完成后复制其输出 (见 pipeline.py)。
+"""
+import os
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .utils import compute_file_sha256
+
+logger = logging.getLogger(__name__)
+
+
+class DeduplicationSummary(NamedTuple):
+    """一次批量处理中重复输入的统计。"""
+    duplicates: int  # 复用了代表文件输出的副本数
+    extract_seconds_saved: float  # 副本无需提取而节省的提取时间 (按代表文件的提取耗时计)
+    tokens_saved: int  # 副本无需处理而节省的估算 token 数 (按代表文件提取文本的 token 数计)
+    files_hashed: int  # 因大小相同而计算了摘要的文件数
+    bytes_hashed: int
+
+    def summary(self) -> str:
+        return (f"{self.duplicates} 个重复文件复用了已转换的输出，节省提取时间约 {self.extract_seconds_saved:.2f}s、"
+                f"约 {self.tokens_saved} tokens (为此计算了 {self.files_hashed} 个文件的摘要，"
+                f"共 {self.bytes_hashed / (1024 * 1024):.1f} MB)")
+
+
+class DuplicateDetector:
+    """
+    按 "大小 → 内容摘要" 两级比较识别内容相同的文件。所有方法都是线程安全的。
+    """
+
+    def __init__(self):
+        # {(文件大小, 扩展名): [该大小下各不相同的代表文件路径]}
+        self._by_size: Dict[Tuple[int, str], List[str]] = {}
+        self._hashes: Dict[str, Optional[str]] = {}  # 已计算的内容摘要，读取失败时为 None
+        self.files_hashed = 0
+        self.bytes_hashed = 0
+        self._lock = threading.Lock()
+
+    def _hash(self, path: str, size: int) -> Optional[str]:
+        if path not in self._hashes:
+            try:
+                self._hashes[path] = compute_file_sha256(path)
+                self.files_hashed += 1
+                self.bytes_hashed += size
+            except OSError as e:
+                logger.debug(f"计算文件摘要失败，按不重复处理: {path}: {e}")
+                self._hashes[path] = None
+        return self._hashes[path]
+
+    def find_original(self, input_filepath: str) -> Optional[str]:
+        """
+        返回本批次中较早出现的、与 input_filepath 内容相同的代表文件路径；
+        没有时返回 None，并将 input_filepath 记为新的代表文件。无法读取的文件总是按不重复处理。
+        """
+        try:
+            size = os.path.getsize(input_filepath)
+        except OSError:
+            return None
+        key = (size, os.path.splitext(input_filepath)[1].lower())
+        with self._lock:
+            candidates = self._by_size.setdefault(key, [])
+            if candidates:
+                sha256 = self._hash(input_filepath, size)
+                if sha256 is not None:
+                    for candidate in candidates:
+                        if self._hash(candidate, size) == sha256:
+                            return candidate
+            candidates.append(input_filepath)
+            return None
@@ -0,0 +1,206 @@
+"""
+增量转换的构建清单。
+
+重复运行 `main.py input/ out/` 时，未变化的文件也会重新转换并再次调用 LLM。
+增量模式在输出目录中维护一个清单文件 (MANIFEST_FILENAME)，为每个输入文件记录：
+- 文件内容的 SHA-256 摘要，以及计算摘要时的大小与修改时间 (mtime_ns)；
+- 对应的输出文件路径；
+- 转换设置的摘要 (见 conversion_settings：模型、提示词版本、文本分割参数、结构识别模式等)。
+
+输入内容与转换设置都未变化、且输出文件仍存在的文件会被跳过；大小与 mtime 都未变化时直接复用
+记录的摘要，不重新读取文件。新增或变化的文件重新转换；输入已被删除的文件，其输出也会被删除。
+清单采用"临时文件 + os.replace"的方式原子写入。
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+from .utils import compute_file_sha256
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = ".auto_doc_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def conversion_settings(structure_mode: str) -> Dict[str, Any]:
+    """返回影响转换输出的设置。其中任一项变化时，已转换的文件都需要重新转换。"""
+    from . import config
+    from .llm_processor import PROMPT_VERSION
+    from .extraction_cache import EXTRACTOR_VERSIONS
+    from .core_processor import MAX_TOKENS_FOR_DIRECT_PROCESSING
+    from .text_splitter import DEFAULT_MAX_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, DEFAULT_CHAR_TO_TOKEN_RATIO
+
+    settings: Dict[str, Any] = {
+        "model": config.LLM_MODEL_ID,
+        "prompt_version": PROMPT_VERSION,
+        "extractor_versions": EXTRACTOR_VERSIONS,
+        "splitter": {
+            "max_chunk_tokens": DEFAULT_MAX_CHUNK_TOKENS,
+            "overlap_tokens": DEFAULT_OVERLAP_TOKENS,
+            "direct_processing_tokens": MAX_TOKENS_FOR_DIRECT_PROCESSING,
+            "char_to_token_ratio": DEFAULT_CHAR_TO_TOKEN_RATIO,
+            "chunking": config.TEXT_CHUNKING,
+        },
+        "normalization": [config.TEXT_NORMALIZATION, config.TEXT_NORMALIZATION_STEPS],
+        "structure_mode": structure_mode,
+    }
+    if structure_mode == "layout":
+        settings["layout_threshold"] = config.LAYOUT_CONFIDENCE_THRESHOLD
+    elif structure_mode == "outline":
+        settings["outline_context_lines"] = config.OUTLINE_CONTEXT_LINES
+    elif structure_mode == "rules":
+        settings["rules"] = [config.STRUCTURE_RULE_SETS, config.STRUCTURE_RULES_FILE, config.RULES_CONFIDENCE_THRESHOLD]
+    elif structure_mode == "classifier":
+        settings["classifier"] = [config.HEADING_CLASSIFIER_MODEL, config.CLASSIFIER_CONFIDENCE_THRESHOLD]
+    return settings
+
+
+def settings_digest(settings: Dict[str, Any]) -> str:
+    """计算转换设置的摘要。"""
+    material = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+class BuildManifest:
+    """
+    输出目录中的构建清单。
+
+    参数:
+        output_dir: 输出目录，清单保存在该目录下的 MANIFEST_FILENAME 中。
+        settings: conversion_settings 的返回值。
+    """
+
+    def __init__(self, output_dir: str, settings: Dict[str, Any]):
+        self.output_dir = output_dir
+        self.settings_digest = settings_digest(settings)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+        # 本次运行中已计算的内容摘要 {输入绝对路径: (size, mtime_ns, sha256)}，供 record 复用
+        self._hashes: Dict[str, tuple] = {}
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.output_dir, MANIFEST_FILENAME)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"构建清单 {self.path} 无法读取，将重新转换所有文件: {e}")
+            return {}
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            logger.warning(f"构建清单 {self.path} 版本不兼容，将重新转换所有文件。")
+            return {}
+        return data.get("entries") or {}
+
+    def save(self) -> None:
+        """原子地写入清单。写入失败只记录警告 (下次运行会重新转换)。"""
+        with self._lock:
+            data = {"version": MANIFEST_VERSION, "entries": self._entries}
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, prefix=".manifest-", suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"写入构建清单 {self.path} 失败: {e}")
+
+    def _content_hash(self, abs_path: str, entry: Optional[Dict[str, Any]]) -> Optional[str]:
+        """返回文件内容摘要；大小与 mtime 都与清单记录一致时复用记录的摘要。"""
+        try:
+            stat = os.stat(abs_path)
+        except OSError as e:
+            logger.debug(f"无法获取文件状态: {abs_path}: {e}")
+            return None
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            sha256 = entry.get("sha256")
+        else:
+            try:
+                sha256 = compute_file_sha256(abs_path)
+            except OSError as e:
+                logger.debug(f"计算文件哈希失败: {abs_path}: {e}")
+                return None
+        with self._lock:
+            self._hashes[abs_path] = (stat.st_size, stat.st_mtime_ns, sha256)
+        return sha256
+
+    def is_up_to_date(self, input_filepath: str) -> bool:
+        """输入内容与转换设置都未变化、且上次的输出文件仍存在时返回 True。"""
+        abs_path = os.path.abspath(input_filepath)
+        with self._lock:
+            entry = self._entries.get(abs_path)
+        if not entry or entry.get("settings") != self.settings_digest:
+            return False
+        output_path = entry.get("output")
+        if not output_path or not os.path.isfile(output_path):
+            return False
+        sha256 = self._content_hash(abs_path, entry)
+        if sha256 is None or sha256 != entry.get("sha256"):
+            return False
+        # 内容未变化但 mtime 变了 (例如文件被复制或 touch)：更新记录，下次无需重新计算摘要
+        size, mtime_ns, _ = self._hashes[abs_path]
+        with self._lock:
+            entry["size"], entry["mtime_ns"] = size, mtime_ns
+        return True
+
+    def record(self, input_filepath: str, output_path: str) -> None:
+        """记录一次成功的转换。"""
+        abs_path = os.path.abspath(input_filepath)
+        with self._lock:
+            known = self._hashes.get(abs_path)
+        if known is None:
+            if self._content_hash(abs_path, None) is None:
+                return
+            with self._lock:
+                known = self._hashes[abs_path]
+        size, mtime_ns, sha256 = known
+        with self._lock:
+            self._entries[abs_path] = {
+                "sha256": sha256, "size": size, "mtime_ns": mtime_ns,
+                "output": os.path.abspath(output_path), "settings": self.settings_digest,
+            }
+
+    def forget(self, input_filepath: str) -> None:
+        """删除输入文件的记录 (例如转换失败时)，下次运行会重新转换。"""
+        with self._lock:
+            self._entries.pop(os.path.abspath(input_filepath), None)
+
+    def remove_orphans(self, input_root: str) -> List[str]:
+        """
+        删除位于 input_root 之下、但输入文件已不存在的记录及其输出。
+
+        只处理 input_root (文件或目录) 范围内的记录，因此不同输入目录可以共用同一个输出目录。
+        输入文件仍然存在时 (例如本次运行被 --include / --exclude、大小过滤或非递归遍历排除) 保留其输出。
+        输出文件仍被其他输入文件使用时不会被删除。
+
+        返回:
+            List[str]: 已删除的输出文件路径。
+        """
+        root = os.path.abspath(input_root)
+        removed: List[str] = []
+        with self._lock:
+            orphans = [path for path in self._entries
+                       if (path == root or path.startswith(root.rstrip(os.sep) + os.sep)) and not os.path.exists(path)]
+            for path in orphans:
+                output_path = self._entries.pop(path).get("output")
+                still_used = any(entry.get("output") == output_path for entry in self._entries.values())
+                if not output_path or still_used:
+                    continue
+                try:
+                    os.remove(output_path)
+                    removed.append(output_path)
+                    logger.info(f"输入文件 '{path}' 已不存在，已删除其输出: {output_path}")
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"删除孤立的输出文件 {output_path} 失败: {e}")
+        return removed
@@ -0,0 +1,120 @@
+"""
+长文档分块 LLM 处理的检查点。
+
+长文档被分成数十个文本块分别交给 LLM 时，只要有一个文本块失败，整篇文档就会失败，
+重新运行又要为所有文本块再付一次费用。本模块为每个文档维护一个检查点文件 (JSONL)：
+每个文本块的 LLM 结果在完成时立即追加写入，重新运行 (或重试失败的文本块) 时已完成的文本块直接复用。
+
+- 检查点文件按输入文件的绝对路径命名，保存在 CHUNK_CHECKPOINT_DIR 中；内存中的文档 (例如 Web 应用的上传)
+  没有稳定的路径，按内容摘要命名，同名的不同文档不会共用检查点；
+- 每条记录以 "模型 + 提示词版本 + 文本块内容" 的摘要为键，因此文档被修改后，未受影响的文本块仍可复用，
+  模型或提示词变化后旧记录自动失效；
+- 进程在写入过程中被中断时，最后一行可能不完整，加载时会被跳过；
+- 文档成功转换后检查点会被删除。
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SUFFIX = ".jsonl"
+
+
+def chunk_key(chunk: str) -> str:
+    """返回文本块的检查点键：模型、提示词版本与文本块内容的摘要。"""
+    from .config import LLM_MODEL_ID
+    from .llm_processor import PROMPT_VERSION
+    material = json.dumps([LLM_MODEL_ID, PROMPT_VERSION, chunk], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ChunkCheckpoint:
+    """
+    单个文档的文本块结果检查点。所有方法都是线程安全的。
+
+    参数:
+        path: 检查点文件路径，父目录不存在时会自动创建。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._results: Dict[str, str] = self._load()
+
+    def _load(self) -> Dict[str, str]:
+        results: Dict[str, str] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for raw_line in f:
+                    try:
+                        record = json.loads(raw_line)
+                        results[record["key"]] = record["result"]
+                    except (ValueError, KeyError, TypeError):
+                        logger.debug(f"跳过检查点 {self.path} 中不完整的记录。")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"无法读取检查点 {self.path}，将重新处理所有文本块: {e}")
+        if results:
+            logger.info(f"已从检查点恢复 {len(results)} 个文本块的 LLM 结果: {self.path}")
+        return results
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._results)
+
+    def get(self, chunk: str) -> Optional[str]:
+        """返回文本块已保存的 LLM 结果，没有时返回 None。"""
+        key = chunk_key(chunk)
+        with self._lock:
+            return self._results.get(key)
+
+    def put(self, chunk: str, result: str) -> None:
+        """保存文本块的 LLM 结果 (立即追加写入文件)。写入失败只记录警告。"""
+        key = chunk_key(chunk)
+        line = json.dumps({"key": key, "result": result}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._results[key] = result
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                logger.warning(f"写入检查点 {self.path} 失败: {e}")
+
+    def discard(self) -> None:
+        """文档转换成功后删除检查点。"""
+        with self._lock:
+            self._results.clear()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除检查点 {self.path} 失败: {e}")
+
+
+def open_chunk_checkpoint(input_filepath: str, content_hash: Optional[str] = None) -> Optional[ChunkCheckpoint]:
+    """
+    打开输入文件对应的检查点。
+
+    参数:
+        input_filepath (str): 输入文件路径。
+        content_hash (Optional[str]): 内存中文档内容的 SHA-256 摘要；给出时按内容而不是名称命名检查点。
+
+    返回:
+        Optional[ChunkCheckpoint]: 若配置中禁用了检查点 (CHUNK_CHECKPOINT_ENABLED=false)，则返回 None。
+    """
+    from . import config  # 在调用时读取，以便测试中修改配置后生效
+
+    if not config.CHUNK_CHECKPOINT_ENABLED:
+        return None
+    if content_hash:
+        name = "memory-" + content_hash[:32]
+    else:
+        name = hashlib.sha256(os.path.abspath(input_filepath).encode("utf-8")).hexdigest()[:32]
+    return ChunkCheckpoint(os.path.join(config.CHUNK_CHECKPOINT_DIR, name + CHECKPOINT_SUFFIX))
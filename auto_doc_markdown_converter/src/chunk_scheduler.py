@@ -0,0 +1,229 @@
+"""
+进程级 LLM 文本块调度器。
+
+按文档各自创建 ThreadPoolExecutor(max_workers=MAX_CONCURRENT_LLM_REQUESTS) 时，只有一两个文本块的短文档
+会让大部分并发槽位空闲，批量处理大量小文件时实际上一次只有一个请求在进行。
+ChunkScheduler 维护一组常驻工作线程和一个优先级队列，接收来自多个文档的文本块：
+
+- 只要队列中还有任务，所有工作线程都保持忙碌；
+- 调度策略决定不同文档之间的先后顺序：
+    "fifo"            按提交顺序；
+    "shortest_first"  总长度最短的文档优先，使小文档尽早完成 (默认)；
+    "deadline"        截止时间最早的文档优先，未指定截止时间的文档排在最后；
+  同一文档的文本块总是按原始顺序出队；
+- 文档的最后一个文本块完成时立即调用该文档的完成回调，不必等待整批文档；
+  也可以注册文本块回调，在每个文本块成功时立即处理其结果 (例如流式写入，见 markdown_writer.py)。
+
+一个文本块失败 (返回 None 或抛出异常) 时，按文档原有的优先级重新排队，最多尝试 max_attempts 次；
+仍然失败时文档被标记为失败，同一文档尚未开始的文本块会被跳过。
+
+一个任务本身可能发出多个 LLM 请求 (例如 "layout" 等结构识别模式把整个文档作为一个任务提交)。
+任务已经占用了一个工作线程，即一个全局并发槽位，因此这些请求必须在任务内串行执行，
+否则实际并发会达到 工作线程数 × 每个任务的并发数。处理函数通过 llm_request_workers 获取可用的并发数。
+"""
+import time
+import queue
+import logging
+import itertools
+import threading
+from typing import Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_POLICIES = ("shortest_first", "fifo", "deadline")
+
+# 标记当前线程是否为调度器的工作线程
+_worker_context = threading.local()
+
+
+def llm_request_workers(limit: int) -> int:
+    """
+    返回当前线程中一组 LLM 请求可以使用的并发数：在调度器的工作线程中为 1 (任务已占用一个全局并发槽位)，
+    否则为 limit。
+    """
+    return 1 if getattr(_worker_context, "active", False) else limit
+
+
+class ScheduledDocument:
+    """提交给调度器的一个文档。可通过 wait() 等待完成，或在提交时注册完成回调。"""
+
+    def __init__(self, name: str, chunks: Sequence, analyzer: Callable[[object], Optional[str]],
+                 on_complete: Optional[Callable[["ScheduledDocument"], None]],
+                 on_chunk_complete: Optional[Callable[[int, str], None]] = None, retain_results: bool = True):
+        self.name = name
+        self.chunks = list(chunks)
+        self.analyzer = analyzer
+        self.results: List[Optional[str]] = [None] * len(self.chunks)
+        self.failed = False
+        self.submitted_at = time.perf_counter()
+        self.completed_at: Optional[float] = None
+        self._remaining = len(self.chunks)
+        self._attempts = [0] * len(self.chunks)
+        self._on_complete = on_complete
+        self._on_chunk_complete = on_chunk_complete
+        self._retain_results = retain_results
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[List[str]]:
+        """等待文档的全部文本块完成，返回按原始顺序排列的结果；任一文本块失败或等待超时时返回 None。"""
+        if not self._done.wait(timeout) or self.failed:
+            return None
+        return list(self.results)
+
+    def _record(self, chunk_index: int, result: Optional[str]) -> bool:
+        """记录一个文本块的结果，返回文档是否已全部完成。"""
+        if result is not None and self._on_chunk_complete is not None:
+            # 在计入完成之前调用：文档的完成回调执行时，所有文本块回调都已返回
+            try:
+                self._on_chunk_complete(chunk_index, result)
+            except Exception as e:
+                logger.warning(f"文档 '{self.name}' 的文本块回调发生错误: {e}", exc_info=True)
+        with self._lock:
+            if self._retain_results:
+                self.results[chunk_index] = result
+            if result is None:
+                self.failed = True
+            self._remaining -= 1
+            return self._remaining == 0
+
+    def _finish(self) -> None:
+        self.completed_at = time.perf_counter()
+        if self._on_complete is not None:
+            try:
+                self._on_complete(self)
+            except Exception as e:
+                logger.warning(f"文档 '{self.name}' 的完成回调发生错误: {e}", exc_info=True)
+        self._done.set()
+
+
+class ChunkScheduler:
+    """
+    在所有文档之间共享的 LLM 文本块调度器。
+
+    参数:
+        workers: 工作线程数，即全局 LLM 并发上限。
+        policy: 调度策略，见 SCHEDULER_POLICIES。
+        max_attempts: 每个文本块最多尝试的次数 (含首次)。
+    """
+
+    def __init__(self, workers: int, policy: str = "shortest_first", max_attempts: int = 1):
+        if policy not in SCHEDULER_POLICIES:
+            raise ValueError(f"未知的调度策略 '{policy}'，可选: {', '.join(SCHEDULER_POLICIES)}")
+        self.workers = workers
+        self.policy = policy
+        self.max_attempts = max(1, max_attempts)
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._closed:
+                raise RuntimeError("调度器已关闭。")
+            if not self._threads:
+                for index in range(self.workers):
+                    thread = threading.Thread(target=self._worker, name=f"llm-scheduler-{index}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _document_key(self, size: int, deadline: Optional[float], sequence: int) -> tuple:
+        if self.policy == "shortest_first":
+            return (size, sequence)
+        if self.policy == "deadline":
+            return (deadline if deadline is not None else float("inf"), sequence)
+        return (sequence,)
+
+    def submit_document(self, chunks: Sequence, analyzer: Callable[[object], Optional[str]],
+                        name: str = "", size: Optional[int] = None, deadline: Optional[float] = None,
+                        on_complete: Optional[Callable[[ScheduledDocument], None]] = None,
+                        on_chunk_complete: Optional[Callable[[int, str], None]] = None,
+                        retain_results: bool = True) -> ScheduledDocument:
+        """
+        提交一个文档的全部文本块。
+
+        参数:
+            chunks: 文本块 (或任意任务参数)，每个元素调用一次 analyzer。
+            analyzer: 处理单个文本块的函数，返回 None 表示失败。
+            name: 文档名称，用于日志。
+            size: "shortest_first" 策略使用的文档大小，默认为各文本块长度之和。
+            deadline: "deadline" 策略使用的截止时间 (time.perf_counter() 时间基准)。
+            on_complete: 文档全部文本块完成 (或失败) 时在工作线程中调用的回调。
+            on_chunk_complete: 每个文本块成功时在工作线程中调用的回调，参数为 (文本块序号, 结果)，调用顺序不确定。
+            retain_results: 是否在 results 中保存各文本块的结果。结果由 on_chunk_complete 处理时可设为 False，
+                            此时 results 中全部为 None，只有 failed 表示文档是否失败。
+
+        返回:
+            ScheduledDocument: 文档句柄。没有文本块的文档会立即完成。
+        """
+        document = ScheduledDocument(name, chunks, analyzer, on_complete, on_chunk_complete, retain_results)
+        if not document.chunks:
+            document._finish()
+            return document
+        self._ensure_started()
+        if size is None:
+            size = sum(len(chunk) if hasattr(chunk, "__len__") else 1 for chunk in document.chunks)
+        key = self._document_key(size, deadline, next(self._sequence))
+        for chunk_index in range(len(document.chunks)):
+            # 同一文档的文本块共享文档优先级，并按原始顺序出队
+            self._queue.put((key, chunk_index, document))
+        return document
+
+    def pending_chunks(self) -> int:
+        """队列中尚未开始处理的文本块数 (近似值)。"""
+        return self._queue.qsize()
+
+    def _worker(self) -> None:
+        _worker_context.active = True
+        while True:
+            item = self._queue.get()
+            if item[2] is None:
+                break
+            key, chunk_index, document = item
+            result = None
+            if not document.failed:
+                document._attempts[chunk_index] += 1
+                try:
+                    result = document.analyzer(document.chunks[chunk_index])
+                except Exception as e:
+                    logger.error(f"处理文档 '{document.name}' 的第 {chunk_index + 1} 个文本块时发生意外错误: {e}",
+                                 exc_info=True)
+                if result is None:
+                    if document._attempts[chunk_index] < self.max_attempts:
+                        logger.warning(f"文档 '{document.name}' 的第 {chunk_index + 1} 个文本块处理失败，将重试 "
+                                       f"(已尝试 {document._attempts[chunk_index]}/{self.max_attempts} 次)。")
+                        self._queue.put((key, chunk_index, document))
+                        continue
+                    logger.error(f"文档 '{document.name}' 的第 {chunk_index + 1} 个文本块处理失败。")
+            if document._record(chunk_index, result):
+                document._finish()
+
+    def shutdown(self) -> None:
+        """处理完队列中已有的任务后停止工作线程。"""
+        with self._start_lock:
+            self._closed = True
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            # 结束标记排在所有任务之后
+            self._queue.put(((float("inf"), float("inf")), next(self._sequence), None))
+        for thread in threads:
+            thread.join()
+
+
+_scheduler: Optional[ChunkScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_chunk_scheduler() -> ChunkScheduler:
+    """返回按配置 (MAX_CONCURRENT_LLM_REQUESTS / LLM_SCHEDULER_POLICY / LLM_CHUNK_MAX_ATTEMPTS) 创建的进程内共享调度器。"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from .config import MAX_CONCURRENT_LLM_REQUESTS, LLM_SCHEDULER_POLICY, LLM_CHUNK_MAX_ATTEMPTS
+            _scheduler = ChunkScheduler(MAX_CONCURRENT_LLM_REQUESTS, LLM_SCHEDULER_POLICY, LLM_CHUNK_MAX_ATTEMPTS)
+        return _scheduler
@@ -16,111 +16,311 @@
                 例如："qwen-plus", "qwen-turbo", "qwen-max"。
                 如果未设置，应用程序将在 `llm_processor.py` 中使用默认模型 (当前为 "qwen-plus")。
 
-如果关键配置（LLM_API_KEY 或 LLM_API_ENDPOINT）缺失，
-程序在启动时会记录严重错误并引发 EnvironmentError 异常。
+配置在首次访问任一配置项 (例如 `config.STRUCTURE_MODE` 或 `from .config import API_KEY`) 时才加载，
+导入本模块本身不会读取 .env 文件，也不会因为缺少配置而失败，因此 `main.py --help`、测试收集和
+短生命周期的工作进程都不必为此付出代价。
+关键配置 (LLM_API_KEY 或 LLM_API_ENDPOINT) 在真正使用时才校验：
+调用 require_llm_credentials() 时，若其中任一项缺失，会记录严重错误并引发 EnvironmentError 异常。
 """
 import os
 import logging
-from dotenv import load_dotenv # 导入 load_dotenv
+import threading
+from typing import Any, Dict, Tuple
 
 # 获取模块特定的记录器
 logger = logging.getLogger(__name__)
 
-# 尝试从 .env 文件加载环境变量
-# .env 文件应该位于项目根目录 (即 config.py 往上两级目录)
-# __file__ 是当前文件 (config.py) 的路径
-# os.path.dirname(__file__) 是 src 目录
-# os.path.dirname(os.path.dirname(__file__)) 是 auto_doc_markdown_converter 目录 (项目子根，如果src在里面)
-# os.path.dirname(os.path.dirname(os.path.dirname(__file__))) 是真正的项目根目录
-# 假设 src 目录位于项目根目录下的 auto_doc_markdown_converter 文件夹中
-# 则 .env 文件应该在 auto_doc_markdown_converter 的父目录中
-# 如果结构是 /project_root/auto_doc_markdown_converter/src/config.py
-# 那么 .env 在 /project_root/.env
-project_root_env = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '.env'))
-# 或者，如果 .env 和 main.py 同级，且 main.py 在项目根
-# project_root_env = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env')) # 如果config.py在src/下，.env在auto_doc_markdown_converter/下
-
-# 最常见的情况是 .env 文件在项目的最顶层根目录
-# 我们假设项目的结构是 /<project_root>/auto_doc_markdown_converter/src/config.py
-# 则 .env 文件在 /<project_root>/.env
-dotenv_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".env")) 
-# 这个路径是根据当前文件 (auto_doc_markdown_converter/src/config.py) 计算的
-# .. 返回到 auto_doc_markdown_converter/src
-# .. 返回到 auto_doc_markdown_converter
-# 所以，这里假设 .env 文件与 auto_doc_markdown_converter 文件夹同级，即在项目的根目录下。
-# 如果项目结构是： auto-doc-markdown-converter (root) / .env
-#                    auto-doc-markdown-converter (root) / auto_doc_markdown_converter (package) / src / config.py
-# 则正确的路径应该是：
-dotenv_path_correct = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".env"))
-
-# 考虑到脚本可能从不同位置运行，我们尝试加载 .env (通常在项目根目录)
-# load_dotenv() 会自动查找当前目录或父目录中的 .env 文件，通常这就够了
-# 但为了明确性，可以指定路径。
-# 假设 config.py 在 my_project/src/config.py，而 .env 在 my_project/.env
-# 则 .env 路径是 os.path.join(os.path.dirname(__file__), "..", "..", ".env")
-# 对于当前结构 /auto_doc_markdown_converter/auto_doc_markdown_converter/src/config.py
-# .env 在 /auto_doc_markdown_converter/.env
-final_dotenv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", ".env")
-
-if os.path.exists(final_dotenv_path):
-    logger.info(f"正在从 {final_dotenv_path} 加载环境变量...")
-    load_dotenv(dotenv_path=final_dotenv_path, override=True) # override=True 允许 .env 文件覆盖已存在的系统环境变量
-else:
-    logger.info(f".env 文件未在预期路径 {final_dotenv_path} 找到。将仅使用系统环境变量。")
-    # 如果没有 .env 文件，load_dotenv() 不会报错，而是静默失败，后续 os.environ.get 会回退到系统变量
-    load_dotenv(override=True) # 尝试从标准位置加载，如果存在的话
-
-# 从环境变量中读取 API 密钥
-# 此密钥用于授权对 DashScope API 的访问。
-API_KEY = os.environ.get("LLM_API_KEY")
-
-# 从环境变量中读取 API 端点
-# 这是 DashScope OpenAI 兼容模式的基础 URL。
-API_ENDPOINT = os.environ.get("LLM_API_ENDPOINT")
-
-# 从环境变量中读取模型 ID (可选)
-# 用户可以通过此变量指定要使用的 LLM 模型。
-LLM_MODEL_ID = os.environ.get("LLM_MODEL_ID")
-
-# 检查必需的环境变量是否已设置
-if API_KEY is None:
-    logger.critical("关键配置缺失：环境变量 LLM_API_KEY 未找到 (请检查 .env 文件或系统环境变量)。这是访问 DashScope API 的必需凭证。")
-    raise EnvironmentError("环境变量 LLM_API_KEY 未找到。请在运行应用程序之前设置它 (可配置于 .env 文件或系统环境变量)。")
-
-if API_ENDPOINT is None:
-    logger.critical("关键配置缺失：环境变量 LLM_API_ENDPOINT 未找到 (请检查 .env 文件或系统环境变量)。这是访问 DashScope API 的必需端点。")
-    raise EnvironmentError("环境变量 LLM_API_ENDPOINT 未找到。请在运行应用程序之前设置它 (可配置于 .env 文件或系统环境变量)。")
-
-# 记录模型 ID 的使用情况
-if LLM_MODEL_ID:
-    logger.info(f"LLM 模型 ID: {LLM_MODEL_ID} (来自 .env 文件或系统环境变量)")
-else:
-    logger.info("环境变量 LLM_MODEL_ID 未设置。应用程序将在 llm_processor.py 中使用默认模型 ID (例如 'qwen-plus')。")
-
-# LLM API 调用超时时间 (单位：秒)
-# 从环境变量 LLM_API_CALL_TIMEOUT 读取，如果未设置，则默认为 300 秒 (5分钟)
-# 使用 os.getenv 是为了方便处理环境变量未设置时返回 None 的情况，然后我们可以提供默认值。
-# int() 转换确保了我们得到的是整数类型。
-LLM_API_CALL_TIMEOUT_STR = os.environ.get("LLM_API_CALL_TIMEOUT", "300")
-try:
-    LLM_API_CALL_TIMEOUT = int(LLM_API_CALL_TIMEOUT_STR)
-    if LLM_API_CALL_TIMEOUT <= 0:
-        logger.warning(f"环境变量 LLM_API_CALL_TIMEOUT 的值 '{LLM_API_CALL_TIMEOUT_STR}' 不是一个正整数，将使用默认值 300 秒。")
+# 配置只加载一次；加载前访问任一配置项会触发加载 (见模块末尾的 __getattr__)
+_load_lock = threading.RLock()
+_loaded = False
+# importlib.reload(config) 会重新执行本模块，但不会删除上次加载的配置项；
+# 在此删除，使重新加载后的首次访问按当前环境变量重新读取
+for _stale_name in globals().pop("_loaded_names", ()):
+    globals().pop(_stale_name, None)
+_loaded_names: Tuple[str, ...] = ()
+
+# 可选的文档结构识别模式 (见 _read_settings 中的 STRUCTURE_MODE)；固定不变，访问时不会触发加载配置
+STRUCTURE_MODES = ("llm", "layout", "outline", "rules", "classifier")
+
+
+def _read_bool_env(name: str, default: bool) -> bool:
+    """读取布尔型环境变量。接受 1/true/yes/on 与 0/false/no/off (不区分大小写)，其他值回退到默认值。"""
+    raw_value = os.environ.get(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+    normalized = raw_value.strip().lower()
+    if normalized in ("1", "true", "yes", "on"):
+        return True
+    if normalized in ("0", "false", "no", "off"):
+        return False
+    logger.warning(f"环境变量 {name} 的值 '{raw_value}' 不是有效的布尔值，将使用默认值 {default}。")
+    return default
+
+
+def _read_positive_int_env(name: str, default: int) -> int:
+    """读取正整数型环境变量，缺失或非法时记录警告并回退到默认值。"""
+    raw_value = os.environ.get(name, str(default))
+    try:
+        value = int(raw_value)
+    except ValueError:
+        logger.warning(f"环境变量 {name} 的值 '{raw_value}' 不是有效的整数，将使用默认值 {default}。")
+        return default
+    if value <= 0:
+        logger.warning(f"环境变量 {name} 的值 '{raw_value}' 不是一个正整数，将使用默认值 {default}。")
+        return default
+    return value
+
+
+def _read_ratio_env(name: str, default: float) -> float:
+    """读取 0 到 1 之间的浮点型环境变量，缺失或非法时记录警告并回退到默认值。"""
+    raw_value = os.environ.get(name, str(default))
+    try:
+        value = float(raw_value)
+    except ValueError:
+        value = -1.0
+    if not 0 <= value <= 1:
+        logger.warning(f"环境变量 {name} 的值 '{raw_value}' 不是 0 到 1 之间的数值，将使用默认值 {default}。")
+        return default
+    return value
+
+
+def _load_dotenv_file() -> None:
+    """从 .env 文件加载环境变量 (python-dotenv 在此时才导入)。"""
+    from dotenv import load_dotenv # 导入 load_dotenv
+
+    # 预期的 .env 路径相对于本文件计算，与运行时的工作目录无关；不存在时由 load_dotenv() 自行查找
+    final_dotenv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", ".env")
+
+    if os.path.exists(final_dotenv_path):
+        logger.info(f"正在从 {final_dotenv_path} 加载环境变量...")
+        load_dotenv(dotenv_path=final_dotenv_path, override=True) # override=True 允许 .env 文件覆盖已存在的系统环境变量
+    else:
+        logger.info(f".env 文件未在预期路径 {final_dotenv_path} 找到。将仅使用系统环境变量。")
+        # 如果没有 .env 文件，load_dotenv() 不会报错，而是静默失败，后续 os.environ.get 会回退到系统变量
+        load_dotenv(override=True) # 尝试从标准位置加载，如果存在的话
+
+
+def _read_settings() -> Dict[str, Any]:
+    """从环境变量读取所有配置项，返回 {配置项名称: 值}。"""
+    # 从环境变量中读取 API 密钥
+    # 此密钥用于授权对 DashScope API 的访问。
+    API_KEY = os.environ.get("LLM_API_KEY")
+
+    # 从环境变量中读取 API 端点
+    # 这是 DashScope OpenAI 兼容模式的基础 URL。
+    API_ENDPOINT = os.environ.get("LLM_API_ENDPOINT")
+
+    # 从环境变量中读取模型 ID (可选)
+    # 用户可以通过此变量指定要使用的 LLM 模型。
+    LLM_MODEL_ID = os.environ.get("LLM_MODEL_ID")
+
+    # 必需的 LLM_API_KEY 与 LLM_API_ENDPOINT 在使用时由 require_llm_credentials() 校验
+
+    # 记录模型 ID 的使用情况
+    if LLM_MODEL_ID:
+        logger.info(f"LLM 模型 ID: {LLM_MODEL_ID} (来自 .env 文件或系统环境变量)")
+    else:
+        logger.info("环境变量 LLM_MODEL_ID 未设置。应用程序将在 llm_processor.py 中使用默认模型 ID (例如 'qwen-plus')。")
+
+    # LLM API 调用超时时间 (单位：秒)
+    # 从环境变量 LLM_API_CALL_TIMEOUT 读取，如果未设置，则默认为 300 秒 (5分钟)
+    # 使用 os.getenv 是为了方便处理环境变量未设置时返回 None 的情况，然后我们可以提供默认值。
+    # int() 转换确保了我们得到的是整数类型。
+    LLM_API_CALL_TIMEOUT_STR = os.environ.get("LLM_API_CALL_TIMEOUT", "300")
+    try:
+        LLM_API_CALL_TIMEOUT = int(LLM_API_CALL_TIMEOUT_STR)
+        if LLM_API_CALL_TIMEOUT <= 0:
+            logger.warning(f"环境变量 LLM_API_CALL_TIMEOUT 的值 '{LLM_API_CALL_TIMEOUT_STR}' 不是一个正整数，将使用默认值 300 秒。")
+            LLM_API_CALL_TIMEOUT = 300
+    except ValueError:
+        logger.warning(f"环境变量 LLM_API_CALL_TIMEOUT 的值 '{LLM_API_CALL_TIMEOUT_STR}' 不是有效的整数，将使用默认值 300 秒。")
         LLM_API_CALL_TIMEOUT = 300
-except ValueError:
-    logger.warning(f"环境变量 LLM_API_CALL_TIMEOUT 的值 '{LLM_API_CALL_TIMEOUT_STR}' 不是有效的整数，将使用默认值 300 秒。")
-    LLM_API_CALL_TIMEOUT = 300
-logger.info(f"LLM API 调用超时时间配置为: {LLM_API_CALL_TIMEOUT} 秒")
-
-# 最大并发 LLM 请求数
-# 从环境变量 MAX_CONCURRENT_LLM_REQUESTS 读取，如果未设置，则默认为 5
-MAX_CONCURRENT_LLM_REQUESTS_STR = os.environ.get("MAX_CONCURRENT_LLM_REQUESTS", "5")
-try:
-    MAX_CONCURRENT_LLM_REQUESTS = int(MAX_CONCURRENT_LLM_REQUESTS_STR)
-    if MAX_CONCURRENT_LLM_REQUESTS <= 0:
-        logger.warning(f"环境变量 MAX_CONCURRENT_LLM_REQUESTS 的值 '{MAX_CONCURRENT_LLM_REQUESTS_STR}' 不是一个正整数，将使用默认值 5。")
+    logger.info(f"LLM API 调用超时时间配置为: {LLM_API_CALL_TIMEOUT} 秒")
+
+    # 最大并发 LLM 请求数
+    # 从环境变量 MAX_CONCURRENT_LLM_REQUESTS 读取，如果未设置，则默认为 5
+    MAX_CONCURRENT_LLM_REQUESTS_STR = os.environ.get("MAX_CONCURRENT_LLM_REQUESTS", "5")
+    try:
+        MAX_CONCURRENT_LLM_REQUESTS = int(MAX_CONCURRENT_LLM_REQUESTS_STR)
+        if MAX_CONCURRENT_LLM_REQUESTS <= 0:
+            logger.warning(f"环境变量 MAX_CONCURRENT_LLM_REQUESTS 的值 '{MAX_CONCURRENT_LLM_REQUESTS_STR}' 不是一个正整数，将使用默认值 5。")
+            MAX_CONCURRENT_LLM_REQUESTS = 5
+    except ValueError:
+        logger.warning(f"环境变量 MAX_CONCURRENT_LLM_REQUESTS 的值 '{MAX_CONCURRENT_LLM_REQUESTS_STR}' 不是有效的整数，将使用默认值 5。")
         MAX_CONCURRENT_LLM_REQUESTS = 5
-except ValueError:
-    logger.warning(f"环境变量 MAX_CONCURRENT_LLM_REQUESTS 的值 '{MAX_CONCURRENT_LLM_REQUESTS_STR}' 不是有效的整数，将使用默认值 5。")
-    MAX_CONCURRENT_LLM_REQUESTS = 5
-logger.info(f"最大并发 LLM 请求数配置为: {MAX_CONCURRENT_LLM_REQUESTS}")
+    logger.info(f"最大并发 LLM 请求数配置为: {MAX_CONCURRENT_LLM_REQUESTS}")
+
+
+    # 提取结果缓存 (见 extraction_cache.py)
+    # 重复转换同一批文档时 (例如只更换了模型或提示词)，可直接复用之前的 PDF/DOCX 文本提取结果。
+    # EXTRACTION_CACHE_ENABLED: 是否启用缓存，默认启用。
+    # EXTRACTION_CACHE_DIR: 缓存目录，默认为 ~/.cache/auto_doc_markdown_converter/extraction。
+    # EXTRACTION_CACHE_MAX_MB: 缓存总大小上限 (MB)，超出后按最近最少使用顺序淘汰，默认 512。
+    EXTRACTION_CACHE_ENABLED = _read_bool_env("EXTRACTION_CACHE_ENABLED", True)
+    EXTRACTION_CACHE_DIR = os.environ.get("EXTRACTION_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "auto_doc_markdown_converter", "extraction"
+    )
+    EXTRACTION_CACHE_MAX_MB = _read_positive_int_env("EXTRACTION_CACHE_MAX_MB", 512)
+    if EXTRACTION_CACHE_ENABLED:
+        logger.info(f"提取结果缓存已启用: 目录 {EXTRACTION_CACHE_DIR}，上限 {EXTRACTION_CACHE_MAX_MB} MB")
+    else:
+        logger.info("提取结果缓存已禁用 (EXTRACTION_CACHE_ENABLED)。")
+
+    # 提取文本规范化 (见 text_normalizer.py)
+    # TEXT_NORMALIZATION: 规范化的适用范围。"pdf" (默认) 仅处理 PDF 文本 (视觉换行问题主要出现在 PDF 中)，
+    #                     "all" 处理所有文档，"off" 关闭规范化。
+    # TEXT_NORMALIZATION_STEPS: 逗号分隔的步骤列表，默认执行全部步骤:
+    #                           join_lines, dehyphenate, collapse_whitespace, unify_width
+    TEXT_NORMALIZATION = os.environ.get("TEXT_NORMALIZATION", "pdf").strip().lower()
+    if TEXT_NORMALIZATION not in ("off", "pdf", "all"):
+        logger.warning(f"环境变量 TEXT_NORMALIZATION 的值 '{TEXT_NORMALIZATION}' 无效 (可选 off/pdf/all)，将使用默认值 'pdf'。")
+        TEXT_NORMALIZATION = "pdf"
+    TEXT_NORMALIZATION_STEPS = [
+        step.strip() for step in os.environ.get(
+            "TEXT_NORMALIZATION_STEPS", "join_lines,dehyphenate,collapse_whitespace,unify_width"
+        ).split(",") if step.strip()
+    ]
+    logger.info(f"文本规范化范围: {TEXT_NORMALIZATION}，步骤: {', '.join(TEXT_NORMALIZATION_STEPS)}")
+
+    # 文档结构识别模式 (可被命令行参数 --structure-mode 覆盖)
+    # STRUCTURE_MODE: "llm" (默认) 将全文交给 LLM 标注；
+    #                 "layout" 对 PDF 根据字号/字体等版面特征在本地标注，仅将低置信度区域交给 LLM (DOCX 仍使用 "llm")；
+    #                 "outline" 在本地筛选可能是标题的行，只将候选行 (附带编号和少量上下文) 交给 LLM 指定层级；
+    #                 "rules" 按编号规则 (第X章、一、、（一）、1.1.1 等) 离线识别，文档置信度低于阈值时才交给 LLM；
+    #                 "classifier" 使用由 LLM 标注蒸馏得到的本地分类器，仅将低概率的行交给 LLM。
+    # LAYOUT_CONFIDENCE_THRESHOLD: "layout" 模式下，置信度低于该值的行会交给 LLM 复核，默认 0.75。
+    STRUCTURE_MODE = os.environ.get("STRUCTURE_MODE", "llm").strip().lower()
+    if STRUCTURE_MODE not in STRUCTURE_MODES:
+        logger.warning(f"环境变量 STRUCTURE_MODE 的值 '{STRUCTURE_MODE}' 无效 (可选 {'/'.join(STRUCTURE_MODES)})，将使用默认值 'llm'。")
+        STRUCTURE_MODE = "llm"
+    LAYOUT_CONFIDENCE_THRESHOLD = _read_ratio_env("LAYOUT_CONFIDENCE_THRESHOLD", 0.75)
+    logger.info(f"文档结构识别模式: {STRUCTURE_MODE}")
+    # OUTLINE_CONTEXT_LINES: "outline" 模式下每个候选行前后附带的上下文行数，默认 1。
+    OUTLINE_CONTEXT_LINES = _read_positive_int_env("OUTLINE_CONTEXT_LINES", 1)
+    # STRUCTURE_RULE_SETS: "rules" 模式使用的规则集，逗号分隔，默认 "all" (全部内置规则集及规则文件中的规则集)。
+    # STRUCTURE_RULES_FILE: 可选，自定义规则集的 JSON 文件路径 (格式见 rule_engine.load_rule_sets)。
+    # RULES_CONFIDENCE_THRESHOLD: 文档置信度达到该值时直接使用规则识别结果，否则交给 LLM，默认 0.9。
+    STRUCTURE_RULE_SETS = [name.strip() for name in os.environ.get("STRUCTURE_RULE_SETS", "all").split(",") if name.strip()]
+    STRUCTURE_RULES_FILE = os.environ.get("STRUCTURE_RULES_FILE") or None
+    RULES_CONFIDENCE_THRESHOLD = _read_ratio_env("RULES_CONFIDENCE_THRESHOLD", 0.9)
+
+    # 本地标题分类器 (见 heading_classifier.py)
+    # HEADING_CLASSIFIER_TRAINING_LOG: 可选，设置后每次 LLM 全文标注的 (特征, 标签) 对会追加写入该 JSONL 文件，用于训练分类器。
+    # HEADING_CLASSIFIER_MODEL: "classifier" 模式使用的模型文件，默认 ~/.cache/auto_doc_markdown_converter/heading_classifier.json。
+    # CLASSIFIER_CONFIDENCE_THRESHOLD: 分类器预测概率低于该值的行交给 LLM 复核，默认 0.8。
+    HEADING_CLASSIFIER_TRAINING_LOG = os.environ.get("HEADING_CLASSIFIER_TRAINING_LOG") or None
+    HEADING_CLASSIFIER_MODEL = os.environ.get("HEADING_CLASSIFIER_MODEL") or os.path.join(
+        os.path.expanduser("~"), ".cache", "auto_doc_markdown_converter", "heading_classifier.json"
+    )
+    CLASSIFIER_CONFIDENCE_THRESHOLD = _read_ratio_env("CLASSIFIER_CONFIDENCE_THRESHOLD", 0.8)
+    if HEADING_CLASSIFIER_TRAINING_LOG:
+        logger.info(f"标题分类器训练日志: {HEADING_CLASSIFIER_TRAINING_LOG}")
+
+    # 多文档流水线 (见 pipeline.py)
+    # PIPELINE_EXTRACT_WORKERS: 提取阶段 (进程池) 的工作进程数，默认为 min(4, CPU 核数)。
+    # PIPELINE_QUEUE_SIZE: 各阶段之间有界队列的容量，队列满时上游阶段阻塞 (背压)，默认 8。
+    PIPELINE_EXTRACT_WORKERS = _read_positive_int_env("PIPELINE_EXTRACT_WORKERS", min(4, os.cpu_count() or 1))
+    PIPELINE_QUEUE_SIZE = _read_positive_int_env("PIPELINE_QUEUE_SIZE", 8)
+    # LLM_SCHEDULER_POLICY: 批量处理时多个文档的文本块共享一个 LLM 调度器 (见 chunk_scheduler.py)，该项决定文档之间的先后顺序：
+    #                       "shortest_first" (默认) 总长度最短的文档优先；"fifo" 按提交顺序；"deadline" 截止时间最早的文档优先。
+    LLM_SCHEDULER_POLICIES = ("shortest_first", "fifo", "deadline")
+    LLM_SCHEDULER_POLICY = os.environ.get("LLM_SCHEDULER_POLICY", "shortest_first").strip().lower()
+    if LLM_SCHEDULER_POLICY not in LLM_SCHEDULER_POLICIES:
+        logger.warning(f"环境变量 LLM_SCHEDULER_POLICY 的值 '{LLM_SCHEDULER_POLICY}' 无效 "
+                       f"(可选 {'/'.join(LLM_SCHEDULER_POLICIES)})，将使用默认值 'shortest_first'。")
+        LLM_SCHEDULER_POLICY = "shortest_first"
+
+    # 分块 LLM 处理的检查点与重试 (见 chunk_checkpoint.py)
+    # CHUNK_CHECKPOINT_ENABLED: 是否为长文档保存每个文本块的 LLM 结果，默认启用。中断或失败后重新运行时只处理未完成的文本块。
+    # CHUNK_CHECKPOINT_DIR: 检查点目录，默认为 ~/.cache/auto_doc_markdown_converter/checkpoints。
+    # LLM_CHUNK_MAX_ATTEMPTS: 每个文本块最多尝试的次数 (含首次)，默认 3。只有失败的文本块会被重新发送。
+    CHUNK_CHECKPOINT_ENABLED = _read_bool_env("CHUNK_CHECKPOINT_ENABLED", True)
+    CHUNK_CHECKPOINT_DIR = os.environ.get("CHUNK_CHECKPOINT_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "auto_doc_markdown_converter", "checkpoints"
+    )
+    LLM_CHUNK_MAX_ATTEMPTS = _read_positive_int_env("LLM_CHUNK_MAX_ATTEMPTS", 3)
+
+    # 各处理阶段的中间结果包 (见 stage_artifacts.py)
+    # STAGE_ARTIFACTS_ENABLED: 是否保存每个文档各阶段 (提取、分割、LLM、合并、渲染) 的输出，默认不启用
+    #                          (结果包包含全文与全部 LLM 输出，且不会被自动清理)。
+    #                          启用后可以通过 main.py 的 --from-stage 选项从任一阶段重新开始处理。
+    # STAGE_ARTIFACTS_DIR: 中间结果包目录，默认为 ~/.cache/auto_doc_markdown_converter/artifacts。
+    STAGE_ARTIFACTS_ENABLED = _read_bool_env("STAGE_ARTIFACTS_ENABLED", False)
+    STAGE_ARTIFACTS_DIR = os.environ.get("STAGE_ARTIFACTS_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "auto_doc_markdown_converter", "artifacts"
+    )
+
+    # TEXT_CHUNKING: 长文档的分块方式。"fixed" (默认) 按固定 token 预算切分并在块之间保留重叠；
+    #                "content_defined" 按段落内容 (滚动哈希) 决定块边界，修改文档的一处只会使附近一两个块发生变化，
+    #                配合检查点 (CHUNK_CHECKPOINT_*) 重新转换修改过的长文档时只需重新发送这些块。
+    TEXT_CHUNKING = os.environ.get("TEXT_CHUNKING", "fixed").strip().lower()
+    if TEXT_CHUNKING not in ("fixed", "content_defined"):
+        logger.warning(f"环境变量 TEXT_CHUNKING 的值 '{TEXT_CHUNKING}' 无效 (可选 fixed/content_defined)，将使用默认值 'fixed'。")
+        TEXT_CHUNKING = "fixed"
+
+    # STREAMING_MARKDOWN_WRITER: 批量处理分块的长文档时，是否在文本块完成时就按原始顺序合并并追加写入 Markdown
+    #                            (见 markdown_writer.py)，默认启用。写入临时文件，全部完成后原子地替换为最终文件。
+    #                            保存中间结果包 (STAGE_ARTIFACTS_ENABLED) 时同样流式写入，文档完成后再记录合并与渲染结果；
+    #                            记录分类器训练样本 (HEADING_CLASSIFIER_TRAINING_LOG) 时需要完整的合并结果，不使用流式写入。
+    STREAMING_MARKDOWN_WRITER = _read_bool_env("STREAMING_MARKDOWN_WRITER", True)
+
+    # BATCH_DEDUPLICATION: 批量处理时是否检测内容相同的输入文件 (先比较大小，大小相同时再比较 SHA-256)，默认启用。
+    #                      每组相同的文件只转换第一个，其余文件直接复制其输出 (见 batch_dedup.py)。
+    BATCH_DEDUPLICATION = _read_bool_env("BATCH_DEDUPLICATION", True)
+
+    # 内容覆盖检查 (见 coverage_checker.py)
+    # COVERAGE_CHECK: 是否检查每个文本块的 LLM 标注结果是否覆盖了原文，默认启用。标签格式不规范的行在本地修复，
+    #                 被遗漏或被概括的原文片段单独重新发送给 LLM，并为每个文档记录覆盖率。
+    # COVERAGE_LINE_THRESHOLD: 原文一行中至少有该比例的 n-gram 出现在输出中才视为已覆盖，默认 0.5。
+    COVERAGE_CHECK = _read_bool_env("COVERAGE_CHECK", True)
+    COVERAGE_LINE_THRESHOLD = _read_ratio_env("COVERAGE_LINE_THRESHOLD", 0.5)
+
+    # 转换估算 (main.py --plan，见 conversion_planner.py)
+    # LLM_PRICE_TABLE: 价格表，JSON 文件路径或 JSON 字符串，形如 {"currency": "CNY", "qwen-plus": {"input": 0.8, "output": 2.0}}
+    #                  (每百万 token 的价格)，覆盖 conversion_planner.DEFAULT_PRICE_TABLE 中的同名模型。
+    # LLM_LATENCY_PROFILE: LLM 请求耗时记录文件，每次批量转换后追加实测样本，估算墙钟时间时使用。
+    #                      默认为 ~/.cache/auto_doc_markdown_converter/llm_latency.json。
+    LLM_PRICE_TABLE = os.environ.get("LLM_PRICE_TABLE") or None
+    LLM_LATENCY_PROFILE = os.environ.get("LLM_LATENCY_PROFILE") or os.path.join(
+        os.path.expanduser("~"), ".cache", "auto_doc_markdown_converter", "llm_latency.json"
+    )
+
+    return {name: value for name, value in locals().items() if name.isupper()}
+
+
+def load_config() -> None:
+    """加载 .env 文件并读取所有配置项，使其成为本模块的属性。重复调用不会重新加载。"""
+    global _loaded, _loaded_names
+    with _load_lock:
+        if _loaded:
+            return
+        _load_dotenv_file()
+        settings = _read_settings()
+        globals().update(settings)
+        _loaded_names = tuple(settings)
+        _loaded = True
+
+
+def require_llm_credentials() -> None:
+    """
+    校验调用 LLM 所必需的配置。
+
+    异常:
+        EnvironmentError: LLM_API_KEY 或 LLM_API_ENDPOINT 未设置。
+    """
+    load_config()
+    if API_KEY is None:
+        logger.critical("关键配置缺失：环境变量 LLM_API_KEY 未找到 (请检查 .env 文件或系统环境变量)。这是访问 DashScope API 的必需凭证。")
+        raise EnvironmentError("环境变量 LLM_API_KEY 未找到。请在运行应用程序之前设置它 (可配置于 .env 文件或系统环境变量)。")
+    if API_ENDPOINT is None:
+        logger.critical("关键配置缺失：环境变量 LLM_API_ENDPOINT 未找到 (请检查 .env 文件或系统环境变量)。这是访问 DashScope API 的必需端点。")
+        raise EnvironmentError("环境变量 LLM_API_ENDPOINT 未找到。请在运行应用程序之前设置它 (可配置于 .env 文件或系统环境变量)。")
+
+
+def __getattr__(name: str) -> Any:
+    # 首次访问配置项 (大写名称) 时加载配置；加载后配置项是普通的模块属性，不再经过这里
+    if name.isupper() and not _loaded:
+        load_config()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,305 @@
+"""
+转换估算 (dry run)。
+
+在启动大批量转换之前估算其 LLM 用量、费用与耗时：对每个文件只运行提取与文本分割 (以及规则引擎、版面分析、
+标题分类器等本地步骤)，列出将要发送的 LLM 请求 (见 core_processor.plan_llm_requests)，但不调用 LLM。
+
+- 输入 token：系统提示词 + 用户消息 (按 text_splitter.estimate_tokens 估算)；
+- 输出 token：结构标注请求中 LLM 会为每个非空行回显 "标签: 内容"，按此估算；大纲模式的请求只回复 "编号: 标签"；
+- 费用：按价格表 (DEFAULT_PRICE_TABLE，可通过 LLM_PRICE_TABLE 覆盖) 中当前模型每百万 token 的输入/输出价格计算；
+- 墙钟时间：单次请求耗时由实测样本拟合 (见 llm_latency.py)，按 LLM 并发数折算；提取耗时取估算过程中的实测值，
+  按提取进程数折算。流水线中提取与 LLM 调用并行进行，总耗时按较慢的阶段计。
+
+估算不包括失败请求的重试；增量模式下已是最新的文件、以及内容重复的文件 (见 batch_dedup.py) 不计入请求。
+"""
+import os
+import json
+import time
+import logging
+import concurrent.futures
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from . import core_processor
+from .batch_dedup import DuplicateDetector
+from .llm_latency import LatencyModel, fit_latency_model
+from .llm_processor import STRUCTURE_ANALYSIS_SYSTEM_PROMPT, OUTLINE_SYSTEM_PROMPT, DEFAULT_DASHSCOPE_MODEL_ID
+from .text_splitter import estimate_tokens
+from .utils import document_log_context
+
+logger = logging.getLogger(__name__)
+
+# 参考价格 (每百万 token，人民币)，以服务商当前公布的价格为准，可通过 LLM_PRICE_TABLE 覆盖或补充
+DEFAULT_PRICE_TABLE: Dict[str, Any] = {
+    "currency": "CNY",
+    "qwen-turbo": {"input": 0.3, "output": 0.6},
+    "qwen-plus": {"input": 0.8, "output": 2.0},
+    "qwen-max": {"input": 2.4, "output": 9.6},
+}
+# 每次请求中消息格式等带来的额外输入 token
+MESSAGE_OVERHEAD_TOKENS = 8
+
+_SYSTEM_PROMPTS = {"structure": STRUCTURE_ANALYSIS_SYSTEM_PROMPT, "outline": OUTLINE_SYSTEM_PROMPT}
+
+
+class ModelPrice(NamedTuple):
+    """模型每百万 token 的输入/输出价格。"""
+    input_per_million: float
+    output_per_million: float
+    currency: str
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        return (input_tokens * self.input_per_million + output_tokens * self.output_per_million) / 1_000_000
+
+
+def load_price_table(source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    读取价格表：source 为 JSON 文件路径或 JSON 字符串，其中的条目覆盖 DEFAULT_PRICE_TABLE 中的同名项。
+
+    异常:
+        ValueError: source 无法读取或不是 JSON 对象。
+    """
+    table = dict(DEFAULT_PRICE_TABLE)
+    if not source:
+        return table
+    try:
+        if os.path.isfile(source):
+            with open(source, "r", encoding="utf-8") as f:
+                overrides = json.load(f)
+        else:
+            overrides = json.loads(source)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"价格表 '{source}' 无法读取: {e}")
+    if not isinstance(overrides, dict):
+        raise ValueError(f"价格表 '{source}' 不是 JSON 对象。")
+    table.update(overrides)
+    return table
+
+
+def price_for_model(table: Dict[str, Any], model: str) -> Optional[ModelPrice]:
+    """返回价格表中 model 的价格；没有该模型或格式不正确时返回 None。"""
+    entry = table.get(model)
+    try:
+        return ModelPrice(float(entry["input"]), float(entry["output"]), str(table.get("currency", "")))
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+def estimate_request_tokens(request: core_processor.LlmRequest) -> Tuple[int, int]:
+    """估算一次请求的 (输入 token 数, 输出 token 数)。"""
+    input_tokens = estimate_tokens(_SYSTEM_PROMPTS[request.kind]) + estimate_tokens(request.text) + MESSAGE_OVERHEAD_TOKENS
+    lines = [line.strip() for line in request.text.split("\n") if line.strip()]
+    if request.kind == "outline":
+        # 只有 "[编号] 内容" 形式的候选行需要回复 "编号: 标签"
+        expected_output = "\n".join(f"{line[1:line.index(']')]}: H2" for line in lines
+                                    if line.startswith("[") and "]" in line)
+    else:
+        expected_output = "\n".join(f"P: {line}" for line in lines)
+    return input_tokens, estimate_tokens(expected_output)
+
+
+class FilePlan(NamedTuple):
+    """单个文件的估算结果。error 不为 None 表示提取或分割失败；duplicate_of 不为 None 表示复用其他文件的结果。"""
+    input_filepath: str
+    requests: int
+    input_tokens: int
+    output_tokens: int
+    llm_seconds: float  # 各请求的估算耗时之和 (串行)
+    extract_seconds: float  # 本次估算中实测的提取与分割耗时
+    cost: Optional[float] = None
+    duplicate_of: Optional[str] = None
+    error: Optional[str] = None
+
+
+class _FileEstimate(NamedTuple):
+    """提取进程返回的结果：每次请求的 (输入 token, 输出 token)。"""
+    request_tokens: Optional[List[Tuple[int, int]]]
+    seconds: float
+    error: Optional[str]
+
+
+def _estimate_file(input_filepath: str, structure_mode: str) -> _FileEstimate:
+    """在提取进程中运行：提取并列出 LLM 请求，返回各请求的 token 估算。"""
+    start = time.perf_counter()
+    with document_log_context(os.path.basename(input_filepath)):
+        document = core_processor.extract_document(input_filepath, structure_mode)
+        if document is None:
+            return _FileEstimate(None, time.perf_counter() - start, "提取失败")
+        requests = core_processor.plan_llm_requests(document, structure_mode)
+        if requests is None:
+            return _FileEstimate(None, time.perf_counter() - start, "文本分割失败")
+    return _FileEstimate([estimate_request_tokens(request) for request in requests], time.perf_counter() - start, None)
+
+
+class ConversionPlan(NamedTuple):
+    """一批文件的估算结果及估算所用的参数。"""
+    files: List[FilePlan]
+    model: str
+    structure_mode: str
+    price: Optional[ModelPrice]
+    latency: LatencyModel
+    llm_concurrency: int
+    extract_workers: int
+
+    def total(self, field: str):
+        return sum(getattr(plan, field) for plan in self.files)
+
+    def total_cost(self) -> Optional[float]:
+        return None if self.price is None else sum(plan.cost or 0.0 for plan in self.files)
+
+    def extract_wall_seconds(self) -> float:
+        return self.total("extract_seconds") / max(1, self.extract_workers)
+
+    def llm_wall_seconds(self) -> float:
+        """所有请求由 llm_concurrency 个工作线程共享；总耗时不少于单个请求的耗时 (按各文件的平均请求耗时取最大值)。"""
+        longest = max((plan.llm_seconds / plan.requests for plan in self.files if plan.requests), default=0.0)
+        return max(self.total("llm_seconds") / max(1, self.llm_concurrency), longest)
+
+    def wall_seconds(self) -> float:
+        """流水线中提取与 LLM 调用并行进行，按较慢的阶段估算。"""
+        return max(self.extract_wall_seconds(), self.llm_wall_seconds())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可序列化为 JSON 的字典。"""
+        return {
+            "model": self.model,
+            "structure_mode": self.structure_mode,
+            "currency": self.price.currency if self.price else None,
+            "price_per_million_tokens": ({"input": self.price.input_per_million, "output": self.price.output_per_million}
+                                         if self.price else None),
+            "latency_model": {"base_seconds": self.latency.base_seconds,
+                              "seconds_per_output_token": self.latency.seconds_per_output_token,
+                              "samples": self.latency.samples},
+            "llm_concurrency": self.llm_concurrency,
+            "extract_workers": self.extract_workers,
+            "files": [plan._asdict() for plan in self.files],
+            "totals": {
+                "files": len(self.files),
+                "failed_files": sum(1 for plan in self.files if plan.error),
+                "duplicate_files": sum(1 for plan in self.files if plan.duplicate_of),
+                "requests": self.total("requests"),
+                "input_tokens": self.total("input_tokens"),
+                "output_tokens": self.total("output_tokens"),
+                "cost": self.total_cost(),
+                "extract_wall_seconds": self.extract_wall_seconds(),
+                "llm_wall_seconds": self.llm_wall_seconds(),
+                "wall_seconds": self.wall_seconds(),
+            },
+        }
+
+    def format_report(self, root: Optional[str] = None) -> str:
+        """生成供终端显示的表格：每个文件一行，最后为合计与耗时估算。root 不为 None 时显示相对路径。"""
+        currency = self.price.currency if self.price else ""
+        header = f"{'文件':<40} {'请求数':>6} {'输入 tokens':>12} {'输出 tokens':>12} {'费用 ' + currency:>12}"
+        rows = [header, "-" * len(header)]
+        for plan in self.files:
+            name = os.path.relpath(plan.input_filepath, root) if root else plan.input_filepath
+            if plan.error:
+                rows.append(f"{name:<40} {plan.error}")
+                continue
+            cost = f"{plan.cost:.4f}" if plan.cost is not None else "-"
+            note = f"  (与 {os.path.basename(plan.duplicate_of)} 相同)" if plan.duplicate_of else ""
+            rows.append(f"{name:<40} {plan.requests:>6} {plan.input_tokens:>12} {plan.output_tokens:>12} {cost:>12}{note}")
+        rows.append("-" * len(header))
+        total_cost = self.total_cost()
+        rows.append(f"{'合计 (' + str(len(self.files)) + ' 个文件)':<40} {self.total('requests'):>6} "
+                    f"{self.total('input_tokens'):>12} {self.total('output_tokens'):>12} "
+                    f"{(f'{total_cost:.4f}' if total_cost is not None else '-'):>12}")
+        if self.price is None:
+            rows.append(f"价格表中没有模型 '{self.model}' 的价格，未估算费用 (可通过 LLM_PRICE_TABLE 或 --price-table 指定)。")
+        latency_source = (f"根据 {self.latency.samples} 次实测请求拟合" if self.latency.samples else "尚无实测数据，使用默认值")
+        rows.append(f"单次请求耗时 ≈ {self.latency.base_seconds:.2f}s + {self.latency.seconds_per_output_token * 1000:.1f}s/千输出 token "
+                    f"({latency_source})")
+        rows.append(f"预计墙钟时间 ≈ {_format_duration(self.wall_seconds())} "
+                    f"(LLM {_format_duration(self.llm_wall_seconds())}，并发 {self.llm_concurrency}；"
+                    f"提取 {_format_duration(self.extract_wall_seconds())}，{self.extract_workers} 个进程)")
+        return "\n".join(rows)
+
+
+def _format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def plan_conversion(input_filepaths: Iterable[str], structure_mode: Optional[str] = None,
+                    extract_workers: int = 1, llm_concurrency: int = 1,
+                    price_table: Optional[Dict[str, Any]] = None, latency: Optional[LatencyModel] = None,
+                    use_processes: bool = True, deduplicate: bool = True) -> ConversionPlan:
+    """
+    估算一批文件的转换用量。
+
+    参数:
+        input_filepaths: 文档路径 (可以是迭代器)。
+        structure_mode: 结构识别模式，为 None 时使用配置 STRUCTURE_MODE。
+        extract_workers: 并行提取的工作者数，同时用于估算提取阶段的耗时。
+        llm_concurrency: 实际转换时的 LLM 并发数，用于估算墙钟时间。
+        price_table: load_price_table 的返回值，默认为 DEFAULT_PRICE_TABLE。
+        latency: 单次请求耗时模型，默认使用 llm_latency 的默认值。
+        use_processes: 提取是否使用进程池；为 False 时使用线程池。
+        deduplicate: 是否将内容相同的文件按一个文件计算。
+
+    返回:
+        ConversionPlan: 按输入顺序排列的各文件估算及合计。
+    """
+    structure_mode = structure_mode or core_processor.STRUCTURE_MODE
+    model = core_processor.LLM_MODEL_ID or DEFAULT_DASHSCOPE_MODEL_ID
+    price = price_for_model(price_table if price_table is not None else DEFAULT_PRICE_TABLE, model)
+    latency = latency or fit_latency_model([])
+    detector = DuplicateDetector() if deduplicate else None
+
+    paths: List[str] = []
+    estimates: Dict[int, _FileEstimate] = {}
+    duplicates: Dict[int, int] = {}
+    first_index: Dict[str, int] = {}
+    executor_class = concurrent.futures.ProcessPoolExecutor if use_processes else concurrent.futures.ThreadPoolExecutor
+    with executor_class(max_workers=extract_workers) as executor:
+        pending: Dict[concurrent.futures.Future, int] = {}
+        remaining = iter(input_filepaths)
+        exhausted = False
+        while not exhausted or pending:
+            # 与流水线相同，在途的任务数有上限，文件列表可以是很长的迭代器
+            while not exhausted and len(pending) < extract_workers * 2:
+                path = next(remaining, None)
+                if path is None:
+                    exhausted = True
+                    break
+                path = str(path)
+                index = len(paths)
+                paths.append(path)
+                original = detector.find_original(path) if detector is not None else None
+                if original is not None:
+                    duplicates[index] = first_index[original]
+                    continue
+                first_index.setdefault(path, index)
+                pending[executor.submit(_estimate_file, path, structure_mode)] = index
+            if not pending:
+                continue
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    estimates[index] = future.result()
+                except Exception as e:
+                    logger.error(f"估算文档 '{paths[index]}' 时发生意外错误: {e}", exc_info=True)
+                    estimates[index] = _FileEstimate(None, 0.0, "估算失败")
+
+    files: List[FilePlan] = []
+    for index, path in enumerate(paths):
+        if index in duplicates:
+            files.append(FilePlan(path, 0, 0, 0, 0.0, 0.0, 0.0 if price else None,
+                                  duplicate_of=paths[duplicates[index]]))
+            continue
+        estimate = estimates[index]
+        if estimate.request_tokens is None:
+            files.append(FilePlan(path, 0, 0, 0, 0.0, estimate.seconds, error=estimate.error))
+            continue
+        input_tokens = sum(tokens[0] for tokens in estimate.request_tokens)
+        output_tokens = sum(tokens[1] for tokens in estimate.request_tokens)
+        files.append(FilePlan(
+            path, len(estimate.request_tokens), input_tokens, output_tokens,
+            sum(latency.request_seconds(tokens[1]) for tokens in estimate.request_tokens), estimate.seconds,
+            price.cost(input_tokens, output_tokens) if price else None,
+        ))
+    return ConversionPlan(files, model, structure_mode, price, latency, llm_concurrency, extract_workers)
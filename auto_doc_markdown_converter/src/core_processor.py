@@ -1,15 +1,33 @@
 import os
 import logging
-from typing import Optional, List # 确保 List 也被导入
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
 import concurrent.futures # 导入 concurrent.futures
 
-from .file_handler import get_file_type, read_file_content
-from .llm_processor import analyze_text_with_llm
-from .markdown_generator import generate_markdown_from_labeled_text
+from .file_handler import get_file_type, read_file_content, read_pdf_layout_lines, detect_content_type, DocumentContent
+from .llm_processor import analyze_text_with_llm, assign_heading_levels_with_llm
+from .markdown_generator import generate_markdown_from_labeled_text, iter_markdown_blocks_from_labeled_text
+from .utils import compute_content_sha256
 from .config import API_KEY, API_ENDPOINT, LLM_MODEL_ID, MAX_CONCURRENT_LLM_REQUESTS # 导入 MAX_CONCURRENT_LLM_REQUESTS
+from .config import TEXT_NORMALIZATION, TEXT_NORMALIZATION_STEPS
+from .config import STRUCTURE_MODE, LAYOUT_CONFIDENCE_THRESHOLD, OUTLINE_CONTEXT_LINES, RULES_CONFIDENCE_THRESHOLD
+from .config import HEADING_CLASSIFIER_TRAINING_LOG, CLASSIFIER_CONFIDENCE_THRESHOLD
+from .config import LLM_CHUNK_MAX_ATTEMPTS, TEXT_CHUNKING
+from .config import COVERAGE_CHECK, COVERAGE_LINE_THRESHOLD
+from .text_normalizer import normalize_text
+from .layout_analyzer import label_layout_lines
+from .hybrid_labeler import LabeledLine, resolve_uncertain_lines, labeled_lines_to_text, parse_labeled_text
+from .hybrid_labeler import find_uncertain_regions
+from .outline_filter import label_lines_with_outline, build_outline_requests
+from .rule_engine import get_rule_engine
+from .heading_classifier import get_heading_classifier, log_training_samples
+from .chunk_checkpoint import open_chunk_checkpoint
+from .chunk_scheduler import llm_request_workers
+from .coverage_checker import DocumentCoverage
+from .progress import PartialMarkdownReporter, progress_enabled, report_progress
 from .text_splitter import ( # 导入文本分割相关函数和常量
     estimate_tokens,
     split_text_into_chunks,
+    split_text_into_content_defined_chunks,
     merge_processed_chunks,
     DEFAULT_MAX_CHUNK_TOKENS,
     DEFAULT_OVERLAP_TOKENS
@@ -21,63 +39,123 @@ MAX_TOKENS_FOR_DIRECT_PROCESSING = DEFAULT_MAX_CHUNK_TOKENS
 # logger 实例将在函数内部获取，或者如果已在模块级别定义则可直接使用
 # 此处假设 logger 将在函数内通过 logging.getLogger(__name__) 获取
 
-def process_document_to_markdown(input_filepath: str, results_dir: str) -> Optional[str]:
+def _normalize_extracted_text(raw_text: str, file_type: str, input_filepath: str, model_name: Optional[str]) -> str:
     """
-    处理单个文档（.docx 或 .pdf），将其转换为 Markdown 文件并保存到指定目录。
+    按配置 (TEXT_NORMALIZATION / TEXT_NORMALIZATION_STEPS) 对提取的文本进行规范化，并记录 token 减少量。
+    规范化失败或结果为空时返回原始文本，不影响后续处理。
+    """
+    logger = logging.getLogger(__name__)
+    if TEXT_NORMALIZATION == "off" or (TEXT_NORMALIZATION == "pdf" and file_type != "pdf"):
+        return raw_text
+    try:
+        result = normalize_text(raw_text, steps=TEXT_NORMALIZATION_STEPS, model_name=model_name)
+    except Exception as e:
+        logger.warning(f"文本规范化失败，将使用原始提取文本 ({input_filepath}): {e}", exc_info=logger.isEnabledFor(logging.DEBUG))
+        return raw_text
+    if not result.text.strip():
+        logger.warning(f"文本规范化结果为空，将使用原始提取文本 ({input_filepath})。")
+        return raw_text
+    logger.info(
+        f"文本规范化完成 ({input_filepath}): 估算 token 数 {result.original_tokens} -> {result.normalized_tokens} "
+        f"(减少 {result.token_reduction}, {result.token_reduction_ratio:.1%})"
+    )
+    return result.text
+
+
+def _read_normalized_text(input_filepath: str, file_type: str, model_name_for_splitting: Optional[str],
+                          content: Optional[DocumentContent] = None) -> Optional[str]:
+    """读取文档全文 (给出 content 时从内存读取) 并按配置进行规范化。读取失败时返回 None (错误已记录)。"""
+    logger = logging.getLogger(__name__)
+    # 3. 读取文件内容
+    logger.debug(f"正在从 '{input_filepath}' (类型: {file_type}) 读取内容...")
+    try:
+        raw_text = read_file_content(input_filepath, file_type, content=content)
+        if raw_text is None:
+            # read_file_content 内部已记录具体错误 (例如，文件为空或提取失败)
+            logger.error(f"未能从文件 '{input_filepath}' 读取到有效内容。")
+            return None
+        logger.debug(f"成功从 '{input_filepath}' 读取内容 (前100字符预览: '{raw_text[:100].strip()}...')")
+    except Exception as e:
+        logger.error(f"读取文件 '{input_filepath}' 内容时发生意外的严重错误: {e}", exc_info=True)
+        return None
+
+    # 3.1 文本规范化 (拼接视觉换行、去除断字连字符、压缩空白等)
+    raw_text = _normalize_extracted_text(raw_text, file_type, input_filepath, model_name_for_splitting)
+    return raw_text
+
+
+class ExtractedDocument(NamedTuple):
+    """
+    提取阶段的结果。
+
+    text 为规范化后的全文；local_labels 为本地版面分析给出的标注 (仅 "layout" 模式下的 PDF)，
+    此时 text 为 None，后续只需将低置信度区域交给 LLM。
+    content_hash 为内存中文档内容的摘要 (文件系统中的文档为 None)，分块检查点按它区分同名的不同文档。
+    """
+    input_filepath: str
+    file_type: str
+    text: Optional[str]
+    local_labels: Optional[List[LabeledLine]] = None
+    content_hash: Optional[str] = None
+
 
-    该函数封装了文档处理的核心逻辑：文件类型识别、内容读取、LLM 分析、
-    Markdown 生成以及结果保存。
+class LlmWorkPlan(NamedTuple):
+    """分割阶段的结果：需要交给 LLM 的文本块，以及是否为不分块的直接处理。"""
+    chunks: List[str]
+    direct: bool
+
+
+def extract_document(input_filepath: str, structure_mode: Optional[str] = None,
+                     content: Optional[DocumentContent] = None, file_type: Optional[str] = None) -> Optional[ExtractedDocument]:
+    """
+    提取阶段：识别文件类型并提取 (规范化后的) 文本。该函数只做本地 CPU 工作，可在独立进程中运行。
 
     参数:
-        input_filepath (str): 要处理的单个文档的完整路径。
-        results_dir (str): 用于保存生成的 .md 文件的目录路径。
+        input_filepath (str): 文档路径。给出 content 时为文档名称，只用于识别类型、日志与检查点。
+        structure_mode (Optional[str]): 结构识别模式，为 None 时使用配置 STRUCTURE_MODE。
+            "layout" 模式下 PDF 会在此阶段完成本地版面分析。
+        content (Optional[DocumentContent]): 内存中的文档内容 (字节串或二进制文件对象)；给出时不读取文件系统。
+        file_type (Optional[str]): 文件类型 ("docx" 或 "pdf")；为 None 时由扩展名识别，
+            内存中的文档无法由名称识别时再按文件头识别。
 
     返回:
-        Optional[str]: 如果处理成功，则返回生成的 Markdown 文件的完整路径。
-                       如果任何步骤失败或文件不受支持，则返回 None。
+        Optional[ExtractedDocument]: 提取结果；文件不受支持或读取失败时返回 None。
     """
     logger = logging.getLogger(__name__)
-    # 在函数开始处记录长文本处理阈值
-    logger.info(f"长文本处理阈值 (直接处理的最大 token 数): {MAX_TOKENS_FOR_DIRECT_PROCESSING}")
-    logger.info(f"开始处理文档: {input_filepath}")
-
-    # 1. 检查 API 配置 (关键步骤，确保核心功能可用)
-    # LLM_MODEL_ID 不是必需的，llm_processor 有默认值，所以不在此处检查
-    if not API_KEY:
-        logger.critical("核心处理器错误：LLM_API_KEY 未配置。无法继续处理。")
-        return None
-    if not API_ENDPOINT:
-        logger.critical("核心处理器错误：LLM_API_ENDPOINT 未配置。无法继续处理。")
-        return None
-    
-    # 获取模型ID，供 estimate_tokens 和 split_text_into_chunks 使用 (如果它们内部需要)
-    # llm_processor 内部会自行处理默认模型ID，这里主要是为 text_splitter 提供（如果其设计需要）
-    # 当前 text_splitter.estimate_tokens 的 model_name 参数是 Optional 且未被使用。
-    model_name_for_splitting = LLM_MODEL_ID # 可以是 None
+    structure_mode = structure_mode or STRUCTURE_MODE
+    model_name_for_splitting = LLM_MODEL_ID
 
     # 2. 获取文件类型
     logger.debug(f"正在获取文件 '{input_filepath}' 的类型...")
-    file_type = get_file_type(input_filepath)
+    file_type = file_type or get_file_type(input_filepath)
+    if file_type == "unsupported" and content is not None:
+        file_type = detect_content_type(content)
     if file_type == "unsupported":
         logger.warning(f"文件 '{os.path.basename(input_filepath)}' 类型不受支持。已跳过。")
         return None
     logger.debug(f"文件类型识别为: {file_type}")
 
-    # 3. 读取文件内容
-    logger.debug(f"正在从 '{input_filepath}' (类型: {file_type}) 读取内容...")
-    try:
-        raw_text = read_file_content(input_filepath, file_type)
-        if raw_text is None:
-            # read_file_content 内部已记录具体错误 (例如，文件为空或提取失败)
-            logger.error(f"未能从文件 '{input_filepath}' 读取到有效内容。")
-            return None
-        logger.debug(f"成功从 '{input_filepath}' 读取内容 (前100字符预览: '{raw_text[:100].strip()}...')")
-    except Exception as e:
-        logger.error(f"读取文件 '{input_filepath}' 内容时发生意外的严重错误: {e}", exc_info=True)
+    if structure_mode == "layout" and file_type == "pdf":
+        local_labels = _analyze_pdf_layout(input_filepath, content)
+        if local_labels:
+            return ExtractedDocument(input_filepath, file_type, None, local_labels)
+        logger.warning(f"版面分析未能完成 ({input_filepath})，回退到 LLM 全文标注。")
+
+    # 3. 读取文件内容并规范化
+    raw_text = _read_normalized_text(input_filepath, file_type, model_name_for_splitting, content)
+    if raw_text is None:
         return None
+    return ExtractedDocument(input_filepath, file_type, raw_text)
 
-    # 4. LLM 处理 (根据文本长度选择直接处理或分块处理)
-    llm_output: Optional[str] = None # 初始化 llm_output
+
+def split_text_for_llm(raw_text: str, input_filepath: str, model_name_for_splitting: Optional[str]) -> Optional[LlmWorkPlan]:
+    """
+    分割阶段：估算 token 数，未超过 MAX_TOKENS_FOR_DIRECT_PROCESSING 时整篇直接处理，否则分割为多个文本块。
+
+    返回:
+        Optional[LlmWorkPlan]: 文本块列表；token 估算或分割失败时返回 None (错误已记录)。
+    """
+    logger = logging.getLogger(__name__)
     try:
         num_estimated_tokens = estimate_tokens(raw_text, model_name=model_name_for_splitting)
         logger.info(f"提取的原始文本估算 token 数: {num_estimated_tokens} (模型用于估算: {model_name_for_splitting or '默认'})")
@@ -87,87 +165,58 @@ def process_document_to_markdown(input_filepath: str, results_dir: str) -> Optio
 
     if num_estimated_tokens <= MAX_TOKENS_FOR_DIRECT_PROCESSING:
         logger.info(f"文本 token 数 ({num_estimated_tokens}) 未超过阈值 ({MAX_TOKENS_FOR_DIRECT_PROCESSING})，直接进行 LLM 分析。")
-        try:
-            llm_output = analyze_text_with_llm(raw_text)
-            if llm_output is None: # analyze_text_with_llm 内部已记录错误
-                logger.error(f"直接 LLM 分析失败 ({input_filepath})。")
-                return None 
-        except Exception as e_llm_direct:
-            logger.error(f"直接 LLM 分析文本内容时发生意外错误 ({input_filepath}): {e_llm_direct}", exc_info=True)
-            return None
-    else:
-        logger.info(f"文本 token 数 ({num_estimated_tokens}) 超过阈值 ({MAX_TOKENS_FOR_DIRECT_PROCESSING})，启动长文本分块处理流程。")
-        
-        # 4.1. 分割文本
-        try:
+        return LlmWorkPlan([raw_text], True)
+
+    logger.info(f"文本 token 数 ({num_estimated_tokens}) 超过阈值 ({MAX_TOKENS_FOR_DIRECT_PROCESSING})，启动长文本分块处理流程。")
+    # 4.1. 分割文本
+    try:
+        if TEXT_CHUNKING == "content_defined":
+            # 边界由段落内容决定，文档局部修改后其余文本块 (及其检查点) 保持不变
+            original_text_chunks = split_text_into_content_defined_chunks(
+                raw_text,
+                model_name=model_name_for_splitting,
+                max_tokens_per_chunk=DEFAULT_MAX_CHUNK_TOKENS
+            )
+        else:
             original_text_chunks = split_text_into_chunks(
                 raw_text,
                 model_name=model_name_for_splitting, # 传递模型名称
                 max_tokens_per_chunk=DEFAULT_MAX_CHUNK_TOKENS, # 使用导入的常量
                 overlap_tokens=DEFAULT_OVERLAP_TOKENS      # 使用导入的常量
             )
-            if not original_text_chunks:
-                logger.error(f"文本分割后未产生任何有效文本块 ({input_filepath})。")
-                return None
-            logger.info(f"文本被分割成 {len(original_text_chunks)} 个原始块进行处理。")
-        except Exception as e_split:
-            logger.error(f"文本分割过程中发生错误 ({input_filepath}): {e_split}", exc_info=True)
-            return None
-
-        # 4.2. 分块处理
-        processed_chunks_results: List[Optional[str]] = [None] * len(original_text_chunks) # 初始化结果列表以保持顺序
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_LLM_REQUESTS) as executor:
-            future_to_chunk_index = {
-                executor.submit(analyze_text_with_llm, chunk): i
-                for i, chunk in enumerate(original_text_chunks)
-            }
-
-            for i, future in enumerate(concurrent.futures.as_completed(future_to_chunk_index)):
-                original_index = future_to_chunk_index[future]
-                try:
-                    chunk_result = future.result()
-                    if chunk_result is None:
-                        logger.error(f"处理文本块 {original_index + 1} (原始顺序) 失败 ({input_filepath})。中止长文本处理。")
-                        # 取消其他所有未完成的 future
-                        for f in future_to_chunk_index:
-                            if not f.done():
-                                f.cancel()
-                        return None
-                    processed_chunks_results[original_index] = chunk_result
-                    logger.info(f"文本块 {original_index + 1}/{len(original_text_chunks)} (原始顺序) 处理完成。")
-                except concurrent.futures.CancelledError:
-                    logger.warning(f"文本块 {original_index + 1} (原始顺序) 的处理被取消。")
-                    # 如果一个任务被取消（通常是因为另一个任务失败），则整体失败
-                    return None
-                except Exception as e_llm_chunk:
-                    logger.error(f"处理文本块 {original_index + 1} (原始顺序) 时发生意外错误 ({input_filepath}): {e_llm_chunk}", exc_info=True)
-                    # 取消其他所有未完成的 future
-                    for f in future_to_chunk_index:
-                        if not f.done():
-                            f.cancel()
-                    return None
-        
-        # 检查是否有任何块处理失败 (理论上如果上面逻辑正确，这里不会是 None，除非 analyze_text_with_llm 返回 None 但未抛异常)
-        if any(result is None for result in processed_chunks_results):
-            logger.error(f"一个或多个文本块未能成功处理 ({input_filepath})。")
+        if not original_text_chunks:
+            logger.error(f"文本分割后未产生任何有效文本块 ({input_filepath})。")
             return None
+        logger.info(f"文本被分割成 {len(original_text_chunks)} 个原始块进行处理。")
+    except Exception as e_split:
+        logger.error(f"文本分割过程中发生错误 ({input_filepath}): {e_split}", exc_info=True)
+        return None
+    return LlmWorkPlan(original_text_chunks, False)
 
-        # 将 List[Optional[str]] 转换为 List[str] 给 merge_processed_chunks
-        # 此时可以安全地假设没有 None 值，因为上面已经检查过了
-        final_processed_chunks = [str(chunk) for chunk in processed_chunks_results]
 
+def merge_chunk_results(processed_chunks: List[str], plan: LlmWorkPlan, input_filepath: str,
+                        model_name_for_splitting: Optional[str]) -> Optional[str]:
+    """
+    合并阶段：按原始顺序合并各文本块的 LLM 输出，并记录分类器训练样本 (如已启用)。
 
+    返回:
+        Optional[str]: "标签: 内容" 格式的完整标注结果；合并失败时返回 None。
+    """
+    logger = logging.getLogger(__name__)
+    if plan.direct:
+        llm_output = processed_chunks[0] if processed_chunks else None
+    else:
         # 4.3. 合并结果
-        if not final_processed_chunks: 
-             logger.error(f"所有文本块处理后均未产生有效结果 ({input_filepath})。")
-             return None
+        if not processed_chunks:
+            logger.error(f"所有文本块处理后均未产生有效结果 ({input_filepath})。")
+            return None
 
-        logger.info(f"所有 {len(final_processed_chunks)} 个块均已处理，开始合并结果...")
+        logger.info(f"所有 {len(processed_chunks)} 个块均已处理，开始合并结果...")
         try:
             # 确保 merge_processed_chunks 接收的是 List[str]
             llm_output = merge_processed_chunks(
-                final_processed_chunks, # 使用转换后的列表
-                original_text_chunks,
+                processed_chunks,
+                plan.chunks,
                 overlap_tokens=DEFAULT_OVERLAP_TOKENS,
                 model_name=model_name_for_splitting
             )
@@ -178,17 +227,300 @@ def process_document_to_markdown(input_filepath: str, results_dir: str) -> Optio
         except Exception as e_merge:
             logger.error(f"合并已处理文本块时发生错误 ({input_filepath}): {e_merge}", exc_info=True)
             return None
-    
-    # 确保 llm_output 在进入 Markdown 生成前有值（如果前面逻辑正确，应该有，除非直接处理或分块处理都失败了）
-    if llm_output is None:
-        logger.error(f"LLM 处理步骤未能生成任何输出内容 ({input_filepath})。")
+
+    # 4.4 记录 LLM 标注结果，用于训练本地标题分类器
+    if HEADING_CLASSIFIER_TRAINING_LOG and llm_output:
+        log_training_samples(parse_labeled_text(llm_output), HEADING_CLASSIFIER_TRAINING_LOG,
+                             source=os.path.basename(input_filepath))
+    return llm_output
+
+
+def _label_text_with_llm(raw_text: str, input_filepath: str, model_name_for_splitting: Optional[str],
+                         content_hash: Optional[str] = None) -> Optional[str]:
+    """
+    将已提取的文本交给 LLM 标注 (文本较长时分块处理再合并)。content_hash 见 ExtractedDocument。
+
+    返回:
+        Optional[str]: "标签: 内容" 格式的 LLM 输出；任何步骤失败时返回 None (错误已记录)。
+    """
+    logger = logging.getLogger(__name__)
+    # 4. LLM 处理 (根据文本长度选择直接处理或分块处理)
+    plan = split_text_for_llm(raw_text, input_filepath, model_name_for_splitting)
+    if plan is None:
+        return None
+    # 内容覆盖检查：修复格式不规范的标签行，只将被遗漏的原文片段重新发送给 LLM (见 coverage_checker.py)
+    coverage = DocumentCoverage(COVERAGE_LINE_THRESHOLD) if COVERAGE_CHECK else None
+    chunk_count = 1 if plan.direct else len(plan.chunks)
+    report_progress("chunks", count=chunk_count)
+    # 设置了进度监听器时，按原始顺序报告已可输出的部分 Markdown (见 progress.py)
+    partial = PartialMarkdownReporter(chunk_count, DEFAULT_OVERLAP_TOKENS, model_name_for_splitting) \
+        if progress_enabled() else None
+
+    if plan.direct:
+        try:
+            llm_output = analyze_text_with_llm(raw_text)
+            if llm_output is None: # analyze_text_with_llm 内部已记录错误
+                logger.error(f"直接 LLM 分析失败 ({input_filepath})。")
+                return None
+            if coverage is not None:
+                llm_output = coverage.check(raw_text, llm_output, analyze_text_with_llm)
+                logger.info(f"{coverage.summary()} ({input_filepath})")
+        except Exception as e_llm_direct:
+            logger.error(f"直接 LLM 分析文本内容时发生意外错误 ({input_filepath}): {e_llm_direct}", exc_info=True)
+            return None
+        report_progress("chunk_done", index=0, completed=1, count=1)
+        if partial is not None:
+            partial.add(0, llm_output)
+            partial.finish()
+        return merge_chunk_results([llm_output], plan, input_filepath, model_name_for_splitting)
+
+    original_text_chunks = plan.chunks
+    # 4.2. 分块处理
+    # 每个文本块的结果在完成时写入检查点；失败的文本块最多尝试 LLM_CHUNK_MAX_ATTEMPTS 次，
+    # 成功的文本块不会被重新发送。仍有文本块失败时保留检查点，重新运行时从检查点继续。
+    checkpoint = open_chunk_checkpoint(input_filepath, content_hash)
+    processed_chunks_results: List[Optional[str]] = [None] * len(original_text_chunks) # 初始化结果列表以保持顺序
+    if checkpoint is not None:
+        for i, chunk in enumerate(original_text_chunks):
+            processed_chunks_results[i] = checkpoint.get(chunk)
+    completed_count = sum(1 for result in processed_chunks_results if result is not None)
+    if completed_count:
+        report_progress("chunk_done", index=None, completed=completed_count, count=chunk_count)
+    if partial is not None:
+        for i, result in enumerate(processed_chunks_results):
+            if result is not None:
+                partial.add(i, result)
+
+    for attempt in range(1, LLM_CHUNK_MAX_ATTEMPTS + 1):
+        pending_indices = [i for i, result in enumerate(processed_chunks_results) if result is None]
+        if not pending_indices:
+            break
+        if attempt > 1:
+            logger.warning(f"重试 {len(pending_indices)} 个失败的文本块 (第 {attempt}/{LLM_CHUNK_MAX_ATTEMPTS} 次尝试，{input_filepath})。")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=llm_request_workers(MAX_CONCURRENT_LLM_REQUESTS)) as executor:
+            future_to_chunk_index = {
+                executor.submit(analyze_text_with_llm, original_text_chunks[i]): i
+                for i in pending_indices
+            }
+
+            for future in concurrent.futures.as_completed(future_to_chunk_index):
+                original_index = future_to_chunk_index[future]
+                try:
+                    chunk_result = future.result()
+                    if chunk_result is not None and coverage is not None:
+                        chunk_result = coverage.check(original_text_chunks[original_index], chunk_result, analyze_text_with_llm)
+                except Exception as e_llm_chunk:
+                    logger.error(f"处理文本块 {original_index + 1} (原始顺序) 时发生意外错误 ({input_filepath}): {e_llm_chunk}", exc_info=True)
+                    continue
+                if chunk_result is None:
+                    logger.error(f"处理文本块 {original_index + 1} (原始顺序) 失败 ({input_filepath})。")
+                    continue
+                processed_chunks_results[original_index] = chunk_result
+                if checkpoint is not None:
+                    checkpoint.put(original_text_chunks[original_index], chunk_result)
+                logger.info(f"文本块 {original_index + 1}/{len(original_text_chunks)} (原始顺序) 处理完成。")
+                completed_count += 1
+                report_progress("chunk_done", index=original_index, completed=completed_count, count=chunk_count)
+                if partial is not None:
+                    partial.add(original_index, chunk_result)
+
+    # 检查是否有文本块在所有尝试后仍然失败
+    failed_count = sum(1 for result in processed_chunks_results if result is None)
+    if failed_count:
+        logger.error(f"{failed_count} 个文本块在 {LLM_CHUNK_MAX_ATTEMPTS} 次尝试后仍未能成功处理 ({input_filepath})。"
+                     + ("已完成的文本块结果已保存到检查点，重新运行时将只处理失败的文本块。" if checkpoint is not None else ""))
+        return None
+    if coverage is not None and coverage.total_chars:
+        logger.info(f"{coverage.summary()} ({input_filepath})")
+    if partial is not None:
+        partial.finish()
+
+    # 将 List[Optional[str]] 转换为 List[str] 给 merge_processed_chunks
+    # 此时可以安全地假设没有 None 值，因为上面已经检查过了
+    final_processed_chunks = [str(chunk) for chunk in processed_chunks_results]
+    merged = merge_chunk_results(final_processed_chunks, plan, input_filepath, model_name_for_splitting)
+    if merged is not None and checkpoint is not None:
+        checkpoint.discard()
+    return merged
+
+
+def _analyze_pdf_layout(input_filepath: str, content: Optional[DocumentContent] = None) -> Optional[List[LabeledLine]]:
+    """根据版面特征在本地标注 PDF (不调用 LLM)。无法提取版面信息时返回 None。"""
+    logger = logging.getLogger(__name__)
+    try:
+        layout_lines = read_pdf_layout_lines(input_filepath, content=content)
+        if not layout_lines:
+            return None
+        return label_layout_lines(layout_lines) or None
+    except Exception as e:
+        logger.error(f"版面分析 '{input_filepath}' 时发生意外错误: {e}", exc_info=True)
         return None
-    logger.debug(f"LLM 处理完成，最终输出 (前100字符预览: '{llm_output[:100].strip()}...')")
 
+
+def _resolve_layout_labels(local_labels: List[LabeledLine], input_filepath: str) -> Optional[str]:
+    """将版面分析中置信度低于 LAYOUT_CONFIDENCE_THRESHOLD 的区域交给 LLM，返回 "标签: 内容" 格式的标注结果。"""
+    logger = logging.getLogger(__name__)
+    try:
+        resolved_lines = resolve_uncertain_lines(local_labels, LAYOUT_CONFIDENCE_THRESHOLD, analyzer=analyze_text_with_llm)
+    except Exception as e:
+        logger.error(f"版面分析 '{input_filepath}' 时发生意外错误: {e}", exc_info=True)
+        return None
+    logger.info(f"版面分析完成 ({input_filepath}): 共 {len(resolved_lines)} 个文本块。")
+    return labeled_lines_to_text(resolved_lines)
+
+
+def _label_text_by_outline(raw_text: str, input_filepath: str) -> Optional[str]:
+    """
+    大纲模式：本地筛选候选标题行，只将候选行交给 LLM 指定层级，其余行在本地标注为 P。
+
+    返回:
+        Optional[str]: "标签: 内容" 格式的标注结果；LLM 请求失败时返回 None。
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        labeled_lines = label_lines_with_outline(
+            raw_text.split("\n"),
+            analyzer=assign_heading_levels_with_llm,
+            context_lines=OUTLINE_CONTEXT_LINES,
+        )
+    except Exception as e:
+        logger.error(f"大纲模式标注 '{input_filepath}' 时发生意外错误: {e}", exc_info=True)
+        return None
+    if not labeled_lines:
+        logger.error(f"大纲模式未能为 '{input_filepath}' 生成任何标注。")
+        return None
+    return labeled_lines_to_text(labeled_lines)
+
+
+def _label_text_by_rules(raw_text: str, input_filepath: str, model_name_for_splitting: Optional[str],
+                         content_hash: Optional[str] = None) -> Optional[str]:
+    """
+    规则模式：按编号规则离线识别文档结构。文档置信度达到 RULES_CONFIDENCE_THRESHOLD 时不调用 LLM，
+    否则将全文交给 LLM 标注。
+
+    返回:
+        Optional[str]: "标签: 内容" 格式的标注结果；任何步骤失败时返回 None。
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        result = get_rule_engine().classify(raw_text.split("\n"))
+    except Exception as e:
+        logger.error(f"规则引擎识别 '{input_filepath}' 时发生意外错误，将交给 LLM 处理: {e}", exc_info=True)
+        return _label_text_with_llm(raw_text, input_filepath, model_name_for_splitting, content_hash)
+    if result.lines and result.confidence >= RULES_CONFIDENCE_THRESHOLD:
+        logger.info(f"规则引擎识别完成 ({input_filepath})，置信度 {result.confidence:.2f}，跳过 LLM。")
+        return labeled_lines_to_text(result.lines)
+    logger.info(f"规则引擎置信度 {result.confidence:.2f} 低于阈值 {RULES_CONFIDENCE_THRESHOLD} ({input_filepath})，交给 LLM 处理。")
+    return _label_text_with_llm(raw_text, input_filepath, model_name_for_splitting, content_hash)
+
+
+def _label_text_by_classifier(raw_text: str, input_filepath: str, model_name_for_splitting: Optional[str],
+                              content_hash: Optional[str] = None) -> Optional[str]:
+    """
+    分类器模式：使用本地标题分类器标注，仅将预测概率低于 CLASSIFIER_CONFIDENCE_THRESHOLD 的行交给 LLM。
+    模型不可用时将全文交给 LLM。
+
+    返回:
+        Optional[str]: "标签: 内容" 格式的标注结果；任何步骤失败时返回 None。
+    """
+    logger = logging.getLogger(__name__)
+    classifier = get_heading_classifier()
+    if classifier is None:
+        logger.warning(f"标题分类器不可用，'{input_filepath}' 将交给 LLM 处理。")
+        return _label_text_with_llm(raw_text, input_filepath, model_name_for_splitting, content_hash)
+    try:
+        labeled_lines = classifier.predict(raw_text.split("\n"))
+        resolved_lines = resolve_uncertain_lines(labeled_lines, CLASSIFIER_CONFIDENCE_THRESHOLD, analyzer=analyze_text_with_llm)
+    except Exception as e:
+        logger.error(f"标题分类器标注 '{input_filepath}' 时发生意外错误: {e}", exc_info=True)
+        return None
+    if not resolved_lines:
+        logger.error(f"标题分类器未能为 '{input_filepath}' 生成任何标注。")
+        return None
+    return labeled_lines_to_text(resolved_lines)
+
+
+def label_extracted_document(document: ExtractedDocument, structure_mode: Optional[str] = None) -> Optional[str]:
+    """
+    标注阶段：按结构识别模式为提取结果生成 "标签: 内容" 格式的标注 (可能调用 LLM)。
+
+    返回:
+        Optional[str]: 标注结果；任何步骤失败时返回 None (错误已记录)。
+    """
+    structure_mode = structure_mode or STRUCTURE_MODE
+    model_name_for_splitting = LLM_MODEL_ID
+    if document.local_labels is not None:
+        return _resolve_layout_labels(document.local_labels, document.input_filepath)
+    if structure_mode == "outline":
+        return _label_text_by_outline(document.text, document.input_filepath)
+    if structure_mode == "rules":
+        return _label_text_by_rules(document.text, document.input_filepath, model_name_for_splitting,
+                                    document.content_hash)
+    if structure_mode == "classifier":
+        return _label_text_by_classifier(document.text, document.input_filepath, model_name_for_splitting,
+                                         document.content_hash)
+    return _label_text_with_llm(document.text, document.input_filepath, model_name_for_splitting, document.content_hash)
+
+
+class LlmRequest(NamedTuple):
+    """
+    一次 LLM 请求 (仅用于估算，不发送)。kind 为 "structure" (结构标注，LLM 回显带标签的全文)
+    或 "outline" (大纲模式，LLM 只为每个候选行回复 "编号: 标签")；text 为用户消息。
+    """
+    kind: str
+    text: str
+
+
+def _region_requests(lines: List[LabeledLine], threshold: float) -> List[LlmRequest]:
+    return [LlmRequest("structure", "\n".join(line.text for line in lines[start:end]))
+            for start, end in find_uncertain_regions(lines, threshold)]
+
+
+def _llm_requests_for_text(raw_text: str, input_filepath: str) -> Optional[List[LlmRequest]]:
+    plan = split_text_for_llm(raw_text, input_filepath, LLM_MODEL_ID)
+    if plan is None:
+        return None
+    return [LlmRequest("structure", chunk) for chunk in plan.chunks]
+
+
+def plan_llm_requests(document: ExtractedDocument, structure_mode: Optional[str] = None) -> Optional[List[LlmRequest]]:
+    """
+    估算阶段：按结构识别模式列出 label_extracted_document 将发送的 LLM 请求，但不调用 LLM。
+    本地方法 (规则引擎、版面分析、标题分类器) 照常运行，因此它们能够处理的部分不计入请求。
+    未考虑失败后的重试。
+
+    返回:
+        Optional[List[LlmRequest]]: 请求列表 (可能为空)；分割失败时返回 None (错误已记录)。
+    """
+    logger = logging.getLogger(__name__)
+    structure_mode = structure_mode or STRUCTURE_MODE
+    if document.local_labels is not None:
+        return _region_requests(document.local_labels, LAYOUT_CONFIDENCE_THRESHOLD)
+    if structure_mode == "outline":
+        return [LlmRequest("outline", text)
+                for text in build_outline_requests(document.text.split("\n"), context_lines=OUTLINE_CONTEXT_LINES)]
+    if structure_mode == "rules":
+        try:
+            result = get_rule_engine().classify(document.text.split("\n"))
+        except Exception as e:
+            logger.warning(f"规则引擎识别 '{document.input_filepath}' 时发生意外错误，按交给 LLM 处理估算: {e}")
+        else:
+            if result.lines and result.confidence >= RULES_CONFIDENCE_THRESHOLD:
+                return []
+    if structure_mode == "classifier":
+        classifier = get_heading_classifier()
+        if classifier is not None:
+            return _region_requests(classifier.predict(document.text.split("\n")), CLASSIFIER_CONFIDENCE_THRESHOLD)
+    return _llm_requests_for_text(document.text, document.input_filepath)
+
+
+def render_markdown(labeled_text: str, input_filepath: str) -> Optional[str]:
+    """渲染阶段：将 "标签: 内容" 格式的标注转换为 Markdown。结果为空或出错时返回 None。"""
+    logger = logging.getLogger(__name__)
     # 5. Markdown 生成
     logger.debug(f"正在从 LLM 输出为 '{input_filepath}' 生成 Markdown...")
     try:
-        markdown_content = generate_markdown_from_labeled_text(llm_output)
+        markdown_content = generate_markdown_from_labeled_text(labeled_text)
         if markdown_content is None or not markdown_content.strip(): # 检查是否为 None 或空/仅空白
             logger.error(f"从 LLM 输出为 '{input_filepath}' 生成 Markdown 时出错，结果为空或无效。")
             return None
@@ -196,22 +528,33 @@ def process_document_to_markdown(input_filepath: str, results_dir: str) -> Optio
     except Exception as e:
         logger.error(f"从 LLM 输出为 '{input_filepath}' 生成 Markdown 时发生意外的严重错误: {e}", exc_info=True)
         return None
+    return markdown_content
+
 
+def markdown_output_path(input_filepath: str, results_dir: str) -> str:
+    """返回输入文件对应的 Markdown 输出路径：results_dir 下与输入文件同名的 .md 文件。"""
+    base_name = os.path.splitext(os.path.basename(input_filepath))[0] + ".md"
+    return os.path.join(results_dir, base_name)
+
+
+def write_markdown_file(markdown_content: str, input_filepath: str, results_dir: str) -> Optional[str]:
+    """写入阶段：将 Markdown 保存为 results_dir 下与输入文件同名的 .md 文件，返回其路径；失败时返回 None。"""
+    logger = logging.getLogger(__name__)
     # 6. 保存 Markdown 文件
+    output_md_path = None
     try:
         # 确保 results_dir 目录存在
         os.makedirs(results_dir, exist_ok=True)
         logger.debug(f"确保结果目录 '{results_dir}' 已存在。")
 
         # 构造输出文件名和路径
-        base_name = os.path.splitext(os.path.basename(input_filepath))[0] + ".md"
-        output_md_path = os.path.join(results_dir, base_name)
+        output_md_path = markdown_output_path(input_filepath, results_dir)
         logger.debug(f"Markdown 输出路径构造为: {output_md_path}")
 
         # 写入文件
         with open(output_md_path, "w", encoding="utf-8") as f:
             f.write(markdown_content)
-        
+
         logger.info(f"成功将处理后的 Markdown 内容保存到: {output_md_path}")
         return output_md_path  # 返回生成的 Markdown 文件路径
 
@@ -224,3 +567,143 @@ def process_document_to_markdown(input_filepath: str, results_dir: str) -> Optio
     except Exception as e: # 捕获其他可能的意外错误
         logger.error(f"保存 Markdown 文件到 '{output_md_path}' 时发生意外的严重错误: {e}", exc_info=True)
         return None
+
+
+# 可转换的文档来源：文件路径，或内存中的文档内容 (字节串、二进制文件对象)
+DocumentSource = Union[str, "os.PathLike[str]", DocumentContent]
+
+
+def _llm_credentials_configured() -> bool:
+    """检查 LLM API 配置 (关键步骤，确保核心功能可用)。未配置时记录错误并返回 False。"""
+    logger = logging.getLogger(__name__)
+    # LLM_MODEL_ID 不是必需的，llm_processor 有默认值，所以不在此处检查
+    if not API_KEY:
+        logger.critical("核心处理器错误：LLM_API_KEY 未配置。无法继续处理。")
+        return False
+    if not API_ENDPOINT:
+        logger.critical("核心处理器错误：LLM_API_ENDPOINT 未配置。无法继续处理。")
+        return False
+    return True
+
+
+def _label_source(source: DocumentSource, name: Optional[str], file_type: Optional[str],
+                  structure_mode: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    提取并标注文档来源。返回 (文档名称, "标签: 内容" 格式的标注结果)；任何步骤失败时返回 None。
+
+    路径来源从文件系统读取；内存来源直接交给提取器，不写入临时文件。
+    """
+    logger = logging.getLogger(__name__)
+    if isinstance(source, (str, os.PathLike)):
+        input_filepath, content, content_hash = os.fspath(source), None, None
+    else:
+        content = source
+        # 内存中的文档没有稳定的路径：分块检查点按内容摘要区分 (同名上传不会共用检查点)
+        content_hash = compute_content_sha256(content)
+        input_filepath = name or getattr(source, "name", None)
+        if not isinstance(input_filepath, str) or not input_filepath:
+            # 没有名称时以内容摘要区分不同文档 (日志)
+            input_filepath = f"<memory:{content_hash[:12]}>"
+
+    # 在函数开始处记录长文本处理阈值
+    logger.info(f"长文本处理阈值 (直接处理的最大 token 数): {MAX_TOKENS_FOR_DIRECT_PROCESSING}")
+    logger.info(f"开始处理文档: {input_filepath}")
+
+    # 1. 检查 API 配置
+    if not _llm_credentials_configured():
+        return None
+
+    # 2-3. 获取文件类型并提取内容
+    document = extract_document(input_filepath, structure_mode, content=content, file_type=file_type)
+    if document is None:
+        return None
+    document = document._replace(content_hash=content_hash)
+    if progress_enabled():
+        text = document.text if document.text is not None else "\n".join(line.text for line in document.local_labels or [])
+        report_progress("extracted", file_type=document.file_type, chars=len(text))
+
+    # 4. 结构标注
+    llm_output = label_extracted_document(document, structure_mode)
+    # 确保 llm_output 在进入 Markdown 生成前有值（如果前面逻辑正确，应该有，除非直接处理或分块处理都失败了）
+    if llm_output is None:
+        logger.error(f"LLM 处理步骤未能生成任何输出内容 ({input_filepath})。")
+        return None
+    report_progress("merged", lines=llm_output.count("\n") + 1)
+    logger.debug(f"LLM 处理完成，最终输出 (前100字符预览: '{llm_output[:100].strip()}...')")
+    return input_filepath, llm_output
+
+
+def convert_to_markdown(source: DocumentSource, name: Optional[str] = None, file_type: Optional[str] = None,
+                        structure_mode: Optional[str] = None) -> Optional[str]:
+    """
+    将单个文档（.docx 或 .pdf）转换为 Markdown 字符串，不写入任何文件。
+
+    参数:
+        source (DocumentSource): 文档路径，或内存中的文档内容：bytes / bytearray / memoryview，
+            或以二进制模式打开、可随机访问的文件对象 (例如 io.BytesIO、上传文件的流)。
+        name (Optional[str]): 内存中文档的名称 (例如 "report.pdf")，用于识别文件类型与日志；
+            为 None 时使用文件对象的 name 属性。
+        file_type (Optional[str]): 文件类型 ("docx" 或 "pdf")；为 None 时由名称识别，仍无法识别时按文件头识别。
+        structure_mode (Optional[str]): 结构识别模式 ("llm"、"layout"、"outline"、"rules" 或 "classifier")，为 None 时使用配置 STRUCTURE_MODE。
+
+    返回:
+        Optional[str]: 生成的 Markdown；如果任何步骤失败或文件类型不受支持，则返回 None。
+    """
+    labeled = _label_source(source, name, file_type, structure_mode)
+    if labeled is None:
+        return None
+    input_filepath, llm_output = labeled
+
+    # 5. Markdown 生成
+    return render_markdown(llm_output, input_filepath)
+
+
+def iter_markdown_blocks(source: DocumentSource, name: Optional[str] = None, file_type: Optional[str] = None,
+                         structure_mode: Optional[str] = None) -> Iterator[str]:
+    """
+    与 convert_to_markdown 相同，但逐个产出 Markdown 块 (标题或段落)，用 "\n\n" 连接即为完整的 Markdown。
+
+    提取与标注在取第一个块时完成 (结构标注需要全文)，之后各块按需渲染，调用方可以边渲染边输出。
+    任何步骤失败时不产出任何块 (错误已记录)。
+    """
+    labeled = _label_source(source, name, file_type, structure_mode)
+    if labeled is None:
+        return
+    yield from iter_markdown_blocks_from_labeled_text(labeled[1])
+
+
+def process_document_to_markdown(input_filepath: DocumentSource, results_dir: str, structure_mode: Optional[str] = None,
+                                 name: Optional[str] = None) -> Optional[str]:
+    """
+    处理单个文档（.docx 或 .pdf），将其转换为 Markdown 文件并保存到指定目录。
+
+    该函数是 convert_to_markdown 的简单封装：依次执行提取 (extract_document)、标注 (label_extracted_document)、
+    Markdown 生成 (render_markdown)，再保存结果 (write_markdown_file)。
+    批量处理多个文档时，pipeline.DocumentPipeline 以流水线方式并发执行相同的阶段。
+
+    参数:
+        input_filepath (DocumentSource): 要处理的单个文档的完整路径，或内存中的文档内容 (见 convert_to_markdown)。
+        results_dir (str): 用于保存生成的 .md 文件的目录路径。
+        structure_mode (Optional[str]): 结构识别模式 ("llm"、"layout"、"outline"、"rules" 或 "classifier")，为 None 时使用配置 STRUCTURE_MODE。
+        name (Optional[str]): 内存中文档的名称 (例如 "report.pdf")，用于识别文件类型和生成输出文件名；
+            为 None 时使用文件对象的 name 属性。
+
+    返回:
+        Optional[str]: 如果处理成功，则返回生成的 Markdown 文件的完整路径。
+                       如果任何步骤失败或文件不受支持，则返回 None。
+    """
+    logger = logging.getLogger(__name__)
+    if isinstance(input_filepath, (str, os.PathLike)):
+        output_name = os.fspath(input_filepath)
+    else:
+        output_name = name or getattr(input_filepath, "name", None)
+        if not isinstance(output_name, str) or not output_name:
+            logger.error("保存内存中文档的转换结果时需要提供文档名称 (name)，用于生成输出文件名。")
+            return None
+
+    markdown_content = convert_to_markdown(input_filepath, name=name, structure_mode=structure_mode)
+    if markdown_content is None:
+        return None
+
+    # 6. 保存 Markdown 文件
+    return write_markdown_file(markdown_content, output_name, results_dir)
@@ -0,0 +1,259 @@
+"""
+LLM 标注结果的内容覆盖检查。
+
+结构标注请求要求 LLM 逐行回显原文并加上标签，但实际输出中可能出现：
+- 标签格式不规范 (例如 "H1：标题" 使用全角冒号、"h2:副标题" 缺少空格)，generate_markdown_from_labeled_text
+  会跳过这些行，内容因此丢失；
+- 无法识别的标签 (例如 "Heading: ...")；
+- 段落被遗漏或被概括为一句话。
+
+原先只能重新转换整个文档。本模块对每个文本块的 LLM 输出做一次快速检查：
+1. 在本地修复格式不规范但含义明确的标签行 (不调用 LLM)；
+2. 将原文与输出的内容规范化 (NFKC、小写、去除空白和标点)，按字符 n-gram 计算哈希，
+   统计原文每一行有多少 n-gram 出现在输出中，判断该行是否被覆盖；
+3. 只将未覆盖的连续原文行 (缺失片段) 重新发送给 LLM，用结果替换输出中对应位置 (前后两个已覆盖行之间) 的内容；
+4. 按规范化后的字符数计算覆盖率，DocumentCoverage 汇总一个文档所有文本块的覆盖率。
+
+初始覆盖率低于 MIN_ALIGNMENT_SCORE 时，输出与原文几乎无法对齐 (例如 LLM 返回了完全不同的内容)，
+此时定位缺失片段没有意义，只记录覆盖率并给出警告。
+"""
+import re
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .markdown_generator import parse_labeled_line, LABEL_TO_MARKDOWN_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# 计算覆盖率时使用的字符 n-gram 长度 (规范化之后)
+NGRAM_SIZE = 6
+# 初始覆盖率低于该值时不定位缺失片段
+MIN_ALIGNMENT_SCORE = 0.3
+# 每个文本块最多重新请求的缺失片段数
+MAX_REREQUEST_SPANS = 8
+# 可以在本地修复的标签行：标签前后可带 Markdown 强调/标题符号，冒号可为全角，冒号后可无空格，标签不区分大小写
+_LENIENT_LABEL_PATTERN = re.compile(r"^[\s*#>]*([HhPp][1-4]?)[\s*]*[:：]\s*(.*)$")
+
+
+class CoverageReport(NamedTuple):
+    """单个文本块的覆盖检查结果。覆盖率按规范化后的原文字符数计算。"""
+    score: float  # 修复与重新请求之后的覆盖率
+    initial_score: float  # LLM 原始输出的覆盖率
+    covered_chars: int
+    total_chars: int
+    repaired_lines: int  # 在本地修复了标签格式的行数
+    rerequested_spans: int  # 重新发送给 LLM 的缺失片段数
+
+
+def normalize_for_coverage(text: str) -> str:
+    """规范化文本：NFKC、小写，只保留字母、数字与汉字。"""
+    return "".join(ch for ch in unicodedata.normalize("NFKC", text).lower() if ch.isalnum())
+
+
+def repair_labeled_line(line: str) -> Optional[str]:
+    """
+    返回规范的 "标签: 内容" 行。已经规范的行原样返回；格式不规范但标签明确的行 (全角冒号、缺少空格、
+    小写标签、带 ** 或 # 修饰) 被修复；无法识别标签或内容为空时返回 None。
+    """
+    stripped = line.strip()
+    if parse_labeled_line(stripped) is not None:
+        return stripped
+    match = _LENIENT_LABEL_PATTERN.match(stripped)
+    if not match:
+        return None
+    label, content = match.group(1).upper(), match.group(2).strip().strip("*").strip()
+    if label not in LABEL_TO_MARKDOWN_PREFIX or not content:
+        return None
+    return f"{label}: {content}"
+
+
+class _OutputLine(NamedTuple):
+    raw: str
+    labeled: Optional[str]  # 修复后的规范行；无法识别时为 None
+    content: str  # 规范化后的内容 (用于对齐)
+
+
+def _parse_output(labeled_text: str) -> Tuple[List[_OutputLine], int]:
+    lines: List[_OutputLine] = []
+    repaired = 0
+    for raw in labeled_text.split("\n"):
+        if not raw.strip():
+            continue
+        labeled = repair_labeled_line(raw)
+        if labeled is not None and labeled != raw.strip():
+            repaired += 1
+        content = normalize_for_coverage(parse_labeled_line(labeled)[1]) if labeled is not None else ""
+        lines.append(_OutputLine(raw, labeled, content))
+    return lines, repaired
+
+
+def _align(source_lines: Sequence[str], output_lines: Sequence[_OutputLine],
+           line_threshold: float) -> Tuple[List[Optional[int]], List[int]]:
+    """
+    将原文的每一行与输出对齐。
+
+    返回:
+        (anchors, weights)：anchors[i] 为覆盖原文第 i 行的输出行下标 (未覆盖或空行为 None)；
+        weights[i] 为原文第 i 行规范化后的字符数。
+    """
+    first_line_of: Dict[int, int] = {}
+    for index, line in enumerate(output_lines):
+        for start in range(max(0, len(line.content) - NGRAM_SIZE + 1)):
+            first_line_of.setdefault(hash(line.content[start:start + NGRAM_SIZE]), index)
+
+    anchors: List[Optional[int]] = []
+    weights: List[int] = []
+    last_anchor = 0
+    for source_line in source_lines:
+        normalized = normalize_for_coverage(source_line)
+        weights.append(len(normalized))
+        anchor = None
+        if not normalized:
+            pass
+        elif len(normalized) < NGRAM_SIZE:
+            # 短行 (例如 "第一章") 直接在输出行中查找，优先从上一个对齐位置向后查找
+            order = list(range(last_anchor, len(output_lines))) + list(range(0, last_anchor))
+            anchor = next((index for index in order if normalized in output_lines[index].content), None)
+        else:
+            hits = [first_line_of[key] for key in
+                    (hash(normalized[start:start + NGRAM_SIZE]) for start in range(len(normalized) - NGRAM_SIZE + 1))
+                    if key in first_line_of]
+            if len(hits) >= line_threshold * (len(normalized) - NGRAM_SIZE + 1):
+                anchor = Counter(hits).most_common(1)[0][0]
+        if anchor is not None:
+            last_anchor = anchor
+        anchors.append(anchor)
+    return anchors, weights
+
+
+def _score(anchors: Sequence[Optional[int]], weights: Sequence[int]) -> Tuple[int, int]:
+    covered = sum(weight for anchor, weight in zip(anchors, weights) if anchor is not None)
+    return covered, sum(weights)
+
+
+def _missing_spans(anchors: Sequence[Optional[int]], weights: Sequence[int]) -> List[Tuple[int, int]]:
+    """返回未覆盖的连续原文行 (空行不打断片段)，每个片段为半开区间 [start, end)。"""
+    spans: List[Tuple[int, int]] = []
+    start = None
+    for index, (anchor, weight) in enumerate(zip(anchors, weights)):
+        if weight and anchor is None:
+            if start is None:
+                start = index
+            end = index + 1
+        elif weight and start is not None:
+            spans.append((start, end))
+            start = None
+    if start is not None:
+        spans.append((start, end))
+    return spans
+
+
+def check_coverage(source_text: str, labeled_text: str, line_threshold: float = 0.5) -> CoverageReport:
+    """只计算覆盖率 (含本地标签修复后的结果)，不重新请求。"""
+    output_lines, repaired = _parse_output(labeled_text or "")
+    anchors, weights = _align(source_text.split("\n"), output_lines, line_threshold)
+    covered, total = _score(anchors, weights)
+    score = covered / total if total else 1.0
+    return CoverageReport(score, score, covered, total, repaired, 0)
+
+
+def ensure_coverage(source_text: str, labeled_text: str, analyzer: Callable[[str], Optional[str]],
+                    line_threshold: float = 0.5) -> Tuple[str, CoverageReport]:
+    """
+    检查 labeled_text 对 source_text 的覆盖情况，修复标签格式，并将缺失片段重新发送给 analyzer。
+
+    参数:
+        source_text: 发送给 LLM 的原文 (一个文本块)。
+        labeled_text: LLM 返回的 "标签: 内容" 文本。
+        analyzer: 对一段原文返回 "标签: 内容" 文本的函数 (例如 analyze_text_with_llm)，失败时返回 None。
+        line_threshold: 原文一行中至少有该比例的 n-gram 出现在输出中才视为已覆盖。
+
+    返回:
+        (修复后的标注文本, CoverageReport)。重新请求失败的片段保留原输出。
+    """
+    source_lines = source_text.split("\n")
+    output_lines, repaired = _parse_output(labeled_text)
+    anchors, weights = _align(source_lines, output_lines, line_threshold)
+    covered, total = _score(anchors, weights)
+    initial_score = covered / total if total else 1.0
+    spans = _missing_spans(anchors, weights)
+    rerequested = 0
+
+    if spans and initial_score < MIN_ALIGNMENT_SCORE:
+        logger.warning(f"LLM 输出与原文的覆盖率仅为 {initial_score:.0%}，无法定位缺失片段，未重新请求。")
+        spans = []
+    elif len(spans) > MAX_REREQUEST_SPANS:
+        logger.warning(f"LLM 输出缺失 {len(spans)} 个片段，只重新请求其中最长的 {MAX_REREQUEST_SPANS} 个。")
+        spans = sorted(sorted(spans, key=lambda span: -sum(weights[span[0]:span[1]]))[:MAX_REREQUEST_SPANS])
+
+    # 每个缺失片段替换输出中前后两个已覆盖行之间的内容 (通常是被概括的段落或无法识别的行)；从后向前替换，下标保持有效
+    replacements: List[Tuple[int, int, List[_OutputLine]]] = []
+    for start, end in spans:
+        previous = next((anchors[i] for i in range(start - 1, -1, -1) if anchors[i] is not None), None)
+        following = next((anchors[i] for i in range(end, len(anchors)) if anchors[i] is not None), None)
+        insert_at = previous + 1 if previous is not None else 0
+        replace_end = following if following is not None else len(output_lines)
+        if replace_end < insert_at:
+            replace_end = insert_at  # 对齐顺序不一致时只插入，不删除
+        response = analyzer("\n".join(source_lines[start:end]))
+        rerequested += 1
+        parsed, _ = _parse_output(response or "")
+        parsed = [line for line in parsed if line.labeled is not None]
+        if not parsed:
+            logger.warning(f"缺失片段 (原文第 {start + 1}-{end} 行) 重新请求失败，保留原输出。")
+            continue
+        replacements.append((insert_at, replace_end, parsed))
+    for insert_at, replace_end, parsed in sorted(replacements, key=lambda item: item[0], reverse=True):
+        output_lines[insert_at:replace_end] = parsed
+
+    if repaired or replacements:
+        result_text = "\n".join(line.labeled if line.labeled is not None else line.raw for line in output_lines)
+    else:
+        result_text = labeled_text
+    if replacements:
+        anchors, weights = _align(source_lines, output_lines, line_threshold)
+        covered, total = _score(anchors, weights)
+    score = covered / total if total else 1.0
+    if repaired or rerequested:
+        logger.info(f"内容覆盖检查: 修复 {repaired} 行标签格式，重新请求 {rerequested} 个缺失片段，"
+                    f"覆盖率 {initial_score:.1%} -> {score:.1%}。")
+    return result_text, CoverageReport(score, initial_score, covered, total, repaired, rerequested)
+
+
+class DocumentCoverage:
+    """汇总一个文档所有文本块的覆盖检查结果。所有方法都是线程安全的。"""
+
+    def __init__(self, line_threshold: float = 0.5):
+        self.line_threshold = line_threshold
+        self.covered_chars = 0
+        self.total_chars = 0
+        self.initial_covered_chars = 0
+        self.repaired_lines = 0
+        self.rerequested_spans = 0
+        self._lock = threading.Lock()
+
+    def check(self, source_text: str, labeled_text: str, analyzer: Callable[[str], Optional[str]]) -> str:
+        """对一个文本块运行 ensure_coverage，记录结果并返回修复后的标注文本。"""
+        result_text, report = ensure_coverage(source_text, labeled_text, analyzer, self.line_threshold)
+        with self._lock:
+            self.covered_chars += report.covered_chars
+            self.total_chars += report.total_chars
+            self.initial_covered_chars += round(report.initial_score * report.total_chars)
+            self.repaired_lines += report.repaired_lines
+            self.rerequested_spans += report.rerequested_spans
+        return result_text
+
+    @property
+    def score(self) -> float:
+        with self._lock:
+            return self.covered_chars / self.total_chars if self.total_chars else 1.0
+
+    def summary(self) -> str:
+        with self._lock:
+            initial = self.initial_covered_chars / self.total_chars if self.total_chars else 1.0
+            score = self.covered_chars / self.total_chars if self.total_chars else 1.0
+            return (f"内容覆盖率 {score:.1%} (LLM 原始输出 {initial:.1%}；修复 {self.repaired_lines} 行标签格式，"
+                    f"重新请求 {self.rerequested_spans} 个缺失片段)")
@@ -1,19 +1,21 @@
-import docx
 import logging
+from typing import BinaryIO
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_docx(file_path: str) -> str | None:
+def extract_text_from_docx(file_path: str | BinaryIO) -> str | None:
     """
     从 .docx 文件中提取所有文本，保留段落分隔。
 
     参数:
-        file_path: .docx 文件的路径。
+        file_path: .docx 文件的路径，或以二进制模式打开、可随机访问的文件对象 (例如 io.BytesIO)。
 
     返回:
         包含提取文本的字符串，段落之间用换行符分隔。
         如果发生错误，则返回 None。
     """
+    import docx  # 延迟导入：python-docx (lxml) 加载较慢，只在真正提取 DOCX 时才需要
+
     try:
         logger.debug(f"开始从 DOCX 文件提取文本: {file_path}")
         doc = docx.Document(file_path)
@@ -0,0 +1,227 @@
+"""
+文本提取结果的持久化缓存。
+
+重新运行转换时 (例如只更换了提示词或模型)，PDF/DOCX 的文本提取往往是本地最耗 CPU 的步骤。
+本模块将 `read_file_content` 的输出缓存在本地目录中，缓存键由以下三部分组成：
+- 文件内容的 SHA-256 摘要；
+- 对应提取器的版本号 (见 EXTRACTOR_VERSIONS，提取逻辑变化时应递增)；
+- 提取选项 (可选的字典，序列化后参与计算)。
+
+为避免重复计算哈希，索引中会记录每个文件路径上次计算时的大小与修改时间 (mtime_ns)，
+两者都未变化时直接复用已记录的摘要。缓存总大小超过上限时，按最近最少使用的顺序淘汰条目。
+
+索引写入采用"临时文件 + os.replace"的方式，保证单个写入是原子的。多个进程共享同一缓存目录时
+索引可能出现"后写覆盖先写"的情况，这只会导致少量额外的重新哈希或缓存未命中，不会返回错误内容。
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Optional, Dict, Any
+
+from .utils import compute_file_sha256
+
+logger = logging.getLogger(__name__)
+
+# 各提取器的版本号。修改 docx_extractor / pdf_extractor 的输出格式时请递增对应版本，使旧缓存自动失效。
+EXTRACTOR_VERSIONS = {"docx": "1", "pdf": "1"}
+
+INDEX_FILENAME = "index.json"
+ENTRY_SUFFIX = ".txt"
+
+
+class ExtractionCache:
+    """
+    基于文件内容哈希的提取结果缓存。
+
+    参数:
+        cache_dir (str): 缓存目录，不存在时会自动创建。
+        max_bytes (int): 缓存条目总大小上限 (字节)。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+
+    # --- 索引读写 ---
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, INDEX_FILENAME)
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        if self._index is not None:
+            return self._index
+        index: Dict[str, Dict[str, Any]] = {"files": {}, "entries": {}}
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            if isinstance(loaded, dict):
+                index["files"] = loaded.get("files") or {}
+                index["entries"] = loaded.get("entries") or {}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"提取缓存索引 {self._index_path()} 无法读取，将重新建立: {e}")
+        self._index = index
+        return index
+
+    def _save_index(self) -> None:
+        if self._index is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".index-", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(tmp_path, self._index_path())
+        except OSError as e:
+            logger.warning(f"写入提取缓存索引失败: {e}")
+
+    # --- 键计算 ---
+
+    def _content_hash(self, filepath: str) -> Optional[str]:
+        """返回文件内容摘要；大小与 mtime 均未变化时复用索引中记录的摘要，不重新读取文件。"""
+        try:
+            stat = os.stat(filepath)
+        except OSError as e:
+            logger.debug(f"无法获取文件状态，跳过提取缓存: {filepath}: {e}")
+            return None
+        files = self._load_index()["files"]
+        abs_path = os.path.abspath(filepath)
+        record = files.get(abs_path)
+        if record and record.get("size") == stat.st_size and record.get("mtime_ns") == stat.st_mtime_ns:
+            return record.get("sha256")
+        try:
+            sha256 = compute_file_sha256(filepath)
+        except OSError as e:
+            logger.debug(f"计算文件哈希失败，跳过提取缓存: {filepath}: {e}")
+            return None
+        files[abs_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+        return sha256
+
+    @staticmethod
+    def make_key(content_hash: str, file_type: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """由内容摘要、提取器版本和提取选项计算缓存键。"""
+        key_material = json.dumps(
+            [content_hash, file_type, EXTRACTOR_VERSIONS.get(file_type, "0"), options or {}],
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    # --- 公共接口 ---
+
+    def get(self, filepath: str, file_type: str, options: Optional[Dict[str, Any]] = None,
+            content_hash: Optional[str] = None) -> Optional[str]:
+        """
+        查找文件的已缓存提取结果，未命中时返回 None。
+
+        content_hash 已知时 (例如内存中的文档) 直接使用，不再读取 filepath，此时 filepath 只用于日志。
+        """
+        with self._lock:
+            content_hash = content_hash or self._content_hash(filepath)
+            if content_hash is None:
+                return None
+            key = self.make_key(content_hash, file_type, options)
+            entries = self._load_index()["entries"]
+            entry = entries.get(key)
+            try:
+                with open(self._entry_path(key), "r", encoding="utf-8") as f:
+                    text = f.read()
+            except FileNotFoundError:
+                if entry is not None:
+                    entries.pop(key, None)
+                self._save_index()
+                logger.debug(f"提取缓存未命中: {filepath}")
+                return None
+            except OSError as e:
+                logger.warning(f"读取提取缓存条目失败 ({filepath}): {e}")
+                return None
+            size = entry.get("size") if entry else len(text.encode("utf-8"))
+            entries[key] = {"size": size, "last_used": time.time()}
+            self._save_index()
+            logger.info(f"提取缓存命中，跳过文本提取: {filepath}")
+            return text
+
+    def put(self, filepath: str, file_type: str, text: str, options: Optional[Dict[str, Any]] = None,
+            content_hash: Optional[str] = None) -> None:
+        """写入文件的提取结果，并在总大小超限时淘汰旧条目。content_hash 的含义同 get。"""
+        with self._lock:
+            content_hash = content_hash or self._content_hash(filepath)
+            if content_hash is None:
+                return
+            key = self.make_key(content_hash, file_type, options)
+            data = text.encode("utf-8")
+            if len(data) > self.max_bytes:
+                logger.debug(f"提取结果 ({len(data)} 字节) 超过缓存上限，不写入缓存: {filepath}")
+                self._save_index()
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".entry-", suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self._entry_path(key))
+            except OSError as e:
+                logger.warning(f"写入提取缓存条目失败 ({filepath}): {e}")
+                return
+            self._load_index()["entries"][key] = {"size": len(data), "last_used": time.time()}
+            self._evict()
+            self._save_index()
+            logger.debug(f"已缓存提取结果 ({len(data)} 字节): {filepath}")
+
+    def total_bytes(self) -> int:
+        """返回索引中记录的缓存条目总大小 (字节)。"""
+        with self._lock:
+            return sum(entry.get("size", 0) for entry in self._load_index()["entries"].values())
+
+    def _evict(self) -> None:
+        """按最近最少使用顺序删除条目，直到总大小不超过上限。调用方需持有锁。"""
+        entries = self._load_index()["entries"]
+        total = sum(entry.get("size", 0) for entry in entries.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(entries.items(), key=lambda item: item[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._entry_path(key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"淘汰提取缓存条目 {key} 失败: {e}")
+                continue
+            total -= entry.get("size", 0)
+            del entries[key]
+            logger.debug(f"已淘汰提取缓存条目 {key}")
+
+
+_cache_instance: Optional[ExtractionCache] = None
+_cache_instance_lock = threading.Lock()
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """
+    返回进程内共享的提取缓存实例。
+
+    返回:
+        Optional[ExtractionCache]: 若配置中禁用了缓存 (EXTRACTION_CACHE_ENABLED=false)，则返回 None。
+    """
+    global _cache_instance
+    from . import config  # 在调用时读取，以便测试中 reload(config) 后的配置生效
+
+    if not config.EXTRACTION_CACHE_ENABLED:
+        return None
+    with _cache_instance_lock:
+        max_bytes = config.EXTRACTION_CACHE_MAX_MB * 1024 * 1024
+        if (_cache_instance is None or _cache_instance.cache_dir != config.EXTRACTION_CACHE_DIR
+                or _cache_instance.max_bytes != max_bytes):
+            _cache_instance = ExtractionCache(config.EXTRACTION_CACHE_DIR, max_bytes)
+        return _cache_instance
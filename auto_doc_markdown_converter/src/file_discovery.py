@@ -0,0 +1,115 @@
+"""
+输入文件发现。
+
+main.py 原先只列出输入目录的第一层 (Path.iterdir)，并对每一项调用 is_file()。对于包含大量文件、
+多层子目录的共享目录，本模块提供基于 os.scandir 的递归遍历：
+
+- 以生成器的形式逐个产出文件路径，流水线在发现第一个文件时就可以开始处理，不必先建立完整的文件列表；
+- os.scandir 返回的目录项自带文件类型信息，判断文件/目录通常不需要额外的 stat 调用；
+  只有设置了大小限制时才读取文件大小；
+- 支持 glob 形式的包含/排除模式：含 "/" 的模式匹配相对于输入根目录的路径 (例如 "reports/*/2024-*.pdf")，
+  否则只匹配文件名 (例如 "*.docx")；与排除模式匹配的目录不会被遍历；
+- 同一目录中的条目按名称排序，结果与文件系统返回的顺序无关；符号链接的目录不会被跟随 (避免循环)。
+
+output_directory_for 将输入文件映射到输出目录中的对应子目录，使输出保持与输入相同的目录结构。
+"""
+import os
+import fnmatch
+import logging
+from typing import Iterator, Optional, Sequence
+
+from .file_handler import SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+
+def _relative_posix_path(path: str, root: str) -> str:
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def _matches(relative_path: str, patterns: Sequence[str]) -> bool:
+    name = relative_path.rsplit("/", 1)[-1]
+    for pattern in patterns:
+        if fnmatch.fnmatchcase(relative_path if "/" in pattern else name, pattern.strip("/")):
+            return True
+    return False
+
+
+def _size_allowed(size: int, min_size: Optional[int], max_size: Optional[int]) -> bool:
+    return (min_size is None or size >= min_size) and (max_size is None or size <= max_size)
+
+
+def discover_documents(input_path: str, recursive: bool = False,
+                       include: Sequence[str] = (), exclude: Sequence[str] = (),
+                       min_size: Optional[int] = None, max_size: Optional[int] = None) -> Iterator[str]:
+    """
+    逐个产出 input_path 中受支持的文档路径 (.docx / .pdf)。
+
+    参数:
+        input_path: 输入文件或目录。为文件时只检查扩展名与大小限制。
+        recursive: 是否遍历子目录。
+        include: 包含模式；非空时只产出与其中任一模式匹配的文件。
+        exclude: 排除模式；与之匹配的文件和目录被跳过。
+        min_size / max_size: 文件大小的下限与上限 (字节，含边界)，为 None 时不限制。
+
+    返回:
+        Iterator[str]: 文档路径的生成器。无法读取的目录或文件只记录警告并跳过。
+    """
+    if os.path.isfile(input_path):
+        name = os.path.basename(input_path)
+        if os.path.splitext(name)[1].lower() not in SUPPORTED_EXTENSIONS:
+            logger.warning(f"输入文件 {name} 不是 .docx 或 .pdf 文件。已跳过。")
+            return
+        if min_size is not None or max_size is not None:
+            size = os.path.getsize(input_path)
+            if not _size_allowed(size, min_size, max_size):
+                logger.info(f"输入文件 {name} 的大小 ({size} 字节) 超出限制。已跳过。")
+                return
+        yield input_path
+        return
+
+    check_size = min_size is not None or max_size is not None
+    pending_dirs = [input_path]
+    while pending_dirs:
+        directory = pending_dirs.pop()
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"无法读取目录 {directory}，已跳过: {e}")
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and not (exclude and _matches(_relative_posix_path(entry.path, input_path), exclude)):
+                        subdirectories.append(entry.path)
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in SUPPORTED_EXTENSIONS or not entry.is_file():
+                    continue
+                relative_path = _relative_posix_path(entry.path, input_path)
+                if include and not _matches(relative_path, include):
+                    continue
+                if exclude and _matches(relative_path, exclude):
+                    continue
+                if check_size and not _size_allowed(entry.stat().st_size, min_size, max_size):
+                    logger.debug(f"文件大小超出限制，已跳过: {relative_path}")
+                    continue
+            except OSError as e:
+                logger.warning(f"无法读取 {entry.path} 的文件信息，已跳过: {e}")
+                continue
+            yield entry.path
+        # 先处理当前目录的文件，再按名称顺序深入子目录 (栈后进先出，因此逆序压入)
+        pending_dirs.extend(reversed(subdirectories))
+
+
+def output_directory_for(input_filepath: str, input_root: str, output_root: str) -> str:
+    """
+    返回输入文件在输出目录中的对应目录：input_root 之下的文件保持相对目录结构，
+    其他文件 (例如 input_root 本身就是文件) 直接输出到 output_root。
+    """
+    relative_dir = os.path.relpath(os.path.dirname(os.path.abspath(input_filepath)), os.path.abspath(input_root))
+    if relative_dir == os.curdir or relative_dir == os.pardir or relative_dir.startswith(os.pardir + os.sep):
+        return output_root
+    return os.path.join(output_root, relative_dir)
@@ -1,10 +1,21 @@
+import io
 import os
+import json
 import logging
+from typing import BinaryIO, List, Union
 from .docx_extractor import extract_text_from_docx
-from .pdf_extractor import extract_text_from_pdf
+from .pdf_extractor import extract_text_from_pdf, extract_layout_lines_from_pdf, LayoutLine
+from .extraction_cache import get_extraction_cache
+from .utils import compute_content_sha256
 
 SUPPORTED_EXTENSIONS = {".docx": "docx", ".pdf": "pdf"}
 
+# 内存中的文档内容：字节串，或以二进制模式打开、可随机访问的文件对象
+DocumentContent = Union[bytes, bytearray, memoryview, BinaryIO]
+
+# 文件头 -> 文件类型 (DOCX 是 ZIP 容器)
+_CONTENT_SIGNATURES = ((b"%PDF-", "pdf"), (b"PK\x03\x04", "docx"))
+
 # Configure logging for this module if not configured by main application
 # This ensures logs are captured even if file_handler is used standalone or tested separately.
 logger = logging.getLogger(__name__)
@@ -29,35 +40,116 @@ def get_file_type(filepath: str) -> str:
     return SUPPORTED_EXTENSIONS.get(ext.lower(), "unsupported")
 
 
-def read_file_content(filepath: str, file_type: str) -> str | None:
+def detect_content_type(content: DocumentContent) -> str:
+    """
+    根据文件头识别内存中文档的类型 (没有文件名可供 get_file_type 判断时使用)。
+
+    Returns:
+        "docx", "pdf", or "unsupported".
+    """
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        header = bytes(content[:8])
+    else:
+        content.seek(0)
+        header = content.read(8)
+        content.seek(0)
+    for signature, file_type in _CONTENT_SIGNATURES:
+        if header.startswith(signature):
+            return file_type
+    return "unsupported"
+
+
+def _open_content(content: DocumentContent) -> BinaryIO:
+    """返回可交给提取器的文件对象：字节串包装为 BytesIO (不复制到临时文件)，文件对象重置到开头。"""
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        return io.BytesIO(content)
+    content.seek(0)
+    return content
+
+
+def read_file_content(filepath: str, file_type: str, content: DocumentContent | None = None) -> str | None:
     """
     Reads content from a supported file type using the appropriate extractor.
     假定文件存在性由调用方检查。
 
+    如果启用了提取缓存 (见 extraction_cache.py)，会先按文件内容哈希查找之前的提取结果，
+    命中时直接返回，未命中时在提取成功后写入缓存。
+
     Args:
-        filepath: 文件的路径。
+        filepath: 文件的路径。给出 content 时只用于日志。
         file_type: 文件的类型 ("docx" 或 "pdf")，通常来自 get_file_type。
+        content: 内存中的文档内容；给出时直接从内存提取，不读取 filepath。
 
     Returns:
         提取的文本（字符串形式），如果提取失败、文件类型不是 'docx' 或 'pdf'，则为 None。
     """
     # 移除了 os.path.exists(filepath) 检查，因为调用方 (main.py) 应该已经检查过了。
+    if file_type not in SUPPORTED_EXTENSIONS.values():
+        # 如果调用方正确使用了 get_file_type，则理论上不应到达此路径。
+        logger.error(f"向 read_file_content 提供了不支持的文件类型 '{file_type}' 用于文件: {filepath}。无法读取内容。") # 改为 ERROR
+        return None
+
+    cache = get_extraction_cache()
+    content_hash = None
+    if cache is not None:
+        content_hash = compute_content_sha256(content) if content is not None else None
+        cached_text = cache.get(filepath, file_type, content_hash=content_hash)
+        if cached_text is not None:
+            return cached_text
+
+    text = _extract_file_content(filepath, file_type, content)
+    if text is not None and cache is not None:
+        cache.put(filepath, file_type, text, content_hash=content_hash)
+    return text
 
+
+def _extract_file_content(filepath: str, file_type: str, content: DocumentContent | None = None) -> str | None:
+    """调用对应的提取器读取文件 (或内存中的文档) 内容，不经过缓存。"""
     try:
+        source = _open_content(content) if content is not None else filepath
         if file_type == "docx":
             logger.debug(f"正在从 DOCX 提取文本: {filepath}")
-            return extract_text_from_docx(filepath)
-        elif file_type == "pdf":
+            return extract_text_from_docx(source)
+        else:
             logger.debug(f"正在从 PDF 提取文本: {filepath}")
-            text = extract_text_from_pdf(filepath)
+            text = extract_text_from_pdf(source)
             if text is None or not text.strip(): # 检查文本是否为 None 或空/仅空白
                 logger.warning(f"未能从 PDF 提取文本: {filepath}。它可能是基于图像的、已加密的或空的。")
                 return None 
             return text
-        else:
-            # 如果调用方正确使用了 get_file_type，则理论上不应到达此路径。
-            logger.error(f"向 read_file_content 提供了不支持的文件类型 '{file_type}' 用于文件: {filepath}。无法读取内容。") # 改为 ERROR
-            return None
     except Exception as e: # 捕获提取器可能抛出的任何其他异常
         logger.error(f"处理文件 {filepath} (类型: {file_type}) 时发生意外错误: {e}", exc_info=logger.isEnabledFor(logging.DEBUG))
         return None
+
+
+# 版面行在提取缓存中使用的选项，用于与纯文本提取结果区分
+_LAYOUT_CACHE_OPTIONS = {"mode": "layout"}
+
+
+def read_pdf_layout_lines(filepath: str, content: DocumentContent | None = None) -> List[LayoutLine] | None:
+    """
+    读取 PDF 的版面行 (文本及字号、字体、位置)，同样经过提取缓存。
+
+    Args:
+        filepath: PDF 文件的路径。给出 content 时只用于日志。
+        content: 内存中的 PDF 内容，含义同 read_file_content。
+
+    Returns:
+        LayoutLine 列表；如果提取失败，则为 None。
+    """
+    cache = get_extraction_cache()
+    content_hash = None
+    if cache is not None:
+        content_hash = compute_content_sha256(content) if content is not None else None
+        cached = cache.get(filepath, "pdf", options=_LAYOUT_CACHE_OPTIONS, content_hash=content_hash)
+        if cached is not None:
+            try:
+                return [LayoutLine(*fields) for fields in json.loads(cached)]
+            except (ValueError, TypeError) as e:
+                logger.warning(f"提取缓存中的版面行数据无效，将重新提取 ({filepath}): {e}")
+
+    layout_lines = extract_layout_lines_from_pdf(_open_content(content) if content is not None else filepath)
+    if layout_lines and cache is not None:
+        cache.put(filepath, "pdf", json.dumps([list(line) for line in layout_lines], ensure_ascii=False),
+                  options=_LAYOUT_CACHE_OPTIONS, content_hash=content_hash)
+    return layout_lines
@@ -0,0 +1,287 @@
+"""
+将 LLM 的标注结果蒸馏为本地 CPU 标题分类器。
+
+每次使用 LLM 标注文档后，都会得到 H1-H4/P 的逐行标签。本模块：
+1. 从文本行中提取轻量特征 (长度区间、句末标点、编号类型、相邻行信息等)；
+2. 将 (特征, 标签) 对追加写入 JSONL 训练日志 (见 log_training_samples)；
+3. 用纯 Python 实现的多分类逻辑回归 (softmax，SGD 训练，L2 正则) 在训练日志上训练模型，
+   模型以 JSON 保存，不依赖 numpy/scikit-learn；
+4. 推理时为每行给出标签和概率，概率不足的行交给 LLM 复核 (见 hybrid_labeler.resolve_uncertain_lines)。
+
+命令行训练:
+    python -m auto_doc_markdown_converter.src.heading_classifier --data <训练日志.jsonl> --output <模型.json>
+"""
+import os
+import json
+import math
+import random
+import logging
+import argparse
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .hybrid_labeler import LabeledLine
+from .rule_engine import RuleEngine, BUILTIN_RULE_SETS
+
+logger = logging.getLogger(__name__)
+
+LABELS = ("H1", "H2", "H3", "H4", "P")
+# 特征定义发生变化时递增，训练日志和模型中都会记录该版本，不匹配的样本/模型不会被使用
+FEATURE_VERSION = 1
+
+_SENTENCE_END_CHARS = "。！？!?；;"
+_LENGTH_BUCKETS = (10, 20, 40, 80)
+_numbering_engine = RuleEngine([rule for rules in BUILTIN_RULE_SETS.values() for rule in rules])
+# 多个文档 (Web 任务队列、流水线中的并发文档) 同时追加训练日志时，每篇文档的样本作为一个整体写入
+_training_log_lock = threading.Lock()
+
+Features = Dict[str, float]
+
+
+def _length_bucket(length: int) -> str:
+    for bucket in _LENGTH_BUCKETS:
+        if length <= bucket:
+            return f"len<={bucket}"
+    return f"len>{_LENGTH_BUCKETS[-1]}"
+
+
+def extract_line_features(lines: Sequence[str]) -> List[Features]:
+    """
+    为每一行提取稀疏特征。编号类型通过规则引擎对整篇文档一次扫描得到。
+
+    参数:
+        lines: 文档的文本行 (已去除首尾空白，不含空行)。
+
+    返回:
+        List[Dict[str, float]]: 与 lines 一一对应的特征字典。
+    """
+    numbering = _numbering_engine.match_rules(lines)
+    total = len(lines)
+    features_list: List[Features] = []
+    for index, line in enumerate(lines):
+        features: Features = {"bias": 1.0, _length_bucket(len(line)): 1.0, "position": index / max(total - 1, 1)}
+        last_char = line[-1:] or ""
+        if last_char in _SENTENCE_END_CHARS:
+            features["ends_sentence"] = 1.0
+        elif last_char in "：:":
+            features["ends_colon"] = 1.0
+        elif last_char in "，,、":
+            features["ends_comma"] = 1.0
+        if numbering[index] is not None:
+            features[f"num:{numbering[index].name}"] = 1.0
+            if index > 0 and numbering[index - 1] is not None and numbering[index - 1].name == numbering[index].name:
+                features["num_same_as_prev"] = 1.0
+        else:
+            features["num:none"] = 1.0
+        if index == 0:
+            features["first_line"] = 1.0
+        if any(ch.isdigit() for ch in line):
+            features["has_digit"] = 1.0
+        if sum(1 for ch in line if ch.isascii()) > len(line) / 2:
+            features["mostly_ascii"] = 1.0
+        if index > 0:
+            previous = lines[index - 1]
+            features[f"prev_{_length_bucket(len(previous))}"] = 1.0
+            if previous[-1:] in _SENTENCE_END_CHARS:
+                features["prev_ends_sentence"] = 1.0
+        if index + 1 < total:
+            following = lines[index + 1]
+            features[f"next_{_length_bucket(len(following))}"] = 1.0
+            if following[-1:] in _SENTENCE_END_CHARS:
+                features["next_ends_sentence"] = 1.0
+        features_list.append(features)
+    return features_list
+
+
+def log_training_samples(labeled_lines: Sequence[LabeledLine], log_path: str, source: Optional[str] = None) -> int:
+    """
+    将一篇文档的 (特征, 标签) 对追加写入 JSONL 训练日志。
+
+    参数:
+        labeled_lines: LLM 给出的标注结果。
+        log_path: 训练日志路径，父目录不存在时会自动创建。
+        source: 可选，记录样本来源 (例如输入文件名)。
+
+    返回:
+        int: 写入的样本数；写入失败时为 0 (错误已记录，不影响文档转换)。
+    """
+    lines = [line for line in labeled_lines if line.text.strip() and line.label in LABELS]
+    if not lines:
+        return 0
+    features_list = extract_line_features([line.text.strip() for line in lines])
+    records = []
+    for line, features in zip(lines, features_list):
+        record = {"v": FEATURE_VERSION, "label": line.label, "features": features, "text": line.text}
+        if source:
+            record["source"] = source
+        records.append(json.dumps(record, ensure_ascii=False) + "\n")
+    payload = "".join(records)
+    try:
+        with _training_log_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(payload)
+    except OSError as e:
+        logger.warning(f"写入标题分类器训练日志 {log_path} 失败: {e}")
+        return 0
+    logger.debug(f"已向训练日志 {log_path} 写入 {len(lines)} 条样本。")
+    return len(lines)
+
+
+def load_training_samples(log_path: str) -> List[Tuple[Features, str]]:
+    """读取训练日志中与当前 FEATURE_VERSION 一致的样本，无法解析的行会被跳过。"""
+    samples: List[Tuple[Features, str]] = []
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line_number, raw_line in enumerate(f, start=1):
+            try:
+                record = json.loads(raw_line)
+            except ValueError:
+                logger.warning(f"训练日志 {log_path} 第 {line_number} 行不是有效的 JSON，已跳过。")
+                continue
+            if record.get("v") == FEATURE_VERSION and record.get("label") in LABELS:
+                samples.append((record["features"], record["label"]))
+    return samples
+
+
+class HeadingClassifier:
+    """多分类逻辑回归标题分类器。weights[label][feature] 为对应权重。"""
+
+    def __init__(self, weights: Optional[Dict[str, Features]] = None):
+        self.weights: Dict[str, Features] = weights or {label: {} for label in LABELS}
+
+    def _scores(self, features: Features) -> Dict[str, float]:
+        return {
+            label: sum(label_weights.get(name, 0.0) * value for name, value in features.items())
+            for label, label_weights in self.weights.items()
+        }
+
+    def predict_proba(self, features: Features) -> Dict[str, float]:
+        """返回各标签的概率。"""
+        scores = self._scores(features)
+        max_score = max(scores.values())
+        exp_scores = {label: math.exp(score - max_score) for label, score in scores.items()}
+        total = sum(exp_scores.values())
+        return {label: value / total for label, value in exp_scores.items()}
+
+    def predict(self, lines: Sequence[str]) -> List[LabeledLine]:
+        """为文本行打标签，confidence 为预测标签的概率。空行会被忽略。"""
+        lines = [line.strip() for line in lines if line.strip()]
+        labeled: List[LabeledLine] = []
+        for line, features in zip(lines, extract_line_features(lines)):
+            probabilities = self.predict_proba(features)
+            label = max(probabilities, key=probabilities.get)
+            labeled.append(LabeledLine(label, line, probabilities[label]))
+        return labeled
+
+    @classmethod
+    def train(cls, samples: Sequence[Tuple[Features, str]], epochs: int = 20, learning_rate: float = 0.1,
+              l2: float = 1e-4, seed: int = 0) -> "HeadingClassifier":
+        """
+        用随机梯度下降训练模型。
+
+        参数:
+            samples: (特征, 标签) 对。
+            epochs: 训练轮数。
+            learning_rate: 初始学习率 (按轮次衰减)。
+            l2: L2 正则系数。
+            seed: 打乱样本顺序的随机种子，保证结果可复现。
+        """
+        model = cls()
+        order = list(range(len(samples)))
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = learning_rate / (1 + epoch)
+            for sample_index in order:
+                features, target = samples[sample_index]
+                probabilities = model.predict_proba(features)
+                for label, label_weights in model.weights.items():
+                    gradient = probabilities[label] - (1.0 if label == target else 0.0)
+                    for name, value in features.items():
+                        weight = label_weights.get(name, 0.0)
+                        label_weights[name] = weight - rate * (gradient * value + l2 * weight)
+        return model
+
+    def accuracy(self, samples: Iterable[Tuple[Features, str]]) -> float:
+        """返回模型在给定样本上的准确率。"""
+        samples = list(samples)
+        if not samples:
+            return 0.0
+        correct = 0
+        for features, target in samples:
+            probabilities = self.predict_proba(features)
+            if max(probabilities, key=probabilities.get) == target:
+                correct += 1
+        return correct / len(samples)
+
+    def save(self, model_path: str) -> None:
+        """以 JSON 格式保存模型。"""
+        os.makedirs(os.path.dirname(os.path.abspath(model_path)), exist_ok=True)
+        with open(model_path, "w", encoding="utf-8") as f:
+            json.dump({"feature_version": FEATURE_VERSION, "weights": self.weights}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, model_path: str) -> Optional["HeadingClassifier"]:
+        """加载模型。文件不存在、格式无效或特征版本不匹配时返回 None。"""
+        try:
+            with open(model_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"标题分类器模型文件不存在: {model_path}")
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"无法加载标题分类器模型 {model_path}: {e}")
+            return None
+        if data.get("feature_version") != FEATURE_VERSION or set(data.get("weights", {})) != set(LABELS):
+            logger.error(f"标题分类器模型 {model_path} 与当前特征版本 ({FEATURE_VERSION}) 不兼容，请重新训练。")
+            return None
+        return cls(data["weights"])
+
+
+_classifier: Optional[HeadingClassifier] = None
+_classifier_path: Optional[str] = None  # 最近一次尝试加载的模型路径 (加载失败时同样记录，不再重复尝试)
+_classifier_lock = threading.Lock()
+
+
+def get_heading_classifier() -> Optional[HeadingClassifier]:
+    """
+    返回按配置 (HEADING_CLASSIFIER_MODEL) 加载的进程内共享模型；模型不可用时返回 None。
+    每个模型路径只加载一次，模型不可用的结果也会被缓存 (训练出新模型后需要重新启动进程)。
+    """
+    global _classifier, _classifier_path
+    from .config import HEADING_CLASSIFIER_MODEL
+    with _classifier_lock:
+        if _classifier_path != HEADING_CLASSIFIER_MODEL:
+            _classifier = HeadingClassifier.load(HEADING_CLASSIFIER_MODEL)
+            _classifier_path = HEADING_CLASSIFIER_MODEL
+        return _classifier
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """训练命令行入口：读取训练日志，留出部分样本评估准确率，然后保存模型。"""
+    parser = argparse.ArgumentParser(description="用 LLM 标注日志训练本地标题分类器。")
+    parser.add_argument("--data", required=True, help="训练日志 (JSONL) 路径，即 HEADING_CLASSIFIER_TRAINING_LOG。")
+    parser.add_argument("--output", required=True, help="模型输出路径 (JSON)。")
+    parser.add_argument("--epochs", type=int, default=20, help="训练轮数，默认 20。")
+    parser.add_argument("--holdout", type=float, default=0.1, help="用于评估的样本比例，默认 0.1。")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    samples = load_training_samples(args.data)
+    if not samples:
+        logger.error(f"训练日志 {args.data} 中没有可用的样本。")
+        return 1
+    random.Random(0).shuffle(samples)
+    holdout_count = int(len(samples) * args.holdout)
+    holdout, training = samples[:holdout_count], samples[holdout_count:]
+    model = HeadingClassifier.train(training, epochs=args.epochs)
+    logger.info(f"训练完成: {len(training)} 条训练样本，训练集准确率 {model.accuracy(training):.1%}")
+    if holdout:
+        logger.info(f"留出集 ({len(holdout)} 条) 准确率 {model.accuracy(holdout):.1%}")
+    model.save(args.output)
+    logger.info(f"模型已保存到 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,137 @@
+"""
+本地标注与 LLM 标注的混合流程。
+
+版面分析等本地方法可以为文档中的大部分行直接给出 H1-H4/P 标签，并附带一个置信度。
+本模块负责把置信度低于阈值的连续行归并为若干"区域"，只将这些区域发送给 LLM 重新标注，
+再将 LLM 的结果拼接回原位置，从而显著减少 LLM 调用量。
+"""
+import logging
+import concurrent.futures
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from . import llm_processor
+from .config import MAX_CONCURRENT_LLM_REQUESTS
+from .chunk_scheduler import llm_request_workers
+from .markdown_generator import parse_labeled_line
+from .text_splitter import estimate_tokens, DEFAULT_MAX_CHUNK_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# 两个低置信度区域之间相隔不超过该行数时合并为一个区域，以减少请求次数
+REGION_MERGE_GAP = 2
+
+
+class LabeledLine(NamedTuple):
+    """一行带标签的文本。label 取值为 "H1"-"H4" 或 "P"，confidence 位于 [0, 1]。"""
+    label: str
+    text: str
+    confidence: float
+
+
+def labeled_lines_to_text(lines: List[LabeledLine]) -> str:
+    """将 LabeledLine 列表转换为 "标签: 内容" 格式的文本，可直接传给 generate_markdown_from_labeled_text。"""
+    return "\n".join(f"{line.label}: {line.text}" for line in lines if line.text.strip())
+
+
+def parse_labeled_text(labeled_text: str, confidence: float = 1.0) -> List[LabeledLine]:
+    """将 "标签: 内容" 格式的文本 (例如 LLM 输出) 解析为 LabeledLine 列表，无法识别的行会被跳过。"""
+    parsed_lines: List[LabeledLine] = []
+    for raw_line in labeled_text.splitlines():
+        parsed = parse_labeled_line(raw_line.strip())
+        if parsed is None:
+            if raw_line.strip():
+                logger.debug(f"跳过无法识别标签的行: '{raw_line}'")
+            continue
+        label, content = parsed
+        parsed_lines.append(LabeledLine(label, content, confidence))
+    return parsed_lines
+
+
+def find_uncertain_regions(lines: List[LabeledLine], threshold: float,
+                           max_tokens_per_region: int = DEFAULT_MAX_CHUNK_TOKENS) -> List[Tuple[int, int]]:
+    """
+    找出置信度低于阈值的行所组成的区域。
+
+    返回:
+        List[Tuple[int, int]]: 区域列表，每个区域为行下标的半开区间 [start, end)。
+        间隔不超过 REGION_MERGE_GAP 行的区域会被合并，单个区域的估算 token 数不超过 max_tokens_per_region。
+    """
+    regions: List[Tuple[int, int]] = []
+    for index, line in enumerate(lines):
+        if line.confidence >= threshold:
+            continue
+        if regions and index - regions[-1][1] <= REGION_MERGE_GAP:
+            regions[-1] = (regions[-1][0], index + 1)
+        else:
+            regions.append((index, index + 1))
+
+    # 按 token 上限拆分过大的区域
+    bounded_regions: List[Tuple[int, int]] = []
+    for start, end in regions:
+        region_start = start
+        region_tokens = 0
+        for index in range(start, end):
+            line_tokens = estimate_tokens(lines[index].text)
+            if index > region_start and region_tokens + line_tokens > max_tokens_per_region:
+                bounded_regions.append((region_start, index))
+                region_start = index
+                region_tokens = 0
+            region_tokens += line_tokens
+        bounded_regions.append((region_start, end))
+    return bounded_regions
+
+
+def resolve_uncertain_lines(
+    lines: List[LabeledLine],
+    threshold: float,
+    analyzer: Optional[Callable[[str], Optional[str]]] = None,
+) -> List[LabeledLine]:
+    """
+    将低置信度区域发送给 LLM 重新标注，并与高置信度的本地标注拼接。
+
+    参数:
+        lines: 本地标注结果。
+        threshold: 置信度阈值，低于该值的行会发送给 LLM。
+        analyzer: 对一段纯文本返回 "标签: 内容" 格式结果的函数，默认为 llm_processor.analyze_text_with_llm。
+
+    返回:
+        List[LabeledLine]: 合并后的标注结果。某个区域的 LLM 请求失败或返回空结果时，该区域保留本地标注。
+    """
+    if analyzer is None:
+        analyzer = llm_processor.analyze_text_with_llm
+    regions = find_uncertain_regions(lines, threshold)
+    if not regions:
+        logger.info(f"全部 {len(lines)} 行均由本地标注完成，无需调用 LLM。")
+        return list(lines)
+
+    uncertain_count = sum(end - start for start, end in regions)
+    logger.info(f"{len(lines)} 行中有 {uncertain_count} 行置信度不足，将分为 {len(regions)} 个区域发送给 LLM。")
+
+    region_results: List[Optional[List[LabeledLine]]] = [None] * len(regions)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(llm_request_workers(MAX_CONCURRENT_LLM_REQUESTS), len(regions))) as executor:
+        future_to_region = {
+            executor.submit(analyzer, "\n".join(line.text for line in lines[start:end])): region_index
+            for region_index, (start, end) in enumerate(regions)
+        }
+        for future in concurrent.futures.as_completed(future_to_region):
+            region_index = future_to_region[future]
+            start, end = regions[region_index]
+            try:
+                llm_output = future.result()
+            except Exception as e:
+                logger.warning(f"区域 {start + 1}-{end} 行的 LLM 标注发生错误，保留本地标注: {e}")
+                continue
+            parsed = parse_labeled_text(llm_output) if llm_output else []
+            if not parsed:
+                logger.warning(f"区域 {start + 1}-{end} 行的 LLM 标注失败或为空，保留本地标注。")
+                continue
+            region_results[region_index] = parsed
+
+    resolved: List[LabeledLine] = []
+    cursor = 0
+    for (start, end), parsed in zip(regions, region_results):
+        resolved.extend(lines[cursor:start])
+        resolved.extend(parsed if parsed is not None else lines[start:end])
+        cursor = end
+    resolved.extend(lines[cursor:])
+    return resolved
@@ -0,0 +1,145 @@
+"""
+基于 PDF 版面特征 (字号、字体、位置) 的标题识别。
+
+排版规范的文档 (报告、公文、标准) 中，字号和加粗是判断标题层级的强信号。本模块：
+1. 以字符数最多的字号和字体作为正文基准；
+2. 将大于正文字号的字号按从大到小聚类为 H1-H4 候选；
+3. 与正文字号相同但整行使用粗体/不同字体的短行视为下一层级的标题候选；
+4. 根据行的右边界和首行缩进，把被视觉换行拆开的正文行重新拼接成段落。
+
+每个输出行都带有置信度。置信度低于阈值的行 (例如未居中的加粗短行) 交给 LLM 复核，
+见 hybrid_labeler.resolve_uncertain_lines。
+"""
+import re
+import logging
+from collections import Counter
+from typing import Dict, List, Optional
+
+from .pdf_extractor import LayoutLine
+from .hybrid_labeler import LabeledLine
+
+logger = logging.getLogger(__name__)
+
+# 被判定为页码的行 (例如 "— 1 —"、"- 2 -"、"第 3 页") 不参与标注
+PAGE_NUMBER_PATTERN = re.compile(r"^[\s—–\-_·|]*(第\s*)?\d+(\s*页)?(\s*/\s*\d+)?[\s—–\-_·|]*$")
+# 以这些字符结尾的短行更像是正文中的短句，而不是标题
+_SENTENCE_END_CHARS = "。；;，,：:！？!?"
+# 字号与正文字号相差超过该值 (磅) 时才视为不同字号
+_SIZE_TOLERANCE = 0.5
+# 标题候选的最大显示长度 (字符数)
+_MAX_HEADING_LENGTH = 40
+
+# 各类判断的置信度
+CONFIDENCE_LARGER_FONT_HEADING = 0.95
+CONFIDENCE_LONG_LARGER_FONT_LINE = 0.6
+CONFIDENCE_CENTERED_EMPHASIS_HEADING = 0.8
+CONFIDENCE_EMPHASIS_HEADING = 0.6
+CONFIDENCE_CENTERED_SHORT_LINE = 0.6
+CONFIDENCE_SMALL_FONT_PARAGRAPH = 0.85
+CONFIDENCE_BODY_PARAGRAPH = 0.9
+
+
+def _dominant(values: Counter) -> Optional[str]:
+    return values.most_common(1)[0][0] if values else None
+
+
+def _is_centered(line: LayoutLine, left_margin: float, right_margin: float) -> bool:
+    """行在正文区域内居中：两侧都明显离开正文边界 (排除仅有首行缩进的行)，且中心接近正文区域中心。"""
+    if line.x0 < left_margin + line.size * 2 or line.x1 > right_margin - line.size * 2:
+        return False
+    block_center = (left_margin + right_margin) / 2
+    return abs((line.x0 + line.x1) / 2 - block_center) <= line.page_width * 0.05
+
+
+def _heading_levels(lines: List[LayoutLine], body_size: float) -> Dict[float, int]:
+    """将大于正文字号的字号从大到小映射为 1-4 级，超过 4 种的较小字号统一归为 4 级。"""
+    larger_sizes = sorted({line.size for line in lines if line.size > body_size + _SIZE_TOLERANCE}, reverse=True)
+    return {size: min(index + 1, 4) for index, size in enumerate(larger_sizes)}
+
+
+def _join_paragraph_text(previous: str, following: str) -> str:
+    """拼接同一段落中相邻的两个视觉行：英文单词之间补空格，行尾断字连字符去除，中文直接相连。"""
+    if re.search(r"[A-Za-z]-$", previous) and following[:1].islower():
+        return previous[:-1] + following
+    if previous[-1:].isascii() and previous[-1:].isalnum() and following[:1].isascii() and following[:1].isalnum():
+        return previous + " " + following
+    return previous + following
+
+
+def label_layout_lines(lines: List[LayoutLine]) -> List[LabeledLine]:
+    """
+    根据版面特征为 PDF 视觉行打标签。
+
+    参数:
+        lines: extract_layout_lines_from_pdf 返回的版面行。
+
+    返回:
+        List[LabeledLine]: 标注结果。多行标题和被换行拆开的段落已被合并为单个条目。
+    """
+    content_lines = [line for line in lines if not PAGE_NUMBER_PATTERN.match(line.text)]
+    if not content_lines:
+        return []
+
+    size_weights: Counter = Counter()
+    font_weights: Counter = Counter()
+    for line in content_lines:
+        size_weights[line.size] += len(line.text)
+        font_weights[line.fontname] += len(line.text)
+    body_size = _dominant(size_weights)
+    body_font = _dominant(font_weights)
+    size_levels = _heading_levels(content_lines, body_size)
+    emphasis_level = min(max(size_levels.values(), default=0) + 1, 4)
+
+    body_lines = [line for line in content_lines if abs(line.size - body_size) <= _SIZE_TOLERANCE]
+    right_edges = sorted(line.x1 for line in body_lines)
+    left_edges = sorted(line.x0 for line in body_lines)
+    # 正文右边界取较大的分位数，左边界取众数附近的较小分位数，用于判断满行与首行缩进
+    right_margin = right_edges[int(len(right_edges) * 0.9)] if right_edges else 0.0
+    left_margin = left_edges[int(len(left_edges) * 0.1)] if left_edges else 0.0
+    logger.debug(f"版面分析: 正文字号 {body_size}，正文字体 {body_font}，标题字号层级 {size_levels}，"
+                 f"正文左右边界 {left_margin:.1f}/{right_margin:.1f}")
+
+    labeled: List[LabeledLine] = []
+    previous_line: Optional[LayoutLine] = None
+    previous_is_paragraph_continuation = False
+    for line in content_lines:
+        text = line.text
+        is_short = len(text) <= _MAX_HEADING_LENGTH and text[-1] not in _SENTENCE_END_CHARS
+        if line.size in size_levels:
+            label = f"H{size_levels[line.size]}"
+            confidence = CONFIDENCE_LARGER_FONT_HEADING if is_short else CONFIDENCE_LONG_LARGER_FONT_LINE
+        elif line.size < body_size - _SIZE_TOLERANCE:
+            label, confidence = "P", CONFIDENCE_SMALL_FONT_PARAGRAPH
+        elif is_short and (line.bold or line.fontname != body_font):
+            label = f"H{emphasis_level}"
+            centered = _is_centered(line, left_margin, right_margin)
+            confidence = CONFIDENCE_CENTERED_EMPHASIS_HEADING if centered else CONFIDENCE_EMPHASIS_HEADING
+        elif is_short and _is_centered(line, left_margin, right_margin):
+            label, confidence = "P", CONFIDENCE_CENTERED_SHORT_LINE
+        else:
+            label, confidence = "P", CONFIDENCE_BODY_PARAGRAPH
+
+        previous = labeled[-1] if labeled else None
+        same_style_as_previous = (
+            previous_line is not None and previous is not None and previous.label == label
+            and previous_line.size == line.size and previous_line.fontname == line.fontname
+            and previous_line.page_number == line.page_number
+        )
+        if line.size in size_levels and same_style_as_previous and line.top - previous_line.top <= line.size * 2.5:
+            # 多行标题：同页、同字号同字体、行距较近的连续大字号标题行合并
+            labeled[-1] = LabeledLine(label, _join_paragraph_text(previous.text, text),
+                                      min(previous.confidence, confidence))
+        elif label == "P" and previous is not None and previous.label == "P" and previous_is_paragraph_continuation \
+                and line.x0 <= left_margin + line.size:
+            # 上一行是满行，且本行没有首行缩进：属于同一段落
+            labeled[-1] = LabeledLine("P", _join_paragraph_text(previous.text, text),
+                                      min(previous.confidence, confidence))
+        else:
+            labeled.append(LabeledLine(label, text, confidence))
+
+        previous_line = line
+        previous_is_paragraph_continuation = (
+            label == "P" and abs(line.size - body_size) <= _SIZE_TOLERANCE
+            and line.x1 >= right_margin - line.size * 1.5 and text[-1] not in "。！？!?"
+        )
+    return labeled
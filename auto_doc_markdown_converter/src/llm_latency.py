@@ -0,0 +1,121 @@
+"""
+LLM 请求耗时的记录与建模。
+
+llm_processor 在每次成功的 LLM 请求后调用 record_llm_call 记录耗时与输入/输出 token 数 (优先使用 API 响应中的
+usage 字段)；批量转换结束时 save_latency_samples 将本次运行的样本追加到耗时记录文件 (LLM_LATENCY_PROFILE)，
+只保留最近 MAX_LATENCY_SAMPLES 条。
+
+转换估算 (见 conversion_planner.py) 通过 load_latency_model 读取这些样本，按最小二乘拟合
+"单次请求耗时 = 固定开销 + 每个输出 token 的生成时间"，用于估算墙钟时间。尚无实测样本时使用默认值。
+"""
+import os
+import json
+import logging
+import tempfile
+import threading
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# 耗时记录文件中保留的最大样本数
+MAX_LATENCY_SAMPLES = 500
+# 尚无实测样本时的默认模型：每次请求 2 秒固定开销，每秒生成约 40 个输出 token
+DEFAULT_BASE_SECONDS = 2.0
+DEFAULT_SECONDS_PER_OUTPUT_TOKEN = 0.025
+
+
+class LatencySample(NamedTuple):
+    """一次成功的 LLM 请求。"""
+    seconds: float
+    input_tokens: int
+    output_tokens: int
+
+
+class LatencyModel(NamedTuple):
+    """单次请求耗时的线性模型；samples 为拟合所用的样本数 (0 表示使用默认值)。"""
+    base_seconds: float
+    seconds_per_output_token: float
+    samples: int = 0
+
+    def request_seconds(self, output_tokens: int) -> float:
+        return self.base_seconds + self.seconds_per_output_token * max(0, output_tokens)
+
+
+_recorded: List[LatencySample] = []
+_lock = threading.Lock()
+
+
+def record_llm_call(seconds: float, input_tokens: int, output_tokens: int) -> None:
+    """记录一次成功的 LLM 请求 (线程安全)。"""
+    with _lock:
+        _recorded.append(LatencySample(seconds, input_tokens, output_tokens))
+        if len(_recorded) > MAX_LATENCY_SAMPLES:
+            del _recorded[:len(_recorded) - MAX_LATENCY_SAMPLES]
+
+
+def recorded_samples() -> List[LatencySample]:
+    """返回本进程中已记录的样本。"""
+    with _lock:
+        return list(_recorded)
+
+
+def _load_samples(path: str) -> List[LatencySample]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return [LatencySample(float(item[0]), int(item[1]), int(item[2])) for item in data.get("samples", [])]
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, TypeError, IndexError, AttributeError) as e:
+        logger.warning(f"LLM 耗时记录文件 {path} 无法读取，已忽略: {e}")
+        return []
+
+
+def save_latency_samples(path: str) -> int:
+    """
+    将本进程记录的样本追加到耗时记录文件 (原子写入)，并清空内存中的样本。
+
+    返回:
+        int: 本次写入的新样本数；写入失败时只记录警告并返回 0。
+    """
+    with _lock:
+        new_samples = list(_recorded)
+        _recorded.clear()
+    if not new_samples:
+        return 0
+    samples = (_load_samples(path) + new_samples)[-MAX_LATENCY_SAMPLES:]
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".llm_latency-", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"samples": [list(sample) for sample in samples]}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"写入 LLM 耗时记录文件 {path} 失败: {e}")
+        return 0
+    return len(new_samples)
+
+
+def fit_latency_model(samples: List[LatencySample]) -> LatencyModel:
+    """按最小二乘拟合 "耗时 = 固定开销 + 每输出 token 耗时 × 输出 token 数"；样本不足以拟合时使用平均值或默认值。"""
+    if not samples:
+        return LatencyModel(DEFAULT_BASE_SECONDS, DEFAULT_SECONDS_PER_OUTPUT_TOKEN, 0)
+    count = len(samples)
+    mean_tokens = sum(sample.output_tokens for sample in samples) / count
+    mean_seconds = sum(sample.seconds for sample in samples) / count
+    variance = sum((sample.output_tokens - mean_tokens) ** 2 for sample in samples)
+    if variance == 0:
+        # 所有样本的输出长度相同：按平均耗时折算，固定开销沿用默认值
+        per_token = max(0.0, (mean_seconds - DEFAULT_BASE_SECONDS) / mean_tokens) if mean_tokens else 0.0
+        return LatencyModel(min(mean_seconds, DEFAULT_BASE_SECONDS), per_token, count)
+    covariance = sum((sample.output_tokens - mean_tokens) * (sample.seconds - mean_seconds) for sample in samples)
+    per_token = max(0.0, covariance / variance)
+    base = max(0.0, mean_seconds - per_token * mean_tokens)
+    return LatencyModel(base, per_token, count)
+
+
+def load_latency_model(path: Optional[str]) -> LatencyModel:
+    """根据耗时记录文件 (以及本进程中已记录的样本) 拟合耗时模型。"""
+    samples = _load_samples(path) if path else []
+    return fit_latency_model(samples + recorded_samples())
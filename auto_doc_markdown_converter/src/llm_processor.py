@@ -1,7 +1,8 @@
+import time
 import logging
-import requests
 # 从 .config 模块导入所有需要的配置项
 from .config import API_KEY, API_ENDPOINT, LLM_MODEL_ID, LLM_API_CALL_TIMEOUT 
+from .llm_latency import record_llm_call
 
 # 获取模块特定的记录器
 logger = logging.getLogger(__name__)
@@ -12,6 +13,29 @@ DEFAULT_DASHSCOPE_MODEL_ID = "qwen-plus"
 # # 默认的 API 超时时间
 # DEFAULT_API_TIMEOUT = 60 # 秒
 
+# 结构分析 (H1-H4/P 标注) 使用的系统提示词
+STRUCTURE_ANALYSIS_SYSTEM_PROMPT = (
+    "你是一个专业的文档结构分析助手。"
+    "请分析用户提供的文本内容，并将其中的各级标题（H1, H2, H3, H4）和段落（P）准确地识别出来。"
+    "请严格按照以下格式输出每一项内容，每项占一行：'标签: 内容'。"
+    "例如：'H1: 这是一个一级标题' 或 'P: 这是一个段落。'。"
+    "在你的回答中，不要包含任何解释性文字、开场白或总结。"
+)
+
+# 大纲模式 (只为候选标题行指定层级) 使用的系统提示词
+OUTLINE_SYSTEM_PROMPT = (
+    "你是一个专业的文档结构分析助手。"
+    "用户提供的是一篇文档中可能是标题的行，每行以方括号中的编号开头，例如 '[12] 第一章 总则'；"
+    "以 '    … ' 开头的行是相邻正文的片段，仅供参考，不需要输出。"
+    "请判断每个编号行是几级标题（H1, H2, H3, H4）还是普通段落（P），"
+    "并严格按照 '编号: 标签' 的格式输出，每个编号占一行，例如 '12: H1' 或 '13: P'。"
+    "在你的回答中，不要包含任何解释性文字、开场白或总结。"
+)
+
+# 提示词版本。修改上面的系统提示词时请递增，使增量转换 (见 build_manifest) 重新转换已有文档。
+PROMPT_VERSION = 1
+
+
 def analyze_text_with_llm(text: str) -> str | None:
     """
     使用阿里云 DashScope OpenAI 兼容模式分析给定文本以识别标题和段落。
@@ -23,10 +47,44 @@ def analyze_text_with_llm(text: str) -> str | None:
         LLM 识别的包含标题和段落的结构化文本。
         如果发生严重错误或 API 调用失败，则返回 None。
     """
-    # --- Mock LLM 调用已移除，恢复真实 API 调用逻辑 ---
-    # logger.info("LLM 分析被 Mock，返回固定模拟输出。")
-    # return "H1: 模拟标题\nP: 这是一个通过 Mock LLM 生成的模拟段落。"
+    return _call_chat_completion(STRUCTURE_ANALYSIS_SYSTEM_PROMPT, text)
+
+
+def assign_heading_levels_with_llm(outline_text: str) -> str | None:
+    """
+    请 LLM 为带编号的候选标题行指定层级 (大纲模式)。
+
+    参数:
+        outline_text: 由 outline_filter.build_outline_request 生成的文本，候选行形如 "[编号] 内容"，
+                      上下文行以 "    … " 开头。
+
+    返回:
+        每行形如 "编号: 标签" 的 LLM 输出；如果发生严重错误或 API 调用失败，则返回 None。
+    """
+    return _call_chat_completion(OUTLINE_SYSTEM_PROMPT, outline_text)
+
 
+def _record_latency(seconds: float, usage, request_text: str, response_text: str) -> None:
+    """记录请求耗时，供转换估算使用。响应中没有 usage 字段时按字符数估算 token 数。"""
+    usage = usage if isinstance(usage, dict) else {}
+    input_tokens, output_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+    if not isinstance(input_tokens, int) or not isinstance(output_tokens, int):
+        from .text_splitter import estimate_tokens
+        input_tokens, output_tokens = estimate_tokens(request_text), estimate_tokens(response_text)
+    record_llm_call(seconds, input_tokens, output_tokens)
+
+
+def _call_chat_completion(system_prompt: str, text: str) -> str | None:
+    """
+    调用 DashScope OpenAI 兼容模式的 chat/completions 接口，返回回复内容。
+
+    参数:
+        system_prompt: 系统提示词。
+        text: 用户消息内容。
+
+    返回:
+        LLM 的回复文本 (已去除首尾空白)；如果发生严重错误或 API 调用失败，则返回 None。
+    """
     if not API_KEY:
         logger.critical("DashScope API 密钥 (LLM_API_KEY) 未配置。")
         return None
@@ -34,19 +92,13 @@ def analyze_text_with_llm(text: str) -> str | None:
     if not API_ENDPOINT:
         logger.critical("DashScope API 端点 (LLM_API_ENDPOINT) 未配置。")
         return None
-        
+
+    import requests  # 延迟导入：只在真正发送请求时加载，不影响 CLI 启动与测试收集
+
     # 使用 config 模块中定义的 LLM_MODEL_ID，如果为 None，则使用此处的默认值
     llm_model_id = LLM_MODEL_ID if LLM_MODEL_ID else DEFAULT_DASHSCOPE_MODEL_ID
     logger.info(f"使用的 DashScope (OpenAI 兼容模式) 模型 ID: {llm_model_id}")
 
-    system_prompt = (
-        "你是一个专业的文档结构分析助手。"
-        "请分析用户提供的文本内容，并将其中的各级标题（H1, H2, H3, H4）和段落（P）准确地识别出来。"
-        "请严格按照以下格式输出每一项内容，每项占一行：'标签: 内容'。"
-        "例如：'H1: 这是一个一级标题' 或 'P: 这是一个段落。'。"
-        "在你的回答中，不要包含任何解释性文字、开场白或总结。"
-    )
-
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json",
@@ -71,7 +123,9 @@ def analyze_text_with_llm(text: str) -> str | None:
 
     try:
         # 使用从 config 模块导入的 LLM_API_CALL_TIMEOUT
+        request_started = time.perf_counter()
         response = requests.post(target_url, headers=headers, json=payload, timeout=LLM_API_CALL_TIMEOUT)
+        request_seconds = time.perf_counter() - request_started
         response.raise_for_status()  # 对 HTTP 错误状态码 (4XX 或 5XX) 引发 HTTPError
 
         response_json = response.json()
@@ -89,6 +143,7 @@ def analyze_text_with_llm(text: str) -> str | None:
             processed_text = response_json["choices"][0]["message"]["content"]
             if processed_text:
                 logger.debug(f"从 DashScope API 提取的文本内容 (前100字符): {processed_text[:100]}")
+                _record_latency(request_seconds, response_json.get("usage"), system_prompt + text, processed_text)
                 return processed_text.strip() # 移除可能的首尾空白
             else:
                 logger.warning("DashScope API 响应的 'choices[0].message.content' 字段为空。")
@@ -1,45 +1,72 @@
 import logging
+from typing import Iterator, Optional, Tuple
 
 # 获取模块特定的记录器
 logger = logging.getLogger(__name__)
 
-def generate_markdown_from_labeled_text(labeled_text: str) -> str:
+# 标签 -> Markdown 前缀
+LABEL_TO_MARKDOWN_PREFIX = {"H1": "# ", "H2": "## ", "H3": "### ", "H4": "#### ", "P": ""}
+
+
+def parse_labeled_line(line: str) -> Optional[Tuple[str, str]]:
     """
-    将带标签的文本 (例如来自 LLM) 转换为 Markdown 格式。
+    解析一行带标签的文本 (例如 "H2: 副标题")。
+
+    参数:
+        line: 已去除首尾空白的一行文本。
+
+    返回:
+        (标签, 内容) 元组；如果该行不以可识别的标签开头，则返回 None。
+    """
+    label, separator, content = line.partition(": ")
+    if separator and label in LABEL_TO_MARKDOWN_PREFIX:
+        return label, content
+    return None
+
+
+def iter_markdown_blocks_from_labeled_text(labeled_text: str) -> Iterator[str]:
+    """
+    逐块将带标签的文本转换为 Markdown：每个可识别的标签行生成一个块 (标题或段落，不含块间空行)。
 
     参数:
         labeled_text: 一个字符串，其中每行都应以类似 "H1:", "P:" 等标签为前缀。
 
     返回:
-        包含转换后的 Markdown 文本的字符串。
+        Markdown 块的迭代器；无法识别标签的行被跳过。
     """
     if not labeled_text:
-        logger.debug("输入 labeled_text 为空，返回空字符串。")
-        return ""
-
-    markdown_blocks = []
-    lines = labeled_text.strip().split('\n')
-    
-    for i, line_raw in enumerate(lines): # 添加行号以便于调试
+        return
+    for i, line_raw in enumerate(labeled_text.strip().split('\n')): # 添加行号以便于调试
         line = line_raw.strip()
         if not line: # 跳过输入中的空行
             logger.debug(f"第 {i+1} 行为空，已跳过。")
             continue
 
-        if line.startswith("H1: "):
-            markdown_blocks.append(f"# {line[4:]}")
-        elif line.startswith("H2: "):
-            markdown_blocks.append(f"## {line[4:]}")
-        elif line.startswith("H3: "):
-            markdown_blocks.append(f"### {line[4:]}")
-        elif line.startswith("H4: "):
-            markdown_blocks.append(f"#### {line[4:]}")
-        elif line.startswith("P: "):
-            markdown_blocks.append(line[3:])
+        parsed = parse_labeled_line(line)
+        if parsed is not None:
+            label, content = parsed
+            yield f"{LABEL_TO_MARKDOWN_PREFIX[label]}{content}"
         else:
             logger.warning(f"第 {i+1} 行无法识别标签，已跳过: '{line_raw}'")
             # 继续到下一行，有效地跳过格式错误的行
 
+
+def generate_markdown_from_labeled_text(labeled_text: str) -> str:
+    """
+    将带标签的文本 (例如来自 LLM) 转换为 Markdown 格式。
+
+    参数:
+        labeled_text: 一个字符串，其中每行都应以类似 "H1:", "P:" 等标签为前缀。
+
+    返回:
+        包含转换后的 Markdown 文本的字符串。
+    """
+    if not labeled_text:
+        logger.debug("输入 labeled_text 为空，返回空字符串。")
+        return ""
+
+    markdown_blocks = list(iter_markdown_blocks_from_labeled_text(labeled_text))
+
     # 用两个换行符连接块，然后修剪开头/结尾多余的换行符。
     # 这确保了所有有效块之间的分隔。
     if not markdown_blocks:
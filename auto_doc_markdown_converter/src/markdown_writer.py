@@ -0,0 +1,171 @@
+"""
+按原始顺序流式写入 Markdown。
+
+长文档被分割为多个文本块后，各文本块的 LLM 结果以任意顺序完成。原先的做法是等待全部文本块完成，
+再合并 (merge_processed_chunks)、生成完整的 Markdown 字符串并写入文件，整个文档的结果都保存在内存中，
+直到最后一个文本块完成前没有任何输出。
+
+OrderedMarkdownWriter 接收乱序到达的文本块结果：
+- 只有还不能按顺序写出的文本块暂存在重排缓冲区中；
+- 下一个文本块到达后立即与之前的结果合并 (ChunkMerger 只保留检测重叠所需的末尾几行)，
+  渲染为 Markdown 并追加写入输出目录中的临时文件；
+- 全部文本块完成后，临时文件通过 os.replace 原子地替换为最终文件；失败时删除临时文件，
+  已有的输出文件保持不变。
+
+写出的内容与 merge_processed_chunks + generate_markdown_from_labeled_text 的结果完全相同。
+保存中间结果包时 (retain_output=True)，写入器同时保留合并后的标注与写出的 Markdown，
+供文档完成后记录 merge 与 render 阶段的输出；此时内存占用与统一合并后写入相同。
+"""
+import os
+import logging
+import tempfile
+import threading
+from typing import Dict, List, Optional, TextIO
+
+from .text_splitter import ChunkMerger, DEFAULT_OVERLAP_TOKENS
+from .markdown_generator import iter_markdown_blocks_from_labeled_text
+
+logger = logging.getLogger(__name__)
+
+
+class OrderedMarkdownWriter:
+    """
+    单个文档的流式 Markdown 写入器。所有方法都是线程安全的，add 可以在多个 LLM 工作线程中调用。
+
+    参数:
+        output_path: 最终的 Markdown 文件路径，父目录不存在时会自动创建。
+        chunk_count: 文档的文本块总数。
+        overlap_tokens: 分割时设置的重叠 token 数，传递给 ChunkMerger。
+        model_name: 用于 token 估算的模型名称。
+        retain_output: 是否保留合并后的标注 (labeled_text) 与写出的 Markdown (markdown)，默认不保留。
+    """
+
+    def __init__(self, output_path: str, chunk_count: int,
+                 overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, model_name: Optional[str] = None,
+                 retain_output: bool = False):
+        self.output_path = output_path
+        self.chunk_count = chunk_count
+        self.max_buffered = 0  # 重排缓冲区曾经暂存的最大文本块数
+        self._merger = ChunkMerger(overlap_tokens, model_name)
+        self._pending: Dict[int, str] = {}  # 重排缓冲区: {文本块序号: LLM 结果}
+        self._next_index = 0
+        self._blocks_written = 0
+        self._file: Optional[TextIO] = None
+        self._tmp_path: Optional[str] = None
+        self._failed = False
+        self._lock = threading.Lock()
+        # retain_output 时保留的合并后标注行与写出的 Markdown 片段
+        self._labeled_lines: Optional[List[str]] = [] if retain_output else None
+        self._markdown_parts: Optional[List[str]] = [] if retain_output else None
+
+    @property
+    def labeled_text(self) -> Optional[str]:
+        """合并后的 "标签: 内容" 标注 (与 merge_processed_chunks 的结果相同)；未保留输出时为 None。"""
+        with self._lock:
+            if self._labeled_lines is None:
+                return None
+            labeled_text = "\n".join(self._labeled_lines).strip()
+            return labeled_text + "\n" if labeled_text else labeled_text
+
+    @property
+    def markdown(self) -> Optional[str]:
+        """已写出的 Markdown 内容；未保留输出时为 None。"""
+        with self._lock:
+            return "".join(self._markdown_parts) if self._markdown_parts is not None else None
+
+    @property
+    def buffered_chunks(self) -> int:
+        """当前暂存在重排缓冲区中的文本块数。"""
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, index: int, processed_chunk: str) -> None:
+        """提交第 index 个文本块 (从 0 开始) 的结果，并写出所有已能按顺序写出的内容。重复提交会被忽略。"""
+        with self._lock:
+            if self._failed or index < self._next_index or index in self._pending:
+                return
+            self._pending[index] = processed_chunk
+            self.max_buffered = max(self.max_buffered, len(self._pending))
+            while self._next_index in self._pending:
+                chunk = self._pending.pop(self._next_index)
+                self._next_index += 1
+                self._write_lines(self._merger.add(chunk))
+
+    def commit(self) -> Optional[str]:
+        """
+        写出剩余内容，并将临时文件原子地替换为最终文件。
+
+        返回:
+            Optional[str]: 输出文件路径；有文本块缺失、结果为空或写入失败时返回 None (临时文件已删除)。
+        """
+        with self._lock:
+            if self._next_index < self.chunk_count:
+                logger.error(f"{self.chunk_count - self._next_index} 个文本块的结果缺失，未写入 {self.output_path}。")
+                self._discard()
+                return None
+            self._write_lines(self._merger.finish())
+            if self._failed:
+                return None
+            if not self._blocks_written:
+                logger.error(f"合并所有已处理文本块后结果为空，未写入 {self.output_path}。")
+                self._discard()
+                return None
+            try:
+                self._file.close()
+                os.replace(self._tmp_path, self.output_path)
+            except OSError as e:
+                logger.error(f"写入 Markdown 文件 '{self.output_path}' 时发生错误: {e}", exc_info=True)
+                self._discard()
+                return None
+            self._file = self._tmp_path = None
+            logger.info(f"成功将处理后的 Markdown 内容保存到: {self.output_path}")
+            return self.output_path
+
+    def abort(self) -> None:
+        """放弃写入：删除临时文件，已有的输出文件保持不变。"""
+        with self._lock:
+            self._discard()
+
+    def _write_lines(self, labeled_lines: List[str]) -> None:
+        """将已合并的 "标签: 内容" 行渲染为 Markdown 块并追加到临时文件。调用方持有锁。"""
+        if self._failed or not labeled_lines:
+            return
+        if self._labeled_lines is not None:
+            self._labeled_lines.extend(labeled_lines)
+        try:
+            for block in iter_markdown_blocks_from_labeled_text("\n".join(labeled_lines)):
+                if self._file is None:
+                    self._open()
+                    block = block.lstrip()  # 与 generate_markdown_from_labeled_text 对结果的 strip() 一致
+                part = f"\n\n{block}" if self._blocks_written else block
+                self._file.write(part)
+                if self._markdown_parts is not None:
+                    self._markdown_parts.append(part)
+                self._blocks_written += 1
+            if self._file is not None:
+                self._file.flush()  # 已写出的内容不在进程内缓冲
+        except OSError as e:
+            logger.error(f"写入 Markdown 临时文件 ({self.output_path}) 时发生错误: {e}", exc_info=True)
+            self._discard()
+
+    def _open(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.output_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.output_path)}-",
+                                              suffix=".tmp")
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+
+    def _discard(self) -> None:
+        self._failed = True
+        self._pending.clear()
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        if self._tmp_path is not None:
+            try:
+                os.remove(self._tmp_path)
+            except OSError:
+                pass
+        self._file = self._tmp_path = None
@@ -0,0 +1,180 @@
+"""
+大纲模式：本地筛选候选标题行，只将候选行交给 LLM 指定层级。
+
+文档中的大部分行显然是正文段落 (较长、以句号等结尾、没有编号)，把它们逐字发送给 LLM
+再逐字回显既耗费输入 token，也耗费输出 token。本模块：
+1. 用快速的本地规则把每一行判定为"确定是段落"或"可能是标题"；
+2. 只把候选行 (附带行号及少量截断的上下文) 发送给 LLM，LLM 只需回复 "编号: 标签"；
+3. 其余行直接在本地标注为 P。
+"""
+import re
+import logging
+import concurrent.futures
+from typing import Callable, Dict, List, Optional, Sequence
+
+from . import llm_processor
+from .config import MAX_CONCURRENT_LLM_REQUESTS
+from .chunk_scheduler import llm_request_workers
+from .hybrid_labeler import LabeledLine
+from .text_splitter import estimate_tokens, DEFAULT_MAX_CHUNK_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# 以这些字符结尾的行视为完整的句子
+_SENTENCE_END_CHARS = "。！？!?；;…"
+# 常见的标题编号：第X章/节/条、一、（一）、1.、1.1、1.1.1、Chapter 1 等
+_NUMBERED_LINE_PATTERN = re.compile(
+    r"^\s*(第[一二三四五六七八九十百千零〇\d]+[章节条篇部分编]|[一二三四五六七八九十]+[、.．]|[（(][一二三四五六七八九十\d]+[)）]"
+    r"|\d+(\.\d+)*[.、．]?\s|\d+(\.\d+)+|(chapter|section|part)\s+\w+)",
+    re.IGNORECASE,
+)
+# 超过该字符数且未编号的行视为正文
+MAX_CANDIDATE_LENGTH = 40
+# 发送给 LLM 的候选行与上下文行的最大字符数 (超出部分截断)，层级判断只需行首内容
+CANDIDATE_PREVIEW_CHARS = 40
+CONTEXT_PREVIEW_CHARS = 20
+_RESPONSE_LINE_PATTERN = re.compile(r"^\s*\[?(\d+)\]?\s*[:：]\s*(H[1-4]|P)\b", re.IGNORECASE)
+
+
+def is_heading_candidate(line: str) -> bool:
+    """判断一行是否可能是标题。带编号的行总是候选；未编号的行只有较短且不以句末标点结尾时才是候选。"""
+    text = line.strip()
+    if not text:
+        return False
+    if _NUMBERED_LINE_PATTERN.match(text):
+        return True
+    return len(text) <= MAX_CANDIDATE_LENGTH and text[-1] not in _SENTENCE_END_CHARS
+
+
+def _preview(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def build_outline_request(lines: Sequence[str], candidate_indices: Sequence[int], context_lines: int = 1) -> str:
+    """
+    构造大纲模式的 LLM 请求文本。
+
+    候选行输出为 "[编号] 内容"，编号即该行在 lines 中的下标；前后 context_lines 行非候选行
+    作为上下文输出为 "    … 内容片段"。内容均按 CANDIDATE_PREVIEW_CHARS / CONTEXT_PREVIEW_CHARS 截断。
+    """
+    candidate_set = set(candidate_indices)
+    included = set()
+    for index in candidate_indices:
+        included.update(range(max(0, index - context_lines), min(len(lines), index + context_lines + 1)))
+
+    request_lines = []
+    for index in sorted(included):
+        text = lines[index].strip()
+        if index in candidate_set:
+            request_lines.append(f"[{index}] {_preview(text, CANDIDATE_PREVIEW_CHARS)}")
+        elif text:
+            request_lines.append(f"    … {_preview(text, CONTEXT_PREVIEW_CHARS)}")
+    return "\n".join(request_lines)
+
+
+def parse_outline_response(response: str) -> Dict[int, str]:
+    """解析 LLM 返回的 "编号: 标签" 行，返回 {编号: 标签}。无法识别的行会被忽略。"""
+    assignments: Dict[int, str] = {}
+    for raw_line in response.splitlines():
+        match = _RESPONSE_LINE_PATTERN.match(raw_line)
+        if match:
+            assignments[int(match.group(1))] = match.group(2).upper()
+        elif raw_line.strip():
+            logger.debug(f"跳过无法识别的大纲响应行: '{raw_line}'")
+    return assignments
+
+
+def _batch_candidates(lines: Sequence[str], candidate_indices: Sequence[int], context_lines: int,
+                      max_tokens_per_request: int) -> List[List[int]]:
+    """按估算 token 数将候选行分组，每组对应一次 LLM 请求。"""
+    batches: List[List[int]] = []
+    batch_tokens = 0
+    for index in candidate_indices:
+        block = build_outline_request(lines, [index], context_lines)
+        block_tokens = estimate_tokens(block)
+        if batches and batch_tokens + block_tokens <= max_tokens_per_request:
+            batches[-1].append(index)
+            batch_tokens += block_tokens
+        else:
+            batches.append([index])
+            batch_tokens = block_tokens
+    return batches
+
+
+def _candidate_lines(lines: Sequence[str]):
+    """去除空行，返回 (非空行列表, 候选标题行下标)。"""
+    lines = [line.strip() for line in lines if line.strip()]
+    return lines, [index for index, line in enumerate(lines) if is_heading_candidate(line)]
+
+
+def build_outline_requests(lines: Sequence[str], context_lines: int = 1,
+                           max_tokens_per_request: int = DEFAULT_MAX_CHUNK_TOKENS) -> List[str]:
+    """返回 label_lines_with_outline 将发送给 LLM 的全部请求文本 (不发送请求)，用于估算 LLM 用量。"""
+    lines, candidate_indices = _candidate_lines(lines)
+    return [build_outline_request(lines, batch, context_lines)
+            for batch in _batch_candidates(lines, candidate_indices, context_lines, max_tokens_per_request)]
+
+
+def label_lines_with_outline(
+    lines: Sequence[str],
+    analyzer: Optional[Callable[[str], Optional[str]]] = None,
+    context_lines: int = 1,
+    max_tokens_per_request: int = DEFAULT_MAX_CHUNK_TOKENS,
+) -> Optional[List[LabeledLine]]:
+    """
+    以大纲模式为文本行打标签。
+
+    参数:
+        lines: 文档的文本行 (每行一个段落或标题)，空行会被忽略。
+        analyzer: 接收 build_outline_request 生成的文本并返回 "编号: 标签" 行的函数，
+                  默认为 llm_processor.assign_heading_levels_with_llm。
+        context_lines: 每个候选行前后附带的上下文行数。
+        max_tokens_per_request: 单次请求的最大估算 token 数。
+
+    返回:
+        Optional[List[LabeledLine]]: 标注结果；任一 LLM 请求失败时返回 None。
+        LLM 响应中遗漏的候选行按 P 处理 (置信度为 0)。
+    """
+    if analyzer is None:
+        analyzer = llm_processor.assign_heading_levels_with_llm
+    lines, candidate_indices = _candidate_lines(lines)
+    logger.info(f"大纲模式: {len(lines)} 行中有 {len(candidate_indices)} 行为候选标题，其余行在本地标注为段落。")
+
+    assignments: Dict[int, str] = {}
+    if candidate_indices:
+        batches = _batch_candidates(lines, candidate_indices, context_lines, max_tokens_per_request)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(llm_request_workers(MAX_CONCURRENT_LLM_REQUESTS), len(batches))) as executor:
+            future_to_batch = {
+                executor.submit(analyzer, build_outline_request(lines, batch, context_lines)): batch
+                for batch in batches
+            }
+            for future in concurrent.futures.as_completed(future_to_batch):
+                batch = future_to_batch[future]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    logger.error(f"大纲模式的 LLM 请求 (候选行 {batch[0]}-{batch[-1]}) 发生错误: {e}", exc_info=True)
+                    response = None
+                if response is None:
+                    logger.error(f"大纲模式的 LLM 请求 (候选行 {batch[0]}-{batch[-1]}) 失败。")
+                    for f in future_to_batch:
+                        f.cancel()
+                    return None
+                batch_set = set(batch)
+                assignments.update({index: label for index, label in parse_outline_response(response).items()
+                                    if index in batch_set})
+
+    missing = [index for index in candidate_indices if index not in assignments]
+    if missing:
+        logger.warning(f"LLM 未返回 {len(missing)} 个候选行的标签，这些行将按段落处理。")
+
+    labeled: List[LabeledLine] = []
+    candidate_set = set(candidate_indices)
+    for index, line in enumerate(lines):
+        if index not in candidate_set:
+            labeled.append(LabeledLine("P", line, 1.0))
+        elif index in assignments:
+            labeled.append(LabeledLine(assignments[index], line, 1.0))
+        else:
+            labeled.append(LabeledLine("P", line, 0.0))
+    return labeled
@@ -1,18 +1,22 @@
-import pdfplumber
+import ast
 import logging
+from collections import Counter
+from typing import BinaryIO, List, NamedTuple
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(file_path: str) -> str | None:
+def extract_text_from_pdf(file_path: str | BinaryIO) -> str | None:
     """
     从基于文本的 .pdf 文件中提取所有文本，并尽可能保留段落分隔。
 
     参数:
-        file_path: .pdf 文件的路径。
+        file_path: .pdf 文件的路径，或以二进制模式打开、可随机访问的文件对象 (例如 io.BytesIO)。
 
     返回:
         包含提取文本的字符串。如果发生错误，则返回 None。
     """
+    import pdfplumber  # 延迟导入：pdfplumber 加载较慢，只在真正提取 PDF 时才需要
+
     full_text = []
     try:
         logger.debug(f"开始从 PDF 文件提取文本: {file_path}")
@@ -39,4 +43,89 @@ def extract_text_from_pdf(file_path: str) -> str | None:
         return None
     except Exception as e:
         logger.error(f"从 PDF 文件 {file_path} 提取文本时发生意外错误: {e}", exc_info=logger.isEnabledFor(logging.DEBUG))
-        return None
\ No newline at end of file
+        return None
+
+class LayoutLine(NamedTuple):
+    """PDF 中的一个视觉行及其版面特征 (供 layout_analyzer 判断标题层级)。"""
+    text: str
+    size: float          # 行内字符字号的众数
+    fontname: str        # 行内字符数最多的字体名
+    bold: bool           # 主要字体是否为粗体/黑体
+    x0: float            # 行左边界
+    x1: float            # 行右边界
+    top: float           # 行上边界 (页内坐标)
+    page_number: int     # 从 1 开始的页码
+    page_width: float
+
+
+# 字体名中表示粗体的关键字 (包括常见中文黑体/粗体字体)
+_BOLD_FONT_KEYWORDS = ("bold", "black", "heavy", "semibold", "demi", "黑体", "粗", "hei")
+
+
+def _decode_fontname(fontname: str) -> str:
+    """
+    pdfminer 对非 ASCII 字体名会返回 bytes 的 repr 字符串 (形如 "b'ABCDEE+...'")，
+    这里尝试将其还原为可读名称 (例如 "ABCDEE+黑体")，失败时原样返回。
+    """
+    if fontname.startswith(("b'", 'b"')):
+        try:
+            raw_bytes = ast.literal_eval(fontname)
+            for encoding in ("utf-8", "gbk"):
+                try:
+                    return raw_bytes.decode(encoding)
+                except UnicodeDecodeError:
+                    continue
+        except (ValueError, SyntaxError):
+            pass
+    return fontname
+
+
+def _is_bold_font(fontname: str) -> bool:
+    lowered = fontname.lower()
+    return any(keyword in lowered for keyword in _BOLD_FONT_KEYWORDS)
+
+
+def extract_layout_lines_from_pdf(file_path: str | BinaryIO) -> List[LayoutLine] | None:
+    """
+    从 PDF 中按视觉行提取文本，并保留字号、字体、位置等版面特征。
+
+    参数:
+        file_path: .pdf 文件的路径，或以二进制模式打开、可随机访问的文件对象 (例如 io.BytesIO)。
+
+    返回:
+        LayoutLine 列表 (按页面和行的顺序)。如果发生错误或未提取到任何文本，则返回 None。
+    """
+    import pdfplumber  # 延迟导入，见 extract_text_from_pdf
+
+    layout_lines: List[LayoutLine] = []
+    try:
+        logger.debug(f"开始从 PDF 文件提取版面行: {file_path}")
+        with pdfplumber.open(file_path) as pdf:
+            for page_index, page in enumerate(pdf.pages):
+                for line in page.extract_text_lines(return_chars=True):
+                    chars = [c for c in line.get("chars", []) if c.get("text", "").strip()]
+                    text = line.get("text", "").strip()
+                    if not chars or not text:
+                        continue
+                    size_counts = Counter(round(float(c.get("size", 0)), 1) for c in chars)
+                    font_counts = Counter(c.get("fontname", "") for c in chars)
+                    fontname = _decode_fontname(font_counts.most_common(1)[0][0])
+                    layout_lines.append(LayoutLine(
+                        text=text,
+                        size=size_counts.most_common(1)[0][0],
+                        fontname=fontname,
+                        bold=_is_bold_font(fontname),
+                        x0=float(line["x0"]),
+                        x1=float(line["x1"]),
+                        top=float(line["top"]),
+                        page_number=page_index + 1,
+                        page_width=float(page.width),
+                    ))
+        if not layout_lines:
+            logger.warning(f"未能从 PDF 文件 {file_path} 提取任何版面行 (可能是基于图像的 PDF)。")
+            return None
+        logger.debug(f"成功从 PDF 文件提取 {len(layout_lines)} 个版面行: {file_path}")
+        return layout_lines
+    except Exception as e: # 包括 pdfminer 对损坏或格式不受支持的文件抛出的解析异常
+        logger.error(f"从 PDF 文件 {file_path} 提取版面行时发生错误: {e}", exc_info=logger.isEnabledFor(logging.DEBUG))
+        return None
@@ -0,0 +1,676 @@
+"""
+多文档流水线处理。
+
+逐个文档顺序处理时，每个文档内部的步骤严格串行：提取 (CPU)、分割 (CPU)、LLM (网络 I/O)、合并与写入。
+CPU 在等待 LLM 时空闲，网络在提取时空闲。本模块把 core_processor 中的各处理阶段用有界队列连接起来，
+使不同文档可以同时处于不同阶段：
+
+    提取 (进程池) --> [分割队列] --> 分割 --> LLM 调度器 (chunk_scheduler) --> [写入队列] --> 写入
+
+- 提取：core_processor.extract_document 在进程池中运行，同时在途的文档数受队列容量限制；
+- 分割：将 "llm" 模式的文档分割为文本块，每个文本块作为一个 LLM 任务；其他结构识别模式的文档作为一个整体任务；
+- LLM 调度器：所有文档的文本块提交给同一个 ChunkScheduler，按调度策略 (例如短文档优先) 排序，
+  共享 MAX_CONCURRENT_LLM_REQUESTS 个工作线程；
+- 写入：一个文档的最后一个文本块完成后立即按原始顺序合并、生成 Markdown 并写入文件。
+  启用 STREAMING_MARKDOWN_WRITER 时，分块文档的各文本块一完成就按原始顺序合并并追加写入临时文件
+  (见 markdown_writer.py)，最后一个文本块完成后只需原子地替换为最终文件。
+
+所有队列都是有界的，等待 LLM 的文档数也不超过队列容量：下游阶段处理不过来时，上游阶段会阻塞 (背压)，
+内存占用不会随文档数增长。
+指定 artifacts_dir 时，各阶段的输出会保存到每个文档的中间结果包 (见 stage_artifacts.py)，
+之后可以通过 from_stage 从任一阶段重新开始，之前的阶段直接复用保存的结果。
+启用重复输入检测 (BATCH_DEDUPLICATION) 时，与本批次中较早文件内容相同的副本不进入提取阶段，
+代表文件完成后直接复制其输出 (见 batch_dedup.py)。
+启用内容覆盖检查 (COVERAGE_CHECK) 时，每个文本块的 LLM 输出在写入检查点之前先检查是否覆盖了原文，
+只将被遗漏的片段重新发送给 LLM，每个文档的覆盖率记录在 PipelineResult.coverage 中 (见 coverage_checker.py)。
+每个阶段都会记录处理数量、忙碌时间、阻塞时间和队列最大深度，运行结束时输出利用率汇总。
+"""
+import os
+import time
+import queue
+import shutil
+import tempfile
+import logging
+import threading
+import concurrent.futures
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from . import core_processor
+from .utils import document_log_context
+from .chunk_scheduler import ChunkScheduler, ScheduledDocument, get_chunk_scheduler
+from .chunk_checkpoint import ChunkCheckpoint, open_chunk_checkpoint
+from .markdown_writer import OrderedMarkdownWriter
+from .file_discovery import output_directory_for
+from .batch_dedup import DeduplicationSummary, DuplicateDetector
+from .coverage_checker import DocumentCoverage
+from .stage_artifacts import (
+    STAGES, ArtifactBundle, open_artifact_bundle, input_fingerprint,
+    extract_record, document_from_record, split_record, plan_from_record,
+)
+from .config import PIPELINE_QUEUE_SIZE, PIPELINE_EXTRACT_WORKERS, LLM_SCHEDULER_POLICY, LLM_CHUNK_MAX_ATTEMPTS
+from .config import STREAMING_MARKDOWN_WRITER, BATCH_DEDUPLICATION, COVERAGE_CHECK, COVERAGE_LINE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记
+_DONE = object()
+
+
+class StageMetrics:
+    """单个阶段的运行统计。所有方法都是线程安全的。"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+    def record_item(self, busy_seconds: float) -> None:
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += busy_seconds
+
+    def record_blocked(self, seconds: float) -> None:
+        with self._lock:
+            self.blocked_seconds += seconds
+
+    def record_queue_depth(self, depth: int) -> None:
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def utilisation(self, wall_seconds: float) -> float:
+        """忙碌时间占 (墙钟时间 × 工作者数) 的比例。"""
+        if wall_seconds <= 0 or self.workers <= 0:
+            return 0.0
+        return min(1.0, self.busy_seconds / (wall_seconds * self.workers))
+
+    def summary(self, wall_seconds: float) -> str:
+        return (f"{self.name}: {self.items} 项，工作者 {self.workers}，利用率 {self.utilisation(wall_seconds):.0%}，"
+                f"忙碌 {self.busy_seconds:.2f}s，向下游阻塞 {self.blocked_seconds:.2f}s，输入队列最大深度 {self.max_queue_depth}")
+
+
+class PipelineResult(NamedTuple):
+    """
+    单个文档的处理结果。output_path 为 None 表示处理失败；tokens 为提取文本的估算 token 数。
+    duplicate_of 不为 None 时，该文档与本批次中的另一个文档内容相同，输出复制自该文档的结果。
+    coverage 为 LLM 输出对原文的内容覆盖率 (0 到 1)；未经过分块 LLM 标注或未启用覆盖检查时为 None。
+    """
+    input_filepath: str
+    output_path: Optional[str]
+    tokens: int = 0
+    duplicate_of: Optional[str] = None
+    coverage: Optional[float] = None
+
+
+class PipelineReport(NamedTuple):
+    """一次流水线运行的结果：按输入顺序排列的文档结果、各阶段统计、总耗时以及重复输入统计 (未启用时为 None)。"""
+    results: List[PipelineResult]
+    metrics: Dict[str, StageMetrics]
+    wall_seconds: float
+    deduplication: Optional[DeduplicationSummary] = None
+
+    def files_per_minute(self) -> float:
+        """每分钟成功处理的文件数。"""
+        succeeded = sum(1 for result in self.results if result.output_path)
+        return succeeded * 60 / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def processed_tokens(self) -> int:
+        """成功处理的文件的估算 token 数 (复用输出的重复文件不计入)。"""
+        return sum(result.tokens for result in self.results if result.output_path and result.duplicate_of is None)
+
+    def tokens_per_minute(self) -> float:
+        """每分钟处理的估算 token 数 (仅计成功处理的文件)。"""
+        return self.processed_tokens() * 60 / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def throughput_summary(self) -> str:
+        succeeded = sum(1 for result in self.results if result.output_path)
+        tokens = self.processed_tokens()
+        return (f"{succeeded}/{len(self.results)} 个文件，约 {tokens} tokens，耗时 {self.wall_seconds:.1f}s；"
+                f"{self.files_per_minute():.1f} 文件/分钟，{self.tokens_per_minute():.0f} tokens/分钟")
+
+
+class _DocumentState(NamedTuple):
+    """在分割、LLM 与写入阶段之间传递的单个文档的状态。"""
+    index: int
+    document: core_processor.ExtractedDocument
+    plan: Optional[core_processor.LlmWorkPlan]  # None 表示整篇文档作为一个任务 (非 "llm" 结构识别模式)
+    checkpoint: Optional[ChunkCheckpoint] = None  # 分块处理时各文本块结果的检查点
+    bundle: Optional[ArtifactBundle] = None  # 中间结果包 (未启用时为 None)
+    start_stage: str = STAGES[0]  # 从哪个阶段开始处理，之前阶段的输出来自中间结果包
+    writer: Optional[OrderedMarkdownWriter] = None  # 流式写入时各文本块结果直接交给写入器
+    coverage: Optional[DocumentCoverage] = None  # 各文本块 LLM 输出的内容覆盖检查 (未启用时为 None)
+
+
+def _document_tag(input_filepath: str) -> str:
+    return os.path.basename(input_filepath)
+
+
+def _timed_extract(input_filepath: str, structure_mode: Optional[str]):
+    """在提取进程中运行 extract_document，并返回 (结果, 耗时秒数)。"""
+    start = time.perf_counter()
+    with document_log_context(_document_tag(input_filepath)):
+        document = core_processor.extract_document(input_filepath, structure_mode)
+    return document, time.perf_counter() - start
+
+
+def _estimate_document_tokens(document: core_processor.ExtractedDocument) -> int:
+    """估算文档提取文本的 token 数，用于吞吐量统计。"""
+    if document.text is not None:
+        text = document.text
+    else:
+        text = "\n".join(line.text for line in document.local_labels or [])
+    return core_processor.estimate_tokens(text, core_processor.LLM_MODEL_ID)
+
+
+class DocumentPipeline:
+    """
+    多文档流水线。
+
+    参数:
+        results_dir: Markdown 输出目录。
+        structure_mode: 结构识别模式，为 None 时使用配置 STRUCTURE_MODE。
+        extract_workers: 提取阶段的工作者数，默认为 PIPELINE_EXTRACT_WORKERS。
+        use_processes: 提取阶段是否使用进程池 (默认)；为 False 时使用线程池 (例如在不便创建子进程的环境中)。
+        llm_workers: LLM 并发数。默认使用进程内共享的调度器 (get_chunk_scheduler)；
+                     指定时为本流水线单独创建一个调度器，运行结束后关闭。
+        queue_size: 各阶段之间队列的容量，默认为 PIPELINE_QUEUE_SIZE。
+        scheduler_policy: 单独创建调度器时使用的调度策略，默认为 LLM_SCHEDULER_POLICY。
+        artifacts_dir: 中间结果包目录，为 None 时不保存各阶段的输出。
+        from_stage: 从哪个阶段开始处理 (STAGES 之一，默认 "extract")。之前阶段的输出从中间结果包读取；
+                    结果包中缺少所需记录的文档回退到较早的阶段。
+        input_root: 输入根目录。指定时，位于其子目录中的文档输出到 results_dir 中对应的子目录 (镜像输入的目录结构)；
+                    为 None 时所有输出都写入 results_dir。
+        deduplicate: 是否检测内容相同的输入文件并只转换其中一个，默认为 BATCH_DEDUPLICATION。
+    """
+
+    def __init__(self, results_dir: str, structure_mode: Optional[str] = None,
+                 extract_workers: Optional[int] = None, use_processes: bool = True,
+                 llm_workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 scheduler_policy: Optional[str] = None, artifacts_dir: Optional[str] = None,
+                 from_stage: str = STAGES[0], input_root: Optional[str] = None,
+                 deduplicate: Optional[bool] = None):
+        if from_stage not in STAGES:
+            raise ValueError(f"未知的处理阶段: {from_stage} (可选 {'/'.join(STAGES)})")
+        if from_stage != STAGES[0] and artifacts_dir is None:
+            raise ValueError(f"从 '{from_stage}' 阶段开始处理需要中间结果包 (artifacts_dir)。")
+        self.results_dir = results_dir
+        self.structure_mode = structure_mode or core_processor.STRUCTURE_MODE
+        self.extract_workers = extract_workers or PIPELINE_EXTRACT_WORKERS
+        self.use_processes = use_processes
+        self.llm_workers = llm_workers
+        self.queue_size = queue_size or PIPELINE_QUEUE_SIZE
+        self.scheduler_policy = scheduler_policy or LLM_SCHEDULER_POLICY
+        self.artifacts_dir = artifacts_dir
+        self.from_stage = from_stage
+        self.input_root = input_root
+        self.deduplicate = BATCH_DEDUPLICATION if deduplicate is None else deduplicate
+
+    def _results_dir_for(self, input_filepath: str) -> str:
+        if self.input_root is None:
+            return self.results_dir
+        return output_directory_for(input_filepath, self.input_root, self.results_dir)
+
+    def _put(self, target: queue.Queue, item, metrics: StageMetrics, consumer_metrics: StageMetrics) -> None:
+        """向有界队列放入一项；队列已满时阻塞 (背压)，阻塞时间记入生产者阶段的统计。"""
+        start = time.perf_counter()
+        target.put(item)
+        waited = time.perf_counter() - start
+        if waited > 0.001:
+            metrics.record_blocked(waited)
+        consumer_metrics.record_queue_depth(target.qsize())
+
+    def run(self, input_filepaths: Iterable[str],
+            on_document_done: Optional[Callable[[PipelineResult], None]] = None,
+            deadlines: Optional[Dict[str, float]] = None) -> PipelineReport:
+        """
+        处理一组文档。
+
+        参数:
+            input_filepaths: 要处理的文档路径。可以是迭代器 (例如 file_discovery.discover_documents)：
+                             提取阶段在有空闲容量时才逐个取出，发现第一个文件后即可开始处理。
+            on_document_done: 可选回调，每个文档处理完成 (成功或失败) 时调用 (提取失败的文档在提取线程中，
+                              其他文档在写入线程中)，不必等待整批文档。
+            deadlines: 可选，{文档路径: 相对于本次运行开始的截止秒数}，供 "deadline" 调度策略使用。
+
+        返回:
+            PipelineReport: 按输入顺序排列的处理结果以及各阶段统计。
+        """
+        start_time = time.perf_counter()
+        pending_paths = iter(input_filepaths)
+        deadlines = {str(path): seconds for path, seconds in (deadlines or {}).items()}
+        # 以下列表在提取阶段取出文档时追加，其他阶段只访问已存在的下标
+        input_paths: List[str] = []
+        outputs: List[Optional[str]] = []
+        tokens: List[int] = []
+        extract_seconds: List[float] = []
+        coverages: List[Optional[float]] = []
+        # 重复输入：{副本下标: 代表文件下标}；代表文件完成前到达的副本暂存在 waiting_duplicates 中
+        detector = DuplicateDetector() if self.deduplicate else None
+        first_index: Dict[str, int] = {}
+        duplicate_of: Dict[int, int] = {}
+        finished: set = set()
+        waiting_duplicates: Dict[int, List[int]] = {}
+        dedup_lock = threading.Lock()
+        if self.llm_workers:
+            scheduler = ChunkScheduler(self.llm_workers, self.scheduler_policy, LLM_CHUNK_MAX_ATTEMPTS)
+        else:
+            scheduler = get_chunk_scheduler()
+        metrics = {
+            "extract": StageMetrics("提取", self.extract_workers),
+            "split": StageMetrics("分割", 1),
+            "llm": StageMetrics("LLM", scheduler.workers),
+            "write": StageMetrics("合并与写入", 1),
+        }
+        split_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        write_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        # 限制已提交给调度器但尚未完成的文档数
+        llm_slots = threading.Semaphore(self.queue_size)
+        # 正在提取的文档的中间结果包与输入文件指纹 (仅在提取线程中访问)
+        bundles: Dict[int, ArtifactBundle] = {}
+        fingerprints: Dict[int, Optional[dict]] = {}
+
+        def result_for(index: int) -> PipelineResult:
+            original = duplicate_of.get(index)
+            return PipelineResult(input_paths[index], outputs[index], tokens[index],
+                                  input_paths[original] if original is not None else None, coverages[index])
+
+        def finish_document(index: int, output_path: Optional[str]) -> None:
+            outputs[index] = output_path
+            if on_document_done is not None:
+                try:
+                    on_document_done(result_for(index))
+                except Exception as e:
+                    logger.warning(f"文档完成回调发生错误: {e}")
+            with dedup_lock:
+                finished.add(index)
+                duplicates = waiting_duplicates.pop(index, [])
+            for duplicate in duplicates:
+                finish_duplicate(duplicate)
+
+        def finish_duplicate(index: int) -> None:
+            """代表文件完成后，将其输出复制为副本的输出。"""
+            original = duplicate_of[index]
+            tokens[index] = tokens[original]
+            extract_seconds[index] = extract_seconds[original]
+            coverages[index] = coverages[original]
+            with document_log_context(_document_tag(input_paths[index])):
+                output_path = self._copy_duplicate_output(input_paths[index], input_paths[original], outputs[original])
+            finish_document(index, output_path)
+
+        def register_duplicate(index: int) -> bool:
+            """input_paths[index] 与之前的某个文档内容相同时登记为副本并返回 True，之后不再提取。"""
+            path = input_paths[index]
+            original_path = detector.find_original(path)
+            if original_path is None:
+                first_index.setdefault(path, index)
+                return False
+            original = first_index[original_path]
+            duplicate_of[index] = original
+            logger.info(f"'{path}' 与 '{original_path}' 内容相同，将复用其转换结果。")
+            with dedup_lock:
+                if original not in finished:
+                    waiting_duplicates.setdefault(original, []).append(index)
+                    return True
+            finish_duplicate(index)
+            return True
+
+        def next_input_path() -> Optional[str]:
+            """从输入中取出下一个文档路径并分配下标；输入已取完 (或迭代出错) 时返回 None。"""
+            try:
+                path = str(next(pending_paths))
+            except StopIteration:
+                return None
+            except Exception as e:
+                logger.error(f"读取输入文件列表时发生意外错误，之后的文件将不被处理: {e}", exc_info=True)
+                return None
+            input_paths.append(path)
+            outputs.append(None)
+            tokens.append(0)
+            extract_seconds.append(0.0)
+            coverages.append(None)
+            return path
+
+        def prepare_extraction(index: int, input_filepath: str) -> bool:
+            """
+            为取出的文档做提取前的准备。返回 True 表示需要提交提取任务；
+            重复输入以及提取结果来自中间结果包的文档返回 False。
+            """
+            if detector is not None and register_duplicate(index):
+                return False
+            if self.artifacts_dir is not None:
+                bundle = open_artifact_bundle(self.artifacts_dir, input_filepath)
+                with document_log_context(_document_tag(input_filepath)):
+                    fingerprint = input_fingerprint(input_filepath)
+                    start_stage = bundle.resume_stage(self.from_stage, self.structure_mode, fingerprint)
+                if start_stage != STAGES[0]:
+                    # 提取结果来自中间结果包，不需要重新提取
+                    document = document_from_record(bundle.get("extract"), input_filepath)
+                    metrics["extract"].record_item(0.0)
+                    self._put(split_queue, (index, document, bundle, start_stage),
+                              metrics["extract"], metrics["split"])
+                    return False
+                bundles[index] = bundle
+                fingerprints[index] = fingerprint
+            return True
+
+        def extract_stage() -> None:
+            # 无论如何结束都要放入结束标记，否则分割阶段和 run() 会一直等待
+            try:
+                executor_class = concurrent.futures.ProcessPoolExecutor if self.use_processes \
+                    else concurrent.futures.ThreadPoolExecutor
+                with executor_class(max_workers=self.extract_workers) as executor:
+                    pending: Dict[concurrent.futures.Future, int] = {}
+                    inputs_exhausted = False
+                    while not inputs_exhausted or pending:
+                        # 在途的提取任务数不超过 工作者数 + 队列容量，避免提取结果在内存中堆积
+                        while not inputs_exhausted and len(pending) < self.extract_workers + self.queue_size:
+                            input_filepath = next_input_path()
+                            if input_filepath is None:
+                                inputs_exhausted = True
+                                break
+                            index = len(input_paths) - 1
+                            try:
+                                if not prepare_extraction(index, input_filepath):
+                                    continue
+                            except Exception as e:
+                                logger.error(f"准备提取文档 '{input_filepath}' 时发生意外错误: {e}", exc_info=True)
+                                finish_document(index, None)
+                                continue
+                            future = executor.submit(_timed_extract, input_filepath, self.structure_mode)
+                            pending[future] = index
+                        if not pending:
+                            continue
+                        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                        for future in sorted(done, key=pending.get):
+                            index = pending.pop(future)
+                            try:
+                                document, seconds = future.result()
+                            except Exception as e:
+                                logger.error(f"提取文档 '{input_paths[index]}' 时发生意外错误: {e}", exc_info=True)
+                                document, seconds = None, 0.0
+                            metrics["extract"].record_item(seconds)
+                            extract_seconds[index] = seconds
+                            bundle = bundles.pop(index, None)
+                            fingerprint = fingerprints.pop(index, None)
+                            if document is None:
+                                finish_document(index, None)
+                                continue
+                            if bundle is not None:
+                                try:
+                                    bundle.put("extract", extract_record(document, self.structure_mode, fingerprint))
+                                except Exception as e:
+                                    logger.error(f"保存文档 '{input_paths[index]}' 的提取结果时发生意外错误: {e}", exc_info=True)
+                                    finish_document(index, None)
+                                    continue
+                            self._put(split_queue, (index, document, bundle, STAGES[0]), metrics["extract"], metrics["split"])
+            except Exception as e:
+                logger.error(f"提取阶段发生意外错误，之后的文件将不被处理: {e}", exc_info=True)
+            finally:
+                split_queue.put(_DONE)
+
+        def timed(analyzer: Callable[[object], Optional[str]], tag: str) -> Callable[[object], Optional[str]]:
+            def run_task(task) -> Optional[str]:
+                started = time.perf_counter()
+                try:
+                    with document_log_context(tag):
+                        return analyzer(task)
+                finally:
+                    metrics["llm"].record_item(time.perf_counter() - started)
+            return run_task
+
+        def label_whole_document(document: core_processor.ExtractedDocument) -> Optional[str]:
+            return core_processor.label_extracted_document(document, self.structure_mode)
+
+        def checkpointed_analyzer(checkpoint: Optional[ChunkCheckpoint],
+                                  coverage: Optional[DocumentCoverage]) -> Callable[[str], Optional[str]]:
+            """
+            分析文本块：检查点中已有结果时直接复用；新的结果先经过内容覆盖检查 (只重新请求缺失片段)，
+            再立即写入检查点。
+            """
+            def analyze_chunk(chunk: str) -> Optional[str]:
+                if checkpoint is not None:
+                    saved = checkpoint.get(chunk)
+                    if saved is not None:
+                        return saved
+                result = core_processor.analyze_text_with_llm(chunk)
+                if result is not None and coverage is not None:
+                    result = coverage.check(chunk, result, core_processor.analyze_text_with_llm)
+                if result is not None and checkpoint is not None:
+                    checkpoint.put(chunk, result)
+                return result
+            return analyze_chunk
+
+        def on_llm_complete(state: _DocumentState, scheduled: ScheduledDocument) -> None:
+            llm_slots.release()
+            results = None if scheduled.failed else scheduled.results
+            self._put(write_queue, (state, results), metrics["llm"], metrics["write"])
+
+        def split_document(index: int, document: core_processor.ExtractedDocument,
+                           bundle: Optional[ArtifactBundle], start_stage: str) -> Optional[ScheduledDocument]:
+            """分割一个文档并提交给 LLM 调度器；不需要 LLM 的文档直接交给写入阶段 (返回 None)。"""
+            tag = _document_tag(document.input_filepath)
+            started = time.perf_counter()
+            tokens[index] = _estimate_document_tokens(document)
+            plan = None
+            if STAGES.index(start_stage) > STAGES.index("split"):
+                plan = plan_from_record(bundle.get("split") or {})
+            elif document.text is not None and document.local_labels is None and self.structure_mode == "llm":
+                with document_log_context(tag):
+                    plan = core_processor.split_text_for_llm(document.text, document.input_filepath,
+                                                             core_processor.LLM_MODEL_ID)
+                if plan is None:
+                    metrics["split"].record_item(time.perf_counter() - started)
+                    finish_document(index, None)
+                    return None
+            if bundle is not None and STAGES.index(start_stage) <= STAGES.index("split"):
+                bundle.put("split", split_record(plan))
+            metrics["split"].record_item(time.perf_counter() - started)
+
+            if start_stage in ("merge", "render"):
+                # LLM 输出来自中间结果包，直接交给写入阶段
+                state = _DocumentState(index, document, plan, None, bundle, start_stage)
+                stored = bundle.get("llm") or {}
+                self._put(write_queue, (state, stored.get("results")), metrics["split"], metrics["write"])
+                return None
+
+            blocked_start = time.perf_counter()
+            llm_slots.acquire()
+            waited = time.perf_counter() - blocked_start
+            if waited > 0.001:
+                metrics["split"].record_blocked(waited)
+
+            checkpoint = writer = None
+            try:
+                if plan is not None and not plan.direct:
+                    checkpoint = open_chunk_checkpoint(document.input_filepath)
+                    writer = self._streaming_writer(document, plan, bundle)
+                coverage = DocumentCoverage(COVERAGE_LINE_THRESHOLD) if plan is not None and COVERAGE_CHECK else None
+                state = _DocumentState(index, document, plan, checkpoint, bundle, start_stage, writer, coverage)
+                if plan is not None:
+                    tasks, analyzer = plan.chunks, checkpointed_analyzer(checkpoint, coverage)
+                    size = sum(len(chunk) for chunk in plan.chunks)
+                else:
+                    tasks, analyzer, size = [document], label_whole_document, len(document.text or "")
+                deadline = deadlines.get(document.input_filepath)
+                scheduled = scheduler.submit_document(
+                    tasks, timed(analyzer, tag), name=document.input_filepath, size=size,
+                    deadline=start_time + deadline if deadline is not None else None,
+                    on_complete=lambda scheduled, state=state: on_llm_complete(state, scheduled),
+                    on_chunk_complete=writer.add if writer is not None else None,
+                    retain_results=writer is None or bundle is not None,
+                )
+            except Exception:
+                # 文档未能提交给调度器：归还名额并删除流式写入的临时文件
+                llm_slots.release()
+                if writer is not None:
+                    writer.abort()
+                raise
+            metrics["llm"].record_queue_depth(scheduler.pending_chunks())
+            return scheduled
+
+        def split_stage() -> None:
+            submitted: List[ScheduledDocument] = []
+            try:
+                while True:
+                    item = split_queue.get()
+                    if item is _DONE:
+                        break
+                    index = item[0]
+                    try:
+                        scheduled = split_document(*item)
+                    except Exception as e:
+                        logger.error(f"分割文档 '{input_paths[index]}' 时发生意外错误: {e}", exc_info=True)
+                        finish_document(index, None)
+                        continue
+                    if scheduled is not None:
+                        submitted.append(scheduled)
+            except Exception as e:
+                logger.error(f"分割阶段发生意外错误，之后的文件将不被处理: {e}", exc_info=True)
+            finally:
+                # 所有文档的完成回调都执行完毕 (已放入写入队列) 后再结束写入阶段
+                for scheduled in submitted:
+                    scheduled.wait()
+                write_queue.put(_DONE)
+
+        def write_stage() -> None:
+            while True:
+                item = write_queue.get()
+                if item is _DONE:
+                    break
+                state, results = item
+                started = time.perf_counter()
+                with document_log_context(_document_tag(state.document.input_filepath)):
+                    try:
+                        if state.coverage is not None and state.coverage.total_chars:
+                            coverages[state.index] = state.coverage.score
+                            logger.info(state.coverage.summary())
+                        output_path = self._write_document(state, results)
+                        if output_path is not None and state.checkpoint is not None:
+                            state.checkpoint.discard()
+                    except Exception as e:
+                        logger.error(f"合并与写入文档时发生意外错误: {e}", exc_info=True)
+                        if state.writer is not None:
+                            state.writer.abort()
+                        output_path = None
+                finish_document(state.index, output_path)
+                metrics["write"].record_item(time.perf_counter() - started)
+
+        threads = [threading.Thread(target=extract_stage, name="pipeline-extract"),
+                   threading.Thread(target=split_stage, name="pipeline-split"),
+                   threading.Thread(target=write_stage, name="pipeline-write")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self.llm_workers:
+            scheduler.shutdown()
+
+        wall_seconds = time.perf_counter() - start_time
+        logger.info(f"流水线处理完成: {len(input_paths)} 个文档，耗时 {wall_seconds:.2f}s")
+        for stage_metrics in metrics.values():
+            logger.info(f"  {stage_metrics.summary(wall_seconds)}")
+        results = [result_for(index) for index in range(len(input_paths))]
+        deduplication = None
+        if detector is not None:
+            reused = [index for index in duplicate_of if outputs[index]]
+            deduplication = DeduplicationSummary(len(reused), sum(extract_seconds[index] for index in reused),
+                                                 sum(tokens[index] for index in reused),
+                                                 detector.files_hashed, detector.bytes_hashed)
+            if duplicate_of:
+                logger.info(f"  重复输入: {deduplication.summary()}")
+        return PipelineReport(results, metrics, wall_seconds, deduplication)
+
+    def _streaming_writer(self, document: core_processor.ExtractedDocument, plan: core_processor.LlmWorkPlan,
+                          bundle: Optional[ArtifactBundle]) -> Optional[OrderedMarkdownWriter]:
+        """
+        为分块文档创建流式写入器。保存中间结果包时写入器同时保留合并结果与 Markdown，
+        文档完成后记入结果包。分类器训练样本需要在渲染之前处理完整的合并结果，此时仍在全部文本块完成后统一合并与写入。
+        """
+        if not STREAMING_MARKDOWN_WRITER or core_processor.HEADING_CLASSIFIER_TRAINING_LOG:
+            return None
+        output_path = core_processor.markdown_output_path(document.input_filepath,
+                                                          self._results_dir_for(document.input_filepath))
+        return OrderedMarkdownWriter(output_path, len(plan.chunks), core_processor.DEFAULT_OVERLAP_TOKENS,
+                                     core_processor.LLM_MODEL_ID, retain_output=bundle is not None)
+
+    def _copy_duplicate_output(self, input_filepath: str, original_filepath: str,
+                               original_output: Optional[str]) -> Optional[str]:
+        """将代表文件的 Markdown 输出原子地复制为副本的输出文件；代表文件转换失败时返回 None。"""
+        if original_output is None:
+            logger.error(f"与之内容相同的文件 '{original_filepath}' 转换失败，未生成输出。")
+            return None
+        output_path = core_processor.markdown_output_path(input_filepath, self._results_dir_for(input_filepath))
+        if os.path.abspath(output_path) == os.path.abspath(original_output):
+            return output_path
+        directory = os.path.dirname(os.path.abspath(output_path))
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(output_path)}-", suffix=".tmp")
+            os.close(fd)
+            shutil.copyfile(original_output, tmp_path)
+            os.replace(tmp_path, output_path)
+        except OSError as e:
+            logger.error(f"复制 '{original_output}' 到 '{output_path}' 时发生错误: {e}", exc_info=True)
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return None
+        logger.info(f"已复用 '{os.path.basename(original_filepath)}' 的转换结果并保存到: {output_path}")
+        return output_path
+
+    def _write_document(self, state: _DocumentState, results: Optional[List[Optional[str]]]) -> Optional[str]:
+        """
+        按原始顺序合并文档的各任务结果，生成 Markdown 并写入文件。
+        results 为 None 表示 LLM 处理失败；从 "render" 阶段开始时直接使用结果包中的合并结果。
+        流式写入的文档已在各文本块完成时写入临时文件，这里只需提交 (或放弃) 写入。
+        """
+        input_filepath = state.document.input_filepath
+        bundle = state.bundle
+        if state.writer is not None:
+            if results is None:
+                state.writer.abort()
+                logger.error(f"LLM 处理步骤未能生成任何输出内容 ({input_filepath})。")
+                return None
+            output_path = state.writer.commit()
+            if output_path is not None and bundle is not None:
+                bundle.put("llm", {"results": list(results)})
+                bundle.put("merge", {"labeled_text": state.writer.labeled_text})
+                bundle.put("render", {"markdown": state.writer.markdown})
+            return output_path
+        if state.start_stage == "render":
+            labeled_text = (bundle.get("merge") or {}).get("labeled_text")
+        else:
+            if results is None:
+                logger.error(f"LLM 处理步骤未能生成任何输出内容 ({input_filepath})。")
+                return None
+            if bundle is not None and state.start_stage != "merge":
+                bundle.put("llm", {"results": list(results)})
+            if state.plan is None:
+                labeled_text = results[0]
+            else:
+                labeled_text = core_processor.merge_chunk_results(
+                    [str(result) for result in results], state.plan, input_filepath, core_processor.LLM_MODEL_ID
+                )
+            if labeled_text and bundle is not None:
+                bundle.put("merge", {"labeled_text": labeled_text})
+        if not labeled_text:
+            logger.error(f"LLM 处理步骤未能生成任何输出内容 ({input_filepath})。")
+            return None
+        markdown_content = core_processor.render_markdown(labeled_text, input_filepath)
+        if markdown_content is None:
+            return None
+        if bundle is not None:
+            bundle.put("render", {"markdown": markdown_content})
+        return core_processor.write_markdown_file(markdown_content, input_filepath, self._results_dir_for(input_filepath))
+
+
+def process_documents(input_filepaths: Iterable[str], results_dir: str,
+                      structure_mode: Optional[str] = None, **pipeline_options) -> PipelineReport:
+    """以流水线方式批量处理文档的便捷函数，pipeline_options 会传递给 DocumentPipeline。"""
+    return DocumentPipeline(results_dir, structure_mode=structure_mode, **pipeline_options).run(input_filepaths)
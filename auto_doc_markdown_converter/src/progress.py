@@ -0,0 +1,100 @@
+"""
+单个文档转换过程中的进度事件。
+
+调用方 (例如 Web 应用的后台任务) 在 progress_listener 的 with 块内调用 process_document_to_markdown 等函数，
+core_processor 在当前线程中依次报告以下事件：
+
+- "extracted": 文本提取完成，数据包含 file_type 和 chars (提取的字符数)；
+- "chunks": 文本分割完成，count 为 LLM 请求的文本块数 (不经过 LLM 分块标注的结构识别模式不报告)；
+- "chunk_done": 一个文本块的 LLM 结果已返回，index 为文本块序号 (从 0 开始)，completed/count 为已完成数/总数；
+- "partial": 新的 Markdown 块已可以按原始顺序输出 (之前的文本块都已完成)，markdown 为这些块，
+  所有 "partial" 事件的 markdown 用 "\n\n" 连接即为最终的 Markdown；
+- "merged": 各文本块的结果已合并为完整的标注结果，lines 为标注行数。
+
+与 document_log_context 相同，监听器保存在线程局部变量中，不需要修改各处理函数的参数。
+没有监听器时 report_progress 直接返回，PartialMarkdownReporter 也不会被创建。
+"""
+import logging
+import threading
+import contextlib
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .text_splitter import ChunkMerger, DEFAULT_OVERLAP_TOKENS
+from .markdown_generator import iter_markdown_blocks_from_labeled_text
+
+logger = logging.getLogger(__name__)
+
+# 进度监听器：listener(事件名称, 事件数据)
+ProgressListener = Callable[[str, Dict[str, Any]], None]
+
+# 当前线程的进度监听器，由 progress_listener 设置
+_progress_context = threading.local()
+
+
+@contextlib.contextmanager
+def progress_listener(listener: Optional[ProgressListener]) -> Iterator[None]:
+    """在 with 块内，当前线程报告的进度事件都交给 listener。可以嵌套，退出时恢复之前的监听器。"""
+    previous = getattr(_progress_context, "listener", None)
+    _progress_context.listener = listener
+    try:
+        yield
+    finally:
+        _progress_context.listener = previous
+
+
+def progress_enabled() -> bool:
+    """当前线程是否设置了进度监听器。"""
+    return getattr(_progress_context, "listener", None) is not None
+
+
+def report_progress(event: str, **data: Any) -> None:
+    """向当前线程的进度监听器报告一个事件；监听器的异常只记录警告，不影响转换。"""
+    listener = getattr(_progress_context, "listener", None)
+    if listener is None:
+        return
+    try:
+        listener(event, data)
+    except Exception as e:
+        logger.warning(f"进度监听器处理事件 '{event}' 时发生错误: {e}")
+
+
+class PartialMarkdownReporter:
+    """
+    接收乱序完成的文本块结果，按原始顺序合并 (与 markdown_writer.OrderedMarkdownWriter 相同的重排与去重叠方式)，
+    每当有新的 Markdown 块可以输出时报告 "partial" 事件。add 与 finish 需要在设置了监听器的线程中调用。
+    """
+
+    def __init__(self, chunk_count: int, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+                 model_name: Optional[str] = None):
+        self.chunk_count = chunk_count
+        self._merger = ChunkMerger(overlap_tokens, model_name)
+        self._pending: Dict[int, str] = {}
+        self._next_index = 0
+        self._blocks_reported = 0
+
+    def add(self, index: int, processed_chunk: str) -> None:
+        """提交第 index 个文本块的结果。重复提交会被忽略。"""
+        if index < self._next_index or index in self._pending:
+            return
+        self._pending[index] = processed_chunk
+        while self._next_index in self._pending:
+            chunk = self._pending.pop(self._next_index)
+            self._next_index += 1
+            self._report(self._merger.add(chunk))
+
+    def finish(self) -> None:
+        """全部文本块完成后，报告合并器中保留的末尾内容。"""
+        if self._next_index >= self.chunk_count:
+            self._report(self._merger.finish())
+
+    def _report(self, labeled_lines: List[str]) -> None:
+        if not labeled_lines:
+            return
+        blocks = list(iter_markdown_blocks_from_labeled_text("\n".join(labeled_lines)))
+        if not blocks:
+            return
+        if not self._blocks_reported:
+            blocks[0] = blocks[0].lstrip()  # 与 generate_markdown_from_labeled_text 对结果的 strip() 一致
+        self._blocks_reported += len(blocks)
+        report_progress("partial", markdown="\n\n".join(blocks), chunks_merged=self._next_index,
+                        count=self.chunk_count)
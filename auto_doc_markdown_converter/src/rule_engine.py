@@ -0,0 +1,224 @@
+"""
+基于编号规则的离线结构识别引擎。
+
+公文、合同、标准等文档的标题通常遵循固定的编号体系，例如 "第X章"、"第X条"、"一、"、"（一）"、"1.1.1"。
+本模块用可配置的规则集为每一行指定 H1-H4/P，并给出文档级置信度；置信度达到阈值的文档可以完全跳过 LLM。
+
+实现要点：
+- 所有规则被编译为一个带命名分组的组合正则表达式，对整篇文档 (按行拼接) 只做一次 finditer 扫描，
+  而不是对每一行逐条尝试规则；自定义规则开头的全局内联标志 (例如 "(?i)") 被改写为只作用于该规则的标志组，
+  规则之间仍有冲突 (例如重复的分组名称) 而无法组合时，退回到逐条规则扫描；
+- 每条规则有一个"等级序号" (rank)，文档中实际出现的序号从小到大依次映射为 H1-H4，
+  因此只有 "一、" 和 "（一）" 的通知与同时有 "第X章"/"第X节" 的法规都能得到连续的标题层级；
+- 匹配到编号但内容较长或以句末标点结尾的行 (例如 "第一条 ……。") 视为带编号的正文段落。
+"""
+import re
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .hybrid_labeler import LabeledLine
+from .outline_filter import is_heading_candidate
+from .layout_analyzer import PAGE_NUMBER_PATTERN
+
+logger = logging.getLogger(__name__)
+
+_CN_NUM = "[一二三四五六七八九十百千零〇两\\d]+"
+# 以这些字符结尾的行视为句子 (正文)，即使带有标题编号
+_SENTENCE_END_CHARS = "。！？!?；;：:，,"
+# 文档首行标题使用的等级序号 (小于所有内置规则)
+TITLE_RANK = 0
+# 规则开头的全局内联标志，例如 "(?i)"
+_GLOBAL_FLAGS_PATTERN = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+
+class StructureRule(NamedTuple):
+    """一条编号规则。pattern 从行首匹配；匹配行长度不超过 max_heading_length 时视为标题。"""
+    name: str
+    rank: int
+    pattern: str
+    max_heading_length: int = 40
+
+
+class RuleEngineResult(NamedTuple):
+    """规则引擎的识别结果：逐行标注以及文档级置信度 (0-1)。"""
+    lines: List[LabeledLine]
+    confidence: float
+
+
+# 内置规则集。同一规则集内较具体的规则 (例如 1.1.1) 排在较宽泛的规则 (例如 1.) 之前。
+BUILTIN_RULE_SETS: Dict[str, List[StructureRule]] = {
+    # 法规、规章、合同：第X编/章/节/条
+    "chinese_legal": [
+        StructureRule("part", 10, rf"第{_CN_NUM}[编篇部]"),
+        StructureRule("chapter", 20, rf"第{_CN_NUM}章"),
+        StructureRule("section", 30, rf"第{_CN_NUM}节"),
+        StructureRule("article", 40, rf"第{_CN_NUM}条"),
+    ],
+    # 公文：一、 / （一） / 1. / (1)
+    "chinese_official": [
+        StructureRule("cn_enum", 50, r"[一二三四五六七八九十]+、"),
+        StructureRule("cn_paren_enum", 60, r"[（(][一二三四五六七八九十]+[)）]"),
+        StructureRule("arabic_enum", 70, r"\d+[.．、](?!\d)"),
+        StructureRule("arabic_paren_enum", 80, r"[（(]\d+[)）]"),
+    ],
+    # 标准、技术文档：1 / 1.1 / 1.1.1 / 1.1.1.1
+    "decimal": [
+        StructureRule("decimal_4", 100, r"\d+\.\d+\.\d+\.\d+(?![.\d])"),
+        StructureRule("decimal_3", 92, r"\d+\.\d+\.\d+(?![.\d])"),
+        StructureRule("decimal_2", 91, r"\d+\.\d+(?![.\d])"),
+        StructureRule("decimal_1", 90, r"\d{1,2}(?=\s+\S)"),
+    ],
+}
+
+
+def _scope_global_flags(pattern: str) -> str:
+    """
+    将规则开头的全局内联标志改写为作用域标志组 (例如 "(?i)chapter \\d+" -> "(?i:chapter \\d+)")。
+    全局标志只能出现在整个正则表达式的开头，不改写的话规则无法与其他规则组合。
+    """
+    match = _GLOBAL_FLAGS_PATTERN.match(pattern)
+    if match is None:
+        return pattern
+    return f"(?{match.group(1)}:{pattern[match.end():]})"
+
+
+def _compile_rules(rules: Sequence[StructureRule]) -> re.Pattern:
+    """将规则编译为一个组合正则表达式：第 i 条规则对应命名分组 r{i}，每条规则都从行首 (允许缩进) 匹配。"""
+    alternatives = "|".join(f"(?P<r{index}>{rule.pattern})" for index, rule in enumerate(rules))
+    return re.compile(rf"^[ \t]*(?:{alternatives})", re.MULTILINE)
+
+
+def load_rule_sets(names: Iterable[str], rules_file: Optional[str] = None) -> List[StructureRule]:
+    """
+    按名称加载规则集，可选地从 JSON 文件加载自定义规则集。
+
+    JSON 文件格式为 {"规则集名称": [{"name": ..., "rank": ..., "pattern": ..., "max_heading_length": ...}, ...]}，
+    其中的规则集可与内置规则集同名以覆盖内置定义。名称 "all" 表示全部规则集。
+
+    返回:
+        List[StructureRule]: 按规则集顺序排列的规则列表。无效的规则会被记录警告并跳过。
+    """
+    rule_sets = dict(BUILTIN_RULE_SETS)
+    if rules_file:
+        try:
+            with open(rules_file, "r", encoding="utf-8") as f:
+                custom_sets = json.load(f)
+            for set_name, raw_rules in custom_sets.items():
+                rules = []
+                for raw_rule in raw_rules:
+                    try:
+                        rule = StructureRule(**raw_rule)
+                        rule = rule._replace(pattern=_scope_global_flags(rule.pattern))
+                        _compile_rules([rule])  # 按组合后的形式校验，而不只是单独编译
+                        rules.append(rule)
+                    except (TypeError, re.error) as e:
+                        logger.warning(f"规则文件 {rules_file} 中规则集 '{set_name}' 的规则 {raw_rule} 无效，已跳过: {e}")
+                rule_sets[set_name] = rules
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"无法加载结构规则文件 {rules_file}，将只使用内置规则集: {e}")
+
+    selected: List[StructureRule] = []
+    names = list(names)
+    if "all" in names:
+        names = list(rule_sets)
+    for name in names:
+        if name not in rule_sets:
+            logger.warning(f"未知的结构规则集 '{name}'，已忽略。可用规则集: {', '.join(rule_sets)}")
+            continue
+        selected.extend(rule_sets[name])
+    return selected
+
+
+class RuleEngine:
+    """将一组 StructureRule 编译为单个正则表达式，并对整篇文档进行一次扫描完成分类。"""
+
+    def __init__(self, rules: Sequence[StructureRule]):
+        self.rules = list(rules)
+        # 扫描使用的 (正则表达式, 对应的规则列表)：通常只有一个组合正则表达式
+        self._scans: List[Tuple[re.Pattern, List[StructureRule]]] = []
+        if self.rules:
+            try:
+                self._scans = [(_compile_rules(self.rules), self.rules)]
+            except re.error as e:
+                logger.warning(f"结构规则无法组合为一个正则表达式，将逐条规则扫描文档: {e}")
+                self._scans = [(_compile_rules([rule]), [rule]) for rule in self.rules]
+
+    def match_rules(self, lines: Sequence[str]) -> List[Optional[StructureRule]]:
+        """返回每一行匹配到的规则 (没有匹配时为 None；多条规则匹配同一行时取排在前面的规则)。"""
+        matched: List[Optional[StructureRule]] = [None] * len(lines)
+        if not self._scans or not lines:
+            return matched
+        line_starts: Dict[int, int] = {}
+        position = 0
+        for index, line in enumerate(lines):
+            line_starts[position] = index
+            position += len(line) + 1
+        text = "\n".join(lines)
+        for pattern, rules in self._scans:
+            for match in pattern.finditer(text):
+                index = line_starts.get(match.start())
+                if index is not None and matched[index] is None:
+                    matched[index] = rules[int(match.lastgroup[1:])]
+        return matched
+
+    def classify(self, lines: Sequence[str]) -> RuleEngineResult:
+        """
+        为文本行指定 H1-H4/P 标签并计算文档级置信度。
+
+        参数:
+            lines: 文档的文本行 (每行一个段落或标题)，空行会被忽略。
+
+        返回:
+            RuleEngineResult: 逐行标注和置信度。置信度为"确定"的行所占比例；
+            确定的行包括规则匹配的行以及明显的正文段落，未匹配任何规则的短行 (可能是无编号标题) 不确定。
+            未识别出任何编号标题的文档置信度为 0。
+        """
+        lines = [line.strip() for line in lines if line.strip()]
+        if not lines:
+            return RuleEngineResult([], 0.0)
+        matched = self.match_rules(lines)
+
+        ranks: List[Optional[int]] = []
+        certain: List[bool] = []
+        for index, (line, rule) in enumerate(zip(lines, matched)):
+            if rule is not None:
+                is_heading = len(line) <= rule.max_heading_length and line[-1] not in _SENTENCE_END_CHARS
+                ranks.append(rule.rank if is_heading else None)
+                certain.append(True)
+            elif PAGE_NUMBER_PATTERN.match(line):
+                ranks.append(None)
+                certain.append(True)
+            elif index == 0 and is_heading_candidate(line):
+                # 文档首行未编号的短行视为文档标题
+                ranks.append(TITLE_RANK)
+                certain.append(True)
+            else:
+                ranks.append(None)
+                certain.append(not is_heading_candidate(line))
+
+        present_ranks = sorted({rank for rank in ranks if rank is not None})
+        levels = {rank: min(position + 1, 4) for position, rank in enumerate(present_ranks)}
+        labeled = [
+            LabeledLine(f"H{levels[rank]}" if rank is not None else "P", line, 1.0 if is_certain else 0.5)
+            for line, rank, is_certain in zip(lines, ranks, certain)
+        ]
+
+        numbered_headings = sum(1 for rank in ranks if rank is not None and rank != TITLE_RANK)
+        confidence = sum(certain) / len(lines) if numbered_headings else 0.0
+        return RuleEngineResult(labeled, confidence)
+
+
+_rule_engine: Optional[RuleEngine] = None
+_rule_engine_lock = threading.Lock()
+
+
+def get_rule_engine() -> RuleEngine:
+    """返回按配置 (STRUCTURE_RULE_SETS / STRUCTURE_RULES_FILE) 构建的进程内共享规则引擎。"""
+    global _rule_engine
+    with _rule_engine_lock:
+        if _rule_engine is None:
+            from .config import STRUCTURE_RULE_SETS, STRUCTURE_RULES_FILE
+            _rule_engine = RuleEngine(load_rule_sets(STRUCTURE_RULE_SETS, STRUCTURE_RULES_FILE))
+        return _rule_engine
@@ -0,0 +1,197 @@
+"""
+各处理阶段的中间结果 (artifact)。
+
+文档转换依次经过提取、分割、LLM、合并与渲染阶段，各阶段的输出原本只存在于内存中：
+修改下游逻辑 (例如合并策略或 Markdown 渲染) 后，要看到效果就必须重新提取并再次调用 LLM。
+本模块为每个文档维护一个中间结果包 (gzip 压缩的 JSONL)，每个阶段完成时追加一条记录：
+
+    extract  提取的 (规范化后的) 文本或版面分析标注
+    split    交给 LLM 的文本块 (非 "llm" 结构识别模式下为空)
+    llm      各文本块的 LLM 原始输出
+    merge    合并后的 "标签: 内容" 标注
+    render   生成的 Markdown
+
+重新运行时可以从任一阶段开始 (main.py 的 --from-stage 选项)，该阶段之前的输出直接从结果包读取。
+
+- 结果包按输入文件的绝对路径命名，保存在 STAGE_ARTIFACTS_DIR 中；extract 记录包含输入文件的 SHA-256 与大小，
+  输入文件被修改后结果包中的记录不再复用，从提取阶段重新开始；
+- 写入某个阶段的记录时，之后各阶段的旧记录随即失效，因此结果包中的记录总是来自同一次处理；
+- 每条记录是一个独立的 gzip 成员，进程中断时最后一条记录可能不完整，加载时会被跳过。
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .utils import compute_file_sha256
+
+if TYPE_CHECKING:
+    from .core_processor import ExtractedDocument, LlmWorkPlan
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("extract", "split", "llm", "merge", "render")
+BUNDLE_SUFFIX = ".jsonl.gz"
+
+# 从某个阶段开始处理时，结果包中必须已有的记录
+_REQUIRED_RECORDS = {
+    "extract": (),
+    "split": ("extract",),
+    "llm": ("extract", "split"),
+    "merge": ("extract", "split", "llm"),
+    "render": ("extract", "merge"),
+}
+
+
+class ArtifactBundle:
+    """
+    单个文档的中间结果包。所有方法都是线程安全的。
+
+    参数:
+        path: 结果包文件路径，父目录不存在时会自动创建。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _apply(self, stage: str, data: Dict[str, Any]) -> None:
+        """记录阶段输出，并使之后各阶段的旧记录失效。"""
+        position = STAGES.index(stage)
+        for later_stage in STAGES[position + 1:]:
+            self._records.pop(later_stage, None)
+        self._records[stage] = data
+
+    def _load(self) -> None:
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for raw_line in f:
+                    try:
+                        record = json.loads(raw_line)
+                        if record["stage"] in STAGES and isinstance(record["data"], dict):
+                            self._apply(record["stage"], record["data"])
+                    except (ValueError, KeyError, TypeError):
+                        logger.debug(f"跳过结果包 {self.path} 中不完整的记录。")
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError) as e:
+            # 最后一个 gzip 成员被截断 (写入时进程中断)：保留已读取的记录
+            logger.warning(f"结果包 {self.path} 不完整，只使用其中完整的记录: {e}")
+
+    def get(self, stage: str) -> Optional[Dict[str, Any]]:
+        """返回阶段的输出记录，没有时返回 None。"""
+        with self._lock:
+            return self._records.get(stage)
+
+    def stages(self) -> List[str]:
+        """返回结果包中已有记录的阶段 (按处理顺序)。"""
+        with self._lock:
+            return [stage for stage in STAGES if stage in self._records]
+
+    def put(self, stage: str, data: Dict[str, Any]) -> None:
+        """
+        保存阶段的输出 (立即写入文件)。写入失败只记录警告。
+
+        写入 "extract" 阶段表示重新开始处理，会清空整个结果包。
+        """
+        line = json.dumps({"stage": stage, "data": data}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._apply(stage, data)
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with gzip.open(self.path, "wb" if stage == STAGES[0] else "ab") as f:
+                    f.write(line.encode("utf-8"))
+            except OSError as e:
+                logger.warning(f"写入结果包 {self.path} 失败: {e}")
+
+    def resume_stage(self, from_stage: str, structure_mode: str, fingerprint: Optional[Dict[str, Any]]) -> str:
+        """
+        返回实际可以开始处理的阶段：from_stage 所需的记录都存在时即为 from_stage，
+        否则回退到所需记录齐全的最近一个较早阶段 (最终回退到 "extract")。
+        结构识别模式与生成结果包时不同，或输入文件的指纹 (input_fingerprint) 与 extract 记录不一致
+        (文件已被修改或无法读取) 时，已有的记录不可复用。
+        """
+        with self._lock:
+            extract_record = self._records.get("extract")
+            if extract_record is None or extract_record.get("structure_mode") != structure_mode:
+                available = set()
+            elif fingerprint is None or any(extract_record.get(key) != value for key, value in fingerprint.items()):
+                if from_stage != STAGES[0]:
+                    logger.warning(f"输入文件在生成结果包后已被修改 ({self.path})，将从 '{STAGES[0]}' 阶段开始。")
+                return STAGES[0]
+            else:
+                available = set(self._records)
+        for stage in reversed(STAGES[:STAGES.index(from_stage) + 1]):
+            if all(required in available for required in _REQUIRED_RECORDS[stage]):
+                if stage != from_stage:
+                    logger.warning(f"结果包中缺少从 '{from_stage}' 阶段开始所需的记录 ({self.path})，将从 '{stage}' 阶段开始。")
+                return stage
+        return STAGES[0]
+
+
+def artifact_bundle_path(artifacts_dir: str, input_filepath: str) -> str:
+    """返回输入文件对应的结果包路径 (文件名包含输入文件名，便于查找)。"""
+    abs_path = os.path.abspath(input_filepath)
+    stem = os.path.splitext(os.path.basename(abs_path))[0]
+    digest = hashlib.sha256(abs_path.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(artifacts_dir, f"{stem}-{digest}{BUNDLE_SUFFIX}")
+
+
+def input_fingerprint(input_filepath: str) -> Optional[Dict[str, Any]]:
+    """返回输入文件的指纹 ({"input_sha256", "input_size"})，保存在 extract 记录中；文件无法读取时返回 None。"""
+    try:
+        size = os.path.getsize(input_filepath)
+        return {"input_sha256": compute_file_sha256(input_filepath), "input_size": size}
+    except OSError as e:
+        logger.warning(f"无法读取输入文件 '{input_filepath}' 以计算指纹: {e}")
+        return None
+
+
+def open_artifact_bundle(artifacts_dir: str, input_filepath: str) -> ArtifactBundle:
+    """打开 (或新建) 输入文件对应的结果包。"""
+    return ArtifactBundle(artifact_bundle_path(artifacts_dir, input_filepath))
+
+
+# --- 阶段输出与记录之间的转换 ---
+# core_processor 在函数内导入：main.py 解析命令行参数时需要 STAGES，不应因此加载整个处理链
+
+def extract_record(document: "ExtractedDocument", structure_mode: str,
+                   fingerprint: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    local_labels = None
+    if document.local_labels is not None:
+        local_labels = [[line.label, line.text, line.confidence] for line in document.local_labels]
+    record = {"input_filepath": document.input_filepath, "file_type": document.file_type,
+              "structure_mode": structure_mode, "text": document.text, "local_labels": local_labels}
+    record.update(fingerprint or {})
+    return record
+
+
+def document_from_record(record: Dict[str, Any], input_filepath: str) -> "ExtractedDocument":
+    """由 extract 记录还原提取结果。input_filepath 使用本次运行的路径 (输入目录可能已被移动)。"""
+    from .core_processor import ExtractedDocument
+    from .hybrid_labeler import LabeledLine
+
+    local_labels = None
+    if record.get("local_labels") is not None:
+        local_labels = [LabeledLine(label, text, confidence) for label, text, confidence in record["local_labels"]]
+    return ExtractedDocument(input_filepath, record["file_type"], record.get("text"), local_labels)
+
+
+def split_record(plan: Optional["LlmWorkPlan"]) -> Dict[str, Any]:
+    if plan is None:
+        return {"plan": None}
+    return {"plan": {"chunks": list(plan.chunks), "direct": plan.direct}}
+
+
+def plan_from_record(record: Dict[str, Any]) -> Optional["LlmWorkPlan"]:
+    from .core_processor import LlmWorkPlan
+
+    plan = record.get("plan")
+    if plan is None:
+        return None
+    return LlmWorkPlan(list(plan["chunks"]), bool(plan["direct"]))
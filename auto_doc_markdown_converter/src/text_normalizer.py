@@ -0,0 +1,256 @@
+"""
+提取文本的规范化与压缩。
+
+pdfplumber 提取的文本在每个视觉行末尾都带有硬换行，英文单词会在行尾被连字符拆开，
+还夹杂着连续空格以及全角/半角字母数字混用的情况。这些噪声既浪费 token，也会干扰
+`split_text_into_chunks` 基于 `\\n{2,}` 的段落切分。
+
+本模块提供 `normalize_text`，可按配置执行以下步骤：
+- join_lines: 将被视觉换行拆开的行重新拼接成段落，段落之间以空行 (\\n\\n) 分隔；
+- dehyphenate: 去除英文单词在行尾的断字连字符；
+- collapse_whitespace: 去除行首尾空白并将连续空白压缩为单个空格；
+- unify_width: 将全角字母、数字和全角空格转换为半角 (不改变中文标点)。
+
+规范化结果附带一个可逆的偏移映射 (OffsetMap)，可将规范化文本中的任意位置映射回原始文本中的位置，
+以便后续步骤 (例如内容覆盖率检查) 定位原文。
+"""
+import re
+import bisect
+import logging
+import unicodedata
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from .text_splitter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+ALL_NORMALIZATION_STEPS = ("join_lines", "dehyphenate", "collapse_whitespace", "unify_width")
+
+# 以这些字符结尾的行被视为段落 (或句子) 的自然结束，不与下一行拼接
+_SENTENCE_END_CHARS = "。！？!?.；;：:…"
+# 以这些模式开头的行通常是标题或列表项，不并入上一行
+_BLOCK_START_PATTERN = re.compile(
+    r"^(第[一二三四五六七八九十百千零〇\d]+[章节条篇部分]|[一二三四五六七八九十]+、|[（(][一二三四五六七八九十\d]+[)）]"
+    r"|\d+(\.\d+)*[.、．\s]|[•·●○■□◆▪\-*]\s)"
+)
+# 行长度达到"典型行长"的该比例时，才认为该行是被自动换行截断的
+_WRAPPED_LINE_LENGTH_RATIO = 0.75
+
+# 全角字母、数字 (U+FF10-FF19, U+FF21-FF3A, U+FF41-FF5A) 与全角空格的半角转换表
+_WIDTH_TRANSLATION = {code: code - 0xFEE0 for code in range(0xFF10, 0xFF1A)}
+_WIDTH_TRANSLATION.update({code: code - 0xFEE0 for code in range(0xFF21, 0xFF3B)})
+_WIDTH_TRANSLATION.update({code: code - 0xFEE0 for code in range(0xFF41, 0xFF5B)})
+_WIDTH_TRANSLATION[0x3000] = 0x20
+
+
+class OffsetMap:
+    """
+    规范化文本位置到原始文本位置的分段映射。
+
+    每个分段记录 (规范化起点, 原始起点, 规范化长度, 原始长度)。两者长度相同的分段按字符一一对应；
+    长度不同的分段 (例如被压缩的空白、被替换的换行) 中的位置映射到原始分段内的对应位置并截断到分段末尾。
+    """
+
+    def __init__(self):
+        self._norm_starts: List[int] = []
+        self._segments: List[Tuple[int, int, int, int]] = []
+
+    def add(self, norm_start: int, orig_start: int, norm_length: int, orig_length: int) -> None:
+        """追加一个分段。与前一个分段首尾相接的一一对应分段会被合并，以保持映射紧凑。"""
+        if norm_length <= 0 and orig_length <= 0:
+            return
+        if self._segments:
+            prev_norm, prev_orig, prev_norm_len, prev_orig_len = self._segments[-1]
+            if (prev_norm_len == prev_orig_len and norm_length == orig_length
+                    and prev_norm + prev_norm_len == norm_start and prev_orig + prev_orig_len == orig_start):
+                self._segments[-1] = (prev_norm, prev_orig, prev_norm_len + norm_length, prev_orig_len + orig_length)
+                return
+        self._norm_starts.append(norm_start)
+        self._segments.append((norm_start, orig_start, norm_length, orig_length))
+
+    def to_original(self, norm_pos: int) -> int:
+        """将规范化文本中的位置映射为原始文本中的位置。"""
+        if not self._segments:
+            return norm_pos
+        index = bisect.bisect_right(self._norm_starts, norm_pos) - 1
+        if index < 0:
+            return self._segments[0][1]
+        norm_start, orig_start, norm_length, orig_length = self._segments[index]
+        offset = norm_pos - norm_start
+        if norm_length == orig_length:
+            return orig_start + offset
+        return orig_start + min(offset, orig_length)
+
+    def original_span(self, norm_start: int, norm_end: int) -> Tuple[int, int]:
+        """将规范化文本中的区间 [norm_start, norm_end) 映射为原始文本中的区间。"""
+        if norm_end <= norm_start:
+            position = self.to_original(norm_start)
+            return position, position
+        return self.to_original(norm_start), self.to_original(norm_end - 1) + 1
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+
+class NormalizationResult(NamedTuple):
+    """规范化结果：规范化文本、偏移映射以及规范化前后的估算 token 数。"""
+    text: str
+    offset_map: OffsetMap
+    original_tokens: int
+    normalized_tokens: int
+
+    @property
+    def token_reduction(self) -> int:
+        return self.original_tokens - self.normalized_tokens
+
+    @property
+    def token_reduction_ratio(self) -> float:
+        if self.original_tokens <= 0:
+            return 0.0
+        return self.token_reduction / self.original_tokens
+
+
+class _TextBuilder:
+    """按片段构建规范化文本，并同步记录偏移映射。"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.length = 0
+        self.offset_map = OffsetMap()
+
+    def emit(self, text: str, orig_start: int, orig_length: int) -> None:
+        if not text:
+            return
+        self.offset_map.add(self.length, orig_start, len(text), orig_length)
+        self.parts.append(text)
+        self.length += len(text)
+
+    def last_char(self) -> str:
+        return self.parts[-1][-1] if self.parts else ""
+
+    def build(self) -> str:
+        return "".join(self.parts)
+
+
+def _split_lines_with_offsets(text: str) -> List[Tuple[str, int]]:
+    """按换行符切分文本，返回 (行内容, 行首在原文中的偏移) 列表，行内容不含换行符。"""
+    lines = []
+    position = 0
+    for line in text.split("\n"):
+        lines.append((line, position))
+        position += len(line) + 1
+    return lines
+
+
+def _display_width(line: str) -> int:
+    """按显示宽度计算行长：中日韩等宽字符计为 2，其余字符计为 1，使中英文行长可比。"""
+    return sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1 for ch in line)
+
+
+def _typical_line_length(lines: Sequence[str]) -> int:
+    """估算"满行"的显示宽度：取非空行宽度的第 80 百分位，用于判断一行是否因版面宽度被截断。"""
+    lengths = sorted(_display_width(line) for line in lines if line)
+    if not lengths:
+        return 0
+    return lengths[min(len(lengths) - 1, int(len(lengths) * 0.8))]
+
+
+def _is_wrapped_line(line: str, next_line: str, typical_length: int) -> bool:
+    """判断 line 与 next_line 之间的换行是否只是视觉换行 (应拼接)，而非段落边界。"""
+    if not line or not next_line:
+        return False
+    if line[-1] in _SENTENCE_END_CHARS:
+        return False
+    if _display_width(line) < typical_length * _WRAPPED_LINE_LENGTH_RATIO:
+        return False
+    if _BLOCK_START_PATTERN.match(next_line):
+        return False
+    return True
+
+
+def _emit_line_content(builder: _TextBuilder, line: str, line_offset: int, collapse_whitespace: bool,
+                       unify_width: bool, drop_trailing_hyphen: bool) -> None:
+    """输出单行内容 (不含换行)，按需压缩空白、转换全角字符、去除行尾连字符。"""
+    content_end = len(line) - 1 if drop_trailing_hyphen else len(line)
+    for match in re.finditer(r"\s+|\S+", line[:content_end]):
+        piece = match.group(0)
+        orig_start = line_offset + match.start()
+        if piece[0].isspace() and collapse_whitespace:
+            builder.emit(" ", orig_start, len(piece))
+        else:
+            if unify_width:
+                piece = piece.translate(_WIDTH_TRANSLATION)
+            builder.emit(piece, orig_start, len(piece))
+
+
+def normalize_text(
+    text: str,
+    steps: Optional[Sequence[str]] = None,
+    model_name: Optional[str] = None,
+) -> NormalizationResult:
+    """
+    按给定步骤规范化文本。
+
+    参数:
+        text (str): 原始提取文本。
+        steps (Optional[Sequence[str]]): 要执行的步骤，取值见 ALL_NORMALIZATION_STEPS。为 None 时执行全部步骤。
+        model_name (Optional[str]): 传递给 estimate_tokens 的模型名称。
+
+    返回:
+        NormalizationResult: 规范化文本、偏移映射以及规范化前后的估算 token 数。
+    """
+    enabled = set(ALL_NORMALIZATION_STEPS if steps is None else steps)
+    unknown_steps = enabled - set(ALL_NORMALIZATION_STEPS)
+    if unknown_steps:
+        logger.warning(f"忽略未知的文本规范化步骤: {sorted(unknown_steps)}")
+    join_lines = "join_lines" in enabled
+    dehyphenate = "dehyphenate" in enabled
+    collapse_whitespace = "collapse_whitespace" in enabled
+    unify_width = "unify_width" in enabled
+
+    builder = _TextBuilder()
+    raw_lines = _split_lines_with_offsets(text)
+    # 计算每行去除首尾空白后的内容及其在原文中的起点
+    lines: List[Tuple[str, int, int]] = []  # (内容, 内容起点偏移, 行尾换行符偏移)
+    for line, line_offset in raw_lines:
+        if collapse_whitespace:
+            stripped = line.strip()
+            lead = len(line) - len(line.lstrip())
+            lines.append((stripped, line_offset + lead, line_offset + len(line)))
+        else:
+            lines.append((line, line_offset, line_offset + len(line)))
+    typical_length = _typical_line_length([content for content, _, _ in lines]) if join_lines else 0
+
+    # 行与行之间的分隔符延迟到输出下一行内容时才写入，这样空行可以把它升级为段落分隔，且末尾不会残留分隔符
+    pending_separator: Optional[Tuple[str, int, int]] = None
+    for index, (content, content_offset, newline_offset) in enumerate(lines):
+        if not content.strip():
+            if builder.length:
+                pending_separator = ("\n\n", newline_offset, 1)
+            continue
+        if pending_separator is not None:
+            builder.emit(*pending_separator)
+            pending_separator = None
+
+        next_content = lines[index + 1][0] if index + 1 < len(lines) else ""
+        wrapped = join_lines and _is_wrapped_line(content, next_content, typical_length)
+        drop_hyphen = (
+            wrapped and dehyphenate
+            and re.search(r"[A-Za-z]-$", content) is not None and next_content[:1].islower()
+        )
+        _emit_line_content(builder, content, content_offset, collapse_whitespace, unify_width, drop_hyphen)
+
+        if drop_hyphen:
+            # 断字连字符已去除，下一行直接接续，对应的换行符在映射中记为被删除
+            pending_separator = ("", newline_offset, 1)
+        elif wrapped:
+            last_char = builder.last_char()
+            joins_words = last_char.isascii() and last_char.isalnum() and next_content[:1].isascii()
+            pending_separator = (" " if joins_words else "", newline_offset, 1)
+        else:
+            pending_separator = ("\n\n" if join_lines else "\n", newline_offset, 1)
+
+    normalized = builder.build()
+    original_tokens = estimate_tokens(text, model_name=model_name)
+    normalized_tokens = estimate_tokens(normalized, model_name=model_name)
+    return NormalizationResult(normalized, builder.offset_map, original_tokens, normalized_tokens)
@@ -1,4 +1,5 @@
 import logging
+import random
 from typing import Optional, List
 import re # 用于后续的 split_text_into_chunks
 
@@ -193,39 +194,100 @@ def split_text_into_chunks(
     logger.info(f"文本成功被分割成 {len(final_chunks)} 个非空文本块。")
     return final_chunks
 
-# --- 结果合并逻辑 ---
+# --- 内容定义分块 (content-defined chunking) ---
+#
+# split_text_into_chunks 按固定的 token 预算切分文本：文档开头的一处修改会使之后所有块的边界移动，
+# 所有块的内容 (以及按内容计算的检查点/缓存键) 都随之改变。内容定义分块只在段落末尾放置边界，
+# 是否放置边界由段落末尾文本的滚动哈希 (gear hash) 决定，与该段落在文档中的位置无关。
+# 因此修改一个段落只会影响它所在的块 (边界判断发生变化时最多再影响相邻的一个块)，其余块保持不变。
+# 块的大小仍受 token 预算约束：达到最小值之前不放置边界，超过最大值时强制切分。
+# 内容定义分块不在块之间添加重叠文本 (重叠文本取决于前一个块的位置，会破坏上述性质)。
 
-def merge_processed_chunks(
-    processed_chunks: List[str],
-    original_text_chunks: Optional[List[str]] = None, 
-    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, 
-    model_name: Optional[str] = None 
-) -> str:
+_GEAR_TABLE = [random.Random(0x5EED).getrandbits(32) for _ in range(256)]
+# gear hash 每处理一个字符左移一位，32 位哈希值只取决于最后 32 个字符
+_GEAR_WINDOW_CHARS = 32
+
+
+def _gear_hash(text: str) -> int:
+    """计算文本末尾 _GEAR_WINDOW_CHARS 个字符的 gear 滚动哈希 (32 位)。"""
+    value = 0
+    for ch in text[-_GEAR_WINDOW_CHARS:]:
+        code = ord(ch)
+        value = ((value << 1) + _GEAR_TABLE[(code ^ (code >> 8)) & 0xFF]) & 0xFFFFFFFF
+    return value
+
+
+def _content_defined_units(text: str, max_tokens: int, model_name: Optional[str]) -> List[str]:
+    """将文本拆分为段落 (保留换行符)，超长段落再按句子或字符硬分割，使每个单元都不超过 max_tokens。"""
+    units: List[str] = []
+    for line in text.splitlines(keepends=True):
+        if not line.strip():
+            # 空行并入前一个段落，保持原文的段落间距
+            if units:
+                units[-1] += line
+            continue
+        if estimate_tokens(line, model_name) <= max_tokens:
+            units.append(line)
+            continue
+        for sentence in _split_text_by_sentences(line):
+            if estimate_tokens(sentence, model_name) <= max_tokens:
+                units.append(sentence)
+            else:
+                units.extend(_hard_split_segment(sentence, max_tokens, 0, model_name))
+    return units
+
+
+def split_text_into_content_defined_chunks(
+    text: str,
+    model_name: Optional[str] = None,
+    max_tokens_per_chunk: int = DEFAULT_MAX_CHUNK_TOKENS,
+    min_tokens_per_chunk: Optional[int] = None,
+    target_tokens_per_chunk: Optional[int] = None,
+) -> List[str]:
     """
-    合并由 LLM 处理后的文本块列表，尝试移除重叠部分。
-    此实现基于行比较来检测和移除重叠。
+    按内容定义的边界分割文本。
 
     参数:
-        processed_chunks: LLM 处理后的文本块列表 (带标记字符串)。
-        original_text_chunks: (当前未使用，但为未来更精确合并保留) 分割前的原始文本块。
-        overlap_tokens: 分割时设置的目标重叠 token 数，用于辅助判断。
-        model_name: (当前未使用) 模型名称。
+        text: 要分割的文本。
+        model_name: (当前未使用) 模型名称，传递给 estimate_tokens。
+        max_tokens_per_chunk: 每个块的最大 token 数，超过时强制切分。
+        min_tokens_per_chunk: 每个块的最小 token 数，默认为最大值的 1/4。
+        target_tokens_per_chunk: 期望的平均块大小，默认为最大值的 1/2。
 
     返回:
-        str: 合并后的单一 Markdown 字符串。
+        List[str]: 文本块列表，按顺序拼接即为原文 (不含重叠)。
     """
-    if not processed_chunks:
-        logger.info("没有已处理的块可供合并，返回空字符串。")
-        return ""
+    if not text.strip():
+        return []
+    min_tokens = min_tokens_per_chunk if min_tokens_per_chunk is not None else max_tokens_per_chunk // 4
+    target_tokens = target_tokens_per_chunk if target_tokens_per_chunk is not None else max_tokens_per_chunk // 2
+    # 达到最小值之后，每个段落末尾放置边界的概率与段落的 token 数成正比，
+    # 使边界之间的期望距离约为 (target - min)，与段落长度的分布无关
+    spread = max(target_tokens - min_tokens, 1)
 
-    if len(processed_chunks) == 1:
-        logger.info("只有一个块，无需合并，直接返回该块内容。")
-        return processed_chunks[0].strip()
+    chunks: List[str] = []
+    buffer: List[str] = []
+    buffer_tokens = 0
+    for unit in _content_defined_units(text, max_tokens_per_chunk, model_name):
+        unit_tokens = estimate_tokens(unit, model_name)
+        if buffer and buffer_tokens + unit_tokens > max_tokens_per_chunk:
+            chunks.append("".join(buffer))
+            buffer, buffer_tokens = [], 0
+        buffer.append(unit)
+        buffer_tokens += unit_tokens
+        if buffer_tokens >= min_tokens and _gear_hash(unit.rstrip()) < min(1.0, unit_tokens / spread) * 0x100000000:
+            chunks.append("".join(buffer))
+            buffer, buffer_tokens = [], 0
+    if buffer:
+        chunks.append("".join(buffer))
+    final_chunks = [chunk for chunk in chunks if chunk.strip()]
+    logger.info(f"文本按内容定义的边界被分割成 {len(final_chunks)} 个文本块。")
+    return final_chunks
 
-    # 第一个块直接全部接受
-    merged_lines: List[str] = processed_chunks[0].splitlines()
-    # logger.debug(f"合并：初始内容来自第一个块，包含 {len(merged_lines)} 行。")
+# --- 结果合并逻辑 ---
 
+def _overlap_check_lines(overlap_tokens: int, model_name: Optional[str]) -> int:
+    """合并时检查重叠的最大行数 (启发式)。"""
     # 定义启发式检查的行数
     avg_chars_per_line = 40  # 假设平均每行字符数 (经验值)
     avg_tokens_per_line = estimate_tokens("a" * avg_chars_per_line, model_name) 
@@ -240,25 +302,65 @@ def merge_processed_chunks(
 
     if overlap_tokens > 0 : 
         logger.debug(f"合并时将检查最多 {max_overlap_lines_heuristic} 行的重叠（基于 overlap_tokens: {overlap_tokens}）。")
+    return max_overlap_lines_heuristic
+
 
+class ChunkMerger:
+    """
+    按原始顺序逐个合并 LLM 处理后的文本块，移除相邻文本块之间的重叠行 (merge_processed_chunks 的增量版本)。
 
-    for i in range(1, len(processed_chunks)):
-        current_chunk_text = processed_chunks[i]
+    检测重叠只需要已合并结果末尾的若干行，因此只保留这些行；更早的行已不会再变化，
+    由 add 返回给调用方，内存占用与文档长度无关。
+
+    参数:
+        overlap_tokens: 分割时设置的目标重叠 token 数，用于辅助判断。
+        model_name: (当前未使用) 模型名称。
+    """
+
+    def __init__(self, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, model_name: Optional[str] = None):
+        self.max_overlap_lines = _overlap_check_lines(overlap_tokens, model_name)
+        # 重叠检测需要末尾 max_overlap_lines 行，段落分隔检查需要末尾两行
+        self._keep_lines = max(self.max_overlap_lines, 2)
+        self._tail: List[str] = []
+        self._chunk_count = 0
+
+    def add(self, processed_chunk: str) -> List[str]:
+        """合并下一个文本块，返回已确定的合并结果行 (之后的文本块不会再改变这些行)。"""
+        i = self._chunk_count
+        self._chunk_count += 1
+        if i == 0:
+            # 第一个块直接全部接受
+            self._tail = processed_chunk.splitlines()
+        else:
+            self._merge(processed_chunk, i)
+        if len(self._tail) <= self._keep_lines:
+            return []
+        released = self._tail[:-self._keep_lines]
+        self._tail = self._tail[-self._keep_lines:]
+        return released
+
+    def finish(self) -> List[str]:
+        """返回剩余的合并结果行。"""
+        remaining, self._tail = self._tail, []
+        return remaining
+
+    def _merge(self, current_chunk_text: str, i: int) -> None:
+        merged_lines = self._tail
         if not current_chunk_text.strip():
             logger.debug(f"合并：跳过第 {i+1} 个已处理块，因为它为空或仅含空白。")
-            continue
+            return
 
         current_chunk_lines = current_chunk_text.splitlines()
         if not current_chunk_lines: 
             logger.debug(f"合并：跳过第 {i+1} 个已处理块，因为它在按行分割后为空。")
-            continue
+            return
             
         if not merged_lines: 
             logger.debug(f"合并：之前的合并结果为空，直接使用第 {i+1} 个块。")
-            merged_lines = current_chunk_lines
-            continue
+            self._tail = current_chunk_lines
+            return
         
-        num_lines_to_check = min(len(merged_lines), len(current_chunk_lines), max_overlap_lines_heuristic) if max_overlap_lines_heuristic > 0 else 0
+        num_lines_to_check = min(len(merged_lines), len(current_chunk_lines), self.max_overlap_lines) if self.max_overlap_lines > 0 else 0
         
         actual_overlap_rows = 0
         if num_lines_to_check > 0:
@@ -283,7 +385,6 @@ def merge_processed_chunks(
             if non_overlapping_current_lines:
                 # 追加非重叠行
                 merged_lines.extend(non_overlapping_current_lines)
-                # logger.debug(f"  已追加 {len(non_overlapping_current_lines)} 条非重叠行。")
             # else: 当前块完全被前一个块的重叠部分覆盖，不添加任何内容
         else: # 未发现有意义的行重叠
             logger.debug(f"合并：未发现明显行重叠，直接拼接第 {i+1} 个块的行。")
@@ -297,6 +398,40 @@ def merge_processed_chunks(
                         merged_lines.append("") # 添加一个空行作为分隔
             
             merged_lines.extend(current_chunk_lines)
+
+
+def merge_processed_chunks(
+    processed_chunks: List[str],
+    original_text_chunks: Optional[List[str]] = None, 
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, 
+    model_name: Optional[str] = None 
+) -> str:
+    """
+    合并由 LLM 处理后的文本块列表，尝试移除重叠部分。
+    此实现基于行比较来检测和移除重叠 (见 ChunkMerger)。
+
+    参数:
+        processed_chunks: LLM 处理后的文本块列表 (带标记字符串)。
+        original_text_chunks: (当前未使用，但为未来更精确合并保留) 分割前的原始文本块。
+        overlap_tokens: 分割时设置的目标重叠 token 数，用于辅助判断。
+        model_name: (当前未使用) 模型名称。
+
+    返回:
+        str: 合并后的单一 Markdown 字符串。
+    """
+    if not processed_chunks:
+        logger.info("没有已处理的块可供合并，返回空字符串。")
+        return ""
+
+    if len(processed_chunks) == 1:
+        logger.info("只有一个块，无需合并，直接返回该块内容。")
+        return processed_chunks[0].strip()
+
+    merger = ChunkMerger(overlap_tokens, model_name)
+    merged_lines: List[str] = []
+    for processed_chunk in processed_chunks:
+        merged_lines.extend(merger.add(processed_chunk))
+    merged_lines.extend(merger.finish())
     
     final_text = "\n".join(merged_lines)
     # 移除首尾多余的空白，并确保最终文本以单个换行符结尾（如果非空）
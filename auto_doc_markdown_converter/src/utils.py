@@ -1,4 +1,36 @@
+import hashlib
 import logging
+import threading
+import contextlib
+from typing import BinaryIO, Iterator, Optional, Union
+
+# 当前线程正在处理的文档名称，由 document_log_context 设置，DocumentLogFilter 读取
+_log_context = threading.local()
+
+
+class DocumentLogFilter(logging.Filter):
+    """
+    为日志记录添加 document_tag 字段：当前线程正在处理某个文档时为 "[文件名] "，否则为空字符串。
+
+    批量并行处理时，多个文件的日志交错输出，通过该标签可以区分每条日志属于哪个文件。
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        document = getattr(_log_context, "document", None)
+        record.document_tag = f"[{document}] " if document else ""
+        return True
+
+
+@contextlib.contextmanager
+def document_log_context(document: Optional[str]) -> Iterator[None]:
+    """在 with 块内，当前线程输出的日志都带上 document 标签。可以嵌套，退出时恢复之前的标签。"""
+    previous = getattr(_log_context, "document", None)
+    _log_context.document = document
+    try:
+        yield
+    finally:
+        _log_context.document = previous
+
 
 def setup_logging(level=logging.INFO):
     """
@@ -21,8 +53,51 @@ def setup_logging(level=logging.INFO):
     # 如果没有其他配置，这将是唯一的处理器
     logging.basicConfig(
         level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        format='%(asctime)s - %(name)s - %(levelname)s - %(document_tag)s%(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
+    # 为处理器添加文档标签过滤器，使格式中的 document_tag 字段总是存在
+    for handler in root_logger.handlers:
+        handler.addFilter(DocumentLogFilter())
     
     logging.info("日志记录已通过 setup_logging 初始化。")
+
+
+def compute_file_sha256(filepath: str, block_size: int = 1024 * 1024) -> str:
+    """
+    以流式分块读取的方式计算文件内容的 SHA-256 摘要。
+
+    Args:
+        filepath: 文件路径。
+        block_size: 每次读取的字节数，避免一次性将大文件读入内存。
+
+    Returns:
+        十六进制格式的 SHA-256 摘要字符串。
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compute_content_sha256(content: Union[bytes, bytearray, memoryview, BinaryIO], block_size: int = 1024 * 1024) -> str:
+    """
+    计算内存中文档内容的 SHA-256 摘要。
+
+    Args:
+        content: 字节串，或以二进制模式打开、可随机访问的文件对象。文件对象从头读取，
+            计算完成后读取位置重置到开头，以便之后交给提取器。
+        block_size: 读取文件对象时每次读取的字节数。
+
+    Returns:
+        十六进制格式的 SHA-256 摘要字符串。
+    """
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(content).hexdigest()
+    digest = hashlib.sha256()
+    content.seek(0)
+    for block in iter(lambda: content.read(block_size), b""):
+        digest.update(block)
+    content.seek(0)
+    return digest.hexdigest()
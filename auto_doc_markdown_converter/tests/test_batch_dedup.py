@@ -0,0 +1,144 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import logging
+from unittest.mock import patch
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import batch_dedup, core_processor
+from auto_doc_markdown_converter.src.batch_dedup import DuplicateDetector
+from auto_doc_markdown_converter.src.core_processor import ExtractedDocument
+from auto_doc_markdown_converter.src.pipeline import DocumentPipeline
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+class DedupTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="batch_dedup_test_")
+        self.input_dir = os.path.join(self.root, "in")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write_input(self, relative_path, content):
+        path = os.path.join(self.input_dir, *relative_path.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+
+class TestDuplicateDetector(DedupTestCase):
+
+    def test_identical_files_map_to_first_occurrence(self):
+        first = self.write_input("a/report.pdf", b"%PDF same content")
+        copy = self.write_input("b/report.pdf", b"%PDF same content")
+        other = self.write_input("c/other.pdf", b"%PDF diff content")  # 大小相同，内容不同
+        detector = DuplicateDetector()
+        self.assertIsNone(detector.find_original(first))
+        self.assertEqual(detector.find_original(copy), first)
+        self.assertIsNone(detector.find_original(other))
+        self.assertEqual(detector.find_original(self.write_input("d/third.pdf", b"%PDF diff content")), other)
+
+    def test_files_with_unique_sizes_are_not_hashed(self):
+        paths = [self.write_input(f"f{i}.pdf", b"x" * (i + 1)) for i in range(5)]
+        detector = DuplicateDetector()
+        with patch.object(batch_dedup, "compute_file_sha256") as mock_hash:
+            self.assertEqual([detector.find_original(path) for path in paths], [None] * 5)
+            mock_hash.assert_not_called()
+        self.assertEqual(detector.files_hashed, 0)
+
+        # 出现大小相同的文件时，两个文件各计算一次摘要
+        detector.find_original(self.write_input("g.pdf", b"y"))
+        detector.find_original(self.write_input("h.pdf", b"z"))
+        self.assertEqual(detector.files_hashed, 3)
+
+    def test_different_extensions_are_never_duplicates(self):
+        docx = self.write_input("same.docx", b"identical bytes")
+        pdf = self.write_input("same.pdf", b"identical bytes")
+        detector = DuplicateDetector()
+        self.assertIsNone(detector.find_original(docx))
+        self.assertIsNone(detector.find_original(pdf))
+
+    def test_unreadable_files_are_treated_as_unique(self):
+        detector = DuplicateDetector()
+        self.assertIsNone(detector.find_original(os.path.join(self.input_dir, "missing.pdf")))
+        self.assertIsNone(detector.find_original(os.path.join(self.input_dir, "missing.pdf")))
+
+
+class TestPipelineDeduplication(DedupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.results_dir = os.path.join(self.root, "out")
+        self.extracted = []
+
+        def extract(path, mode=None):
+            self.extracted.append(path)
+            with open(path, encoding="utf-8") as f:
+                return ExtractedDocument(path, "docx", f.read())
+
+        for patcher in (
+            patch.object(core_processor, "extract_document", side_effect=extract),
+            patch.object(core_processor, "analyze_text_with_llm", side_effect=lambda text: f"P: {text}"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_pipeline(self, paths, **options):
+        return DocumentPipeline(self.results_dir, structure_mode="llm", use_processes=False, llm_workers=2,
+                                input_root=self.input_dir, **options).run(paths)
+
+    def test_duplicates_reuse_representative_output(self):
+        paths = [
+            self.write_input("2023/contract.docx", "合同正文".encode("utf-8")),
+            self.write_input("memo.docx", "备忘录".encode("utf-8")),
+            self.write_input("2024/contract.docx", "合同正文".encode("utf-8")),
+            self.write_input("2024/copy/contract-copy.docx", "合同正文".encode("utf-8")),
+        ]
+        report = self.run_pipeline(paths)
+
+        self.assertEqual(self.extracted, paths[:2])
+        self.assertEqual([result.duplicate_of for result in report.results], [None, None, paths[0], paths[0]])
+        expected_outputs = [os.path.join(self.results_dir, "2023", "contract.md"),
+                            os.path.join(self.results_dir, "memo.md"),
+                            os.path.join(self.results_dir, "2024", "contract.md"),
+                            os.path.join(self.results_dir, "2024", "copy", "contract-copy.md")]
+        self.assertEqual([result.output_path for result in report.results], expected_outputs)
+        with open(expected_outputs[0], encoding="utf-8") as f:
+            original = f.read()
+        for output_path in expected_outputs[2:]:
+            with open(output_path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), original)
+
+        summary = report.deduplication
+        self.assertEqual(summary.duplicates, 2)
+        self.assertEqual(summary.tokens_saved, 2 * report.results[0].tokens)
+        self.assertGreater(summary.tokens_saved, 0)
+        self.assertEqual(summary.files_hashed, 3)
+
+    def test_duplicates_of_failed_document_fail(self):
+        paths = [self.write_input("a.docx", b"bad"), self.write_input("b.docx", b"bad")]
+        with patch.object(core_processor, "analyze_text_with_llm", return_value=None):
+            report = self.run_pipeline(paths)
+        self.assertEqual([result.output_path for result in report.results], [None, None])
+        self.assertEqual(report.deduplication.duplicates, 0)
+
+    def test_deduplication_can_be_disabled(self):
+        paths = [self.write_input("a.docx", b"same"), self.write_input("b.docx", b"same")]
+        report = self.run_pipeline(paths, deduplicate=False)
+        self.assertEqual(self.extracted, paths)
+        self.assertIsNone(report.deduplication)
+
+
+if __name__ == '__main__':
+    unittest.main()
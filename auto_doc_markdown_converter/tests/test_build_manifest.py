@@ -0,0 +1,179 @@
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+import logging
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src.build_manifest import (
+    BuildManifest, MANIFEST_FILENAME, conversion_settings, settings_digest,
+)
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SAMPLE_DOCX = os.path.join(os.path.dirname(__file__), "fixtures", "sample.docx")
+
+
+class TestBuildManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="manifest_test_")
+        self.input_dir = os.path.join(self.root, "input")
+        self.output_dir = os.path.join(self.root, "output")
+        os.makedirs(self.input_dir)
+        os.makedirs(self.output_dir)
+        self.settings = conversion_settings("llm")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write_input(self, name, content):
+        path = os.path.join(self.input_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def convert(self, manifest, input_path):
+        """模拟一次成功的转换：写出输出文件并记录到清单。"""
+        output_path = os.path.join(self.output_dir, os.path.splitext(os.path.basename(input_path))[0] + ".md")
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("# converted")
+        manifest.record(input_path, output_path)
+        return output_path
+
+    def test_unchanged_file_is_up_to_date_after_reload(self):
+        path = self.write_input("a.docx", b"content")
+        manifest = BuildManifest(self.output_dir, self.settings)
+        self.assertFalse(manifest.is_up_to_date(path))
+        self.convert(manifest, path)
+        manifest.save()
+
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, MANIFEST_FILENAME)))
+        self.assertTrue(BuildManifest(self.output_dir, self.settings).is_up_to_date(path))
+
+    def test_content_change_requires_reconversion(self):
+        path = self.write_input("a.docx", b"content")
+        manifest = BuildManifest(self.output_dir, self.settings)
+        self.convert(manifest, path)
+        self.write_input("a.docx", b"changed content")
+        self.assertFalse(manifest.is_up_to_date(path))
+
+    def test_touched_file_with_same_content_is_up_to_date(self):
+        path = self.write_input("a.docx", b"content")
+        manifest = BuildManifest(self.output_dir, self.settings)
+        self.convert(manifest, path)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertTrue(manifest.is_up_to_date(path))
+
+    def test_settings_change_requires_reconversion(self):
+        path = self.write_input("a.docx", b"content")
+        manifest = BuildManifest(self.output_dir, self.settings)
+        self.convert(manifest, path)
+        manifest.save()
+
+        changed = dict(self.settings, model="another-model")
+        self.assertNotEqual(settings_digest(changed), settings_digest(self.settings))
+        self.assertFalse(BuildManifest(self.output_dir, changed).is_up_to_date(path))
+        self.assertFalse(BuildManifest(self.output_dir, conversion_settings("outline")).is_up_to_date(path))
+
+    def test_missing_output_requires_reconversion(self):
+        path = self.write_input("a.docx", b"content")
+        manifest = BuildManifest(self.output_dir, self.settings)
+        os.remove(self.convert(manifest, path))
+        self.assertFalse(manifest.is_up_to_date(path))
+
+    def test_forget_removes_entry(self):
+        path = self.write_input("a.docx", b"content")
+        manifest = BuildManifest(self.output_dir, self.settings)
+        self.convert(manifest, path)
+        manifest.forget(path)
+        self.assertFalse(manifest.is_up_to_date(path))
+
+    def test_orphaned_outputs_are_removed_only_under_input_root(self):
+        kept = self.write_input("kept.docx", b"1")
+        deleted = self.write_input("deleted.docx", b"2")
+        other_root = os.path.join(self.root, "other")
+        os.makedirs(other_root)
+        other = os.path.join(other_root, "other.docx")
+        with open(other, "wb") as f:
+            f.write(b"3")
+
+        manifest = BuildManifest(self.output_dir, self.settings)
+        kept_output = self.convert(manifest, kept)
+        deleted_output = self.convert(manifest, deleted)
+        other_output = self.convert(manifest, other)
+        os.remove(deleted)
+
+        removed = manifest.remove_orphans(self.input_dir)
+        self.assertEqual(removed, [os.path.abspath(deleted_output)])
+        self.assertFalse(os.path.exists(deleted_output))
+        self.assertTrue(os.path.exists(kept_output))
+        self.assertTrue(os.path.exists(other_output))
+        self.assertTrue(manifest.is_up_to_date(other))
+
+    def test_existing_inputs_outside_current_filters_are_kept(self):
+        kept = self.write_input("kept.docx", b"1")
+        manifest = BuildManifest(self.output_dir, self.settings)
+        kept_output = self.convert(manifest, kept)
+        self.assertEqual(manifest.remove_orphans(self.input_dir), [])
+        self.assertTrue(os.path.exists(kept_output))
+        self.assertTrue(manifest.is_up_to_date(kept))
+
+    def test_corrupt_manifest_is_ignored(self):
+        with open(os.path.join(self.output_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+            f.write("{not json")
+        path = self.write_input("a.docx", b"content")
+        self.assertFalse(BuildManifest(self.output_dir, self.settings).is_up_to_date(path))
+
+
+
+class TestIncrementalRuns(unittest.TestCase):
+    """在子进程中运行 main.py --incremental ("rules" 模式，不调用 LLM)。"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="manifest_main_test_")
+        self.input_dir = os.path.join(self.root, "input")
+        self.output_dir = os.path.join(self.root, "output")
+        os.makedirs(self.input_dir)
+        for name in ("report.docx", "draft.docx"):
+            shutil.copy(SAMPLE_DOCX, os.path.join(self.input_dir, name))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def run_main(self, *extra_args):
+        env = dict(os.environ, LLM_API_KEY="test-key", LLM_API_ENDPOINT="http://127.0.0.1:9",
+                   CHUNK_CHECKPOINT_DIR=os.path.join(self.root, "checkpoints"),
+                   EXTRACTION_CACHE_DIR=os.path.join(self.root, "extraction_cache"))
+        completed = subprocess.run([sys.executable, "main.py", self.input_dir, self.output_dir, "--incremental",
+                                    "--structure-mode", "rules", *extra_args],
+                                   cwd=PACKAGE_DIR, env=env, capture_output=True, text=True, timeout=120)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+
+    def test_changing_exclude_keeps_earlier_outputs(self):
+        self.run_main()
+        draft_output = os.path.join(self.output_dir, "draft.md")
+        self.assertTrue(os.path.exists(draft_output))
+
+        self.run_main("--exclude", "draft*")
+        self.assertTrue(os.path.exists(draft_output))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "report.md")))
+
+        # 输入文件被删除后，其输出在下一次增量运行时才被删除
+        os.remove(os.path.join(self.input_dir, "draft.docx"))
+        self.run_main()
+        self.assertFalse(os.path.exists(draft_output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import logging
+from unittest.mock import patch
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import config, core_processor
+from auto_doc_markdown_converter.src.chunk_checkpoint import ChunkCheckpoint, chunk_key, open_chunk_checkpoint
+from auto_doc_markdown_converter.src.core_processor import ExtractedDocument, LlmWorkPlan
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+class TestChunkCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.checkpoint_dir = tempfile.mkdtemp(prefix="checkpoint_test_")
+        self.path = os.path.join(self.checkpoint_dir, "doc.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+
+    def test_results_survive_reload(self):
+        checkpoint = ChunkCheckpoint(self.path)
+        checkpoint.put("第一块", "P: 第一块")
+        checkpoint.put("第二块", "H1: 第二块")
+
+        reloaded = ChunkCheckpoint(self.path)
+        self.assertEqual(len(reloaded), 2)
+        self.assertEqual(reloaded.get("第一块"), "P: 第一块")
+        self.assertEqual(reloaded.get("第二块"), "H1: 第二块")
+        self.assertIsNone(reloaded.get("第三块"))
+
+    def test_truncated_last_line_is_skipped(self):
+        ChunkCheckpoint(self.path).put("第一块", "P: 第一块")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"key": "abc", "res')
+        reloaded = ChunkCheckpoint(self.path)
+        self.assertEqual(len(reloaded), 1)
+        self.assertEqual(reloaded.get("第一块"), "P: 第一块")
+
+    def test_model_change_invalidates_results(self):
+        ChunkCheckpoint(self.path).put("第一块", "P: 第一块")
+        original_key = chunk_key("第一块")
+        with patch.object(config, "LLM_MODEL_ID", "another-model"):
+            self.assertNotEqual(chunk_key("第一块"), original_key)
+            self.assertIsNone(ChunkCheckpoint(self.path).get("第一块"))
+
+    def test_discard_removes_file(self):
+        checkpoint = ChunkCheckpoint(self.path)
+        checkpoint.put("第一块", "P: 第一块")
+        checkpoint.discard()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(checkpoint.get("第一块"))
+
+    def test_open_respects_configuration(self):
+        with patch.object(config, "CHUNK_CHECKPOINT_DIR", self.checkpoint_dir), \
+                patch.object(config, "CHUNK_CHECKPOINT_ENABLED", True):
+            checkpoint = open_chunk_checkpoint("/in/doc.pdf")
+            self.assertEqual(os.path.dirname(checkpoint.path), self.checkpoint_dir)
+            self.assertEqual(open_chunk_checkpoint("/in/doc.pdf").path, checkpoint.path)
+            self.assertNotEqual(open_chunk_checkpoint("/in/other.pdf").path, checkpoint.path)
+            # 内存中的文档按内容摘要命名，与名称无关
+            in_memory = open_chunk_checkpoint("report.pdf", "a" * 64)
+            self.assertEqual(open_chunk_checkpoint("other.pdf", "a" * 64).path, in_memory.path)
+            self.assertNotEqual(open_chunk_checkpoint("report.pdf", "b" * 64).path, in_memory.path)
+        with patch.object(config, "CHUNK_CHECKPOINT_ENABLED", False):
+            self.assertIsNone(open_chunk_checkpoint("/in/doc.pdf"))
+
+
+class TestChunkedLabelingWithCheckpoint(unittest.TestCase):
+    """core_processor 分块处理：逐块保存结果、只重试失败的文本块、中断后从检查点继续。"""
+
+    CHUNKS = ["第一块内容", "第二块内容", "第三块内容"]
+
+    def setUp(self):
+        self.checkpoint_dir = tempfile.mkdtemp(prefix="checkpoint_test_")
+        self.calls = []
+        self.failures = {}
+        for patcher in (
+            patch.object(config, "CHUNK_CHECKPOINT_DIR", self.checkpoint_dir),
+            patch.object(config, "CHUNK_CHECKPOINT_ENABLED", True),
+            patch.object(core_processor, "split_text_for_llm", return_value=LlmWorkPlan(self.CHUNKS, direct=False)),
+            patch.object(core_processor, "analyze_text_with_llm", side_effect=self.fake_analyze),
+            patch.object(core_processor, "merge_processed_chunks", side_effect=lambda chunks, *a, **k: "\n".join(chunks)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+
+    def fake_analyze(self, chunk):
+        self.calls.append(chunk)
+        if self.failures.get(chunk, 0) > 0:
+            self.failures[chunk] -= 1
+            return None
+        return f"P: {chunk}"
+
+    def label(self, attempts):
+        with patch.object(core_processor, "LLM_CHUNK_MAX_ATTEMPTS", attempts):
+            return core_processor._label_text_with_llm("全文", "/in/long.pdf", None)
+
+    def test_failed_chunk_is_retried_without_resending_others(self):
+        self.failures = {"第二块内容": 2}
+        result = self.label(attempts=3)
+
+        self.assertEqual(result, "P: 第一块内容\nP: 第二块内容\nP: 第三块内容")
+        self.assertEqual(self.calls.count("第一块内容"), 1)
+        self.assertEqual(self.calls.count("第三块内容"), 1)
+        self.assertEqual(self.calls.count("第二块内容"), 3)
+        # 成功后检查点被删除
+        self.assertEqual(os.listdir(self.checkpoint_dir), [])
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        self.failures = {"第二块内容": 1}
+        self.assertIsNone(self.label(attempts=1))
+        self.assertEqual(len(os.listdir(self.checkpoint_dir)), 1)
+
+        self.calls.clear()
+        result = self.label(attempts=1)
+        self.assertEqual(self.calls, ["第二块内容"])
+        self.assertEqual(result, "P: 第一块内容\nP: 第二块内容\nP: 第三块内容")
+        self.assertEqual(os.listdir(self.checkpoint_dir), [])
+
+    def test_in_memory_documents_with_same_name_use_separate_checkpoints(self):
+        self.failures = {"第二块内容": 1}
+        with patch.object(core_processor, "extract_document",
+                          side_effect=lambda name, mode=None, content=None, file_type=None: ExtractedDocument(name, "pdf", "全文")), \
+                patch.object(core_processor, "_llm_credentials_configured", return_value=True), \
+                patch.object(core_processor, "LLM_CHUNK_MAX_ATTEMPTS", 1):
+            self.assertIsNone(core_processor.convert_to_markdown(b"%PDF first", name="report.pdf", structure_mode="llm"))
+            self.calls.clear()
+            self.assertIsNotNone(core_processor.convert_to_markdown(b"%PDF second", name="report.pdf", structure_mode="llm"))
+        # 第二个文档不复用第一个文档的结果，成功后也只删除自己的检查点
+        self.assertEqual(self.calls, self.CHUNKS)
+        self.assertEqual(len(os.listdir(self.checkpoint_dir)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+import os
+import sys
+import time
+import threading
+import unittest
+import logging
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src.chunk_scheduler import ChunkScheduler, llm_request_workers
+from auto_doc_markdown_converter.src.hybrid_labeler import LabeledLine, REGION_MERGE_GAP, resolve_uncertain_lines
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+class TestChunkScheduler(unittest.TestCase):
+
+    def make_scheduler(self, workers, policy):
+        scheduler = ChunkScheduler(workers, policy)
+        self.addCleanup(scheduler.shutdown)
+        return scheduler
+
+    def submit_blocker(self, scheduler):
+        """提交一个占住唯一工作线程的文档，使后续提交的文档都在队列中等待调度。"""
+        gate = threading.Event()
+        started = threading.Event()
+
+        def block(_):
+            started.set()
+            gate.wait(5)
+            return "blocker"
+
+        handle = scheduler.submit_document(["x"], block, name="blocker")
+        started.wait(5)
+        return gate, handle
+
+    def record_order(self, scheduler, documents, **submit_options):
+        calls = []
+        lock = threading.Lock()
+
+        def analyze(chunk):
+            with lock:
+                calls.append(chunk)
+            return chunk
+
+        gate, blocker = self.submit_blocker(scheduler)
+        handles = [scheduler.submit_document(chunks, analyze, name=name, **submit_options.get(name, {}))
+                   for name, chunks in documents]
+        gate.set()
+        for handle in [blocker] + handles:
+            handle.wait(5)
+        return calls
+
+    def test_shortest_first_policy(self):
+        scheduler = self.make_scheduler(1, "shortest_first")
+        calls = self.record_order(scheduler, [
+            ("long", ["long-1" * 50, "long-2" * 50]),
+            ("short", ["short"]),
+            ("medium", ["medium" * 5]),
+        ])
+        self.assertEqual(calls, ["short", "medium" * 5, "long-1" * 50, "long-2" * 50])
+
+    def test_deadline_policy(self):
+        scheduler = self.make_scheduler(1, "deadline")
+        now = time.perf_counter()
+        calls = self.record_order(scheduler, [
+            ("no_deadline", ["a"]),
+            ("late", ["b"]),
+            ("early", ["c1", "c2"]),
+        ], late={"deadline": now + 60}, early={"deadline": now + 10})
+        self.assertEqual(calls, ["c1", "c2", "b", "a"])
+
+    def test_fifo_policy(self):
+        scheduler = self.make_scheduler(1, "fifo")
+        calls = self.record_order(scheduler, [("first", ["aaaaaaaa", "bbbbbbbb"]), ("second", ["c"])])
+        self.assertEqual(calls, ["aaaaaaaa", "bbbbbbbb", "c"])
+
+    def test_all_workers_stay_busy_across_documents(self):
+        scheduler = self.make_scheduler(3, "fifo")
+        active = [0]
+        peak = [0]
+        lock = threading.Lock()
+
+        def analyze(chunk):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return chunk
+
+        # 十个只有一个文本块的小文档，按文档各自建线程池时一次只有一个请求
+        handles = [scheduler.submit_document([f"doc{i}"], analyze) for i in range(10)]
+        for handle in handles:
+            self.assertEqual(len(handle.wait(5)), 1)
+        self.assertEqual(peak[0], 3)
+
+    def test_documents_are_reported_as_soon_as_they_finish(self):
+        scheduler = self.make_scheduler(2, "fifo")
+        completed = []
+        release_long = threading.Event()
+
+        def analyze(chunk):
+            if chunk == "slow":
+                release_long.wait(5)
+            return chunk.upper()
+
+        long_doc = scheduler.submit_document(["slow", "tail"], analyze, name="long", on_complete=completed.append)
+        short_doc = scheduler.submit_document(["quick"], analyze, name="short", on_complete=completed.append)
+
+        self.assertEqual(short_doc.wait(5), ["QUICK"])
+        self.assertEqual(completed, [short_doc])
+        self.assertFalse(long_doc.done())
+        release_long.set()
+        self.assertEqual(long_doc.wait(5), ["SLOW", "TAIL"])
+        self.assertEqual(completed, [short_doc, long_doc])
+
+    def test_failed_chunk_skips_rest_of_document(self):
+        scheduler = self.make_scheduler(1, "fifo")
+        calls = []
+
+        def analyze(chunk):
+            calls.append(chunk)
+            if chunk == "bad":
+                raise RuntimeError("boom")
+            return chunk
+
+        failed = scheduler.submit_document(["ok", "bad", "skipped"], analyze)
+        healthy = scheduler.submit_document(["other"], analyze)
+        self.assertIsNone(failed.wait(5))
+        self.assertTrue(failed.failed)
+        self.assertEqual(healthy.wait(5), ["other"])
+        self.assertNotIn("skipped", calls)
+
+    def test_failed_chunk_is_retried(self):
+        scheduler = ChunkScheduler(1, "fifo", max_attempts=3)
+        self.addCleanup(scheduler.shutdown)
+        failures = {"flaky": 2}
+        calls = []
+
+        def analyze(chunk):
+            calls.append(chunk)
+            if failures.get(chunk, 0) > 0:
+                failures[chunk] -= 1
+                return None
+            return chunk
+
+        handle = scheduler.submit_document(["ok", "flaky"], analyze)
+        self.assertEqual(handle.wait(5), ["ok", "flaky"])
+        self.assertEqual(calls.count("ok"), 1)
+        self.assertEqual(calls.count("flaky"), 3)
+
+        failures["broken"] = 10
+        self.assertIsNone(scheduler.submit_document(["broken"], analyze).wait(5))
+        self.assertEqual(calls.count("broken"), 3)
+
+    def test_empty_document_completes_immediately(self):
+        scheduler = self.make_scheduler(1, "fifo")
+        completed = []
+        handle = scheduler.submit_document([], str, on_complete=completed.append)
+        self.assertTrue(handle.done())
+        self.assertEqual(handle.wait(0), [])
+        self.assertEqual(completed, [handle])
+
+    def test_llm_requests_inside_a_task_are_serial(self):
+        """整个文档作为一个任务时，任务内的 LLM 请求不能超出全局并发上限 (工作线程数)。"""
+        self.assertEqual(llm_request_workers(5), 5)
+        # 每个文档有 4 个互不相邻的低置信度区域，在调度器之外会并发请求
+        lines = []
+        for region in range(4):
+            lines.append(LabeledLine("P", f"不确定的行 {region}", 0.1))
+            lines.extend(LabeledLine("P", f"正文 {region}-{i}", 1.0) for i in range(REGION_MERGE_GAP + 1))
+        in_flight = [0]
+        peak = [0]
+        lock = threading.Lock()
+
+        def analyzer(text):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return f"H2: {text}"
+
+        def label_document(document_lines):
+            self.assertEqual(llm_request_workers(5), 1)
+            return resolve_uncertain_lines(document_lines, 0.5, analyzer)
+
+        scheduler = self.make_scheduler(2, "fifo")
+        handles = [scheduler.submit_document([lines], label_document, name=f"doc{i}") for i in range(3)]
+        for handle in handles:
+            results = handle.wait(5)
+            self.assertIsNotNone(results)
+            self.assertEqual(sum(line.label == "H2" for line in results[0]), 4)
+        self.assertEqual(peak[0], 2)
+
+    def test_unknown_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ChunkScheduler(1, "random")
+
+
+if __name__ == '__main__':
+    unittest.main()
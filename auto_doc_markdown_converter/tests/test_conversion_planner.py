@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import logging
+from unittest.mock import patch
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import core_processor, llm_latency
+from auto_doc_markdown_converter.src.core_processor import ExtractedDocument, LlmRequest, LlmWorkPlan
+from auto_doc_markdown_converter.src.conversion_planner import (
+    estimate_request_tokens, load_price_table, plan_conversion, price_for_model,
+)
+from auto_doc_markdown_converter.src.hybrid_labeler import LabeledLine
+from auto_doc_markdown_converter.src.llm_latency import LatencyModel, LatencySample, fit_latency_model
+from auto_doc_markdown_converter.src.rule_engine import RuleEngineResult
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+class TestRequestEstimates(unittest.TestCase):
+
+    def test_structure_request_output_echoes_labeled_lines(self):
+        text = "第一章 总则\n\n" + "正文内容。" * 20
+        input_tokens, output_tokens = estimate_request_tokens(LlmRequest("structure", text))
+        self.assertGreater(input_tokens, len(text) // 2)
+        self.assertGreaterEqual(output_tokens, len(text) // 2)
+
+    def test_outline_request_output_is_one_short_line_per_candidate(self):
+        text = "[3] 第一章 总则\n    … 正文片段\n[10] 第二章 范围"
+        _, output_tokens = estimate_request_tokens(LlmRequest("outline", text))
+        self.assertEqual(output_tokens, len("3: H2\n10: H2") // 2)
+
+    def test_price_table_overrides(self):
+        self.assertEqual(price_for_model(load_price_table(), "qwen-plus").currency, "CNY")
+        table = load_price_table('{"currency": "USD", "my-model": {"input": 1, "output": 4}}')
+        price = price_for_model(table, "my-model")
+        self.assertEqual(price.cost(1_000_000, 500_000), 3.0)
+        self.assertEqual(price.currency, "USD")
+        self.assertIsNone(price_for_model(table, "unknown-model"))
+
+        directory = tempfile.mkdtemp(prefix="price_table_test_")
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, "prices.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"qwen-plus": {"input": 0, "output": 0}}, f)
+        self.assertEqual(price_for_model(load_price_table(path), "qwen-plus").cost(10, 10), 0.0)
+        with self.assertRaises(ValueError):
+            load_price_table("not json")
+
+
+class TestPlanLlmRequests(unittest.TestCase):
+
+    def test_confident_rules_need_no_requests(self):
+        document = ExtractedDocument("/in/a.docx", "docx", "第一条 总则\n正文")
+        confident = RuleEngineResult([LabeledLine("H1", "第一条 总则", 1.0), LabeledLine("P", "正文", 1.0)], 1.0)
+        with patch.object(core_processor, "get_rule_engine") as mock_engine, \
+                patch.object(core_processor, "analyze_text_with_llm") as mock_llm:
+            mock_engine.return_value.classify.return_value = confident
+            self.assertEqual(core_processor.plan_llm_requests(document, "rules"), [])
+            mock_engine.return_value.classify.return_value = confident._replace(confidence=0.1)
+            self.assertEqual(core_processor.plan_llm_requests(document, "rules"),
+                             [LlmRequest("structure", document.text)])
+            mock_llm.assert_not_called()
+
+    def test_layout_requests_cover_only_uncertain_regions(self):
+        labels = [LabeledLine("H1", "标题", 0.95), LabeledLine("P", "不确定的行", 0.2), LabeledLine("P", "正文", 0.99)]
+        document = ExtractedDocument("/in/a.pdf", "pdf", None, labels)
+        self.assertEqual(core_processor.plan_llm_requests(document, "layout"), [LlmRequest("structure", "不确定的行")])
+
+
+class TestPlanConversion(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="planner_test_")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write_input(self, name, content):
+        path = os.path.join(self.root, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_plan_counts_chunks_costs_and_time_without_llm_calls(self):
+        paths = [self.write_input("long.docx", b"long"), self.write_input("short.docx", b"short"),
+                 self.write_input("broken.docx", b"broken"), self.write_input("copy.docx", b"short")]
+
+        def extract(path, mode=None):
+            name = os.path.basename(path)
+            return None if name == "broken.docx" else ExtractedDocument(path, "docx", name)
+
+        def split(text, path, model):
+            count = 3 if text == "long.docx" else 1
+            return LlmWorkPlan([f"文本块内容 {i}" * 50 for i in range(count)], count == 1)
+
+        latency = LatencyModel(1.0, 0.01, 10)
+        with patch.object(core_processor, "extract_document", side_effect=extract), \
+                patch.object(core_processor, "split_text_for_llm", side_effect=split), \
+                patch.object(core_processor, "analyze_text_with_llm") as mock_llm:
+            plan = plan_conversion(iter(paths), structure_mode="llm", extract_workers=2, llm_concurrency=2,
+                                   price_table=load_price_table(), latency=latency, use_processes=False)
+            mock_llm.assert_not_called()
+
+        long_plan, short_plan, broken_plan, copy_plan = plan.files
+        self.assertEqual([file_plan.input_filepath for file_plan in plan.files], paths)
+        self.assertEqual((long_plan.requests, short_plan.requests), (3, 1))
+        self.assertEqual(long_plan.input_tokens, 3 * short_plan.input_tokens)
+        self.assertEqual(broken_plan.error, "提取失败")
+        self.assertEqual((copy_plan.duplicate_of, copy_plan.requests), (paths[1], 0))
+
+        price = price_for_model(load_price_table(), plan.model)
+        self.assertAlmostEqual(plan.total_cost(), price.cost(plan.total("input_tokens"), plan.total("output_tokens")))
+        request_seconds = latency.request_seconds(short_plan.output_tokens)
+        self.assertAlmostEqual(plan.llm_wall_seconds(), 4 * request_seconds / 2)
+
+        data = json.loads(json.dumps(plan.to_dict()))
+        self.assertEqual(data["totals"]["requests"], 4)
+        self.assertEqual(data["totals"]["duplicate_files"], 1)
+        self.assertIn("合计 (4 个文件)", plan.format_report(self.root))
+
+
+class TestLatencyModel(unittest.TestCase):
+
+    def test_fit_recovers_linear_latency(self):
+        samples = [LatencySample(1.5 + 0.02 * tokens, 100, tokens) for tokens in (100, 400, 1000, 2500)]
+        model = fit_latency_model(samples)
+        self.assertAlmostEqual(model.base_seconds, 1.5)
+        self.assertAlmostEqual(model.seconds_per_output_token, 0.02)
+        self.assertEqual(model.samples, 4)
+        self.assertEqual(fit_latency_model([]).samples, 0)
+
+    def test_recorded_samples_are_saved_and_loaded(self):
+        directory = tempfile.mkdtemp(prefix="latency_test_")
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, "latency.json")
+        with patch.object(llm_latency, "_recorded", []):
+            llm_latency.record_llm_call(3.0, 500, 100)
+            llm_latency.record_llm_call(5.0, 500, 200)
+            self.assertEqual(llm_latency.save_latency_samples(path), 2)
+            self.assertEqual(llm_latency.recorded_samples(), [])
+            model = llm_latency.load_latency_model(path)
+        self.assertEqual(model.samples, 2)
+        self.assertAlmostEqual(model.request_seconds(300), 7.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import logging
+from unittest.mock import MagicMock, patch
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import core_processor
+from auto_doc_markdown_converter.src.core_processor import ExtractedDocument, LlmWorkPlan
+from auto_doc_markdown_converter.src.coverage_checker import (
+    DocumentCoverage, check_coverage, ensure_coverage, repair_labeled_line,
+)
+from auto_doc_markdown_converter.src.pipeline import DocumentPipeline
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+SOURCE = "\n".join([
+    "第一章 总则",
+    "为规范公司合同管理，防范合同风险，维护公司合法权益，根据国家有关法律法规制定本办法。",
+    "本办法适用于公司所有部门签订的各类经济合同，包括采购合同、销售合同和服务合同。",
+    "第二章 职责",
+    "法务部负责合同的审核、备案与归档，并定期组织合同管理培训。",
+])
+
+FULL_OUTPUT = "\n".join([
+    "H1: 第一章 总则",
+    "P: 为规范公司合同管理，防范合同风险，维护公司合法权益，根据国家有关法律法规制定本办法。",
+    "P: 本办法适用于公司所有部门签订的各类经济合同，包括采购合同、销售合同和服务合同。",
+    "H1: 第二章 职责",
+    "P: 法务部负责合同的审核、备案与归档，并定期组织合同管理培训。",
+])
+
+
+class TestRepairLabeledLine(unittest.TestCase):
+
+    def test_repairs_unambiguous_labels(self):
+        self.assertEqual(repair_labeled_line("H1：第一章 总则"), "H1: 第一章 总则")
+        self.assertEqual(repair_labeled_line("h2:第一节"), "H2: 第一节")
+        self.assertEqual(repair_labeled_line("**H1**: 标题"), "H1: 标题")
+
+    def test_unknown_labels_are_not_repaired(self):
+        self.assertIsNone(repair_labeled_line("Heading: 标题"))
+        self.assertIsNone(repair_labeled_line("H1:"))
+
+
+class TestEnsureCoverage(unittest.TestCase):
+
+    def test_full_output_makes_no_requests(self):
+        analyzer = MagicMock()
+        text, report = ensure_coverage(SOURCE, FULL_OUTPUT, analyzer)
+        self.assertEqual(text, FULL_OUTPUT)
+        self.assertEqual(report.score, 1.0)
+        self.assertEqual((report.repaired_lines, report.rerequested_spans), (0, 0))
+        analyzer.assert_not_called()
+
+    def test_malformed_labels_are_repaired_locally(self):
+        analyzer = MagicMock()
+        text, report = ensure_coverage(SOURCE, FULL_OUTPUT.replace("H1: 第二章", "H1：第二章"), analyzer)
+        self.assertEqual(text, FULL_OUTPUT)
+        self.assertEqual(report.repaired_lines, 1)
+        analyzer.assert_not_called()
+
+    def test_dropped_paragraph_is_rerequested_in_place(self):
+        lines = FULL_OUTPUT.split("\n")
+        dropped = "\n".join(lines[:2] + lines[3:])
+        missing = SOURCE.split("\n")[2]
+        analyzer = MagicMock(return_value=f"P: {missing}")
+        self.assertLess(check_coverage(SOURCE, dropped).score, 1.0)
+
+        text, report = ensure_coverage(SOURCE, dropped, analyzer)
+        analyzer.assert_called_once_with(missing)
+        self.assertEqual(text, FULL_OUTPUT)
+        self.assertEqual(report.score, 1.0)
+        self.assertEqual(report.rerequested_spans, 1)
+
+    def test_summarised_paragraph_is_replaced(self):
+        lines = FULL_OUTPUT.split("\n")
+        summarised = "\n".join(lines[:2] + ["P: 适用于各类合同。"] + lines[3:])
+        missing = SOURCE.split("\n")[2]
+        analyzer = MagicMock(return_value=f"P: {missing}")
+        text, report = ensure_coverage(SOURCE, summarised, analyzer)
+        analyzer.assert_called_once_with(missing)
+        self.assertEqual(text, FULL_OUTPUT)
+        self.assertLess(report.initial_score, report.score)
+
+    def test_failed_rerequest_keeps_original_output(self):
+        lines = FULL_OUTPUT.split("\n")
+        dropped = "\n".join(lines[:2] + lines[3:])
+        text, report = ensure_coverage(SOURCE, dropped, MagicMock(return_value=None))
+        self.assertEqual(text, dropped)
+        self.assertLess(report.score, 1.0)
+
+    def test_unrelated_output_is_not_rerequested(self):
+        analyzer = MagicMock()
+        text, report = ensure_coverage(SOURCE, "P: 完全不同的内容，与原文没有任何关系。", analyzer)
+        analyzer.assert_not_called()
+        self.assertLess(report.score, 0.3)
+
+    def test_document_coverage_aggregates_chunks(self):
+        coverage = DocumentCoverage()
+        self.assertEqual(coverage.score, 1.0)
+        coverage.check(SOURCE, FULL_OUTPUT, MagicMock())
+        coverage.check("另一个文本块的正文内容，共有若干个字符。", "P: 完全不相关的输出内容", MagicMock())
+        self.assertGreater(coverage.score, 0.5)
+        self.assertLess(coverage.score, 1.0)
+        self.assertIn("内容覆盖率", coverage.summary())
+
+
+class TestPipelineCoverage(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="coverage_test_")
+        self.input_path = os.path.join(self.root, "contract.docx")
+        with open(self.input_path, "wb") as f:
+            f.write(b"contract")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_pipeline_rerequests_dropped_span_and_records_coverage(self):
+        chunks = [SOURCE, "第三章 附则\n本办法自发布之日起施行，由法务部负责解释。"]
+        lines = FULL_OUTPUT.split("\n")
+        responses = {
+            chunks[0]: "\n".join(lines[:2] + lines[3:]),
+            chunks[1]: "H1: 第三章 附则\nP: 本办法自发布之日起施行，由法务部负责解释。",
+            SOURCE.split("\n")[2]: lines[2],
+        }
+        requests = []
+
+        def analyze(text):
+            requests.append(text)
+            return responses[text]
+
+        with patch.object(core_processor, "extract_document",
+                          return_value=ExtractedDocument(self.input_path, "docx", "\n".join(chunks))), \
+                patch.object(core_processor, "split_text_for_llm", return_value=LlmWorkPlan(chunks, False)), \
+                patch.object(core_processor, "analyze_text_with_llm", side_effect=analyze), \
+                patch.object(core_processor, "merge_chunk_results", side_effect=lambda results, *a: "\n".join(results)):
+            report = DocumentPipeline(os.path.join(self.root, "out"), structure_mode="llm", use_processes=False,
+                                      llm_workers=1).run([self.input_path])
+
+        result = report.results[0]
+        self.assertEqual(result.coverage, 1.0)
+        self.assertEqual(sorted(requests), sorted(chunks + [SOURCE.split("\n")[2]]))
+        with open(result.output_path, encoding="utf-8") as f:
+            self.assertIn("包括采购合同、销售合同和服务合同", f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
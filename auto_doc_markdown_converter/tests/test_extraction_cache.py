@@ -0,0 +1,86 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import logging
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import extraction_cache
+from auto_doc_markdown_converter.src.extraction_cache import ExtractionCache
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+class TestExtractionCache(unittest.TestCase):
+    """Tests for the content-hash keyed extraction cache."""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="extraction_cache_test_")
+        self.cache_dir = os.path.join(self.work_dir, "cache")
+        self.doc_path = os.path.join(self.work_dir, "doc.pdf")
+        with open(self.doc_path, "wb") as f:
+            f.write(b"%PDF-fake original content")
+        self.cache = ExtractionCache(self.cache_dir, max_bytes=1024 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_round_trip(self):
+        self.assertIsNone(self.cache.get(self.doc_path, "pdf"))
+        self.cache.put(self.doc_path, "pdf", "提取的文本")
+        self.assertEqual(self.cache.get(self.doc_path, "pdf"), "提取的文本")
+
+    def test_cache_persists_across_instances(self):
+        self.cache.put(self.doc_path, "pdf", "persisted text")
+        fresh_cache = ExtractionCache(self.cache_dir, max_bytes=1024 * 1024)
+        self.assertEqual(fresh_cache.get(self.doc_path, "pdf"), "persisted text")
+
+    def test_unchanged_file_is_hashed_only_once(self):
+        with patch.object(extraction_cache, "compute_file_sha256", wraps=extraction_cache.compute_file_sha256) as mock_hash:
+            self.cache.put(self.doc_path, "pdf", "text")
+            self.cache.get(self.doc_path, "pdf")
+            self.cache.get(self.doc_path, "pdf")
+            self.assertEqual(mock_hash.call_count, 1)
+
+    def test_changed_content_misses(self):
+        self.cache.put(self.doc_path, "pdf", "old text")
+        with open(self.doc_path, "wb") as f:
+            f.write(b"%PDF-fake edited content, different size")
+        self.assertIsNone(self.cache.get(self.doc_path, "pdf"))
+
+    def test_identical_content_in_other_path_hits(self):
+        copy_path = os.path.join(self.work_dir, "copy.pdf")
+        shutil.copyfile(self.doc_path, copy_path)
+        self.cache.put(self.doc_path, "pdf", "shared text")
+        self.assertEqual(self.cache.get(copy_path, "pdf"), "shared text")
+
+    def test_options_and_extractor_version_are_part_of_key(self):
+        self.cache.put(self.doc_path, "pdf", "plain text")
+        self.assertIsNone(self.cache.get(self.doc_path, "pdf", options={"mode": "layout"}))
+        with patch.dict(extraction_cache.EXTRACTOR_VERSIONS, {"pdf": "999"}):
+            self.assertIsNone(self.cache.get(self.doc_path, "pdf"))
+
+    def test_eviction_keeps_total_size_under_limit(self):
+        small_cache = ExtractionCache(self.cache_dir, max_bytes=100)
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.work_dir, f"doc{i}.pdf")
+            with open(path, "wb") as f:
+                f.write(f"content {i}".encode("utf-8"))
+            paths.append(path)
+            small_cache.put(path, "pdf", "x" * 40)
+        self.assertLessEqual(small_cache.total_bytes(), 100)
+        # The least recently used entry is evicted first.
+        self.assertIsNone(small_cache.get(paths[0], "pdf"))
+        self.assertEqual(small_cache.get(paths[2], "pdf"), "x" * 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
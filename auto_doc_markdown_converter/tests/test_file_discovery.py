@@ -0,0 +1,141 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+import logging
+from unittest.mock import patch
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import core_processor, file_discovery
+from auto_doc_markdown_converter.src.core_processor import ExtractedDocument
+from auto_doc_markdown_converter.src.file_discovery import discover_documents, output_directory_for
+from auto_doc_markdown_converter.src.pipeline import DocumentPipeline
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+class TestDiscoverDocuments(unittest.TestCase):
+
+    FILES = {
+        "top.pdf": 10,
+        "notes.txt": 10,
+        "reports/2024/q1.docx": 2000,
+        "reports/2024/q2.PDF": 10,
+        "reports/drafts/old.docx": 10,
+        "archive/big.pdf": 50000,
+        "archive/deep/nested/x.docx": 10,
+    }
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="discovery_test_")
+        for relative_path, size in self.FILES.items():
+            path = os.path.join(self.root, *relative_path.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def discover(self, **options):
+        return [os.path.relpath(path, self.root).replace(os.sep, "/")
+                for path in discover_documents(self.root, **options)]
+
+    def test_top_level_only_by_default(self):
+        self.assertEqual(self.discover(), ["top.pdf"])
+
+    def test_recursive_discovery_is_ordered(self):
+        self.assertEqual(self.discover(recursive=True), [
+            "top.pdf", "archive/big.pdf", "archive/deep/nested/x.docx",
+            "reports/2024/q1.docx", "reports/2024/q2.PDF", "reports/drafts/old.docx",
+        ])
+
+    def test_include_and_exclude_patterns(self):
+        self.assertEqual(self.discover(recursive=True, include=["*.docx"], exclude=["drafts"]),
+                         ["archive/deep/nested/x.docx", "reports/2024/q1.docx"])
+        # 与 glob 相同，模式区分大小写
+        self.assertEqual(self.discover(recursive=True, include=["reports/*"], exclude=["*.pdf"]),
+                         ["reports/2024/q1.docx", "reports/2024/q2.PDF", "reports/drafts/old.docx"])
+
+    def test_excluded_directories_are_not_scanned(self):
+        scanned = []
+        real_scandir = os.scandir
+
+        def spy(path):
+            scanned.append(os.path.relpath(path, self.root))
+            return real_scandir(path)
+
+        with patch.object(file_discovery.os, "scandir", side_effect=spy):
+            self.assertNotIn("archive/big.pdf", self.discover(recursive=True, exclude=["archive"]))
+        self.assertFalse(any(path.startswith("archive") for path in scanned))
+
+    def test_size_limits(self):
+        self.assertEqual(self.discover(recursive=True, min_size=1000, max_size=10000), ["reports/2024/q1.docx"])
+
+    def test_single_file_input(self):
+        path = os.path.join(self.root, "top.pdf")
+        self.assertEqual(list(discover_documents(path)), [path])
+        self.assertEqual(list(discover_documents(path, min_size=100)), [])
+        self.assertEqual(list(discover_documents(os.path.join(self.root, "notes.txt"))), [])
+
+    def test_output_directory_mirrors_input_tree(self):
+        input_file = os.path.join(self.root, "reports", "2024", "q1.docx")
+        self.assertEqual(output_directory_for(input_file, self.root, "/out"), os.path.join("/out", "reports", "2024"))
+        self.assertEqual(output_directory_for(os.path.join(self.root, "top.pdf"), self.root, "/out"), "/out")
+        self.assertEqual(output_directory_for("/elsewhere/a.pdf", self.root, "/out"), "/out")
+
+
+class TestPipelineWithDiscoveredFiles(unittest.TestCase):
+    """流水线逐个取出发现的文件，并按输入目录结构输出。"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="discovery_pipeline_test_")
+        self.input_dir = os.path.join(self.root, "in")
+        self.results_dir = os.path.join(self.root, "out")
+        for patcher in (
+            patch.object(core_processor, "extract_document",
+                         side_effect=lambda path, mode=None: ExtractedDocument(path, "docx", os.path.basename(path))),
+            patch.object(core_processor, "analyze_text_with_llm", side_effect=lambda text: f"P: {text}"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_files_are_processed_while_discovery_continues(self):
+        first_extracted = threading.Event()
+        paths = [os.path.join(self.input_dir, "a.docx"), os.path.join(self.input_dir, "sub", "dir", "b.docx")]
+
+        def extract(path, mode=None):
+            first_extracted.set()
+            return ExtractedDocument(path, "docx", os.path.basename(path))
+
+        def discovered():
+            yield paths[0]
+            # 第一个文件在遍历结束之前就已开始处理
+            self.assertTrue(first_extracted.wait(5))
+            yield paths[1]
+
+        pipeline = DocumentPipeline(self.results_dir, structure_mode="llm", use_processes=False,
+                                    extract_workers=1, llm_workers=1, queue_size=1, input_root=self.input_dir)
+        with patch.object(core_processor, "extract_document", side_effect=extract):
+            report = pipeline.run(discovered())
+
+        self.assertEqual([result.input_filepath for result in report.results], paths)
+        self.assertEqual([result.output_path for result in report.results], [
+            os.path.join(self.results_dir, "a.md"),
+            os.path.join(self.results_dir, "sub", "dir", "b.md"),
+        ])
+        self.assertTrue(os.path.isfile(report.results[1].output_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import json
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+import logging
+from unittest.mock import patch
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import config, heading_classifier
+from auto_doc_markdown_converter.src.hybrid_labeler import LabeledLine
+from auto_doc_markdown_converter.src.heading_classifier import (
+    HeadingClassifier,
+    extract_line_features,
+    log_training_samples,
+    load_training_samples,
+)
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+def make_document(chapter_count):
+    lines = [LabeledLine("H1", "低空飞行服务管理办法", 1.0)]
+    for i in range(1, chapter_count + 1):
+        lines.append(LabeledLine("H2", f"第{i}章 总则", 1.0))
+        lines.append(LabeledLine("P", f"第{i}条 为了加强低空飞行活动服务管理，促进本市低空经济高质量发展，制定本办法。", 1.0))
+        lines.append(LabeledLine("P", "本办法适用于本市行政区域范围内的民用航空器低空飞行服务管理工作。", 1.0))
+    return lines
+
+
+class TestHeadingClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="heading_classifier_test_")
+        self.log_path = os.path.join(self.work_dir, "logs", "samples.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_features_capture_numbering_and_punctuation(self):
+        features = extract_line_features(["第一章 总则", "正文内容。"])
+        self.assertEqual(features[0]["num:chapter"], 1.0)
+        self.assertEqual(features[0]["first_line"], 1.0)
+        self.assertEqual(features[1]["ends_sentence"], 1.0)
+        self.assertEqual(features[1]["num:none"], 1.0)
+
+    def test_training_log_round_trip(self):
+        written = log_training_samples(make_document(2), self.log_path, source="doc.pdf")
+        self.assertEqual(written, 7)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("not json\n")
+        samples = load_training_samples(self.log_path)
+        self.assertEqual(len(samples), 7)
+        self.assertEqual(samples[1][1], "H2")
+
+    def test_trained_model_predicts_and_persists(self):
+        log_training_samples(make_document(5), self.log_path)
+        model = HeadingClassifier.train(load_training_samples(self.log_path), epochs=30)
+        self.assertEqual(model.accuracy(load_training_samples(self.log_path)), 1.0)
+
+        model_path = os.path.join(self.work_dir, "model.json")
+        model.save(model_path)
+        loaded = HeadingClassifier.load(model_path)
+        predictions = loaded.predict(["低空飞行服务管理办法", "第9章 附则", "第9条 本办法自发布之日起施行，由市交通运输局负责解释。"])
+        self.assertEqual([line.label for line in predictions], ["H1", "H2", "P"])
+        self.assertTrue(all(0 < line.confidence <= 1 for line in predictions))
+
+    def test_missing_model_loads_as_none(self):
+        self.assertIsNone(HeadingClassifier.load(os.path.join(self.work_dir, "missing.json")))
+
+    def test_missing_model_is_loaded_once_per_path(self):
+        missing = os.path.join(self.work_dir, "missing.json")
+        with patch.object(heading_classifier, "_classifier", None), \
+                patch.object(heading_classifier, "_classifier_path", None), \
+                patch.object(HeadingClassifier, "load", wraps=HeadingClassifier.load) as mock_load:
+            with patch.object(config, "HEADING_CLASSIFIER_MODEL", missing):
+                self.assertIsNone(heading_classifier.get_heading_classifier())
+                self.assertIsNone(heading_classifier.get_heading_classifier())
+            self.assertEqual(mock_load.call_count, 1)
+            with patch.object(config, "HEADING_CLASSIFIER_MODEL", os.path.join(self.work_dir, "other.json")):
+                heading_classifier.get_heading_classifier()
+            self.assertEqual(mock_load.call_count, 2)
+
+    def test_concurrent_documents_write_whole_lines(self):
+        documents = [make_document(20) for _ in range(8)]
+        threads = [threading.Thread(target=log_training_samples, args=(document, self.log_path),
+                                    kwargs={"source": f"doc{i}.pdf"}) for i, document in enumerate(documents)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with open(self.log_path, encoding="utf-8") as f:
+            sources = [json.loads(line)["source"] for line in f]
+        self.assertEqual(len(sources), sum(len(document) for document in documents))
+        # 每篇文档的样本连续写入，不与其他文档交错
+        runs = [source for index, source in enumerate(sources) if index == 0 or sources[index - 1] != source]
+        self.assertCountEqual(runs, [f"doc{i}.pdf" for i in range(len(documents))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+启动开销基准测试。
+
+`python main.py --help` 以及参数错误等不需要处理文档的情况不应加载 pdfplumber、python-docx、requests
+或处理链本身，也不应读取配置 (.env 文件)。耗时与机器负载有关，不作为测试断言；
+直接运行本文件会输出 `main.py --help` 的导入耗时排行：
+
+    python auto_doc_markdown_converter/tests/test_import_time.py
+"""
+import os
+import sys
+import json
+import subprocess
+import unittest
+import logging
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# `main.py --help` 不应导入的模块
+HEAVY_MODULES = ("pdfplumber", "docx", "requests", "dotenv",
+                 "src.core_processor", "src.pipeline", "src.llm_processor")
+
+# 在子进程中运行 main.py --help，并把已加载的模块列表及配置是否已加载写到标准错误的最后一行
+_LIST_MODULES_SCRIPT = """
+import sys, json
+sys.argv = ["main.py", "--help"]
+import main
+try:
+    main.main_cli()
+except SystemExit:
+    pass
+sys.stderr.write("\\n" + json.dumps({"modules": sorted(sys.modules),
+                                     "config_loaded": sys.modules["src.config"]._loaded}) + "\\n")
+"""
+
+
+def _environment_without_credentials():
+    env = dict(os.environ)
+    for name in ("LLM_API_KEY", "LLM_API_ENDPOINT"):
+        env.pop(name, None)
+    return env
+
+
+def measure_help_import_times():
+    """以 -X importtime 运行 `python main.py --help`，返回 (子进程结果, [(模块, 累计耗时秒数, 嵌套深度)])。"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "main.py", "--help"], cwd=PACKAGE_DIR,
+                               env=_environment_without_credentials(), capture_output=True, text=True, timeout=60)
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # 表头
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(fields[1]) / 1e6, depth))
+    return completed, imports
+
+
+class TestStartupImports(unittest.TestCase):
+
+    def test_help_does_not_load_processing_chain(self):
+        completed = subprocess.run([sys.executable, "-c", _LIST_MODULES_SCRIPT], cwd=PACKAGE_DIR,
+                                   env=_environment_without_credentials(), capture_output=True, text=True, timeout=60)
+        self.assertIn("--from-stage", completed.stdout)
+        report = json.loads(completed.stderr.strip().splitlines()[-1])
+        loaded = set(report["modules"])
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, loaded)
+        self.assertFalse(report["config_loaded"])
+
+    def test_config_import_has_no_side_effects(self):
+        script = (
+            "from auto_doc_markdown_converter.src import config\n"
+            "assert not config._loaded\n"
+            "assert config.STRUCTURE_MODE == 'llm' and config._loaded\n"
+            "try:\n"
+            "    config.require_llm_credentials()\n"
+            "except EnvironmentError:\n"
+            "    print('missing credentials reported')\n"
+        )
+        env = _environment_without_credentials()
+        env.pop("STRUCTURE_MODE", None)
+        completed = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(PACKAGE_DIR),
+                                   env=env, capture_output=True, text=True, timeout=60)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        self.assertIn("missing credentials reported", completed.stdout)
+
+
+if __name__ == '__main__':
+    result, measured = measure_help_import_times()
+    print(f"main.py --help 返回码 {result.returncode}，导入耗时最长的模块:")
+    for module_name, cumulative, _ in sorted(measured, key=lambda item: item[1], reverse=True)[:15]:
+        print(f"  {cumulative * 1000:8.1f} ms  {module_name}")
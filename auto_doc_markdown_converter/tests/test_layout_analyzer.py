@@ -0,0 +1,128 @@
+import os
+import sys
+import unittest
+import logging
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src.pdf_extractor import LayoutLine
+from auto_doc_markdown_converter.src.layout_analyzer import label_layout_lines
+from auto_doc_markdown_converter.src.hybrid_labeler import (
+    LabeledLine,
+    find_uncertain_regions,
+    resolve_uncertain_lines,
+    labeled_lines_to_text,
+)
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+PAGE_WIDTH = 595.0
+BODY_FONT = "FangSong"
+
+
+def make_line(text, size=16.0, fontname=BODY_FONT, bold=False, x0=74.0, x1=None, top=100.0, page=1):
+    if x1 is None:
+        x1 = x0 + len(text) * size
+    return LayoutLine(text, size, fontname, bold, x0, x1, top, page, PAGE_WIDTH)
+
+
+def centered_line(text, size=16.0, **kwargs):
+    width = len(text) * size
+    x0 = (74.0 + 522.0) / 2 - width / 2
+    return make_line(text, size=size, x0=x0, x1=x0 + width, **kwargs)
+
+
+class TestLabelLayoutLines(unittest.TestCase):
+
+    def setUp(self):
+        # 28 个字符的满行正文，右边界约 522
+        self.full_line = "这是一行排满版面宽度的正文内容用于确定正文区域的右边界位置"[:28]
+        self.lines = [
+            centered_line("关于低空飞行服务管理的办法", size=22.0, top=60),
+            centered_line("第一章 总则", fontname="SimHei", top=100),
+            make_line(self.full_line, x0=106.0, x1=522.0, top=130),
+            make_line(self.full_line, x1=522.0, top=150),
+            make_line("最后一行结束。", top=170),
+            make_line(self.full_line, x0=106.0, x1=522.0, top=190),
+            make_line("第二段结束。", top=210),
+            centered_line("— 1 —", top=800),
+        ]
+
+    def test_headings_and_paragraphs(self):
+        labeled = label_layout_lines(self.lines)
+        self.assertEqual([line.label for line in labeled], ["H1", "H2", "P", "P"])
+        self.assertEqual(labeled[0].text, "关于低空飞行服务管理的办法")
+        self.assertEqual(labeled[1].text, "第一章 总则")
+        self.assertEqual(labeled[2].text, self.full_line * 2 + "最后一行结束。")
+        self.assertEqual(labeled[3].text, self.full_line + "第二段结束。")
+
+    def test_page_numbers_are_dropped(self):
+        labeled = label_layout_lines(self.lines)
+        self.assertFalse(any("1 —" in line.text for line in labeled))
+
+    def test_centered_emphasis_heading_is_confident(self):
+        labeled = label_layout_lines(self.lines)
+        self.assertGreaterEqual(labeled[0].confidence, 0.9)
+        self.assertGreaterEqual(labeled[1].confidence, 0.75)
+
+    def test_uncentered_bold_line_is_uncertain(self):
+        lines = self.lines[:-1] + [make_line("一、工作要求", bold=True, top=230)]
+        labeled = label_layout_lines(lines)
+        self.assertEqual(labeled[-1].label, "H2")
+        self.assertLess(labeled[-1].confidence, 0.75)
+
+    def test_empty_input(self):
+        self.assertEqual(label_layout_lines([]), [])
+
+
+class TestHybridLabeler(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = [
+            LabeledLine("H1", "标题", 0.95),
+            LabeledLine("P", "正文一", 0.9),
+            LabeledLine("H2", "可疑标题", 0.6),
+            LabeledLine("P", "正文二", 0.9),
+            LabeledLine("P", "正文三", 0.9),
+            LabeledLine("P", "正文四", 0.9),
+            LabeledLine("H2", "另一个可疑标题", 0.5),
+        ]
+
+    def test_uncertain_regions(self):
+        self.assertEqual(find_uncertain_regions(self.lines, 0.75), [(2, 3), (6, 7)])
+        # 间隔不超过两行的区域会被合并
+        self.lines[4] = LabeledLine("P", "正文三", 0.1)
+        self.assertEqual(find_uncertain_regions(self.lines, 0.75), [(2, 7)])
+
+    def test_only_uncertain_regions_are_sent_to_analyzer(self):
+        requests = []
+
+        def fake_analyzer(text):
+            requests.append(text)
+            return "\n".join(f"P: {line}" for line in text.split("\n"))
+
+        resolved = resolve_uncertain_lines(self.lines, 0.75, analyzer=fake_analyzer)
+        self.assertCountEqual(requests, ["可疑标题", "另一个可疑标题"])
+        self.assertEqual(labeled_lines_to_text(resolved),
+                         "H1: 标题\nP: 正文一\nP: 可疑标题\nP: 正文二\nP: 正文三\nP: 正文四\nP: 另一个可疑标题")
+
+    def test_failed_region_keeps_local_labels(self):
+        resolved = resolve_uncertain_lines(self.lines, 0.75, analyzer=lambda text: None)
+        self.assertEqual(resolved, self.lines)
+
+    def test_confident_document_makes_no_requests(self):
+        confident = [line._replace(confidence=0.9) for line in self.lines]
+
+        def failing_analyzer(text):
+            raise AssertionError("analyzer should not be called")
+
+        self.assertEqual(resolve_uncertain_lines(confident, 0.75, analyzer=failing_analyzer), confident)
+
+
+if __name__ == '__main__':
+    unittest.main()
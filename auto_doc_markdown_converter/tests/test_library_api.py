@@ -0,0 +1,109 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import logging
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import core_processor, file_handler
+from auto_doc_markdown_converter.src.extraction_cache import ExtractionCache
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+SAMPLE_DOCX = os.path.join(FIXTURES_DIR, "sample.docx")
+
+
+class TestInMemoryConversion(unittest.TestCase):
+    """convert_to_markdown / iter_markdown_blocks 直接转换内存中的文档 ("rules" 模式，不调用 LLM)。"""
+
+    def setUp(self):
+        with open(SAMPLE_DOCX, "rb") as f:
+            self.data = f.read()
+        self.results_dir = tempfile.mkdtemp(prefix="library_api_test_")
+        for patcher in (
+            patch.object(core_processor, "API_KEY", "test-key"),
+            patch.object(core_processor, "API_ENDPOINT", "http://127.0.0.1:9"),
+            patch.object(file_handler, "get_extraction_cache", return_value=None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.results_dir, ignore_errors=True)
+
+    def test_bytes_are_passed_to_extractor_as_stream(self):
+        sources = []
+        real_extract = file_handler.extract_text_from_docx
+
+        def spy(source):
+            sources.append(source)
+            return real_extract(source)
+
+        with patch.object(file_handler, "extract_text_from_docx", side_effect=spy):
+            markdown = core_processor.convert_to_markdown(self.data, name="sample.docx", structure_mode="rules")
+        self.assertTrue(markdown.startswith("# "))
+        self.assertEqual(len(sources), 1)
+        self.assertIsInstance(sources[0], io.BytesIO)
+
+    def test_path_function_wraps_in_memory_conversion(self):
+        output_path = core_processor.process_document_to_markdown(SAMPLE_DOCX, self.results_dir, structure_mode="rules")
+        with open(output_path, encoding="utf-8") as f:
+            written = f.read()
+        self.assertEqual(core_processor.convert_to_markdown(io.BytesIO(self.data), structure_mode="rules"), written)
+
+    def test_in_memory_document_is_saved_under_its_name(self):
+        with tempfile.SpooledTemporaryFile() as upload:
+            upload.write(self.data)
+            output_path = core_processor.process_document_to_markdown(upload, self.results_dir, structure_mode="rules",
+                                                                      name="合同.docx")
+        self.assertEqual(output_path, os.path.join(self.results_dir, "合同.md"))
+        with open(output_path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), core_processor.convert_to_markdown(self.data, structure_mode="rules"))
+        # 内存中的文档没有名称时无法生成输出文件名
+        self.assertIsNone(core_processor.process_document_to_markdown(self.data, self.results_dir, structure_mode="rules"))
+
+    def test_blocks_join_to_full_markdown(self):
+        blocks = list(core_processor.iter_markdown_blocks(self.data, structure_mode="rules"))
+        self.assertGreater(len(blocks), 1)
+        self.assertEqual("\n\n".join(blocks), core_processor.convert_to_markdown(self.data, structure_mode="rules"))
+
+    def test_file_type_is_detected_from_content(self):
+        self.assertEqual(file_handler.detect_content_type(self.data), "docx")
+        self.assertEqual(file_handler.detect_content_type(io.BytesIO(b"%PDF-1.7 ...")), "pdf")
+        self.assertIsNone(core_processor.convert_to_markdown(b"plain text", structure_mode="rules"))
+        self.assertEqual(list(core_processor.iter_markdown_blocks(b"plain text", structure_mode="rules")), [])
+
+
+class TestInMemoryExtractionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(prefix="library_api_cache_test_")
+        patcher = patch.object(file_handler, "get_extraction_cache",
+                               return_value=ExtractionCache(self.cache_dir, max_bytes=1024 * 1024))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_cache_is_keyed_by_content(self):
+        with patch.object(file_handler, "extract_text_from_docx", return_value="正文") as mock_extract:
+            first = file_handler.read_file_content("upload-1.docx", "docx", content=b"PK\x03\x04 same bytes")
+            second = file_handler.read_file_content("upload-2.docx", "docx", content=io.BytesIO(b"PK\x03\x04 same bytes"))
+            file_handler.read_file_content("upload-3.docx", "docx", content=b"PK\x03\x04 other bytes")
+        self.assertEqual((first, second), ("正文", "正文"))
+        self.assertEqual(mock_extract.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
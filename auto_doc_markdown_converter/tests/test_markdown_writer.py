@@ -0,0 +1,164 @@
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+import logging
+from unittest.mock import patch
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import core_processor, pipeline
+from auto_doc_markdown_converter.src.core_processor import ExtractedDocument, LlmWorkPlan
+from auto_doc_markdown_converter.src.markdown_generator import generate_markdown_from_labeled_text
+from auto_doc_markdown_converter.src.markdown_writer import OrderedMarkdownWriter
+from auto_doc_markdown_converter.src.pipeline import DocumentPipeline
+from auto_doc_markdown_converter.src.stage_artifacts import STAGES, open_artifact_bundle
+from auto_doc_markdown_converter.src.text_splitter import merge_processed_chunks
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+def make_chunks(count, lines_per_chunk=30, overlap_lines=3):
+    """生成带重叠行的已处理文本块 (相邻文本块共享 overlap_lines 行)。"""
+    lines = [f"H2: 第 {i} 节" if i % 10 == 0 else f"P: 第 {i} 段正文内容" for i in range(count * lines_per_chunk)]
+    chunks = []
+    for start in range(0, len(lines), lines_per_chunk):
+        chunks.append("\n".join(lines[max(0, start - overlap_lines):start + lines_per_chunk]))
+    return chunks
+
+
+class TestOrderedMarkdownWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(prefix="markdown_writer_test_")
+        self.output_path = os.path.join(self.output_dir, "doc.md")
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def expected_markdown(self, chunks):
+        return generate_markdown_from_labeled_text(merge_processed_chunks(chunks))
+
+    def read_output(self):
+        with open(self.output_path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_out_of_order_chunks_match_batch_merge(self):
+        chunks = make_chunks(12)
+        order = list(range(len(chunks)))
+        random.Random(7).shuffle(order)
+        writer = OrderedMarkdownWriter(self.output_path, len(chunks))
+        for index in order:
+            writer.add(index, chunks[index])
+        self.assertEqual(writer.buffered_chunks, 0)
+        self.assertEqual(writer.commit(), self.output_path)
+        self.assertEqual(self.read_output(), self.expected_markdown(chunks))
+
+    def test_in_order_chunks_are_written_before_commit_without_buffering(self):
+        chunks = make_chunks(5)
+        writer = OrderedMarkdownWriter(self.output_path, len(chunks))
+        writer.add(0, chunks[0])
+        writer.add(1, chunks[1])
+        self.assertEqual(writer.max_buffered, 1)
+        # 已写入临时文件，最终文件尚不存在
+        temp_files = [name for name in os.listdir(self.output_dir) if name.endswith(".tmp")]
+        self.assertEqual(len(temp_files), 1)
+        self.assertFalse(os.path.exists(self.output_path))
+        with open(os.path.join(self.output_dir, temp_files[0]), encoding="utf-8") as f:
+            self.assertIn("第 0 节", f.read())
+
+        for index in range(2, len(chunks)):
+            writer.add(index, chunks[index])
+        writer.commit()
+        self.assertEqual(os.listdir(self.output_dir), ["doc.md"])
+
+    def test_only_chunks_that_cannot_be_written_are_buffered(self):
+        chunks = make_chunks(6)
+        writer = OrderedMarkdownWriter(self.output_path, len(chunks))
+        for index in (3, 4, 5):
+            writer.add(index, chunks[index])
+        self.assertEqual(writer.buffered_chunks, 3)
+        writer.add(0, chunks[0])
+        self.assertEqual(writer.buffered_chunks, 3)
+        writer.add(1, chunks[1])
+        writer.add(2, chunks[2])
+        self.assertEqual(writer.buffered_chunks, 0)
+        self.assertEqual(writer.max_buffered, 4)
+        writer.commit()
+        self.assertEqual(self.read_output(), self.expected_markdown(chunks))
+
+    def test_abort_and_missing_chunks_keep_existing_output(self):
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            f.write("旧的输出")
+        chunks = make_chunks(3)
+
+        writer = OrderedMarkdownWriter(self.output_path, len(chunks))
+        writer.add(0, chunks[0])
+        writer.abort()
+        self.assertEqual(os.listdir(self.output_dir), ["doc.md"])
+
+        writer = OrderedMarkdownWriter(self.output_path, len(chunks))
+        writer.add(0, chunks[0])
+        writer.add(2, chunks[2])
+        self.assertIsNone(writer.commit())
+        self.assertEqual(os.listdir(self.output_dir), ["doc.md"])
+        self.assertEqual(self.read_output(), "旧的输出")
+
+
+class TestPipelineStreamingWrite(unittest.TestCase):
+    """DocumentPipeline 对分块文档使用流式写入，结果与统一合并后写入相同。"""
+
+    CHUNKS = make_chunks(8)
+
+    def setUp(self):
+        self.results_dir = tempfile.mkdtemp(prefix="pipeline_streaming_test_")
+        plan = LlmWorkPlan([f"原文 {i}" for i in range(len(self.CHUNKS))], direct=False)
+        for patcher in (
+            patch.object(core_processor, "extract_document",
+                         side_effect=lambda path, mode=None: ExtractedDocument(path, "docx", "全文")),
+            patch.object(core_processor, "split_text_for_llm", return_value=plan),
+            patch.object(core_processor, "analyze_text_with_llm",
+                         side_effect=lambda chunk: self.CHUNKS[int(chunk.split()[1])]),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.results_dir, ignore_errors=True)
+
+    def run_pipeline(self, streaming, artifacts_dir=None):
+        with patch.object(pipeline, "STREAMING_MARKDOWN_WRITER", streaming):
+            report = DocumentPipeline(self.results_dir, structure_mode="llm", use_processes=False,
+                                      llm_workers=4, artifacts_dir=artifacts_dir).run(["/in/long.docx"])
+        with open(report.results[0].output_path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_streaming_output_matches_batch_output(self):
+        with patch.object(core_processor, "merge_processed_chunks", wraps=merge_processed_chunks) as mock_merge:
+            streamed = self.run_pipeline(streaming=True)
+            mock_merge.assert_not_called()
+        self.assertEqual(streamed, self.run_pipeline(streaming=False))
+        self.assertEqual(streamed, generate_markdown_from_labeled_text(merge_processed_chunks(self.CHUNKS)))
+
+    def test_streaming_output_is_recorded_in_artifact_bundle(self):
+        artifacts_dir = tempfile.mkdtemp(prefix="pipeline_streaming_artifacts_")
+        self.addCleanup(shutil.rmtree, artifacts_dir, True)
+        with patch.object(core_processor, "merge_processed_chunks", wraps=merge_processed_chunks) as mock_merge:
+            streamed = self.run_pipeline(streaming=True, artifacts_dir=artifacts_dir)
+            mock_merge.assert_not_called()
+
+        bundle = open_artifact_bundle(artifacts_dir, "/in/long.docx")
+        self.assertEqual(bundle.stages(), list(STAGES))
+        self.assertEqual(bundle.get("llm"), {"results": self.CHUNKS})
+        self.assertEqual(bundle.get("merge"), {"labeled_text": merge_processed_chunks(self.CHUNKS)})
+        self.assertEqual(bundle.get("render"), {"markdown": streamed})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import unittest
+import logging
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src.outline_filter import (
+    is_heading_candidate,
+    build_outline_request,
+    parse_outline_response,
+    label_lines_with_outline,
+)
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+DOCUMENT_LINES = [
+    "低空飞行服务管理办法",
+    "第一章 总则",
+    "为了加强低空飞行活动服务管理，提升低空飞行服务便利化、规范化、专业化水平，促进本市低空经济高质量发展，制定本办法。",
+    "本办法适用于本市行政区域范围内的民用航空器低空飞行服务管理工作，以及相关的监督管理活动。",
+    "",
+    "第二章 职责分工",
+    "市人民政府加强对低空飞行服务管理工作的领导，统筹本市低空飞行服务管理工作，协调解决重大问题。",
+]
+
+
+class TestOutlineFilter(unittest.TestCase):
+
+    def test_candidate_detection(self):
+        self.assertTrue(is_heading_candidate("第一章 总则"))
+        self.assertTrue(is_heading_candidate("1.2.3 Scope"))
+        self.assertTrue(is_heading_candidate("（一）收集、发布本市低空基础设施等相关信息；"))
+        self.assertTrue(is_heading_candidate("Introduction"))
+        self.assertFalse(is_heading_candidate("短句也可能是正文。"))
+        self.assertFalse(is_heading_candidate("这是一个没有编号的很长的正文段落" * 4))
+        self.assertFalse(is_heading_candidate("   "))
+
+    def test_request_contains_ids_candidates_and_truncated_context(self):
+        request = build_outline_request(DOCUMENT_LINES, [1], context_lines=1)
+        request_lines = request.split("\n")
+        self.assertEqual(request_lines[1], "[1] 第一章 总则")
+        self.assertTrue(request_lines[0].startswith("    … 低空飞行服务管理办法"))
+        self.assertTrue(request_lines[2].startswith("    … 为了加强"))
+        self.assertTrue(request_lines[2].endswith("…"))
+        self.assertLess(len(request_lines[2]), len(DOCUMENT_LINES[2]))
+
+    def test_parse_response_tolerates_format_variations(self):
+        response = "0: H1\n[1]：h2\n说明文字\n5: P\n6: X1"
+        self.assertEqual(parse_outline_response(response), {0: "H1", 1: "H2", 5: "P"})
+
+    def test_only_candidates_are_sent_and_others_are_paragraphs(self):
+        requests = []
+
+        def fake_analyzer(text):
+            requests.append(text)
+            return "0: H1\n1: H2\n4: H2"
+
+        labeled = label_lines_with_outline(DOCUMENT_LINES, analyzer=fake_analyzer)
+        self.assertEqual(len(requests), 1)
+        self.assertNotIn(DOCUMENT_LINES[3], requests[0])
+        self.assertEqual([(line.label, line.text) for line in labeled], [
+            ("H1", "低空飞行服务管理办法"),
+            ("H2", "第一章 总则"),
+            ("P", DOCUMENT_LINES[2]),
+            ("P", DOCUMENT_LINES[3]),
+            ("H2", "第二章 职责分工"),
+            ("P", DOCUMENT_LINES[6]),
+        ])
+
+    def test_missing_labels_default_to_paragraph(self):
+        labeled = label_lines_with_outline(DOCUMENT_LINES, analyzer=lambda text: "0: H1")
+        self.assertEqual(labeled[1].label, "P")
+        self.assertEqual(labeled[1].confidence, 0.0)
+
+    def test_failed_request_returns_none(self):
+        self.assertIsNone(label_lines_with_outline(DOCUMENT_LINES, analyzer=lambda text: None))
+
+    def test_candidates_are_batched_by_token_budget(self):
+        requests = []
+
+        def fake_analyzer(text):
+            requests.append(text)
+            return ""
+
+        lines = [f"第{i}章 标题" for i in range(1, 21)]
+        label_lines_with_outline(lines, analyzer=fake_analyzer, context_lines=0, max_tokens_per_request=20)
+        self.assertGreater(len(requests), 1)
+        self.assertEqual(sum(text.count("[") for text in requests), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
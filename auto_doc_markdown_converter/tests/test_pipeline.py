@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+import logging
+from unittest.mock import patch
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import core_processor
+from auto_doc_markdown_converter.src.core_processor import ExtractedDocument, LlmWorkPlan
+from auto_doc_markdown_converter.src.pipeline import DocumentPipeline
+from auto_doc_markdown_converter.src.utils import DocumentLogFilter
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+def fake_extract(input_filepath, structure_mode=None):
+    """用文件名作为正文的提取函数；名称中包含 "broken" 的文件提取失败。"""
+    name = os.path.basename(input_filepath)
+    if "broken" in name:
+        return None
+    return ExtractedDocument(input_filepath, "docx", f"正文 {name}")
+
+
+def fake_analyze(text):
+    return f"P: {text}"
+
+
+class TestDocumentPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.results_dir = tempfile.mkdtemp(prefix="pipeline_test_")
+        patcher = patch.object(core_processor, "extract_document", side_effect=fake_extract)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.results_dir, ignore_errors=True)
+
+    def run_pipeline(self, paths, **options):
+        options.setdefault("use_processes", False)
+        options.setdefault("extract_workers", 2)
+        options.setdefault("llm_workers", 3)
+        return DocumentPipeline(self.results_dir, structure_mode="llm", **options).run(paths)
+
+    def test_results_follow_input_order(self):
+        paths = [f"/in/doc{i}.docx" for i in range(6)]
+        with patch.object(core_processor, "analyze_text_with_llm", side_effect=fake_analyze):
+            report = self.run_pipeline(paths)
+
+        self.assertEqual([result.input_filepath for result in report.results], paths)
+        for i, result in enumerate(report.results):
+            self.assertEqual(result.output_path, os.path.join(self.results_dir, f"doc{i}.md"))
+            with open(result.output_path, encoding="utf-8") as f:
+                self.assertIn(f"doc{i}.docx", f.read())
+
+    def test_failed_documents_do_not_block_others(self):
+        paths = ["/in/a.docx", "/in/broken.docx", "/in/llm_fails.docx", "/in/b.docx"]
+
+        def analyze(text):
+            return None if "llm_fails" in text else fake_analyze(text)
+
+        done = []
+        with patch.object(core_processor, "analyze_text_with_llm", side_effect=analyze):
+            report = DocumentPipeline(self.results_dir, structure_mode="llm", use_processes=False,
+                                      queue_size=1).run(paths, on_document_done=done.append)
+
+        outputs = [result.output_path is not None for result in report.results]
+        self.assertEqual(outputs, [True, False, False, True])
+        self.assertCountEqual([result.input_filepath for result in done], paths)
+
+    def run_with_timeout(self, paths, **options):
+        """在独立线程中运行流水线，确认任何阶段出错都不会使 run() 一直阻塞。"""
+        outcome = {}
+        thread = threading.Thread(target=lambda: outcome.setdefault("report", self.run_pipeline(paths, **options)),
+                                  daemon=True)
+        thread.start()
+        thread.join(30)
+        self.assertFalse(thread.is_alive(), "流水线没有结束")
+        return outcome["report"]
+
+    def test_unexpected_errors_in_stages_fail_only_that_document(self):
+        real_split = core_processor.split_text_for_llm
+        real_render = core_processor.render_markdown
+
+        def split(text, *args):
+            if "split_error" in text:
+                raise ValueError("分割出错")
+            return real_split(text, *args)
+
+        def render(labeled_text, input_filepath):
+            if "write_error" in input_filepath:
+                raise ValueError("渲染出错")
+            return real_render(labeled_text, input_filepath)
+
+        paths = ["/in/a.docx", "/in/split_error.docx", "/in/write_error.docx", "/in/b.docx"]
+        done = []
+        with patch.object(core_processor, "split_text_for_llm", side_effect=split), \
+                patch.object(core_processor, "render_markdown", side_effect=render), \
+                patch.object(core_processor, "analyze_text_with_llm", side_effect=fake_analyze):
+            report = self.run_with_timeout(paths, queue_size=1)
+
+        outputs = [result.output_path is not None for result in report.results]
+        self.assertEqual(outputs, [True, False, False, True])
+
+    def test_extract_stage_error_still_ends_the_run(self):
+        # 提取阶段在逐个文档的处理之外出错时，run() 也应结束，未完成的文档视为失败
+        with patch("concurrent.futures.wait", side_effect=RuntimeError("等待提取任务时出错")), \
+                patch.object(core_processor, "analyze_text_with_llm", side_effect=fake_analyze):
+            report = self.run_with_timeout(["/in/a.docx", "/in/b.docx"])
+        self.assertTrue(all(result.output_path is None for result in report.results))
+
+    def test_chunks_of_a_document_are_merged_in_order(self):
+        plan = LlmWorkPlan(["第一块", "第二块", "第三块"], direct=False)
+
+        def analyze(text):
+            # 让前面的块更晚完成，确认合并仍按原始顺序进行
+            time.sleep({"第一块": 0.05, "第二块": 0.02, "第三块": 0.0}[text])
+            return f"H1: {text}"
+
+        with patch.object(core_processor, "split_text_for_llm", return_value=plan), \
+                patch.object(core_processor, "analyze_text_with_llm", side_effect=analyze):
+            report = self.run_pipeline(["/in/chunked.docx"])
+
+        with open(report.results[0].output_path, encoding="utf-8") as f:
+            content = f.read()
+        self.assertLess(content.index("第一块"), content.index("第二块"))
+        self.assertLess(content.index("第二块"), content.index("第三块"))
+        self.assertEqual(report.metrics["llm"].items, 3)
+
+    def test_llm_concurrency_is_shared_across_documents(self):
+        active = [0]
+        peak = [0]
+        lock = threading.Lock()
+
+        def analyze(text):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return fake_analyze(text)
+
+        paths = [f"/in/doc{i}.docx" for i in range(8)]
+        with patch.object(core_processor, "analyze_text_with_llm", side_effect=analyze):
+            report = self.run_pipeline(paths, llm_workers=2)
+
+        self.assertTrue(all(result.output_path for result in report.results))
+        self.assertLessEqual(peak[0], 2)
+        self.assertEqual(peak[0], 2)
+
+    def test_metrics_are_collected_per_stage(self):
+        paths = [f"/in/doc{i}.docx" for i in range(3)]
+        with patch.object(core_processor, "analyze_text_with_llm", side_effect=fake_analyze):
+            report = self.run_pipeline(paths)
+
+        self.assertEqual(set(report.metrics), {"extract", "split", "llm", "write"})
+        for stage in ("extract", "split", "llm", "write"):
+            self.assertEqual(report.metrics[stage].items, 3)
+        self.assertGreater(report.wall_seconds, 0)
+        self.assertIn("利用率", report.metrics["llm"].summary(report.wall_seconds))
+
+    def test_throughput_is_reported(self):
+        paths = ["/in/a.docx", "/in/broken.docx"]
+        with patch.object(core_processor, "analyze_text_with_llm", side_effect=fake_analyze):
+            report = self.run_pipeline(paths)
+
+        self.assertGreater(report.results[0].tokens, 0)
+        self.assertEqual(report.results[1].tokens, 0)
+        self.assertGreater(report.files_per_minute(), 0)
+        self.assertGreater(report.tokens_per_minute(), 0)
+        self.assertIn("1/2 个文件", report.throughput_summary())
+
+    def test_logs_are_tagged_with_document_name(self):
+        records = []
+
+        class Collector(logging.Handler):
+            def emit(self, record):
+                records.append(record)
+
+        handler = Collector()
+        handler.addFilter(DocumentLogFilter())
+        test_logger = logging.getLogger("test_pipeline.analyzer")
+        test_logger.addHandler(handler)
+        self.addCleanup(test_logger.removeHandler, handler)
+
+        def analyze(text):
+            test_logger.critical(text)
+            return fake_analyze(text)
+
+        logging.disable(logging.NOTSET)
+        self.addCleanup(logging.disable, logging.CRITICAL)
+        with patch.object(core_processor, "analyze_text_with_llm", side_effect=analyze):
+            self.run_pipeline(["/in/a.docx", "/in/b.docx"])
+
+        tags = {record.getMessage(): record.document_tag for record in records}
+        self.assertEqual(tags, {"正文 a.docx": "[a.docx] ", "正文 b.docx": "[b.docx] "})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import sys
+import random
+import unittest
+import logging
+from unittest.mock import patch
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import core_processor
+from auto_doc_markdown_converter.src.core_processor import ExtractedDocument, LlmWorkPlan
+from auto_doc_markdown_converter.src.markdown_generator import generate_markdown_from_labeled_text
+from auto_doc_markdown_converter.src.progress import PartialMarkdownReporter, progress_listener, report_progress
+from auto_doc_markdown_converter.src.text_splitter import merge_processed_chunks
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+def make_chunks(count, lines_per_chunk=20, overlap_lines=3):
+    """生成带重叠行的已处理文本块 (相邻文本块共享 overlap_lines 行)。"""
+    lines = [f"H2: 第 {i} 节" if i % 10 == 0 else f"P: 第 {i} 段正文内容" for i in range(count * lines_per_chunk)]
+    return ["\n".join(lines[max(0, start - overlap_lines):start + lines_per_chunk])
+            for start in range(0, len(lines), lines_per_chunk)]
+
+
+class TestProgressListener(unittest.TestCase):
+
+    def test_events_go_to_current_listener_only(self):
+        events = []
+        report_progress("extracted", chars=1)  # 没有监听器时忽略
+        with progress_listener(lambda event, data: events.append((event, data))):
+            report_progress("extracted", chars=10)
+            with progress_listener(None):
+                report_progress("chunks", count=2)
+            report_progress("merged", lines=3)
+        report_progress("merged", lines=4)
+        self.assertEqual(events, [("extracted", {"chars": 10}), ("merged", {"lines": 3})])
+
+    def test_listener_errors_do_not_propagate(self):
+        def failing_listener(event, data):
+            raise RuntimeError("boom")
+        with progress_listener(failing_listener):
+            report_progress("extracted", chars=10)
+
+    def test_partial_markdown_matches_final_markdown(self):
+        chunks = make_chunks(6)
+        order = list(range(len(chunks)))
+        random.Random(3).shuffle(order)
+        partials = []
+        with progress_listener(lambda event, data: partials.append(data["markdown"])):
+            reporter = PartialMarkdownReporter(len(chunks))
+            for index in order:
+                reporter.add(index, chunks[index])
+            reporter.finish()
+        expected = generate_markdown_from_labeled_text(merge_processed_chunks(chunks))
+        self.assertEqual("\n\n".join(partials), expected)
+
+
+class TestCoreProgressEvents(unittest.TestCase):
+
+    def test_chunked_conversion_reports_every_stage(self):
+        chunks = make_chunks(3)
+        events = []
+        with patch.object(core_processor, "_llm_credentials_configured", return_value=True), \
+                patch.object(core_processor, "extract_document",
+                             return_value=ExtractedDocument("/in/doc.docx", "docx", "原文" * 10)), \
+                patch.object(core_processor, "split_text_for_llm", return_value=LlmWorkPlan(chunks, False)), \
+                patch.object(core_processor, "analyze_text_with_llm", side_effect=lambda chunk: chunk), \
+                patch.object(core_processor, "open_chunk_checkpoint", return_value=None), \
+                patch.object(core_processor, "COVERAGE_CHECK", False), \
+                progress_listener(lambda event, data: events.append((event, data))):
+            markdown = core_processor.convert_to_markdown("/in/doc.docx", structure_mode="llm")
+
+        names = [event for event, _ in events]
+        self.assertEqual(names[:2], ["extracted", "chunks"])
+        self.assertEqual(names[-1], "merged")
+        self.assertEqual(events[0][1], {"file_type": "docx", "chars": 20})
+        self.assertEqual(events[1][1], {"count": 3})
+        done = [data for event, data in events if event == "chunk_done"]
+        self.assertEqual(sorted(data["index"] for data in done), [0, 1, 2])
+        self.assertEqual([data["completed"] for data in done], [1, 2, 3])
+        partial = "\n\n".join(data["markdown"] for event, data in events if event == "partial")
+        self.assertEqual(partial, markdown)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import logging
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src.rule_engine import RuleEngine, StructureRule, load_rule_sets
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+def labels(result):
+    return [(line.label, line.text) for line in result.lines]
+
+
+class TestRuleEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = RuleEngine(load_rule_sets(["all"]))
+
+    def test_regulation_hierarchy(self):
+        result = self.engine.classify([
+            "低空飞行服务管理办法",
+            "第一章 总则",
+            "第一条 为了加强低空飞行活动服务管理，促进本市低空经济高质量发展，根据有关法律法规，制定本办法。",
+            "第二章 职责分工",
+            "第一节 市级职责",
+            "第二条 市人民政府加强对低空飞行服务管理工作的领导，统筹本市低空飞行服务管理工作。",
+        ])
+        self.assertEqual([label for label, _ in labels(result)], ["H1", "H2", "P", "H2", "H3", "P"])
+        self.assertEqual(result.confidence, 1.0)
+
+    def test_levels_are_compressed_to_present_schemes(self):
+        result = self.engine.classify([
+            "一、总体要求",
+            "（一）指导思想",
+            "坚持以人民为中心的发展思想，全面提升服务水平，推动经济社会高质量发展。",
+            "二、重点任务",
+        ])
+        self.assertEqual([label for label, _ in labels(result)], ["H1", "H2", "P", "H1"])
+
+    def test_decimal_numbering(self):
+        result = self.engine.classify(["1 范围", "1.1 适用对象", "1.1.1 术语", "2 规范性引用文件", "2024 年 10 月 15 日"])
+        self.assertEqual([label for label, _ in labels(result)], ["H1", "H2", "H3", "H1", "P"])
+
+    def test_unnumbered_short_lines_lower_confidence(self):
+        result = self.engine.classify(["第一章 总则", "附件说明", "附件列表", "这是一段足够长的正文内容，用于说明规则引擎会把它识别为确定的段落。"])
+        self.assertAlmostEqual(result.confidence, 0.5)
+        self.assertEqual(result.lines[1].label, "P")
+        self.assertLess(result.lines[1].confidence, 1.0)
+
+    def test_document_without_numbered_headings_has_zero_confidence(self):
+        result = self.engine.classify(["这是一段没有任何编号标题的正文内容，规则引擎无法判断结构。"])
+        self.assertEqual(result.confidence, 0.0)
+        self.assertEqual(self.engine.classify([]).confidence, 0.0)
+
+    def test_custom_rules_file(self):
+        work_dir = tempfile.mkdtemp(prefix="rule_engine_test_")
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        rules_file = os.path.join(work_dir, "rules.json")
+        with open(rules_file, "w", encoding="utf-8") as f:
+            json.dump({"contract": [{"name": "clause", "rank": 5, "pattern": "Clause \\d+"},
+                                    {"name": "broken", "rank": 6, "pattern": "("}]}, f)
+        rules = load_rule_sets(["contract", "unknown"], rules_file)
+        self.assertEqual(rules, [StructureRule("clause", 5, "Clause \\d+")])
+        result = RuleEngine(rules).classify(["Clause 1 Definitions", "Clause 2 Term"])
+        self.assertEqual([label for label, _ in labels(result)], ["H1", "H1"])
+
+    def test_custom_rules_with_inline_flags_are_combined(self):
+        work_dir = tempfile.mkdtemp(prefix="rule_engine_test_")
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        rules_file = os.path.join(work_dir, "rules.json")
+        with open(rules_file, "w", encoding="utf-8") as f:
+            json.dump({"english": [{"name": "chapter", "rank": 5, "pattern": "(?i)chapter \\d+"},
+                                   {"name": "late_flag", "rank": 6, "pattern": "section(?i)"}]}, f)
+        rules = load_rule_sets(["english", "chinese_legal"], rules_file)
+        # 开头的全局标志改写为作用域标志组；不在开头的全局标志本身无效，规则被跳过
+        self.assertEqual(rules[0], StructureRule("chapter", 5, "(?i:chapter \\d+)"))
+        self.assertNotIn("late_flag", [rule.name for rule in rules])
+
+        result = RuleEngine(rules).classify(["CHAPTER 1 Scope", "第一条 总则", "Chapter 2 Terms"])
+        self.assertEqual([label for label, _ in labels(result)], ["H1", "H2", "H1"])
+
+    def test_conflicting_rules_fall_back_to_separate_scans(self):
+        rules = [StructureRule("chapter", 5, r"(?P<number>\d+)章"), StructureRule("article", 6, r"条(?P<number>\d+)"),
+                 StructureRule("chapter_any", 7, r"\d+")]
+        engine = RuleEngine(rules)
+        matched = engine.match_rules(["1章 总则", "条2 定义", "3 其他"])
+        self.assertEqual([rule.name for rule in matched], ["chapter", "article", "chapter_any"])
+
+
+if __name__ == '__main__':
+    unittest.main()
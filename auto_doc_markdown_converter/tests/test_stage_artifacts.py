@@ -0,0 +1,242 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+import logging
+from unittest.mock import patch
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src import core_processor
+from auto_doc_markdown_converter.src.core_processor import ExtractedDocument, LlmWorkPlan
+from auto_doc_markdown_converter.src.hybrid_labeler import LabeledLine
+from auto_doc_markdown_converter.src.pipeline import DocumentPipeline
+from auto_doc_markdown_converter.src.stage_artifacts import (
+    ArtifactBundle, open_artifact_bundle, input_fingerprint, extract_record, document_from_record,
+)
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+class TestArtifactBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.artifacts_dir = tempfile.mkdtemp(prefix="artifacts_test_")
+        self.path = os.path.join(self.artifacts_dir, "doc.jsonl.gz")
+
+    def tearDown(self):
+        shutil.rmtree(self.artifacts_dir, ignore_errors=True)
+
+    def test_records_survive_reload(self):
+        bundle = ArtifactBundle(self.path)
+        bundle.put("extract", {"structure_mode": "llm", "text": "正文"})
+        bundle.put("split", {"plan": None})
+        bundle.put("llm", {"results": ["P: 正文"]})
+
+        reloaded = ArtifactBundle(self.path)
+        self.assertEqual(reloaded.stages(), ["extract", "split", "llm"])
+        self.assertEqual(reloaded.get("llm"), {"results": ["P: 正文"]})
+        self.assertIsNone(reloaded.get("merge"))
+
+    def test_rewriting_a_stage_invalidates_later_stages(self):
+        bundle = ArtifactBundle(self.path)
+        for stage in ("extract", "split", "llm", "merge", "render"):
+            bundle.put(stage, {"structure_mode": "llm", "value": stage})
+        bundle.put("split", {"value": "new split"})
+        self.assertEqual(bundle.stages(), ["extract", "split"])
+        self.assertEqual(ArtifactBundle(self.path).stages(), ["extract", "split"])
+
+        # 重新提取表示重新开始处理，旧记录全部清除
+        bundle.put("extract", {"structure_mode": "llm", "value": "again"})
+        self.assertEqual(ArtifactBundle(self.path).stages(), ["extract"])
+
+    def test_truncated_last_record_is_skipped(self):
+        bundle = ArtifactBundle(self.path)
+        bundle.put("extract", {"structure_mode": "llm"})
+        first_record_size = os.path.getsize(self.path)
+        bundle.put("split", {"plan": {"chunks": ["文本块" * 50], "direct": True}})
+        # 模拟写入第二条记录时进程中断
+        with open(self.path, "rb") as f:
+            data = f.read()
+        with open(self.path, "wb") as f:
+            f.write(data[:first_record_size + (len(data) - first_record_size) // 2])
+        self.assertEqual(ArtifactBundle(self.path).stages(), ["extract"])
+
+    def test_resume_stage_falls_back_when_records_are_missing(self):
+        fingerprint = {"input_sha256": "ab" * 32, "input_size": 10}
+        bundle = ArtifactBundle(self.path)
+        self.assertEqual(bundle.resume_stage("render", "llm", fingerprint), "extract")
+        bundle.put("extract", dict(fingerprint, structure_mode="llm"))
+        bundle.put("split", {"plan": None})
+        self.assertEqual(bundle.resume_stage("merge", "llm", fingerprint), "llm")
+        self.assertEqual(bundle.resume_stage("split", "llm", fingerprint), "split")
+        # 结构识别模式变化后已有记录不可复用
+        self.assertEqual(bundle.resume_stage("llm", "outline", fingerprint), "extract")
+
+    def test_resume_stage_requires_matching_input_fingerprint(self):
+        input_path = os.path.join(self.artifacts_dir, "a.docx")
+        with open(input_path, "wb") as f:
+            f.write(b"first version")
+        fingerprint = input_fingerprint(input_path)
+        bundle = ArtifactBundle(self.path)
+        bundle.put("extract", dict(fingerprint, structure_mode="llm"))
+        bundle.put("split", {"plan": None})
+        self.assertEqual(bundle.resume_stage("llm", "llm", input_fingerprint(input_path)), "llm")
+
+        # 内容改变而大小不变
+        with open(input_path, "wb") as f:
+            f.write(b"other version")
+        self.assertEqual(bundle.resume_stage("llm", "llm", input_fingerprint(input_path)), "extract")
+        # 输入文件无法读取，或结果包来自没有记录指纹的旧版本
+        self.assertIsNone(input_fingerprint(os.path.join(self.artifacts_dir, "missing.docx")))
+        self.assertEqual(bundle.resume_stage("llm", "llm", None), "extract")
+        bundle.put("extract", {"structure_mode": "llm"})
+        self.assertEqual(bundle.resume_stage("extract", "llm", fingerprint), "extract")
+
+    def test_extract_record_round_trip(self):
+        document = ExtractedDocument("/in/a.pdf", "pdf", None, [LabeledLine("H1", "标题", 0.9)])
+        restored = document_from_record(extract_record(document, "layout"), "/moved/a.pdf")
+        self.assertEqual(restored, document._replace(input_filepath="/moved/a.pdf"))
+
+
+def fake_extract(input_filepath, structure_mode=None):
+    return ExtractedDocument(input_filepath, "docx", f"正文 {os.path.basename(input_filepath)}")
+
+
+class TestPipelineFromStage(unittest.TestCase):
+    """DocumentPipeline 保存各阶段输出，并从指定阶段重新开始处理。"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="artifacts_pipeline_test_")
+        self.results_dir = os.path.join(self.root, "out")
+        self.artifacts_dir = os.path.join(self.root, "artifacts")
+        self.extract_calls = []
+        self.llm_calls = []
+
+        def extract(input_filepath, structure_mode=None):
+            self.extract_calls.append(input_filepath)
+            return fake_extract(input_filepath, structure_mode)
+
+        def analyze(text):
+            self.llm_calls.append(text)
+            return f"P: {text}"
+
+        for patcher in (
+            patch.object(core_processor, "extract_document", side_effect=extract),
+            patch.object(core_processor, "analyze_text_with_llm", side_effect=analyze),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def input_file(self, name, content=b"original"):
+        """在输入目录中创建 (或改写) 输入文件并返回其路径。"""
+        path = os.path.join(self.root, "in", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def run_pipeline(self, paths, from_stage="extract"):
+        pipeline = DocumentPipeline(self.results_dir, structure_mode="llm", use_processes=False,
+                                    extract_workers=1, llm_workers=2,
+                                    artifacts_dir=self.artifacts_dir, from_stage=from_stage)
+        return pipeline.run(paths)
+
+    def read_output(self, name):
+        with open(os.path.join(self.results_dir, name), encoding="utf-8") as f:
+            return f.read()
+
+    def test_full_run_saves_every_stage(self):
+        path = self.input_file("a.docx")
+        self.run_pipeline([path])
+        bundle = open_artifact_bundle(self.artifacts_dir, path)
+        self.assertEqual(bundle.stages(), ["extract", "split", "llm", "merge", "render"])
+        self.assertEqual(bundle.get("llm"), {"results": ["P: 正文 a.docx"]})
+        self.assertEqual(bundle.get("render")["markdown"], self.read_output("a.md"))
+        self.assertEqual(bundle.get("extract")["input_sha256"], input_fingerprint(path)["input_sha256"])
+
+    def test_render_stage_skips_extraction_and_llm(self):
+        path = self.input_file("a.docx")
+        self.run_pipeline([path])
+        self.extract_calls.clear()
+        self.llm_calls.clear()
+
+        with patch.object(core_processor, "generate_markdown_from_labeled_text", return_value="# 新渲染\n"):
+            report = self.run_pipeline([path], from_stage="render")
+        self.assertTrue(report.results[0].output_path)
+        self.assertEqual(self.extract_calls, [])
+        self.assertEqual(self.llm_calls, [])
+        self.assertEqual(self.read_output("a.md"), "# 新渲染\n")
+
+    def test_modified_input_is_extracted_again(self):
+        path = self.input_file("a.docx")
+        self.run_pipeline([path])
+        self.input_file("a.docx", b"edited")
+        self.extract_calls.clear()
+        self.llm_calls.clear()
+
+        report = self.run_pipeline([path], from_stage="render")
+        self.assertTrue(report.results[0].output_path)
+        self.assertEqual(self.extract_calls, [path])
+        self.assertEqual(self.llm_calls, ["正文 a.docx"])
+        # 新的结果包记录了修改后的文件指纹，之后可以再次从中间阶段开始
+        bundle = open_artifact_bundle(self.artifacts_dir, path)
+        self.assertEqual(bundle.get("extract")["input_size"], len(b"edited"))
+        self.assertEqual(bundle.resume_stage("render", "llm", input_fingerprint(path)), "render")
+
+    def test_merge_stage_reuses_chunk_results(self):
+        path = self.input_file("long.docx")
+        plan = LlmWorkPlan(["第一块", "第二块"], False)
+        with patch.object(core_processor, "split_text_for_llm", return_value=plan):
+            self.run_pipeline([path])
+        self.assertEqual(sorted(self.llm_calls), ["第一块", "第二块"])
+        self.llm_calls.clear()
+
+        with patch.object(core_processor, "merge_processed_chunks",
+                          side_effect=lambda chunks, *a, **k: "\n".join(reversed(chunks))):
+            report = self.run_pipeline([path], from_stage="merge")
+        self.assertTrue(report.results[0].output_path)
+        self.assertEqual(self.llm_calls, [])
+        self.assertEqual(open_artifact_bundle(self.artifacts_dir, path).get("merge"),
+                         {"labeled_text": "P: 第二块\nP: 第一块"})
+
+    def test_malformed_bundle_fails_only_that_document(self):
+        broken, intact = self.input_file("broken.docx", b"broken"), self.input_file("intact.docx", b"intact")
+        self.run_pipeline([broken, intact])
+        bundle = open_artifact_bundle(self.artifacts_dir, broken)
+        merge = bundle.get("merge")
+        bundle.put("extract", dict(bundle.get("extract"), local_labels=[["H1"]]))
+        bundle.put("merge", merge)
+
+        outcome = {}
+        thread = threading.Thread(target=lambda: outcome.setdefault(
+            "report", self.run_pipeline([broken, intact], from_stage="render")), daemon=True)
+        thread.start()
+        thread.join(30)
+        self.assertFalse(thread.is_alive(), "流水线没有结束")
+        self.assertEqual([result.output_path is not None for result in outcome["report"].results], [False, True])
+
+    def test_missing_artifacts_fall_back_to_extraction(self):
+        path = self.input_file("new.docx")
+        report = self.run_pipeline([path], from_stage="llm")
+        self.assertTrue(report.results[0].output_path)
+        self.assertEqual(self.extract_calls, [path])
+
+    def test_from_stage_requires_artifacts_dir(self):
+        with self.assertRaises(ValueError):
+            DocumentPipeline(self.results_dir, from_stage="merge")
+        with self.assertRaises(ValueError):
+            DocumentPipeline(self.results_dir, artifacts_dir=self.artifacts_dir, from_stage="unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
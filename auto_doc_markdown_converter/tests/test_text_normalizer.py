@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+import logging
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src.text_normalizer import normalize_text, OffsetMap
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+WRAPPED_PDF_TEXT = (
+    "第一章 总则\n"
+    "第一条 为了加强低空飞行活动服务管理，提升低空飞行服\n"
+    "务便利化、规范化、专业化水平，促进本市低空经济高质量发展，\n"
+    "结合本市实际，制定本办法。\n"
+    "第二条 本市行政区域范围内的民用航空器低空飞行服务管\n"
+    "理工作，适用本办法。"
+)
+
+
+class TestNormalizeText(unittest.TestCase):
+
+    def test_wrapped_lines_are_joined_into_paragraphs(self):
+        result = normalize_text(WRAPPED_PDF_TEXT)
+        self.assertEqual(result.text.split("\n\n"), [
+            "第一章 总则",
+            "第一条 为了加强低空飞行活动服务管理，提升低空飞行服务便利化、规范化、专业化水平，"
+            "促进本市低空经济高质量发展，结合本市实际，制定本办法。",
+            "第二条 本市行政区域范围内的民用航空器低空飞行服务管理工作，适用本办法。",
+        ])
+
+    def test_dehyphenation_and_whitespace_collapse(self):
+        text = ("The   quick brown fox jumps over the lazy dog and then con-\n"
+                "tinues running through the forest to the river bank.")
+        result = normalize_text(text)
+        self.assertEqual(result.text, "The quick brown fox jumps over the lazy dog and then continues "
+                                      "running through the forest to the river bank.")
+
+    def test_full_width_alphanumerics_are_converted(self):
+        result = normalize_text("版本Ｖ２　说明，保留全角标点。")
+        self.assertEqual(result.text, "版本V2 说明，保留全角标点。")
+
+    def test_blank_line_runs_collapse_to_single_paragraph_break(self):
+        result = normalize_text("标题\n\n\n\n正文。\n  \n结尾。")
+        self.assertEqual(result.text, "标题\n\n正文。\n\n结尾。")
+
+    def test_steps_are_configurable(self):
+        result = normalize_text("a  b\nc", steps=["collapse_whitespace"])
+        self.assertEqual(result.text, "a b\nc")
+        untouched = normalize_text("ａ  b", steps=[])
+        self.assertEqual(untouched.text, "ａ  b")
+
+    def test_offset_map_points_back_to_original_text(self):
+        text = "  Ｈｅａｄｅｒ\n\nbody   text con-\ntinues here."
+        result = normalize_text(text, steps=["collapse_whitespace", "dehyphenate", "join_lines"])
+        for word in ("Ｈｅａｄｅｒ", "body", "text", "here"):
+            norm_pos = result.text.index(word)
+            orig_pos = result.offset_map.to_original(norm_pos)
+            self.assertEqual(text[orig_pos:orig_pos + len(word)], word)
+        span = result.offset_map.original_span(result.text.index("continues"), len(result.text))
+        self.assertEqual(text[span[0]:span[1]], "con-\ntinues here.")
+
+    def test_token_reduction_is_reported(self):
+        text = "很长的一行文本" * 3 + "     \n" + "   " * 20 + "继续。"
+        result = normalize_text(text)
+        self.assertGreater(result.original_tokens, result.normalized_tokens)
+        self.assertEqual(result.token_reduction, result.original_tokens - result.normalized_tokens)
+        self.assertGreater(result.token_reduction_ratio, 0)
+
+
+class TestOffsetMap(unittest.TestCase):
+
+    def test_adjacent_identity_segments_are_merged(self):
+        offset_map = OffsetMap()
+        offset_map.add(0, 0, 3, 3)
+        offset_map.add(3, 3, 2, 2)
+        offset_map.add(5, 7, 1, 4)
+        self.assertEqual(len(offset_map), 2)
+        self.assertEqual(offset_map.to_original(4), 4)
+        self.assertEqual(offset_map.to_original(5), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+import logging
+
+# Ensure project root is in sys.path for src module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from auto_doc_markdown_converter.src.text_splitter import (
+    estimate_tokens, split_text_into_content_defined_chunks,
+)
+
+logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+def make_document(paragraphs=200):
+    return "".join(
+        f"第 {i} 段：这是用于测试内容定义分块的段落，包含编号 {i * 7919 % 1000} 以及一些填充文字。\n\n"
+        for i in range(paragraphs)
+    )
+
+
+class TestContentDefinedChunks(unittest.TestCase):
+
+    MAX_TOKENS = 200
+
+    def split(self, text):
+        return split_text_into_content_defined_chunks(text, max_tokens_per_chunk=self.MAX_TOKENS)
+
+    def test_chunks_reassemble_original_text(self):
+        text = make_document()
+        chunks = self.split(text)
+        self.assertGreater(len(chunks), 5)
+        self.assertEqual("".join(chunks), text)
+
+    def test_chunks_respect_token_budget(self):
+        text = make_document() + "超长段落" * 500 + "。\n"
+        for chunk in self.split(text):
+            self.assertLessEqual(estimate_tokens(chunk), self.MAX_TOKENS)
+
+    def test_output_is_deterministic(self):
+        text = make_document()
+        self.assertEqual(self.split(text), self.split(text))
+
+    def test_edit_changes_only_nearby_chunks(self):
+        text = make_document()
+        original = self.split(text)
+        edited_text = text.replace("第 20 段：", "第 20 段 (已修订)：", 1)
+        edited = self.split(edited_text)
+
+        changed = set(edited) - set(original)
+        self.assertGreaterEqual(len(changed), 1)
+        self.assertLessEqual(len(changed), 2)
+        self.assertLessEqual(len(set(original) - set(edited)), 2)
+
+    def test_empty_text(self):
+        self.assertEqual(self.split("  \n\n"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
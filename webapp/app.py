@@ -1,8 +1,15 @@
 import os
+import io
 import sys
+import json
+import uuid
+import hashlib
 import logging
-from flask import Flask, request, jsonify, send_from_directory, render_template # 确保导入 render_template
+import tempfile
+from flask import Flask, Request, Response, current_app, request, jsonify, send_file, send_from_directory, render_template # 确保导入 render_template
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from werkzeug.exceptions import NotFound
 
 # 临时解决方案：将项目根目录添加到 sys.path 以便导入 src 模块
 # 假设 webapp 目录位于项目根目录下
@@ -11,9 +18,52 @@ from auto_doc_markdown_converter.src.core_processor import process_document_to_m
 # 如果 src/__init__.py 中导出了 process_document_to_markdown，也可以用：
 # from auto_doc_markdown_converter.src import process_document_to_markdown
 from auto_doc_markdown_converter.src.utils import setup_logging # 导入日志设置
+from auto_doc_markdown_converter.src import config
+from auto_doc_markdown_converter.src.build_manifest import conversion_settings, settings_digest
+from webapp.job_queue import JobQueue, ConversionJob, JobEvent, JOB_SUCCESS, JOB_ERROR, REUSED_IN_FLIGHT
+from webapp.result_cache import ResultCache, make_cache_key
+from webapp.delivery import MIN_COMPRESS_SIZE, compress_bytes, compressed_variant, negotiate_encoding
+from webapp.preview import PreviewCache
+
+class HashingSpooledTemporaryFile(tempfile.SpooledTemporaryFile):
+    """
+    在写入时同时计算内容 SHA-256 摘要的 SpooledTemporaryFile。
+    werkzeug 解析上传时按顺序写入整个文件，解析完成后摘要即可使用，不需要再读取一遍缓冲区。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sha256 = hashlib.sha256()
+
+    def write(self, s):
+        self._sha256.update(s)
+        return super().write(s)
+
+    def writelines(self, iterable):
+        for line in iterable:
+            self.write(line)
+
+    def sha256_hexdigest(self) -> str:
+        """返回已写入内容的十六进制 SHA-256 摘要。"""
+        return self._sha256.hexdigest()
+
+
+class SpooledUploadRequest(Request):
+    """
+    上传的文件不超过 UPLOAD_MEMORY_LIMIT 字节时保存在内存中，超过时才写入 UPLOAD_FOLDER 中的匿名临时文件
+    (每个文件唯一，关闭后自动删除)。缓冲区直接交给后台任务和提取器，不再另存为上传文件；
+    内容摘要在写入缓冲区时计算 (见 HashingSpooledTemporaryFile)。
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        upload_dir = current_app.config['UPLOAD_FOLDER']
+        os.makedirs(upload_dir, exist_ok=True)
+        return HashingSpooledTemporaryFile(max_size=current_app.config['UPLOAD_MEMORY_LIMIT'], dir=upload_dir)
+
 
 # 初始化 Flask 应用
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
 
 # 配置上传文件和结果文件的存储目录
 # UPLOAD_FOLDER 和 RESULTS_FOLDER 的定义与之前相同
@@ -29,6 +79,32 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['RESULTS_FOLDER'] = RESULTS_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024  # 限制上传大小为 32MB
 
+
+def _read_job_workers(default=4):
+    """读取 WEBAPP_JOB_WORKERS (后台同时转换的文件数)，缺失或非法时使用默认值。"""
+    try:
+        value = int(os.environ.get('WEBAPP_JOB_WORKERS', default))
+    except ValueError:
+        value = 0
+    return value if value > 0 else default
+
+
+def _read_upload_memory_limit(default_mb=4):
+    """读取 WEBAPP_UPLOAD_MEMORY_MB (单个上传文件在内存中保存的最大 MB 数)，缺失或非法时使用默认值。"""
+    try:
+        value = int(os.environ.get('WEBAPP_UPLOAD_MEMORY_MB', default_mb))
+    except ValueError:
+        value = -1
+    return (value if value >= 0 else default_mb) * 1024 * 1024
+
+
+app.config['JOB_WORKERS'] = _read_job_workers()
+app.config['UPLOAD_MEMORY_LIMIT'] = _read_upload_memory_limit()
+# 是否复用相同上传 (内容与转换设置都相同) 的转换结果
+app.config['RESULT_CACHE'] = os.environ.get('WEBAPP_RESULT_CACHE', 'true').strip().lower() not in ('0', 'false', 'no', 'off')
+# /events 连接在没有新事件时每隔多少秒发送一次注释行，防止代理因空闲而断开连接
+app.config['SSE_KEEPALIVE_SECONDS'] = 15
+
 # 获取 Flask 应用的 logger 实例
 # 在 debug=True 模式下，Flask 会自动配置一个基本的 StreamHandler
 # 如果需要更复杂的日志（例如写入文件），可以在非 debug 模式下配置
@@ -43,6 +119,63 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+
+# 各结果目录的上传结果缓存 (测试中可能更换 RESULTS_FOLDER)
+_result_caches = {}
+
+
+def get_result_cache():
+    """返回当前结果目录的上传结果缓存；未启用 RESULT_CACHE 时返回 None。"""
+    if not app.config['RESULT_CACHE']:
+        return None
+    results_dir = app.config['RESULTS_FOLDER']
+    return _result_caches.setdefault(results_dir, ResultCache(results_dir))
+
+
+def run_conversion_job(job: ConversionJob):
+    """
+    在后台线程中转换一个上传的文件，返回生成的 Markdown 文件路径 (失败时为 None)。
+    上传的内容直接交给提取器；成功时将结果记录到上传结果缓存。无论成功与否，转换结束后都会关闭上传缓冲区。
+    """
+    try:
+        output_path = process_document_to_markdown(job.upload, job.results_dir,
+                                                   name=secure_filename(job.original_filename))
+        cache = get_result_cache()
+        if output_path and job.coalesce_key and cache is not None:
+            cache.put(job.coalesce_key, output_path)
+        return output_path
+    finally:
+        job.upload.close()
+
+
+def detach_upload(file):
+    """
+    取出上传文件的缓冲区交给后台任务。请求结束时 Flask 会关闭请求中的所有文件，
+    因此将 FileStorage 的流换成空缓冲区，之后由任务负责关闭取出的缓冲区。
+    """
+    stream = file.stream
+    file.stream = io.BytesIO()
+    return stream
+
+
+# 后台转换任务队列：/upload 提交任务后立即返回，同一次上传的多个文件在线程池中并发转换
+job_queue = JobQueue(run_conversion_job, workers=app.config['JOB_WORKERS'])
+# 结果文件的服务器端预览 (每个文件只渲染一次，文件被修改后重新渲染)
+preview_cache = PreviewCache()
+
+
+def job_summary(job: ConversionJob):
+    """任务状态的 JSON 表示；转换成功时包含用于下载的 processed_filename。"""
+    summary = job.to_dict()
+    summary["status_url"] = f"/jobs/{job.job_id}"
+    summary["result_url"] = f"/jobs/{job.job_id}/result"
+    summary["preview_url"] = f"/jobs/{job.job_id}/preview"
+    if summary["status"] == JOB_SUCCESS and job.output_path:
+        # 每个任务的结果保存在 RESULTS_FOLDER/<任务 ID>/ 下，同名文件互不覆盖
+        relative_path = os.path.relpath(job.output_path, app.config['RESULTS_FOLDER'])
+        summary["processed_filename"] = relative_path.replace(os.sep, '/')
+    return summary
+
 @app.route('/')
 def index():
     """渲染主页 (index.html)。"""
@@ -52,8 +185,9 @@ def index():
 @app.route('/upload', methods=['POST'])
 def upload_files():
     """
-    处理文件上传并将文档转换为 Markdown。
-    支持上传多个文件。
+    处理文件上传：保存每个上传的文件并提交后台转换任务，立即返回任务 ID (不等待转换完成)。
+    支持上传多个文件，同一次上传的文件并发转换。转换状态和结果通过 /jobs/<id> 与 /jobs/<id>/result 获取。
+    内容与转换设置都相同的文件已转换过时直接返回已有结果；正在转换时合并到该转换 (见 result_cache.py)。
     """
     if 'files[]' not in request.files:
         logger.warning("上传请求中没有文件部分 (files[])")
@@ -66,76 +200,148 @@ def upload_files():
         return jsonify({"error": "没有选择文件"}), 400
 
     results = []
+    # 转换设置的摘要：设置变化 (例如更换模型或结构识别模式) 后不会复用旧的结果
+    current_settings_digest = settings_digest(conversion_settings(config.STRUCTURE_MODE))
+    cache = get_result_cache()
 
     for file in uploaded_files:
         # 首先使用原始文件名进行类型检查
         if file and file.filename and allowed_file(file.filename):
-            # 在确认文件类型允许后，再获取安全的文件名用于保存
-            original_filename_for_saving = secure_filename(file.filename)
-            # 但日志和后续处理中，我们可能仍想引用用户上传时的原始文件名
+            # 日志和后续处理中引用用户上传时的原始文件名 (输出文件名在转换时用 secure_filename 清理)
             user_original_filename = file.filename # 保留用户上传的原始文件名
 
-            temp_upload_path = os.path.join(app.config['UPLOAD_FOLDER'], original_filename_for_saving)
-            
-            try:
-                file.save(temp_upload_path)
-                logger.info(f"文件 '{user_original_filename}' (保存为 '{original_filename_for_saving}') 已临时保存到 '{temp_upload_path}'")
-
-                # 调用核心处理逻辑
-                markdown_file_path = process_document_to_markdown(temp_upload_path, app.config['RESULTS_FOLDER'])
-
-                if markdown_file_path:
-                    processed_filename = os.path.basename(markdown_file_path)
-                    results.append({
-                        "original_filename": user_original_filename, # 返回给用户的应是原始文件名
-                        "status": "success",
-                        "processed_filename": processed_filename, # 用于后续下载
-                        "message": "文件处理成功"
-                    })
-                    logger.info(f"文件 '{user_original_filename}' 处理成功，输出为 '{processed_filename}'")
-                else:
-                    results.append({
-                        "original_filename": user_original_filename,
-                        "status": "error",
-                        "message": "文件处理失败 (核心处理器未返回有效路径，详见服务器日志)"
-                    })
-                    logger.warning(f"文件 '{user_original_filename}' 处理失败 (核心处理器返回 None)。")
-
-            except Exception as e:
-                logger.error(f"处理文件 '{user_original_filename}' 时发生严重错误: {e}", exc_info=True)
-                results.append({
-                    "original_filename": user_original_filename,
-                    "status": "error",
-                    "message": f"服务器内部错误: {str(e)}"
-                })
-            finally:
-                # 清理临时上传的文件
-                if os.path.exists(temp_upload_path):
-                    try:
-                        os.remove(temp_upload_path)
-                        logger.debug(f"已删除临时上传文件: {temp_upload_path}")
-                    except OSError as e_remove:
-                        logger.error(f"删除临时文件 {temp_upload_path} 失败: {e_remove}")
+            # 每个任务使用独立的结果目录，同一次上传中的同名文件可以并发转换而互不覆盖。
+            # 上传的内容保存在 SpooledUploadRequest 提供的缓冲区中 (小文件在内存中)，直接交给后台任务，不再另存到 UPLOAD_FOLDER
+            job_id = uuid.uuid4().hex
+            upload = detach_upload(file)
+
+            # 内容摘要在接收上传时已经计算，用于查找缓存结果和合并相同的转换
+            content_hash = upload.sha256_hexdigest()
+            logger.info(f"已接收文件 '{user_original_filename}' (内容摘要 {content_hash[:12]})")
+
+            cache_key = make_cache_key(content_hash, user_original_filename.rsplit('.', 1)[1],
+                                       current_settings_digest)
+            cached_output = cache.get(cache_key) if cache is not None else None
+            if cached_output is not None:
+                # 相同的文件已经转换过：直接返回已有结果
+                upload.close()
+                job = job_queue.complete(user_original_filename, cached_output, job_id=job_id)
+            else:
+                job = job_queue.submit(user_original_filename, upload,
+                                       os.path.join(app.config['RESULTS_FOLDER'], job_id), job_id=job_id,
+                                       coalesce_key=cache_key)
+                if job.reused == REUSED_IN_FLIGHT:
+                    # 相同的文件正在转换：合并到该任务，本次上传的内容不再需要
+                    upload.close()
+            results.append(job_summary(job))
         elif file and file.filename: # 文件存在但类型不允许 (基于原始文件名判断)
             user_original_filename = file.filename
             logger.warning(f"文件 '{user_original_filename}' 的类型不被允许。")
             results.append({
                 "original_filename": user_original_filename,
-                "status": "error",
-                "message": f"文件类型 '{user_original_filename.rsplit('.', 1)[1].lower() if '.' in user_original_filename else '未知'}' 不受支持。请上传 .docx 或 .pdf 文件。"
+                "status": JOB_ERROR,
+                "message": f"文件类型 '{'.' + user_original_filename.rsplit('.', 1)[1].lower() if '.' in user_original_filename else '未知'}' 不受支持。请上传 .docx 或 .pdf 文件。"
             })
         else:
             logger.debug("在上传列表中遇到一个无效的或没有文件名的文件部分。")
             # 可以选择为无效部分添加一个错误条目到 results，或者静默忽略
 
-    return jsonify(results), 200
+    # 202 Accepted：任务已接受，转换在后台进行
+    return jsonify(results), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """返回转换任务的状态 (queued / running / success / error)。"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在或已过期"}), 404
+    return jsonify(job_summary(job)), 200
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """
+    下载转换任务生成的 Markdown 文件。
+    任务尚未结束时返回 202 和任务状态；任务失败时返回 409 和失败原因。
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在或已过期"}), 404
+    summary = job_summary(job)
+    if not job.finished:
+        return jsonify(summary), 202
+    if summary["status"] != JOB_SUCCESS:
+        summary["error"] = summary["message"]
+        return jsonify(summary), 409
+    # 复用的结果文件可能来自另一个同内容的上传，下载时使用本任务上传的文件名
+    download_name = os.path.splitext(job.original_filename)[0] + '.md' if job.reused else None
+    return download_file(summary["processed_filename"], download_name)
+
+
+@app.route('/jobs/<job_id>/preview', methods=['GET'])
+def job_preview(job_id):
+    """返回转换任务结果的 HTML 预览 (见 preview_file)；任务尚未成功完成时返回 409。"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在或已过期"}), 404
+    summary = job_summary(job)
+    if summary["status"] != JOB_SUCCESS:
+        summary["error"] = summary["message"] if job.finished else "任务尚未完成，暂无可预览的结果。"
+        return jsonify(summary), 409
+    return preview_file(summary["processed_filename"])
+
+
+def format_sse_event(event: JobEvent, job: ConversionJob):
+    """将任务事件格式化为 Server-Sent Events 消息；done / failed 事件附带完整的任务状态 (包括下载地址)。"""
+    data = dict(event.data, job_id=event.job_id)
+    if event.event in ("done", "failed"):
+        data.update(job_summary(job))
+    payload = json.dumps(data, ensure_ascii=False)
+    # data 字段中不能有换行 (json.dumps 已将换行转义)，每条消息以空行结束
+    return f"id: {event.seq}\nevent: {event.event}\ndata: {payload}\n\n"
+
+
+@app.route('/events', methods=['GET'])
+def job_events():
+    """
+    以 Server-Sent Events 推送一组任务的进度事件 (查询参数 jobs=<id>,<id>,...)，所有任务结束后关闭连接。
+    事件依次为 queued、running、extracted、chunks、chunk_done (每个文本块)、partial (可按顺序输出的部分 Markdown)、
+    merged，最后是 done 或 failed。断线重连时浏览器发送 Last-Event-ID，只推送之后的事件。
+    """
+    job_ids = [job_id for job_id in request.args.get('jobs', '').split(',') if job_id]
+    jobs = {job_id: job for job_id, job in ((job_id, job_queue.get(job_id)) for job_id in job_ids) if job is not None}
+    if not jobs:
+        return jsonify({"error": "任务不存在或已过期"}), 404
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('after') or 0)
+    except ValueError:
+        last_event_id = 0
+    keepalive_seconds = app.config['SSE_KEEPALIVE_SECONDS']
+
+    def stream():
+        after = last_event_id
+        while True:
+            events = job_queue.wait_for_events(jobs, after, timeout=keepalive_seconds)
+            if not events:
+                if all(job.finished for job in jobs.values()):
+                    return
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                after = event.seq
+                yield format_sse_event(event, jobs[event.job_id])
+
+    # X-Accel-Buffering: 禁止 nginx 缓冲事件流
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/download/<path:filename>', methods=['GET'])
-def download_file(filename):
+def download_file(filename, download_name=None):
     """
     处理文件下载请求。
-    从 RESULTS_FOLDER 安全地发送指定的文件。
+    从 RESULTS_FOLDER 安全地发送指定的文件。download_name 为浏览器保存时使用的文件名 (默认与 filename 相同)。
     """
     logger.info(f"收到下载文件 '{filename}' 的请求。")
     
@@ -150,17 +356,83 @@ def download_file(filename):
     # 如果 processed_filename 是直接从用户输入构造的，或者包含路径信息，则必须用 secure_filename。
     # 在当前场景下，processed_filename 是 os.path.basename(markdown_file_path)，应该是安全的。
 
+    # send_file 会处理 ETag / Last-Modified 条件请求与 Range 请求；
+    # 客户端接受 br 或 gzip 时发送预先压缩好的文件 (见 delivery.py)，响应因 Accept-Encoding 而异
     try:
-        logger.debug(f"尝试从目录 '{results_dir}' 发送文件 '{filename}'。")
-        return send_from_directory(results_dir, filename, as_attachment=True)
+        encoding = negotiate_encoding(request.accept_encodings)
+        path = safe_join(results_dir, filename) if encoding else None
+        variant_path = compressed_variant(path, encoding) if path and os.path.isfile(path) else None
+        if variant_path:
+            logger.debug(f"发送文件 '{filename}' 的 {encoding} 压缩版本。")
+            response = send_file(variant_path, as_attachment=True,
+                                 download_name=download_name or os.path.basename(filename))
+            response.headers['Content-Encoding'] = encoding
+        else:
+            logger.debug(f"尝试从目录 '{results_dir}' 发送文件 '{filename}'。")
+            if download_name:
+                response = send_from_directory(results_dir, filename, as_attachment=True, download_name=download_name)
+            else:
+                response = send_from_directory(results_dir, filename, as_attachment=True)
+        response.vary.add('Accept-Encoding')
+        return response
     except FileNotFoundError:
         logger.error(f"请求下载的文件在服务器上未找到: {os.path.join(results_dir, filename)}")
         return jsonify({"error": "文件未找到"}), 404
+    except NotFound:
+        # send_from_directory 在文件不存在时抛出 NotFound，交给 Flask 返回标准的 404 响应
+        logger.error(f"请求下载的文件在服务器上未找到: {os.path.join(results_dir, filename)}")
+        raise
     except Exception as e:
         logger.error(f"下载文件 '{filename}' 时发生服务器内部错误: {e}", exc_info=True)
         return jsonify({"error": "服务器内部错误，无法提供文件下载。"}), 500
 
 
+@app.route('/preview/<path:filename>', methods=['GET'])
+def preview_file(filename):
+    """
+    返回 RESULTS_FOLDER 中 Markdown 文件一节的 HTML 预览 (查询参数 section，从 0 开始，默认第一节)。
+    JSON 包含 html、section、section_count 与各节标题 titles。文件在服务器端只渲染一次 (见 preview.py)，
+    响应带有 ETag / Last-Modified，未修改时返回 304；客户端接受时用 br 或 gzip 压缩。
+    """
+    path = safe_join(app.config['RESULTS_FOLDER'], filename)
+    if path is None or not os.path.isfile(path):
+        logger.error(f"请求预览的文件在服务器上未找到: {filename}")
+        return jsonify({"error": "文件未找到"}), 404
+    try:
+        section = int(request.args.get('section', 0))
+    except ValueError:
+        return jsonify({"error": "section 参数必须是整数"}), 400
+
+    try:
+        document = preview_cache.get(path)
+    except FileNotFoundError:
+        return jsonify({"error": "文件未找到"}), 404
+    except Exception as e:
+        logger.error(f"渲染文件 '{filename}' 的预览时发生错误: {e}", exc_info=True)
+        return jsonify({"error": "服务器内部错误，无法生成预览。"}), 500
+    if not 0 <= section < len(document.sections):
+        return jsonify({"error": f"章节 {section} 不存在", "section_count": len(document.sections)}), 404
+
+    encoding = negotiate_encoding(request.accept_encodings)
+    response = jsonify({
+        "filename": filename,
+        "section": section,
+        "section_count": len(document.sections),
+        "titles": [item.title for item in document.sections],
+        "html": document.sections[section].html,
+    })
+    mtime_ns, size = document.version
+    response.set_etag(f"{mtime_ns:x}-{size:x}-{section}-{encoding or 'identity'}")
+    response.last_modified = mtime_ns / 1e9
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    response.make_conditional(request)
+    if response.status_code == 200 and encoding and len(response.get_data()) >= MIN_COMPRESS_SIZE:
+        response.set_data(compress_bytes(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
 if __name__ == '__main__':
     # 为了确保 src 模块中的日志也能按预期工作 (如果它们也使用 logging.getLogger)
     # 我们可以在这里调用 setup_logging 来配置根记录器
@@ -179,6 +451,8 @@ if __name__ == '__main__':
         # 这会配置根记录器，Flask 的 app.logger 也会继承这个配置（或被覆盖）
         # 这对于开发调试是可行的，但生产环境需要更精细的日志管理策略
         setup_logging(logging.DEBUG if app.debug else logging.INFO)
+        # 配置按需加载：启动时立即校验 LLM 凭证，缺失时直接退出，而不是等到第一个转换任务才失败
+        config.require_llm_credentials()
 
 
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,88 @@
+"""
+Web 应用结果文件的压缩传输。
+
+Flask 的 send_file / send_from_directory 已经支持 ETag、Last-Modified 条件请求 (304) 与 Range 请求 (206)，
+这里补充内容编码协商：客户端的 Accept-Encoding 接受 br (需要安装可选依赖 brotli) 或 gzip 时，
+发送预先压缩好的文件 (保存在原文件所在目录的 ENCODED_DIRNAME 子目录中，每个文件每种编码只压缩一次)。
+压缩文件的修改时间与原文件保持一致，原文件被重新生成后压缩文件也会随之重新生成。
+条件请求与 Range 请求针对压缩后的文件进行 (与 HTTP 语义一致：范围作用于所选的表示)。
+"""
+import os
+import gzip
+import logging
+import tempfile
+from typing import Optional
+
+try:
+    import brotli  # 可选依赖：未安装时只提供 gzip
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 压缩文件保存在原文件所在目录的这个子目录中
+ENCODED_DIRNAME = ".encoded"
+# 小于该字节数的文件不压缩
+MIN_COMPRESS_SIZE = 1024
+# 各编码对应的压缩文件扩展名
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def available_encodings():
+    """服务器支持的内容编码，按优先顺序排列。"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encodings) -> Optional[str]:
+    """
+    根据请求的 Accept-Encoding (werkzeug 的 request.accept_encodings) 选择内容编码。
+    质量值相同时优先 br；客户端不接受任何压缩编码时返回 None。
+    """
+    best, best_quality = None, 0
+    for encoding in available_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """用指定的内容编码压缩数据。"""
+    if encoding == "br":
+        return brotli.compress(data)
+    # mtime=0：相同内容的压缩结果完全相同
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def compressed_variant(path: str, encoding: str) -> Optional[str]:
+    """
+    返回 path 的压缩文件路径，压缩文件不存在或已过期时重新生成 (临时文件 + os.replace 原子写入)。
+    文件过小或压缩失败时返回 None，调用方应发送原文件。
+    """
+    stat = os.stat(path)
+    if stat.st_size < MIN_COMPRESS_SIZE:
+        return None
+    directory, name = os.path.split(path)
+    encoded_dir = os.path.join(directory, ENCODED_DIRNAME)
+    variant_path = os.path.join(encoded_dir, name + ENCODING_SUFFIXES[encoding])
+    try:
+        if os.stat(variant_path).st_mtime_ns == stat.st_mtime_ns:
+            return variant_path
+    except FileNotFoundError:
+        pass
+
+    try:
+        with open(path, "rb") as f:
+            data = compress_bytes(f.read(), encoding)
+        os.makedirs(encoded_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=encoded_dir, prefix=f".{name}-", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # 与原文件的修改时间一致：用于判断压缩文件是否过期，Last-Modified 也与原文件相同
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, variant_path)
+    except OSError as e:
+        logger.warning(f"生成 '{path}' 的 {encoding} 压缩文件失败，将发送未压缩的文件: {e}")
+        return None
+    logger.debug(f"已生成 '{path}' 的 {encoding} 压缩文件 ({stat.st_size} -> {len(data)} 字节)。")
+    return variant_path
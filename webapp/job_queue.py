@@ -0,0 +1,282 @@
+"""
+Web 应用的后台转换任务队列。
+
+/upload 原先在 HTTP 请求内逐个同步转换上传的文件，多文件上传会长时间占用一个请求线程，经常超过反向代理的超时时间。
+现在 /upload 只保存上传的文件并为每个文件提交一个 ConversionJob，立即返回任务 ID；
+JobQueue 在后台线程池中执行转换 (同一次上传的多个文件并发处理)，客户端通过 /jobs/<id> 查询状态、下载结果。
+
+转换过程中，每个任务记录一串进度事件 (JobEvent)：queued、running，转换函数报告的 extracted、chunks、
+chunk_done、partial、merged (见 auto_doc_markdown_converter/src/progress.py)，最后是 done 或 failed。
+事件带有队列内单调递增的序号，/events 端点据此以 Server-Sent Events 推送，断线重连时从 Last-Event-ID 之后继续。
+
+提交任务时可以指定合并键 (coalesce_key，例如上传内容与转换设置的摘要，见 result_cache.py)：
+同一合并键的任务正在转换时，新任务不再提交转换，而是作为跟随者接收该任务的全部进度事件与最终结果。
+已有缓存结果的上传通过 complete 直接登记为已完成的任务。
+
+任务信息只保存在内存中：已结束超过 retention_seconds 的任务在提交新任务时清理 (转换结果文件不会被删除)。
+"""
+import time
+import uuid
+import logging
+import threading
+import concurrent.futures
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from auto_doc_markdown_converter.src.progress import progress_listener
+
+logger = logging.getLogger(__name__)
+
+# 任务状态：排队中、转换中、成功、失败
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCESS = "success"
+JOB_ERROR = "error"
+FINISHED_STATUSES = (JOB_SUCCESS, JOB_ERROR)
+# 任务结束时的事件名称
+STATUS_EVENTS = {JOB_SUCCESS: "done", JOB_ERROR: "failed"}
+# 任务结果的来源：None 表示自行转换；"cache" 表示复用缓存结果；"in_flight" 表示合并到正在进行的相同转换
+REUSED_FROM_CACHE = "cache"
+REUSED_IN_FLIGHT = "in_flight"
+
+
+class JobEvent(NamedTuple):
+    """一个进度事件。seq 在同一个 JobQueue 内单调递增。"""
+    seq: int
+    job_id: str
+    event: str
+    data: Dict[str, Any]
+
+
+class ConversionJob:
+    """一个上传文件的转换任务。状态字段只由 JobQueue 更新，读取时请使用 to_dict 获取一致的快照。"""
+
+    def __init__(self, job_id: str, original_filename: str, upload: Optional[BinaryIO], results_dir: Optional[str],
+                 coalesce_key: Optional[str] = None):
+        self.job_id = job_id
+        self.original_filename = original_filename
+        self.upload = upload  # 上传文件的内容 (内存或临时文件中的缓冲区)，转换结束后由执行函数关闭
+        self.results_dir = results_dir  # 该任务的结果目录
+        self.coalesce_key = coalesce_key
+        self.reused: Optional[str] = None  # 结果来源 (REUSED_FROM_CACHE / REUSED_IN_FLIGHT)
+        self.followers: List["ConversionJob"] = []  # 合并到本任务的其他任务
+        self.status = JOB_QUEUED
+        self.message = "等待处理"
+        self.output_path: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks_total: Optional[int] = None  # LLM 文本块总数 (收到 "chunks" 事件后才有值)
+        self.chunks_completed = 0
+        self.events: List[JobEvent] = []  # 由 JobQueue 在持有其条件变量时追加
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.done.is_set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "original_filename": self.original_filename,
+                "status": self.status,
+                "message": self.message,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "chunks_total": self.chunks_total,
+                "chunks_completed": self.chunks_completed,
+                "reused": self.reused,
+            }
+
+    def _update(self, status: str, message: str, output_path: Optional[str] = None) -> None:
+        with self._lock:
+            self.status = status
+            self.message = message
+            if status == JOB_RUNNING:
+                self.started_at = time.time()
+            if status in FINISHED_STATUSES:
+                self.output_path = output_path
+                self.finished_at = time.time()
+
+
+class JobQueue:
+    """
+    在后台线程池中执行转换任务。
+
+    参数:
+        runner: 执行一个任务的函数，成功时返回生成的 Markdown 文件路径，失败时返回 None (或抛出异常)。
+        workers: 同时转换的文件数。
+        retention_seconds: 已结束的任务信息保留的秒数。
+    """
+
+    def __init__(self, runner: Callable[[ConversionJob], Optional[str]], workers: int = 4,
+                 retention_seconds: float = 3600.0):
+        self.runner = runner
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, ConversionJob] = {}
+        self._lock = threading.Lock()
+        # 保护所有任务的事件列表与事件序号；有新事件时唤醒等待的 /events 连接
+        self._events_changed = threading.Condition()
+        self._sequence = 0
+        self._in_flight: Dict[str, ConversionJob] = {}  # {合并键: 正在转换的任务}
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def submit(self, original_filename: str, upload: BinaryIO, results_dir: str,
+               job_id: Optional[str] = None, coalesce_key: Optional[str] = None) -> ConversionJob:
+        """
+        登记一个任务并提交到线程池，立即返回 (不等待转换)。
+        同一 coalesce_key 的任务正在转换时不提交新的转换，返回的任务跟随正在进行的任务
+        (reused 为 REUSED_IN_FLIGHT，其上传文件不会被使用，由调用方关闭)。
+        """
+        job = ConversionJob(job_id or uuid.uuid4().hex, original_filename, upload, results_dir, coalesce_key)
+        with self._lock:
+            self._prune_locked()
+            self._jobs[job.job_id] = job
+            leader = self._in_flight.get(coalesce_key) if coalesce_key is not None else None
+            if leader is not None:
+                self._follow_locked(job, leader)
+                logger.info(f"任务 {job.job_id} ('{original_filename}') 与正在进行的任务 {leader.job_id} 内容相同，合并为一次转换。")
+                return job
+            if coalesce_key is not None:
+                self._in_flight[coalesce_key] = job
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                                       thread_name_prefix="webapp-job")
+            executor = self._executor
+        self._publish(job, "queued", {})
+        executor.submit(self._run, job)
+        logger.info(f"已提交转换任务 {job.job_id} ('{original_filename}')。")
+        return job
+
+    def complete(self, original_filename: str, output_path: str, message: str = "已复用相同文件的转换结果",
+                 job_id: Optional[str] = None) -> ConversionJob:
+        """登记一个已经成功完成的任务 (例如命中结果缓存的上传)，不执行任何转换。"""
+        job = ConversionJob(job_id or uuid.uuid4().hex, original_filename, None, None)
+        job.reused = REUSED_FROM_CACHE
+        with self._lock:
+            self._prune_locked()
+            self._jobs[job.job_id] = job
+        self._publish(job, "queued", {})
+        self._set_status(job, JOB_SUCCESS, message, output_path)
+        logger.info(f"任务 {job.job_id} ('{original_filename}') 复用了缓存的转换结果 '{output_path}'。")
+        return job
+
+    def _follow_locked(self, job: ConversionJob, leader: ConversionJob) -> None:
+        """
+        让 job 跟随 leader：复制 leader 已有的事件与状态，之后 leader 的事件与结果同时发给 job。
+        调用方持有 self._lock，leader 结束时也需要先持有该锁从 _in_flight 中移除，因此 job 不会错过结束事件。
+        """
+        job.reused = REUSED_IN_FLIGHT
+        with self._events_changed:
+            for event in leader.events:
+                self._sequence += 1
+                job.events.append(JobEvent(self._sequence, job.job_id, event.event, dict(event.data)))
+            job.chunks_total, job.chunks_completed = leader.chunks_total, leader.chunks_completed
+            leader_state = leader.to_dict()
+            job._update(leader_state["status"], leader_state["message"])
+            leader.followers.append(job)
+            self._events_changed.notify_all()
+
+    def get(self, job_id: str) -> Optional[ConversionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_ids: Iterable[str], timeout: Optional[float] = None) -> bool:
+        """等待指定的任务全部结束；超时返回 False。未知的任务 ID 视为已结束。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job_id in job_ids:
+            job = self.get(job_id)
+            if job is None:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not job.done.wait(remaining):
+                return False
+        return True
+
+    def events_since(self, job_ids: Iterable[str], after: int = 0) -> List[JobEvent]:
+        """返回指定任务中序号大于 after 的事件 (按序号排序)。"""
+        jobs = [job for job in map(self.get, job_ids) if job is not None]
+        with self._events_changed:
+            return self._events_since_locked(jobs, after)
+
+    def wait_for_events(self, job_ids: Iterable[str], after: int = 0,
+                        timeout: Optional[float] = None) -> List[JobEvent]:
+        """
+        等待指定任务产生序号大于 after 的事件并返回这些事件。
+        所有任务都已结束且没有新事件时立即返回空列表；超时也返回空列表。
+        """
+        jobs = [job for job in map(self.get, job_ids) if job is not None]
+        with self._events_changed:
+            self._events_changed.wait_for(
+                lambda: self._events_since_locked(jobs, after) or all(job.finished for job in jobs), timeout)
+            return self._events_since_locked(jobs, after)
+
+    @staticmethod
+    def _events_since_locked(jobs: List[ConversionJob], after: int) -> List[JobEvent]:
+        events = [event for job in jobs for event in job.events if event.seq > after]
+        events.sort(key=lambda event: event.seq)
+        return events
+
+    def _publish(self, job: ConversionJob, event: str, data: Dict[str, Any]) -> None:
+        """为任务 (及其跟随者) 追加一个事件并唤醒等待者。"""
+        with self._events_changed:
+            for target in [job] + job.followers:
+                if event == "chunks":
+                    target.chunks_total = data.get("count")
+                elif event == "chunk_done":
+                    target.chunks_completed = data.get("completed", target.chunks_completed)
+                self._sequence += 1
+                target.events.append(JobEvent(self._sequence, target.job_id, event, dict(data)))
+            self._events_changed.notify_all()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _run(self, job: ConversionJob) -> None:
+        self._set_status(job, JOB_RUNNING, "正在处理")
+        try:
+            # 转换函数在当前线程中报告的进度事件记录到任务中
+            with progress_listener(lambda event, data: self._publish(job, event, data)):
+                output_path = self.runner(job)
+        except Exception as e:
+            logger.error(f"转换任务 {job.job_id} ('{job.original_filename}') 发生严重错误: {e}", exc_info=True)
+            self._set_status(job, JOB_ERROR, f"服务器内部错误: {str(e)}")
+            return
+        if output_path:
+            logger.info(f"转换任务 {job.job_id} ('{job.original_filename}') 处理成功，输出为 '{output_path}'")
+            self._set_status(job, JOB_SUCCESS, "文件处理成功", output_path)
+        else:
+            logger.warning(f"转换任务 {job.job_id} ('{job.original_filename}') 处理失败 (核心处理器返回 None)。")
+            self._set_status(job, JOB_ERROR, "文件处理失败 (核心处理器未返回有效路径，详见服务器日志)")
+
+    def _set_status(self, job: ConversionJob, status: str, message: str, output_path: Optional[str] = None) -> None:
+        """更新任务 (及其跟随者) 的状态并发布对应的事件 (running / done / failed)。"""
+        finished = status in FINISHED_STATUSES
+        if finished and job.coalesce_key is not None:
+            # 先从 _in_flight 中移除，之后到达的相同上传不会再跟随本任务 (也就不会错过结束事件)
+            with self._lock:
+                if self._in_flight.get(job.coalesce_key) is job:
+                    del self._in_flight[job.coalesce_key]
+        with self._events_changed:
+            targets = [job] + job.followers
+        for target in targets:
+            target._update(status, message, output_path)
+        self._publish(job, STATUS_EVENTS.get(status, status), {"status": status, "message": message})
+        if finished:
+            # 结束事件发布之后才标记为已结束，/events 连接不会在收到 done / failed 之前关闭
+            for target in targets:
+                target.done.set()
+
+    def _prune_locked(self) -> None:
+        """删除已结束超过 retention_seconds 的任务信息 (调用方持有 self._lock)。"""
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
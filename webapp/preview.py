@@ -0,0 +1,115 @@
+"""
+Web 应用的 Markdown 服务器端预览。
+
+转换结果由 markdown_generator 生成，只包含 ATX 标题 ("# " ~ "#### ") 和段落 (块之间以空行分隔)，
+这里直接将其渲染为 HTML (文本全部转义)，不需要在浏览器中下载整个文件再用 marked 渲染。
+渲染结果按章节分页：每个 H1 / H2 标题开始新的一节，没有标题的长内容按 SECTION_MAX_CHARS 继续分节，
+浏览器每次只获取一节。
+
+PreviewCache 缓存每个文件的渲染结果 (按文件的修改时间与大小判断是否过期)，同一文件只渲染一次。
+"""
+import os
+import re
+import html
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 从这些级别的标题开始新的一节
+SECTION_HEADING_LEVELS = (1, 2)
+# 一节的 HTML 超过该字符数后，从下一个块开始新的一节
+SECTION_MAX_CHARS = 20000
+# 没有标题的开头部分的章节标题
+UNTITLED_SECTION = "正文"
+
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+
+class PreviewSection(NamedTuple):
+    """预览的一节：title 为章节标题，html 为该节渲染后的 HTML。"""
+    title: str
+    html: str
+
+
+class PreviewDocument(NamedTuple):
+    """一个 Markdown 文件的预览：version 为渲染时文件的 (修改时间, 大小)，用于判断缓存是否过期。"""
+    version: Tuple[int, int]
+    sections: List[PreviewSection]
+
+
+def render_block(block: str) -> Tuple[Optional[int], str, str]:
+    """
+    将一个 Markdown 块渲染为 HTML。
+
+    返回:
+        (标题级别, 标题文本, HTML) 元组；段落的标题级别为 None，标题文本为空。
+    """
+    match = _HEADING_PATTERN.match(block)
+    if match and "\n" not in block:
+        level = len(match.group(1))
+        text = match.group(2)
+        return level, text, f"<h{level}>{html.escape(text)}</h{level}>"
+    lines = [line.strip() for line in block.split("\n") if line.strip()]
+    return None, "", "<p>" + "<br>".join(html.escape(line) for line in lines) + "</p>"
+
+
+def render_sections(markdown_text: str) -> List[PreviewSection]:
+    """将 Markdown 文本渲染为按章节分页的 HTML。空文档返回一个空节。"""
+    sections: List[PreviewSection] = []
+    title, parts, size = UNTITLED_SECTION, [], 0
+
+    def close_section():
+        if parts:
+            sections.append(PreviewSection(title, "\n".join(parts)))
+
+    for block in re.split(r"\n\s*\n", markdown_text.strip()):
+        if not block.strip():
+            continue
+        level, heading, block_html = render_block(block.strip())
+        if level in SECTION_HEADING_LEVELS:
+            close_section()
+            title, parts, size = heading, [], 0
+        elif size >= SECTION_MAX_CHARS:
+            close_section()
+            if not title.endswith("（续）"):
+                title = f"{title}（续）"
+            parts, size = [], 0
+        parts.append(block_html)
+        size += len(block_html)
+    close_section()
+    return sections or [PreviewSection(UNTITLED_SECTION, "")]
+
+
+class PreviewCache:
+    """
+    Markdown 文件预览的缓存，最多保留 max_documents 个文件 (最久未使用的先移除)。线程安全。
+    """
+
+    def __init__(self, max_documents: int = 64):
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        self._documents: "OrderedDict[str, PreviewDocument]" = OrderedDict()
+
+    def get(self, path: str) -> PreviewDocument:
+        """返回 path 的预览，缓存不存在或文件已被修改时重新渲染。文件不存在时抛出 FileNotFoundError。"""
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            document = self._documents.get(path)
+            if document is not None and document.version == version:
+                self._documents.move_to_end(path)
+                return document
+
+        # 渲染在锁外进行，同一文件被并发请求时可能重复渲染，结果相同
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            document = PreviewDocument(version, render_sections(f.read()))
+        logger.debug(f"已渲染 '{path}' 的预览，共 {len(document.sections)} 节。")
+        with self._lock:
+            self._documents[path] = document
+            self._documents.move_to_end(path)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        return document
@@ -0,0 +1,119 @@
+"""
+Web 应用的转换结果缓存。
+
+同一份文档经常被不同的用户反复上传，每次上传都会完整转换一次并调用 LLM。
+/upload 使用接收上传文件时计算的内容 SHA-256 (app.HashingSpooledTemporaryFile)，与转换设置的摘要
+(build_manifest.conversion_settings / settings_digest) 及文件扩展名组成缓存键，在 ResultCache 中查找：
+- 命中时直接复用已生成的 Markdown 文件，不再提交转换；
+- 未命中时提交转换任务，转换成功后记录结果。同一缓存键的转换正在进行时，新的上传合并到该任务 (见 JobQueue.submit)。
+
+索引保存在结果目录下的 INDEX_FILENAME 中 (采用"临时文件 + os.replace"的方式原子写入)，记录的路径相对于结果目录。
+结果文件已被删除的条目在查找时自动移除；条目数超过 max_entries 时移除最久未使用的条目 (结果文件不会被删除)。
+命中时只在内存中更新条目的最近使用时间，不重写整个索引：随下一次 put 一起保存，
+或距上次保存超过 flush_interval 秒时才保存 (最近使用时间只用于淘汰，进程退出时丢失少量更新无关紧要)。
+"""
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = ".upload_result_index.json"
+
+
+def make_cache_key(content_hash: str, extension: str, settings_digest: str) -> str:
+    """缓存键：转换设置摘要、文件扩展名 (决定文件类型) 与内容摘要。"""
+    return f"{settings_digest}:{extension.lower()}:{content_hash}"
+
+
+class ResultCache:
+    """
+    结果目录中的上传结果索引。所有方法都是线程安全的。
+
+    参数:
+        results_dir: 结果目录，索引保存在该目录下的 INDEX_FILENAME 中。
+        max_entries: 最多保留的条目数。
+        flush_interval: 命中时更新的最近使用时间最多延迟多少秒写入索引。
+    """
+
+    def __init__(self, results_dir: str, max_entries: int = 5000, flush_interval: float = 300.0):
+        self.results_dir = results_dir
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None  # 首次访问时加载
+        self._dirty = False  # 内存中有尚未写入索引的最近使用时间
+        self._saved_at = time.monotonic()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.results_dir, INDEX_FILENAME)
+
+    def _load_locked(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._entries = data if isinstance(data, dict) else {}
+            except FileNotFoundError:
+                self._entries = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"上传结果索引 {self.path} 无法读取，将重新建立: {e}")
+                self._entries = {}
+        return self._entries
+
+    def _save_locked(self) -> None:
+        try:
+            os.makedirs(self.results_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.results_dir, prefix=".upload_result_index-", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"写入上传结果索引 {self.path} 失败: {e}")
+            return
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def get(self, key: str) -> Optional[str]:
+        """返回缓存键对应的 Markdown 文件的完整路径；未命中或文件已被删除时返回 None。"""
+        with self._lock:
+            entries = self._load_locked()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            output_path = os.path.join(self.results_dir, entry["path"])
+            if not os.path.isfile(output_path):
+                del entries[key]
+                self._save_locked()
+                return None
+            entry["last_used"] = time.time()
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= self.flush_interval:
+                self._save_locked()
+            return output_path
+
+    def flush(self) -> None:
+        """将内存中尚未保存的最近使用时间写入索引。"""
+        with self._lock:
+            if self._dirty:
+                self._save_locked()
+
+    def put(self, key: str, output_path: str) -> None:
+        """记录缓存键对应的 Markdown 文件 (必须位于结果目录中)。"""
+        relative_path = os.path.relpath(output_path, self.results_dir)
+        if relative_path.startswith(os.pardir):
+            logger.warning(f"'{output_path}' 不在结果目录 {self.results_dir} 中，不加入上传结果缓存。")
+            return
+        with self._lock:
+            entries = self._load_locked()
+            now = time.time()
+            entries[key] = {"path": relative_path, "created_at": now, "last_used": now}
+            if len(entries) > self.max_entries:
+                for old_key in sorted(entries, key=lambda k: entries[k].get("last_used", 0))[:len(entries) - self.max_entries]:
+                    del entries[old_key]
+            self._save_locked()
@@ -19,8 +19,8 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // 获取并显示 Markdown 文件预览的函数
-    function fetchAndShowPreview(filename, listItemElement) {
+    // 获取并显示 Markdown 文件预览的函数：预览由服务器渲染为 HTML 并按章节分页 (见 /preview)，每次只获取一节
+    function fetchAndShowPreview(url, listItemElement) {
         // 移除旧的预览（如果存在）
         const oldPreview = listItemElement.querySelector('.preview-container');
         if (oldPreview) {
@@ -32,39 +32,256 @@ document.addEventListener('DOMContentLoaded', function() {
         previewContainer.textContent = '正在加载预览...';
         listItemElement.appendChild(previewContainer);
 
-        fetch(`/download/${encodeURIComponent(filename)}`) // 使用下载链接获取文件内容
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error(`无法获取预览: ${response.status} ${response.statusText}`);
-                }
-                return response.text(); // 获取文本内容
-            })
-            .then(markdownText => {
-                // 新的 Markdown 到 HTML 转换逻辑
-                if (typeof marked === 'undefined') {
-                    console.error('Marked.js 库未加载。');
-                    previewContainer.innerHTML = '<p class="error-message">Markdown 预览库加载失败。</p>';
-                    return;
-                }
-                try {
-                    const htmlContent = marked.parse(markdownText); // 使用 marked.parse()
-                    previewContainer.innerHTML = ''; // 清空 "正在加载预览..."
-                    // 为了安全起见，如果marked.parse返回的是不可信内容且需要进一步处理，
-                    // 可能需要在这里进行HTML净化 (DOMPurify)，但对于从自己服务器获取的 .md 文件内容，
-                    // 通常认为是可信的。
-                    const previewContentDiv = document.createElement('div');
-                    previewContentDiv.className = 'markdown-preview'; // 可以保留这个类名用于样式
-                    previewContentDiv.innerHTML = htmlContent;
-                    previewContainer.appendChild(previewContentDiv);
-                } catch (e) {
-                    console.error('Markdown 解析错误:', e);
-                    previewContainer.innerHTML = `<p class="error-message">Markdown 内容解析时发生错误: ${escapeHTML(e.message)}</p>`;
-                }
-            })
-            .catch(error => {
-                console.error('获取预览失败:', error);
-                previewContainer.innerHTML = `<p class="error-message">预览失败: ${escapeHTML(error.message)}</p>`;
+        const nav = document.createElement('div');
+        nav.className = 'preview-nav';
+        const prevButton = document.createElement('button');
+        prevButton.textContent = '上一节';
+        const sectionSelect = document.createElement('select');
+        const nextButton = document.createElement('button');
+        nextButton.textContent = '下一节';
+        nav.appendChild(prevButton);
+        nav.appendChild(sectionSelect);
+        nav.appendChild(nextButton);
+        const previewContentDiv = document.createElement('div');
+        previewContentDiv.className = 'markdown-preview';
+
+        const loadedSections = {}; // 已获取的章节 HTML，来回翻页时不再请求
+        let current = 0;
+        let sectionCount = 0;
+
+        function showSection(index) {
+            current = index;
+            previewContentDiv.innerHTML = loadedSections[index];
+            previewContentDiv.scrollTop = 0;
+            sectionSelect.value = String(index);
+            prevButton.disabled = index <= 0;
+            nextButton.disabled = index >= sectionCount - 1;
+        }
+
+        function loadSection(index) {
+            if (loadedSections[index] !== undefined) {
+                showSection(index);
+                return;
+            }
+            const separator = url.indexOf('?') === -1 ? '?' : '&';
+            fetch(`${url}${separator}section=${index}`)
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`无法获取预览: ${response.status} ${response.statusText}`);
+                    }
+                    return response.json();
+                })
+                .then(data => {
+                    if (!sectionCount) {
+                        // 第一次获取时建立章节目录
+                        sectionCount = data.section_count;
+                        data.titles.forEach(function(title, i) {
+                            const option = document.createElement('option');
+                            option.value = String(i);
+                            option.textContent = `${i + 1}/${data.section_count} ${title}`;
+                            sectionSelect.appendChild(option);
+                        });
+                        previewContainer.textContent = '';
+                        if (sectionCount > 1) {
+                            previewContainer.appendChild(nav);
+                        }
+                        previewContainer.appendChild(previewContentDiv);
+                    }
+                    // html 由服务器渲染，文本内容已转义
+                    loadedSections[data.section] = data.html;
+                    showSection(data.section);
+                })
+                .catch(error => {
+                    console.error('获取预览失败:', error);
+                    previewContainer.innerHTML = `<p class="error-message">预览失败: ${escapeHTML(error.message)}</p>`;
+                });
+        }
+
+        prevButton.addEventListener('click', function() { loadSection(current - 1); });
+        nextButton.addEventListener('click', function() { loadSection(current + 1); });
+        sectionSelect.addEventListener('change', function() { loadSection(Number(sectionSelect.value)); });
+        loadSection(0);
+    }
+
+    // 任务状态轮询间隔 (毫秒)，仅在浏览器不支持 EventSource 或事件流中断时使用
+    const JOB_POLL_INTERVAL_MS = 1000;
+    // /events 推送的事件类型 (见 webapp/job_queue.py)
+    const PROGRESS_EVENTS = ['queued', 'running', 'extracted', 'chunks', 'chunk_done', 'partial', 'merged', 'done', 'failed'];
+
+    function isFinished(item) {
+        return item.status === 'success' || item.status === 'error';
+    }
+
+    // 为一个任务创建结果条目：标题行 (文件名、状态、下载链接)、进度行，以及收到部分 Markdown 后出现的实时预览
+    function createResultItem(item) {
+        const li = document.createElement('li');
+        li.className = 'result-item';
+        const header = document.createElement('div');
+        header.className = 'job-header';
+        const progress = document.createElement('div');
+        progress.className = 'job-progress';
+        li.appendChild(header);
+        li.appendChild(progress);
+        const entry = { item: item, li: li, header: header, progress: progress, markdown: '', preview: null, renderPending: false };
+        renderResultItem(entry, item);
+        return entry;
+    }
+
+    // 根据任务状态渲染条目的标题行
+    function renderResultItem(entry, item) {
+        const header = entry.header;
+        header.innerHTML = `<strong>${escapeHTML(item.original_filename)}:</strong> `;
+        if (item.status === 'success') {
+            header.insertAdjacentHTML('beforeend', '<span class="status-success">处理成功。</span> ');
+            const downloadUrl = item.result_url || `/download/${encodeURIComponent(item.processed_filename)}`;
+            const previewUrl = item.preview_url || `/preview/${encodeURIComponent(item.processed_filename)}`;
+            const downloadName = (item.processed_filename || '').split('/').pop();
+
+            const downloadLink = document.createElement('a');
+            downloadLink.href = downloadUrl;
+            downloadLink.textContent = `下载 ${downloadName}`;
+            downloadLink.className = 'download-link';
+            downloadLink.setAttribute('download', downloadName); // 建议浏览器下载
+
+            const previewButton = document.createElement('button');
+            previewButton.textContent = '预览 Markdown';
+            previewButton.className = 'preview-button';
+            previewButton.addEventListener('click', function() { fetchAndShowPreview(previewUrl, entry.li); });
+
+            header.appendChild(downloadLink);
+            header.appendChild(document.createTextNode(' '));
+            header.appendChild(previewButton);
+        } else if (item.status === 'error') {
+            header.insertAdjacentHTML('beforeend',
+                `<span class="status-error">处理失败。</span> 原因: ${escapeHTML(item.message || '未知错误')}`);
+        } else {
+            const label = item.status === 'running' ? '正在处理...' : '排队中...';
+            header.insertAdjacentHTML('beforeend', `<span class="status-pending">${label}</span>`);
+        }
+    }
+
+    // 将收到的部分 Markdown 追加到实时预览 (每帧最多重新渲染一次)
+    function appendPartialMarkdown(entry, markdown) {
+        entry.markdown += (entry.markdown ? '\n\n' : '') + markdown;
+        if (!entry.preview) {
+            const container = document.createElement('div');
+            container.className = 'preview-container partial-preview';
+            entry.preview = document.createElement('div');
+            entry.preview.className = 'markdown-preview';
+            container.appendChild(entry.preview);
+            entry.li.appendChild(container);
+        }
+        if (entry.renderPending) return;
+        entry.renderPending = true;
+        requestAnimationFrame(function() {
+            entry.renderPending = false;
+            if (typeof marked === 'undefined') {
+                entry.preview.textContent = entry.markdown; // Markdown 预览库未加载时显示原文
+            } else {
+                entry.preview.innerHTML = marked.parse(entry.markdown);
+            }
+        });
+    }
+
+    // 处理一个进度事件，更新对应条目的状态、进度和实时预览
+    function handleProgressEvent(entry, name, data) {
+        switch (name) {
+            case 'queued':
+            case 'running':
+                renderResultItem(entry, Object.assign({}, entry.item, { status: name }));
+                break;
+            case 'extracted':
+                entry.progress.textContent = `已提取 ${data.chars} 个字符，正在识别文档结构...`;
+                break;
+            case 'chunks':
+                entry.progress.textContent = `共 ${data.count} 个文本块，正在等待 LLM 处理...`;
+                break;
+            case 'chunk_done':
+                entry.progress.innerHTML = `文本块 ${data.completed}/${data.count} 已完成 ` +
+                    `<progress max="${data.count}" value="${data.completed}"></progress>`;
+                break;
+            case 'partial':
+                appendPartialMarkdown(entry, data.markdown);
+                break;
+            case 'merged':
+                entry.progress.textContent = '已合并所有文本块，正在生成 Markdown...';
+                break;
+            case 'done':
+            case 'failed':
+                entry.progress.textContent = '';
+                renderResultItem(entry, data);
+                break;
+        }
+    }
+
+    // 轮询一个任务直到结束，每次状态变化时更新条目；返回任务结束时完成的 Promise
+    function pollJob(entry) {
+        const item = entry.item;
+        return new Promise(resolve => {
+            function poll() {
+                fetch(item.status_url || `/jobs/${encodeURIComponent(item.job_id)}`)
+                    .then(response => {
+                        if (!response.ok) {
+                            throw new Error(`无法获取任务状态: ${response.status} ${response.statusText}`);
+                        }
+                        return response.json();
+                    })
+                    .then(job => {
+                        renderResultItem(entry, job);
+                        if (job.chunks_total) {
+                            handleProgressEvent(entry, 'chunk_done', { completed: job.chunks_completed, count: job.chunks_total });
+                        }
+                        if (isFinished(job)) {
+                            entry.progress.textContent = '';
+                            resolve(job);
+                        } else {
+                            setTimeout(poll, JOB_POLL_INTERVAL_MS);
+                        }
+                    })
+                    .catch(error => {
+                        console.error('获取任务状态失败:', error);
+                        renderResultItem(entry, { original_filename: item.original_filename, status: 'error', message: error.message });
+                        resolve(null);
+                    });
+            }
+            setTimeout(poll, JOB_POLL_INTERVAL_MS);
+        });
+    }
+
+    // 通过 Server-Sent Events 跟踪一组任务的进度，全部结束时完成；事件流无法恢复时改为轮询尚未结束的任务
+    function followJobs(entries) {
+        if (typeof EventSource === 'undefined') {
+            return Promise.all(entries.map(pollJob));
+        }
+        return new Promise(resolve => {
+            const byId = {};
+            entries.forEach(entry => { byId[entry.item.job_id] = entry; });
+            const finished = new Set();
+            const ids = entries.map(entry => encodeURIComponent(entry.item.job_id)).join(',');
+            const source = new EventSource(`/events?jobs=${ids}`);
+
+            PROGRESS_EVENTS.forEach(name => {
+                source.addEventListener(name, function(message) {
+                    const data = JSON.parse(message.data);
+                    const entry = byId[data.job_id];
+                    if (!entry) return;
+                    handleProgressEvent(entry, name, data);
+                    if (name === 'done' || name === 'failed') {
+                        finished.add(data.job_id);
+                        if (finished.size === entries.length) {
+                            source.close(); // 服务器随后也会关闭连接，关闭后浏览器不再自动重连
+                            resolve();
+                        }
+                    }
+                });
             });
+            source.onerror = function() {
+                // 连接中断时浏览器会自动重连 (从 Last-Event-ID 之后继续)；只有连接被拒绝 (例如任务已过期) 时才改为轮询
+                if (source.readyState !== EventSource.CLOSED) return;
+                const remaining = entries.filter(entry => !finished.has(entry.item.job_id));
+                Promise.all(remaining.map(pollJob)).then(() => resolve());
+            };
+        });
     }
 
     // 添加表单提交事件监听器
@@ -98,7 +315,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: formData
             })
             .then(response => {
-                uploadStatus.innerHTML = '后端正在处理文件，请稍候...'; // 文件已上传，等待后端处理
+                uploadStatus.innerHTML = '文件已上传，正在提交转换任务...'; // 文件已上传，后端为每个文件创建任务
                 if (!response.ok) {
                     // 如果 HTTP 状态码不是 2xx，尝试解析错误信息
                     return response.json().then(errData => {
@@ -112,51 +329,31 @@ document.addEventListener('DOMContentLoaded', function() {
                 return response.json(); // 解析 JSON 响应体
             })
             .then(data => {
-                uploadStatus.innerHTML = '处理完成！';
                 resultsArea.innerHTML = ''; // 清空之前的 "正在准备..." 或错误信息
 
                 if (Array.isArray(data) && data.length > 0) {
+                    // /upload 立即返回每个文件的任务，转换在后台进行；通过事件流实时更新各条目的进度和部分 Markdown
                     const ul = document.createElement('ul');
                     ul.className = 'results-list';
+                    const pendingEntries = [];
 
                     data.forEach(item => {
-                        const li = document.createElement('li');
-                        li.className = 'result-item';
-                        
-                        let content = `<strong>${escapeHTML(item.original_filename)}:</strong> `;
-                        if (item.status === 'success') {
-                            content += `<span class="status-success">处理成功。</span> `;
-                            if (item.processed_filename) {
-                                const downloadLink = document.createElement('a');
-                                downloadLink.href = `/download/${encodeURIComponent(item.processed_filename)}`;
-                                downloadLink.textContent = `下载 ${escapeHTML(item.processed_filename)}`;
-                                downloadLink.className = 'download-link';
-                                downloadLink.setAttribute('download', item.processed_filename); // 建议浏览器下载
-
-                                const previewButton = document.createElement('button');
-                                previewButton.textContent = '预览 Markdown';
-                                previewButton.className = 'preview-button';
-                                // 使用闭包确保 filename 在 onclick 时是正确的
-                                previewButton.onclick = (function(filename, currentListItem) {
-                                    return function() { fetchAndShowPreview(filename, currentListItem); };
-                                })(item.processed_filename, li);
-
-                                content += downloadLink.outerHTML + ' ' + previewButton.outerHTML;
-                            } else {
-                                content += `<span>Markdown 内容已生成 (但未提供下载链接)。</span>`;
-                            }
-                        } else {
-                            content += `<span class="status-error">处理失败。</span> 原因: ${escapeHTML(item.message || '未知错误')}`;
+                        const entry = createResultItem(item);
+                        ul.appendChild(entry.li);
+                        if (item.job_id && !isFinished(item)) {
+                            pendingEntries.push(entry);
                         }
-                        li.innerHTML = content; // 设置 innerHTML 后，之前绑定的 onclick 可能需要重新处理，但这里是直接生成 HTML 字符串
-                        
-                        // 重新获取按钮并绑定事件（如果 previewButton.onclick 的方式在某些浏览器有问题）
-                        // 或者，在创建按钮后，先附加到 li，再通过 li.querySelector 找到按钮并绑定事件。
-                        // 当前的闭包方式通常是有效的。
-
-                        ul.appendChild(li);
                     });
                     resultsArea.appendChild(ul);
+
+                    if (pendingEntries.length === 0) {
+                        uploadStatus.innerHTML = '处理完成！';
+                        return;
+                    }
+                    uploadStatus.innerHTML = `后台正在处理 ${pendingEntries.length} 个文件，请稍候...`;
+                    followJobs(pendingEntries).then(() => {
+                        uploadStatus.innerHTML = '处理完成！';
+                    });
                 } else if (data.error) { // 处理整体上传错误（如果后端这样返回）
                      resultsArea.innerHTML = `<p class="error-message">处理失败: ${escapeHTML(data.error)}</p>`;
                 } else if (Array.isArray(data) && data.length === 0) {
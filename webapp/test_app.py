@@ -3,13 +3,19 @@ import unittest
 from unittest.mock import patch, MagicMock, mock_open
 import io
 import json
+import gzip
+import hashlib
 import sys
+import shutil
+import tempfile
+import threading
 from flask import Flask, Response # Response 用于 test_download_file_success
 
 # 确保项目根目录在 sys.path 中
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from webapp.app import app # 导入 Flask 应用实例
+from webapp.app import app, job_queue # 导入 Flask 应用实例和后台任务队列
+from webapp.result_cache import ResultCache
 
 class TestAppRoutes(unittest.TestCase):
 
@@ -35,6 +41,13 @@ class TestAppRoutes(unittest.TestCase):
         os.environ['LLM_API_ENDPOINT'] = 'http://mock.test.endpoint'
         os.environ['LLM_MODEL_ID'] = 'test-model'
 
+        # 上传和结果目录使用临时目录，测试结束后删除
+        self.original_folders = (app.config['UPLOAD_FOLDER'], app.config['RESULTS_FOLDER'])
+        self.temp_root = tempfile.mkdtemp(prefix="webapp_test_")
+        app.config['UPLOAD_FOLDER'] = os.path.join(self.temp_root, 'uploads')
+        app.config['RESULTS_FOLDER'] = os.path.join(self.temp_root, 'results')
+        os.makedirs(app.config['RESULTS_FOLDER'])
+
 
     def tearDown(self):
         """在每个测试用例结束后运行"""
@@ -43,48 +56,112 @@ class TestAppRoutes(unittest.TestCase):
         del os.environ['LLM_API_ENDPOINT']
         del os.environ['LLM_MODEL_ID']
         # 如果测试中创建了临时文件/目录，在此处清理
+        app.config['UPLOAD_FOLDER'], app.config['RESULTS_FOLDER'] = self.original_folders
+        shutil.rmtree(self.temp_root, ignore_errors=True)
+
+    def upload_and_wait(self, data):
+        """上传文件，等待所有后台任务结束，返回 (上传响应 JSON, 各任务的最终状态 JSON)。"""
+        response = self.client.post('/upload', content_type='multipart/form-data', data=data)
+        self.assertEqual(response.status_code, 202)
+        accepted = json.loads(response.data.decode('utf-8'))
+        job_ids = [item['job_id'] for item in accepted if 'job_id' in item]
+        self.assertTrue(job_queue.wait(job_ids, timeout=10))
+        statuses = []
+        for job_id in job_ids:
+            status_response = self.client.get(f'/jobs/{job_id}')
+            self.assertEqual(status_response.status_code, 200)
+            statuses.append(json.loads(status_response.data.decode('utf-8')))
+        return accepted, statuses
 
     def test_index_route(self):
         """测试根路径 (/) 是否成功渲染 index.html"""
         response = self.client.get('/')
         self.assertEqual(response.status_code, 200)
-        self.assertIn(b'智能文档清洗与 Markdown 转换工具', response.data) # 检查 HTML 内容
-        self.assertIn(b'选择文件 (可多选)', response.data)
+        self.assertIn('智能文档清洗与 Markdown 转换工具'.encode('utf-8'), response.data) # 检查 HTML 内容
+        self.assertIn('选择文件 (可多选)'.encode('utf-8'), response.data)
 
     @patch('webapp.app.process_document_to_markdown') # Mock 核心处理函数
     def test_upload_single_docx_file_success(self, mock_process_document):
-        """测试成功上传单个 .docx 文件"""
-        # 配置 mock_process_document 的返回值
-        mock_md_filename = 'test_doc.md'
-        # 确保返回的是一个完整的模拟路径，或者仅是文件名，取决于 app.py 中如何使用它
-        # app.py 中的 os.path.basename(markdown_file_path) 会提取文件名
-        mock_process_document.return_value = os.path.join(app.config['RESULTS_FOLDER'], mock_md_filename)
+        """测试成功上传单个 .docx 文件：立即返回任务 ID，后台转换完成后状态为 success"""
+        # 模拟 process_document_to_markdown 返回结果目录中的完整路径
+        received = []
+
+        def side_effect_func(upload, results_dir, name):
+            received.append(upload.read())
+            return os.path.join(results_dir, 'test_doc.md')
+
+        mock_process_document.side_effect = side_effect_func
 
         data = {
             'files[]': (io.BytesIO(b"dummy docx content"), 'test_doc.docx')
         }
-        response = self.client.post('/upload', content_type='multipart/form-data', data=data)
-        
-        self.assertEqual(response.status_code, 200)
-        response_json = json.loads(response.data.decode('utf-8'))
-        self.assertIsInstance(response_json, list)
-        self.assertEqual(len(response_json), 1)
-        self.assertEqual(response_json[0]['original_filename'], 'test_doc.docx')
-        self.assertEqual(response_json[0]['status'], 'success')
-        self.assertEqual(response_json[0]['processed_filename'], mock_md_filename)
-        
-        # 验证 mock_process_document 被正确调用
+        accepted, statuses = self.upload_and_wait(data)
+
+        self.assertIsInstance(accepted, list)
+        self.assertEqual(len(accepted), 1)
+        self.assertEqual(accepted[0]['original_filename'], 'test_doc.docx')
+        self.assertIn(accepted[0]['status'], ('queued', 'running', 'success'))
+        job_id = accepted[0]['job_id']
+        self.assertEqual(accepted[0]['status_url'], f'/jobs/{job_id}')
+
+        self.assertEqual(statuses[0]['status'], 'success')
+        self.assertEqual(statuses[0]['original_filename'], 'test_doc.docx')
+        self.assertEqual(statuses[0]['processed_filename'], f'{job_id}/test_doc.md')
+
+        # 验证 mock_process_document 被正确调用：上传的内容直接交给转换函数，每个任务使用独立的结果目录
         args, kwargs = mock_process_document.call_args
-        actual_temp_upload_path = args[0] 
-        self.assertTrue(actual_temp_upload_path.startswith(app.config['UPLOAD_FOLDER']))
-        self.assertTrue(actual_temp_upload_path.endswith('test_doc.docx')) 
-        self.assertEqual(args[1], app.config['RESULTS_FOLDER'])
+        self.assertEqual(received, [b"dummy docx content"])
+        self.assertEqual(kwargs['name'], 'test_doc.docx')
+        self.assertTrue(args[0].closed) # 转换结束后上传缓冲区已关闭
+        self.assertEqual(os.listdir(app.config['UPLOAD_FOLDER']), []) # 上传的文件没有写入上传目录
+        self.assertEqual(args[1], os.path.join(app.config['RESULTS_FOLDER'], job_id))
+
+    def open_files_in_upload_folder(self):
+        """返回本进程在上传目录中打开的文件数 (Linux 上的匿名临时文件不出现在目录列表中，通过 /proc/self/fd 查找)。"""
+        upload_folder = os.path.realpath(app.config['UPLOAD_FOLDER'])
+        if not os.path.isdir('/proc/self/fd'):
+            return len(os.listdir(upload_folder)) if os.path.isdir(upload_folder) else 0
+        count = 0
+        for fd in os.listdir('/proc/self/fd'):
+            try:
+                target = os.readlink(os.path.join('/proc/self/fd', fd))
+            except OSError:
+                continue
+            if os.path.dirname(target) == upload_folder:
+                count += 1
+        return count
+
+    @patch('webapp.app.process_document_to_markdown')
+    def test_large_upload_is_spooled_to_temporary_file(self, mock_process_document):
+        """测试超过 UPLOAD_MEMORY_LIMIT 的上传写入上传目录中的临时文件，小的上传保存在内存中"""
+        received = {}
+
+        def side_effect_func(upload, results_dir, name):
+            # 转换期间上传仍处于打开状态，此时检查上传目录中是否有为它打开的临时文件
+            received[name] = (self.open_files_in_upload_folder(), upload.read())
+            # 内容摘要在写入缓冲区时计算，与完整内容的摘要一致
+            self.assertEqual(upload.sha256_hexdigest(), hashlib.sha256(received[name][1]).hexdigest())
+            return os.path.join(results_dir, name.replace('.pdf', '.md'))
+
+        mock_process_document.side_effect = side_effect_func
+        original_limit = app.config['UPLOAD_MEMORY_LIMIT']
+        app.config['UPLOAD_MEMORY_LIMIT'] = 1024
+        try:
+            # 分两次上传，使检查时上传目录中只可能有当前上传的临时文件
+            _, small_statuses = self.upload_and_wait({'files[]': (io.BytesIO(b"small"), 'small.pdf')})
+            _, large_statuses = self.upload_and_wait({'files[]': (io.BytesIO(b"x" * 4096), 'large.pdf')})
+        finally:
+            app.config['UPLOAD_MEMORY_LIMIT'] = original_limit
+        self.assertEqual([status['status'] for status in small_statuses + large_statuses], ['success', 'success'])
+        self.assertEqual(received['small.pdf'], (0, b"small"))
+        self.assertEqual(received['large.pdf'], (1, b"x" * 4096))
+        self.assertEqual(self.open_files_in_upload_folder(), 0) # 临时文件在关闭后自动删除
 
     @patch('webapp.app.process_document_to_markdown')
     def test_upload_multiple_files_success(self, mock_process_document):
         """测试成功上传多个文件 (.docx, .pdf)"""
-        def side_effect_func(input_path, results_dir):
-            filename = os.path.basename(input_path)
+        def side_effect_func(upload, results_dir, name):
+            filename = name
             # 模拟 process_document_to_markdown 返回的是完整路径
             return os.path.join(results_dir, filename.replace('.docx', '.md').replace('.pdf', '.md'))
         
@@ -96,33 +173,294 @@ class TestAppRoutes(unittest.TestCase):
                 (io.BytesIO(b"pdf content"), 'doc2.pdf')
             ]
         }
-        response = self.client.post('/upload', content_type='multipart/form-data', data=data)
-        self.assertEqual(response.status_code, 200)
-        response_json = json.loads(response.data.decode('utf-8'))
-        self.assertEqual(len(response_json), 2)
+        accepted, statuses = self.upload_and_wait(data)
+        self.assertEqual(len(accepted), 2)
+        self.assertNotEqual(accepted[0]['job_id'], accepted[1]['job_id'])
 
         # 检查第一个文件的结果
-        self.assertEqual(response_json[0]['original_filename'], 'doc1.docx')
-        self.assertEqual(response_json[0]['status'], 'success')
-        self.assertEqual(response_json[0]['processed_filename'], 'doc1.md')
+        self.assertEqual(statuses[0]['original_filename'], 'doc1.docx')
+        self.assertEqual(statuses[0]['status'], 'success')
+        self.assertEqual(statuses[0]['processed_filename'], f"{accepted[0]['job_id']}/doc1.md")
         
         # 检查第二个文件的结果
-        self.assertEqual(response_json[1]['original_filename'], 'doc2.pdf')
-        self.assertEqual(response_json[1]['status'], 'success')
-        self.assertEqual(response_json[1]['processed_filename'], 'doc2.md')
+        self.assertEqual(statuses[1]['original_filename'], 'doc2.pdf')
+        self.assertEqual(statuses[1]['status'], 'success')
+        self.assertEqual(statuses[1]['processed_filename'], f"{accepted[1]['job_id']}/doc2.md")
 
         # 验证 mock 调用次数
         self.assertEqual(mock_process_document.call_count, 2)
 
+    @patch('webapp.app.process_document_to_markdown')
+    def test_files_in_one_upload_are_converted_concurrently(self, mock_process_document):
+        """测试同一次上传的多个文件并发转换：两个转换必须同时进行才能通过 Barrier"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def side_effect_func(upload, results_dir, name):
+            barrier.wait()
+            return os.path.join(results_dir, 'out.md')
+
+        mock_process_document.side_effect = side_effect_func
+        data = {'files[]': [(io.BytesIO(b"a"), 'same.docx'), (io.BytesIO(b"b"), 'same.docx')]}
+        _, statuses = self.upload_and_wait(data)
+        self.assertEqual([status['status'] for status in statuses], ['success', 'success'])
+        self.assertNotEqual(statuses[0]['processed_filename'], statuses[1]['processed_filename'])
+
+    @patch('webapp.app.process_document_to_markdown')
+    def test_job_result_download(self, mock_process_document):
+        """测试通过 /jobs/<id>/result 下载转换结果"""
+        def side_effect_func(upload, results_dir, name):
+            os.makedirs(results_dir, exist_ok=True)
+            output_path = os.path.join(results_dir, 'report.md')
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write('# 报告')
+            return output_path
+
+        mock_process_document.side_effect = side_effect_func
+        accepted, _ = self.upload_and_wait({'files[]': (io.BytesIO(b"docx content"), 'report.docx')})
+        response = self.client.get(f"/jobs/{accepted[0]['job_id']}/result")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data.decode('utf-8'), '# 报告')
+        response.close()
+
+    def parse_sse(self, body):
+        """解析 Server-Sent Events 响应体，返回 [(id, event, data)]，忽略注释行。"""
+        events = []
+        for message in body.decode('utf-8').split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in message.split('\n') if line and not line.startswith(':'))
+            if fields:
+                events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+        return events
+
+    @patch('webapp.app.process_document_to_markdown')
+    def test_progress_events_stream(self, mock_process_document):
+        """测试 /events 按顺序推送转换进度事件，done 事件包含下载信息"""
+        from auto_doc_markdown_converter.src.progress import report_progress
+
+        def side_effect_func(upload, results_dir, name):
+            # 模拟核心处理器在转换过程中报告的进度事件
+            report_progress("extracted", file_type="docx", chars=100)
+            report_progress("chunks", count=2)
+            report_progress("chunk_done", index=1, completed=1, count=2)
+            report_progress("chunk_done", index=0, completed=2, count=2)
+            report_progress("partial", markdown="# 标题", chunks_merged=2, count=2)
+            report_progress("merged", lines=2)
+            return os.path.join(results_dir, 'doc.md')
+
+        mock_process_document.side_effect = side_effect_func
+        accepted, statuses = self.upload_and_wait({'files[]': (io.BytesIO(b"docx"), 'doc.docx')})
+        job_id = accepted[0]['job_id']
+        self.assertEqual((statuses[0]['chunks_total'], statuses[0]['chunks_completed']), (2, 2))
+
+        response = self.client.get(f'/events?jobs={job_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        events = self.parse_sse(response.data)
+        self.assertEqual([event for _, event, _ in events],
+                         ['queued', 'running', 'extracted', 'chunks', 'chunk_done', 'chunk_done',
+                          'partial', 'merged', 'done'])
+        self.assertTrue(all(data['job_id'] == job_id for _, _, data in events))
+        self.assertEqual(events[6][2]['markdown'], '# 标题')
+        self.assertEqual(events[-1][2]['processed_filename'], f'{job_id}/doc.md')
+
+        # 断线重连：只推送 Last-Event-ID 之后的事件
+        resumed = self.parse_sse(self.client.get(f'/events?jobs={job_id}',
+                                                 headers={'Last-Event-ID': str(events[-3][0])}).data)
+        self.assertEqual([event for _, event, _ in resumed], ['merged', 'done'])
+
+    @patch('webapp.app.process_document_to_markdown', return_value=None)
+    def test_progress_events_for_failed_job(self, mock_process_document):
+        """测试转换失败的任务以 failed 事件结束"""
+        accepted, _ = self.upload_and_wait({'files[]': (io.BytesIO(b"docx"), 'bad.docx')})
+        events = self.parse_sse(self.client.get(f"/events?jobs={accepted[0]['job_id']}").data)
+        self.assertEqual(events[-1][1], 'failed')
+        self.assertIn('文件处理失败', events[-1][2]['message'])
+        self.assertEqual(self.client.get('/events?jobs=no-such-job').status_code, 404)
+
+    def write_result(self, upload, results_dir, name):
+        """模拟转换：在结果目录中写入 Markdown 文件并返回其路径"""
+        os.makedirs(results_dir, exist_ok=True)
+        output_path = os.path.join(results_dir, os.path.splitext(name)[0] + '.md')
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write('# 合同')
+        return output_path
+
+    @patch('webapp.app.process_document_to_markdown')
+    def test_repeated_upload_reuses_cached_result(self, mock_process_document):
+        """测试相同内容的文件再次上传时直接返回缓存结果，不再转换"""
+        mock_process_document.side_effect = self.write_result
+        first, _ = self.upload_and_wait({'files[]': (io.BytesIO(b"same bytes"), 'contract.docx')})
+
+        response = self.client.post('/upload', content_type='multipart/form-data',
+                                    data={'files[]': (io.BytesIO(b"same bytes"), 'copy.docx')})
+        second = json.loads(response.data.decode('utf-8'))
+        self.assertEqual(second[0]['status'], 'success') # 上传响应中即为最终结果
+        self.assertEqual(second[0]['reused'], 'cache')
+        self.assertEqual(second[0]['processed_filename'], f"{first[0]['job_id']}/contract.md")
+        self.assertEqual(mock_process_document.call_count, 1)
+        self.assertEqual(os.listdir(app.config['UPLOAD_FOLDER']), []) # 未使用的上传文件已删除
+
+        # 下载时使用本次上传的文件名
+        download = self.client.get(second[0]['result_url'])
+        self.assertEqual(download.data.decode('utf-8'), '# 合同')
+        self.assertIn('copy.md', download.headers['Content-Disposition'])
+        download.close()
+
+        # 内容不同或转换设置不同时不复用
+        self.upload_and_wait({'files[]': (io.BytesIO(b"other bytes"), 'contract.docx')})
+        with patch('webapp.app.conversion_settings', return_value={"model": "another-model"}):
+            self.upload_and_wait({'files[]': (io.BytesIO(b"same bytes"), 'contract.docx')})
+        self.assertEqual(mock_process_document.call_count, 3)
+
+    @patch('webapp.app.process_document_to_markdown')
+    def test_concurrent_identical_uploads_are_coalesced(self, mock_process_document):
+        """测试相同文件的并发上传合并为一次转换，两个任务得到相同的事件与结果"""
+        from auto_doc_markdown_converter.src.progress import report_progress
+        started, release = threading.Event(), threading.Event()
+
+        def side_effect_func(upload, results_dir, name):
+            report_progress("chunks", count=1)
+            started.set()
+            self.assertTrue(release.wait(5))
+            report_progress("chunk_done", index=0, completed=1, count=1)
+            return self.write_result(upload, results_dir, name)
+
+        mock_process_document.side_effect = side_effect_func
+        leader = json.loads(self.client.post('/upload', content_type='multipart/form-data',
+                                             data={'files[]': (io.BytesIO(b"same"), 'a.docx')}).data)[0]
+        self.assertTrue(started.wait(5))
+        follower = json.loads(self.client.post('/upload', content_type='multipart/form-data',
+                                               data={'files[]': (io.BytesIO(b"same"), 'b.docx')}).data)[0]
+        self.assertEqual(follower['reused'], 'in_flight')
+        self.assertEqual(follower['status'], 'running')
+        release.set()
+
+        self.assertTrue(job_queue.wait([leader['job_id'], follower['job_id']], timeout=10))
+        self.assertEqual(mock_process_document.call_count, 1)
+        statuses = [json.loads(self.client.get(f"/jobs/{job['job_id']}").data) for job in (leader, follower)]
+        self.assertEqual([status['status'] for status in statuses], ['success', 'success'])
+        self.assertEqual(statuses[0]['processed_filename'], statuses[1]['processed_filename'])
+        self.assertEqual(statuses[1]['chunks_completed'], 1)
+
+        events = self.parse_sse(self.client.get(f"/events?jobs={follower['job_id']}").data)
+        self.assertEqual([event for _, event, _ in events], ['queued', 'running', 'chunks', 'chunk_done', 'done'])
+        self.assertEqual(events[-1][2]['original_filename'], 'b.docx')
+
+    def test_result_cache_index_is_persistent(self):
+        """测试上传结果索引保存在结果目录中，结果文件被删除后条目失效"""
+        results_dir = app.config['RESULTS_FOLDER']
+        output_path = self.write_result(None, os.path.join(results_dir, 'job1'), 'doc.docx')
+        ResultCache(results_dir).put('key', output_path)
+        reloaded = ResultCache(results_dir)
+        self.assertEqual(reloaded.get('key'), output_path)
+        os.remove(output_path)
+        self.assertIsNone(reloaded.get('key'))
+        self.assertIsNone(ResultCache(results_dir).get('key'))
+
+    def test_result_cache_hits_do_not_rewrite_index(self):
+        """测试命中只在内存中更新最近使用时间，随后的 flush (或 put) 才写入索引"""
+        results_dir = app.config['RESULTS_FOLDER']
+        output_path = self.write_result(None, os.path.join(results_dir, 'job1'), 'doc.docx')
+        cache = ResultCache(results_dir)
+        cache.put('key', output_path)
+        saved_last_used = ResultCache(results_dir)._load_locked()['key']['last_used']
+        with patch.object(cache, '_save_locked', wraps=cache._save_locked) as mock_save:
+            for _ in range(5):
+                self.assertEqual(cache.get('key'), output_path)
+            mock_save.assert_not_called()
+            cache.flush()
+            self.assertEqual(mock_save.call_count, 1)
+            cache.flush()  # 没有新的更新时不再写入
+            self.assertEqual(mock_save.call_count, 1)
+        self.assertGreaterEqual(ResultCache(results_dir)._load_locked()['key']['last_used'], saved_last_used)
+
+        eager = ResultCache(results_dir, flush_interval=0)
+        with patch.object(eager, '_save_locked', wraps=eager._save_locked) as mock_save:
+            eager.get('key')
+            self.assertEqual(mock_save.call_count, 1)
+
+    def write_markdown(self, relative_path, markdown):
+        """在结果目录中写入一个 Markdown 文件"""
+        path = os.path.join(app.config['RESULTS_FOLDER'], relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(markdown)
+        return path
+
+    def test_download_is_compressed_and_conditional(self):
+        """测试下载时协商 gzip 压缩，并支持 ETag 条件请求"""
+        markdown = "\n\n".join(f"## 第 {i} 节\n\n第 {i} 节的正文内容。" for i in range(100))
+        self.write_markdown('job1/doc.md', markdown)
+
+        response = self.client.get('/download/job1/doc.md', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn('doc.md', response.headers['Content-Disposition'])
+        self.assertEqual(gzip.decompress(response.data).decode('utf-8'), markdown)
+        self.assertIsNotNone(response.headers.get('Last-Modified'))
+
+        etag = response.headers['ETag']
+        cached = self.client.get('/download/job1/doc.md', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+
+        # 未压缩的表示使用不同的 ETag
+        plain = self.client.get('/download/job1/doc.md')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertNotEqual(plain.headers['ETag'], etag)
+        self.assertEqual(plain.data.decode('utf-8'), markdown)
+
+    def test_download_range_request(self):
+        """测试下载支持 Range 请求"""
+        self.write_markdown('job1/doc.md', '# 合同\n\nabcdefghij')
+        response = self.client.get('/download/job1/doc.md', headers={'Range': 'bytes=0-9'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, '# 合同'.encode('utf-8') + b'\n\n')
+
+    def test_preview_is_paginated_by_section(self):
+        """测试服务器端预览：按章节分页，内容已转义，支持条件请求"""
+        self.write_markdown('job1/doc.md', "前言 <b>\n\n# 第一章\n\n正文一\n\n### 小节\n\n# 第二章\n\n正文二")
+
+        response = self.client.get('/preview/job1/doc.md')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data.decode('utf-8'))
+        self.assertEqual(data['section_count'], 3)
+        self.assertEqual(data['titles'], ['正文', '第一章', '第二章'])
+        self.assertEqual(data['html'], '<p>前言 &lt;b&gt;</p>')
+
+        response = self.client.get('/preview/job1/doc.md?section=1')
+        data = json.loads(response.data.decode('utf-8'))
+        self.assertEqual(data['html'], '<h1>第一章</h1>\n<p>正文一</p>\n<h3>小节</h3>')
+        cached = self.client.get('/preview/job1/doc.md?section=1', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+        self.assertEqual(self.client.get('/preview/job1/doc.md?section=3').status_code, 404)
+        self.assertEqual(self.client.get('/preview/job1/doc.md?section=x').status_code, 400)
+        self.assertEqual(self.client.get('/preview/job1/missing.md').status_code, 404)
+        self.assertEqual(self.client.get('/preview/../app.py').status_code, 404)
+
+    @patch('webapp.app.process_document_to_markdown')
+    def test_job_preview(self, mock_process_document):
+        """测试通过 /jobs/<id>/preview 预览转换结果"""
+        mock_process_document.side_effect = self.write_result
+        _, statuses = self.upload_and_wait({'files[]': (io.BytesIO(b"content"), 'contract.docx')})
+        response = self.client.get(statuses[0]['preview_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data.decode('utf-8'))['html'], '<h1>合同</h1>')
+
+    def test_unknown_job(self):
+        """测试查询不存在的任务"""
+        self.assertEqual(self.client.get('/jobs/no-such-job').status_code, 404)
+        self.assertEqual(self.client.get('/jobs/no-such-job/result').status_code, 404)
 
     @patch('webapp.app.process_document_to_markdown') 
     def test_upload_unsupported_file_type(self, mock_process_document):
         """测试上传不支持的文件类型"""
         data = {'files[]': (io.BytesIO(b"text content"), 'test.txt')}
         response = self.client.post('/upload', content_type='multipart/form-data', data=data)
-        self.assertEqual(response.status_code, 200) 
+        self.assertEqual(response.status_code, 202) 
         response_json = json.loads(response.data.decode('utf-8'))
         self.assertEqual(len(response_json), 1)
+        self.assertNotIn('job_id', response_json[0])
         self.assertEqual(response_json[0]['original_filename'], 'test.txt')
         self.assertEqual(response_json[0]['status'], 'error')
         self.assertIn("文件类型 '.txt' 不受支持", response_json[0]['message']) # 确保与 app.py 中的错误信息一致
@@ -158,12 +496,15 @@ class TestAppRoutes(unittest.TestCase):
     def test_upload_processing_fails(self, mock_process_document):
         """测试核心处理函数 process_document_to_markdown 返回 None (处理失败)"""
         data = {'files[]': (io.BytesIO(b"docx content"), 'fail_doc.docx')}
-        response = self.client.post('/upload', content_type='multipart/form-data', data=data)
-        self.assertEqual(response.status_code, 200)
-        response_json = json.loads(response.data.decode('utf-8'))
-        self.assertEqual(len(response_json), 1)
-        self.assertEqual(response_json[0]['status'], 'error')
-        self.assertIn('文件处理失败', response_json[0]['message'])
+        accepted, statuses = self.upload_and_wait(data)
+        self.assertEqual(len(statuses), 1)
+        self.assertEqual(statuses[0]['status'], 'error')
+        self.assertIn('文件处理失败', statuses[0]['message'])
+
+        # 失败任务的结果端点返回 409 和失败原因
+        response = self.client.get(f"/jobs/{accepted[0]['job_id']}/result")
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('文件处理失败', json.loads(response.data.decode('utf-8'))['error'])
 
     @patch('webapp.app.send_from_directory') 
     def test_download_file_success(self, mock_send_from_directory):